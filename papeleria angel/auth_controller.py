@@ -1,24 +1,23 @@
 #auth_controller.py
-from database import conectar
+from database import transaccion, SinConexion
+from versiones_tablas import incrementar_version
 import hashlib
 
 def hash_password(password):
     return hashlib.sha256(password.encode()).hexdigest()
 
+_SELECT_LOGIN = "SELECT * FROM usuarios WHERE correo = %s AND contraseña = %s"
+
 def login(correo, contraseña):
-    conn = conectar()
-    if not conn:
-        return False, "Error de conexión"
-    
-    cursor = conn.cursor(dictionary=True)
     hashed_pass = hash_password(contraseña)
     
-    query = "SELECT * FROM usuarios WHERE correo = %s AND contraseña = %s"
-    cursor.execute(query, (correo, hashed_pass))
-    usuario = cursor.fetchone()
-    
-    cursor.close()
-    conn.close()
+    try:
+        # La conexión vuelve al pool al salir del with, aunque la consulta falle
+        with transaccion(dictionary=True) as cursor:
+            cursor.execute(_SELECT_LOGIN, (correo, hashed_pass))
+            usuario = cursor.fetchone()
+    except SinConexion:
+        return False, "Error de conexión"
     
     if usuario:
         return True, usuario
@@ -26,11 +25,6 @@ def login(correo, contraseña):
         return False, "Correo o contraseña incorrectos"
 
 def registrar_usuario(nombre, correo, contraseña, rol="cajero"):
-    conn = conectar()
-    if not conn:
-        return False, "Error de conexión"
-    
-    cursor = conn.cursor()
     hashed_pass = hash_password(contraseña)
     
     query = """
@@ -38,13 +32,11 @@ def registrar_usuario(nombre, correo, contraseña, rol="cajero"):
     VALUES (%s, %s, %s, %s)
     """
     try:
-        cursor.execute(query, (nombre, correo, hashed_pass, rol))
-        conn.commit()
-        cursor.close()
-        conn.close()
+        with transaccion() as cursor:
+            cursor.execute(query, (nombre, correo, hashed_pass, rol))
+            incrementar_version(cursor, "usuarios")
         return True, "Usuario registrado exitosamente"
+    except SinConexion:
+        return False, "Error de conexión"
     except Exception as e:
-        conn.rollback()
-        cursor.close()
-        conn.close()
-        return False, f"Error al registrar: {str(e)}"
\ No newline at end of file
+        return False, f"Error al registrar: {str(e)}"
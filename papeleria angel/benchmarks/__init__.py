@@ -0,0 +1,6 @@
+# Benchmarks de la aplicación Papelería Ángel
+# Ejecutar desde la carpeta de la aplicación, contra una base de pruebas, p. ej.:
+#   python -m benchmarks.generador_datos --confirmar --vaciar   # datos sintéticos
+#   python -m benchmarks.suite --confirmar --guardar base.json  # todos los controladores
+#   python -m benchmarks.bench_registrar_venta --confirmar      # viajes por tamaño de carrito
+#   python -m benchmarks.verificar_transacciones                # puntos de guardado y al_confirmar (SQLite temporal)
@@ -0,0 +1,136 @@
+# bench_concurrencia.py
+"""
+Compara el rendimiento de consultas atendidas una a la vez (controladores
+síncronos) contra las mismas consultas concurrentes desde un bucle asyncio
+(datos_async).
+
+Simula clientes que piden sin pausa una mezcla de lecturas típicas de un front
+end (página del historial, pedidos, abonos de un pedido, totales del mes) y
+reporta solicitudes por segundo y latencia. Solo lee datos, así que puede
+correr contra cualquier base; con DB_BACKEND=sqlite es hermético.
+
+    python -m benchmarks.bench_concurrencia --solicitudes 400 --concurrencia 1 4 16 32
+
+El número de consultas simultáneas reales lo limita el ejecutor de datos_async
+(DATOS_ASYNC_HILOS o el tamaño máximo del pool de conexiones). La ganancia
+aparece cuando cada consulta espera al servidor (MySQL por red); con SQLite
+local el tiempo es casi todo CPU de Python y la concurrencia apenas ayuda.
+"""
+from datetime import datetime
+import argparse
+import asyncio
+import itertools
+import statistics
+import sys
+import time
+
+import database
+import datos_async
+import client_orders_controller
+import sales_history_controller
+import sales_rollup_controller
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[max(0, int(round(len(ordenados) * p / 100.0)) - 1)]
+
+
+def _armar_mezcla():
+    """[(nombre, función síncrona, gemela async, args)] con ids que existen en la base."""
+    with database.conexion() as conn:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("SELECT id FROM pedidos_cliente ORDER BY id DESC LIMIT 1")
+        fila = cursor.fetchone()
+        cursor.close()
+    inicio_mes = datetime.now().replace(day=1).strftime('%Y-%m-%d')
+
+    mezcla = [
+        ("historial", sales_history_controller.get_sales_history_page,
+         datos_async.get_sales_history_page_async, ()),
+        ("pedidos", client_orders_controller.obtener_pedidos_cliente,
+         datos_async.obtener_pedidos_cliente_async, ()),
+        ("totales_mes", sales_rollup_controller.obtener_totales_periodo,
+         datos_async.obtener_totales_periodo_async, (inicio_mes,)),
+    ]
+    if fila:
+        mezcla.append(("abonos", client_orders_controller.obtener_abonos_pedido,
+                       datos_async.obtener_abonos_pedido_async, (fila['id'],)))
+    return mezcla
+
+
+def medir_sincrono(mezcla, total):
+    """Una solicitud detrás de otra, como las atiende hoy un solo hilo."""
+    latencias = []
+    inicio = time.perf_counter()
+    for _, funcion, _, args in itertools.islice(itertools.cycle(mezcla), total):
+        t0 = time.perf_counter()
+        funcion(*args)
+        latencias.append((time.perf_counter() - t0) * 1000)
+    return time.perf_counter() - inicio, latencias
+
+
+async def _medir_async(mezcla, total, concurrencia):
+    pendientes = itertools.islice(itertools.cycle(mezcla), total)
+    latencias = []
+
+    async def cliente():
+        # Cada cliente toma la siguiente solicitud apenas termina la anterior
+        for _, _, gemela, args in pendientes:
+            t0 = time.perf_counter()
+            await gemela(*args)
+            latencias.append((time.perf_counter() - t0) * 1000)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(cliente() for _ in range(concurrencia)))
+    return time.perf_counter() - inicio, latencias
+
+
+def medir_async(mezcla, total, concurrencia):
+    return asyncio.run(_medir_async(mezcla, total, concurrencia))
+
+
+def _resumen(modo, concurrencia, duracion, latencias):
+    return {
+        'modo': modo,
+        'concurrencia': concurrencia,
+        'solicitudes_por_s': len(latencias) / duracion if duracion else 0.0,
+        'mediana_ms': statistics.median(latencias),
+        'p95_ms': _percentil(latencias, 95),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--solicitudes', type=int, default=400,
+                        help="Solicitudes por medición.")
+    parser.add_argument('--concurrencia', type=int, nargs='+', default=[1, 4, 16, 32],
+                        help="Clientes simultáneos a simular en modo async.")
+    args = parser.parse_args(argv)
+
+    try:
+        mezcla = _armar_mezcla()
+        # Calentamiento: abre conexiones del pool y llena cachés del servidor
+        medir_sincrono(mezcla, len(mezcla))
+        resultados = [_resumen("sync", 1, *medir_sincrono(mezcla, args.solicitudes))]
+        for concurrencia in args.concurrencia:
+            resultados.append(_resumen("async", concurrencia,
+                                       *medir_async(mezcla, args.solicitudes, concurrencia)))
+    except database.Error as e:
+        print(f"❌ Error de base de datos: {e}", file=sys.stderr)
+        return 1
+    finally:
+        datos_async.cerrar_ejecutor()
+
+    base = resultados[0]['solicitudes_por_s']
+    print(f"Hilos del ejecutor async: {datos_async._hilos_configurados()}")
+    print(f"{'Modo':<6} {'Clientes':>8} {'Solic/s':>9} {'x sync':>7} {'Mediana ms':>11} {'p95 ms':>9}")
+    for r in resultados:
+        factor = r['solicitudes_por_s'] / base if base else 0.0
+        print(f"{r['modo']:<6} {r['concurrencia']:>8} {r['solicitudes_por_s']:>9.1f} {factor:>7.2f} "
+              f"{r['mediana_ms']:>11.2f} {r['p95_ms']:>9.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,151 @@
+# bench_registrar_venta.py
+"""
+Mide viajes a la base de datos y latencia de registrar_venta según el tamaño del carrito.
+
+Registra ventas REALES en la base configurada (DB_HOST, DB_NAME...), por lo que
+debe ejecutarse contra una base de pruebas:
+
+    python -m benchmarks.bench_registrar_venta --confirmar --tamanos 1 5 10 20 40
+"""
+import argparse
+import statistics
+import sys
+import time
+
+import database
+import sales_controller
+
+
+class _CursorContador:
+    """Cursor que cuenta cada sentencia enviada al servidor."""
+
+    def __init__(self, cursor, contador):
+        self._cursor = cursor
+        self._contador = contador
+
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def execute(self, *args, **kwargs):
+        self._contador['viajes'] += 1
+        return self._cursor.execute(*args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        # mysql.connector convierte un INSERT ... VALUES en un único INSERT multi-fila
+        self._contador['viajes'] += 1
+        return self._cursor.executemany(*args, **kwargs)
+
+
+class _ConexionContadora:
+    """Conexión que cuenta sentencias, commits y rollbacks."""
+
+    def __init__(self, conn, contador):
+        self._conn = conn
+        self._contador = contador
+
+    def __getattr__(self, nombre):
+        return getattr(self._conn, nombre)
+
+    def cursor(self, *args, **kwargs):
+        return _CursorContador(self._conn.cursor(*args, **kwargs), self._contador)
+
+    def commit(self):
+        self._contador['viajes'] += 1
+        return self._conn.commit()
+
+    def rollback(self):
+        self._contador['viajes'] += 1
+        return self._conn.rollback()
+
+
+def _preparar_datos(max_items):
+    """Obtiene un cajero y los productos con más stock para armar carritos."""
+    with database.conexion() as conn:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("SELECT id FROM usuarios ORDER BY id LIMIT 1")
+        usuario = cursor.fetchone()
+        cursor.execute(
+            "SELECT id, precio_venta FROM productos WHERE activo = 1 AND stock > 0 "
+            "ORDER BY stock DESC LIMIT %s",
+            (max_items,)
+        )
+        productos = cursor.fetchall()
+        cursor.close()
+    if not usuario:
+        raise SystemExit("❌ No hay usuarios en la base de datos.")
+    return usuario['id'], productos
+
+
+def _armar_carrito(productos, tamano):
+    carrito = []
+    for p in productos[:tamano]:
+        precio = float(p['precio_venta'])
+        carrito.append({
+            'producto_id': p['id'],
+            'cantidad': 1,
+            'precio_unitario': precio,
+            'subtotal': precio,
+        })
+    return carrito
+
+
+def medir(usuario_id, productos, tamano, repeticiones):
+    contador = {'viajes': 0}
+    # transaccion() (que usa registrar_venta) pide la conexión a database.conectar
+    conectar_original = database.conectar
+
+    def conectar_contando(*args, **kwargs):
+        conn = conectar_original(*args, **kwargs)
+        return _ConexionContadora(conn, contador) if conn else conn
+
+    database.conectar = conectar_contando
+    tiempos = []
+    try:
+        for _ in range(repeticiones):
+            contador['viajes'] = 0
+            inicio = time.perf_counter()
+            ok, mensaje = sales_controller.registrar_venta(usuario_id, _armar_carrito(productos, tamano))
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+            if not ok:
+                raise SystemExit(f"❌ La venta de prueba falló: {mensaje}")
+    finally:
+        database.conectar = conectar_original
+
+    return {
+        'tamano': tamano,
+        'viajes': contador['viajes'],
+        # Enfoque anterior: SELECT + UPDATE por línea, INSERT venta, INSERT detalle y COMMIT
+        'viajes_por_linea': 2 * tamano + 3,
+        'mediana_ms': statistics.median(tiempos),
+        'p95_ms': sorted(tiempos)[max(0, int(len(tiempos) * 0.95) - 1)],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tamanos', type=int, nargs='+', default=[1, 5, 10, 20, 40],
+                        help="Tamaños de carrito a medir.")
+    parser.add_argument('--repeticiones', type=int, default=20)
+    parser.add_argument('--confirmar', action='store_true',
+                        help="Confirma que se pueden registrar ventas de prueba en la base configurada.")
+    args = parser.parse_args(argv)
+
+    if not args.confirmar:
+        parser.error("este benchmark registra ventas reales; use --confirmar contra una base de pruebas.")
+
+    usuario_id, productos = _preparar_datos(max(args.tamanos))
+    if len(productos) < max(args.tamanos):
+        print(f"⚠️ Solo hay {len(productos)} productos con stock; los carritos se recortan.", file=sys.stderr)
+
+    print(f"{'Carrito':>8} {'Viajes':>7} {'Antes':>7} {'Mediana ms':>11} {'p95 ms':>9}")
+    for tamano in args.tamanos:
+        r = medir(usuario_id, productos, tamano, args.repeticiones)
+        print(f"{r['tamano']:>8} {r['viajes']:>7} {r['viajes_por_linea']:>7} "
+              f"{r['mediana_ms']:>11.2f} {r['p95_ms']:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
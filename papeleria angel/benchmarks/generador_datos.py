@@ -0,0 +1,309 @@
+# generador_datos.py
+"""
+Llena una base de pruebas con datos sintéticos de volumen configurable.
+
+Crea el esquema con migraciones.py y luego inserta usuarios, proveedores,
+productos, clientes, ventas con su detalle, pedidos y abonos. Los datos son
+deterministas para una misma semilla, así dos corridas del benchmark sobre
+bases generadas igual son comparables.
+
+Escribe en la base configurada (DB_HOST, DB_NAME...), por lo que debe
+ejecutarse contra una base de pruebas:
+
+    python -m benchmarks.generador_datos --confirmar --vaciar
+    python -m benchmarks.generador_datos --confirmar --vaciar --escala 10
+    DB_BACKEND=sqlite DB_SQLITE_PATH=/tmp/bench.sqlite3 python -m benchmarks.generador_datos --confirmar --vaciar
+    python -m benchmarks.generador_datos --confirmar --productos 50000 --lineas 2000000 \\
+        --clientes 100000 --abonos 500000
+"""
+from datetime import datetime, timedelta
+import argparse
+import random
+import sys
+import time
+
+import database
+import migraciones
+from auth_controller import hash_password
+from sales_rollup_controller import reconstruir_resumen_en_cursor
+from versiones_tablas import incrementar_version
+
+# Volúmenes con --escala 1 (una papelería pequeña con un par de años de ventas)
+VOLUMENES_BASE = {
+    'usuarios': 10,
+    'proveedores': 50,
+    'productos': 5000,
+    'clientes': 10000,
+    'lineas': 200000,      # filas de detalle_venta
+    'pedidos': 20000,
+    'abonos': 50000,
+}
+
+LINEAS_POR_VENTA_MAX = 8
+DIAS_DE_HISTORIA = 730
+TAM_LOTE = 5000
+
+# Orden de vaciado: primero las tablas que referencian a otras
+_TABLAS = [
+    "resumen_ventas_diarias", "abonos", "detalle_pedido_cliente", "pedidos_cliente",
+    "detalle_venta", "ventas", "clientes", "productos", "proveedores", "usuarios",
+]
+
+_CATEGORIAS = ["Cuadernos", "Escritura", "Arte", "Oficina", "Papel", "Escolar",
+               "Adhesivos", "Archivo", "Mochilas", "Regalos"]
+_ARTICULOS = ["Cuaderno", "Lápiz", "Pluma", "Marcador", "Borrador", "Regla", "Carpeta",
+              "Folder", "Cartulina", "Pegamento", "Tijeras", "Colores", "Libreta", "Sobre"]
+_ADJETIVOS = ["rayado", "cuadriculado", "azul", "negro", "rojo", "profesional", "escolar",
+              "tamaño carta", "tamaño oficio", "metálico", "pastel", "neón"]
+_NOMBRES = ["Ana", "Luis", "María", "José", "Carmen", "Jorge", "Lucía", "Pedro",
+            "Sofía", "Miguel", "Elena", "Raúl", "Paola", "Diego", "Rosa", "Iván"]
+_APELLIDOS = ["García", "Hernández", "López", "Martínez", "González", "Pérez",
+              "Sánchez", "Ramírez", "Torres", "Flores", "Rivera", "Gómez"]
+_METODOS = ["Efectivo", "Tarjeta", "Transferencia"]
+
+
+def _insertar_lotes(conn, cursor, sql, filas, etiqueta):
+    """Inserta un iterable de tuplas por lotes (cada executemany es un INSERT multi-fila)."""
+    lote = []
+    total = 0
+    inicio = time.perf_counter()
+    for fila in filas:
+        lote.append(fila)
+        if len(lote) >= TAM_LOTE:
+            cursor.executemany(sql, lote)
+            conn.commit()
+            total += len(lote)
+            lote = []
+            print(f"\r   {etiqueta}: {total:,}", end="", flush=True)
+    if lote:
+        cursor.executemany(sql, lote)
+        conn.commit()
+        total += len(lote)
+    print(f"\r   {etiqueta}: {total:,} ({time.perf_counter() - inicio:.1f} s)")
+    return total
+
+
+def _siguiente_id(cursor, tabla):
+    cursor.execute(f"SELECT IFNULL(MAX(id), 0) + 1 FROM {tabla}")
+    return cursor.fetchone()[0]
+
+
+def generar(volumenes, semilla=42, vaciar=False):
+    """
+    Genera los datos sintéticos.
+
+    Args:
+        volumenes (dict): Cantidades por clave de VOLUMENES_BASE.
+        semilla (int): Semilla del generador aleatorio.
+        vaciar (bool): Vacía las tablas antes de insertar.
+
+    Returns:
+        dict: Filas insertadas por tabla.
+    """
+    ok, mensaje = migraciones.aplicar_migraciones()
+    print(mensaje)
+    if not ok:
+        raise SystemExit(1)
+
+    rnd = random.Random(semilla)
+    insertadas = {}
+    hoy = datetime.now().replace(microsecond=0)
+
+    with database.conexion() as conn:
+        cursor = conn.cursor()
+        try:
+            # Carga masiva: las referencias se generan válidas, no hace falta revisarlas fila por fila
+            cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+            if vaciar:
+                for tabla in _TABLAS:
+                    cursor.execute(f"TRUNCATE TABLE {tabla}")
+
+            # ---------------- Usuarios y proveedores ----------------
+            primer_usuario = _siguiente_id(cursor, "usuarios")
+            clave = hash_password("bench")
+            insertadas['usuarios'] = _insertar_lotes(conn, cursor, """
+                INSERT INTO usuarios (id, nombre, correo, contraseña, rol) VALUES (%s, %s, %s, %s, %s)
+            """, (
+                (primer_usuario + i, f"Cajero {i}", f"cajero{primer_usuario + i}@bench.local", clave,
+                 "admin" if i == 0 else "cajero")
+                for i in range(volumenes['usuarios'])
+            ), "usuarios")
+            usuarios = range(primer_usuario, primer_usuario + volumenes['usuarios'])
+
+            primer_proveedor = _siguiente_id(cursor, "proveedores")
+            insertadas['proveedores'] = _insertar_lotes(conn, cursor, """
+                INSERT INTO proveedores (id, nombre_empresa, contacto, telefono, correo) VALUES (%s, %s, %s, %s, %s)
+            """, (
+                (primer_proveedor + i, f"Distribuidora {i}", rnd.choice(_NOMBRES),
+                 f"55{rnd.randrange(10**8):08d}", f"ventas{i}@proveedor.local")
+                for i in range(volumenes['proveedores'])
+            ), "proveedores")
+
+            # ---------------- Productos ----------------
+            primer_producto = _siguiente_id(cursor, "productos")
+            precios = []
+
+            def productos():
+                for i in range(volumenes['productos']):
+                    compra = round(rnd.uniform(2, 400), 2)
+                    venta = round(compra * rnd.uniform(1.2, 1.8), 2)
+                    precios.append(venta)
+                    nombre = f"{rnd.choice(_ARTICULOS)} {rnd.choice(_ADJETIVOS)} {i}"
+                    yield (primer_producto + i, nombre, f"Descripción de {nombre}", compra, venta,
+                           rnd.randint(50, 5000), rnd.choice(_CATEGORIAS),
+                           primer_proveedor + rnd.randrange(volumenes['proveedores']),
+                           (hoy - timedelta(days=rnd.randrange(DIAS_DE_HISTORIA))).strftime('%Y-%m-%d'),
+                           0 if rnd.random() < 0.03 else 1,
+                           f"750{primer_producto + i:010d}")  # Código de barras de 13 dígitos
+
+            insertadas['productos'] = _insertar_lotes(conn, cursor, """
+                INSERT INTO productos (id, nombre, descripcion, precio_compra, precio_venta, stock,
+                                       categoria, proveedor_id, fecha_ingreso, activo, sku)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """, productos(), "productos")
+
+            # ---------------- Clientes ----------------
+            primer_cliente = _siguiente_id(cursor, "clientes")
+            insertadas['clientes'] = _insertar_lotes(conn, cursor, """
+                INSERT INTO clientes (id, nombre, apellido, telefono, direccion, email) VALUES (%s, %s, %s, %s, %s, %s)
+            """, (
+                (primer_cliente + i, rnd.choice(_NOMBRES), f"{rnd.choice(_APELLIDOS)} {rnd.choice(_APELLIDOS)}",
+                 f"55{rnd.randrange(10**8):08d}", f"Calle {rnd.randint(1, 300)} #{rnd.randint(1, 999)}",
+                 f"cliente{primer_cliente + i}@correo.local")
+                for i in range(volumenes['clientes'])
+            ), "clientes")
+
+            # ---------------- Ventas y detalle ----------------
+            # Primero se arma el detalle (venta por venta) y después se insertan las
+            # ventas con su total; ambas tablas se escriben por lotes intercalados.
+            primera_venta = _siguiente_id(cursor, "ventas")
+            primer_detalle = _siguiente_id(cursor, "detalle_venta")
+            ventas_lote, detalle_lote = [], []
+            venta_id, detalle_id, lineas = primera_venta, primer_detalle, 0
+            segundos_historia = DIAS_DE_HISTORIA * 86400
+            sql_venta = "INSERT INTO ventas (id, usuario_id, cliente_id, fecha_venta, total) VALUES (%s, %s, %s, %s, %s)"
+            sql_detalle = """
+                INSERT INTO detalle_venta (id, venta_id, producto_id, cantidad, precio_unitario, subtotal)
+                VALUES (%s, %s, %s, %s, %s, %s)
+            """
+            inicio = time.perf_counter()
+            while lineas < volumenes['lineas']:
+                n = min(rnd.randint(1, LINEAS_POR_VENTA_MAX), volumenes['lineas'] - lineas)
+                total = 0.0
+                for producto in rnd.sample(range(len(precios)), min(n, len(precios))):
+                    cantidad = rnd.randint(1, 5)
+                    subtotal = round(precios[producto] * cantidad, 2)
+                    total += subtotal
+                    detalle_lote.append((detalle_id, venta_id, primer_producto + producto,
+                                         cantidad, precios[producto], subtotal))
+                    detalle_id += 1
+                    lineas += 1
+                fecha = hoy - timedelta(seconds=rnd.randrange(segundos_historia))
+                ventas_lote.append((venta_id, rnd.choice(usuarios), None,
+                                    fecha.strftime('%Y-%m-%d %H:%M:%S'), round(total, 2)))
+                venta_id += 1
+
+                if len(detalle_lote) >= TAM_LOTE:
+                    cursor.executemany(sql_venta, ventas_lote)
+                    cursor.executemany(sql_detalle, detalle_lote)
+                    conn.commit()
+                    ventas_lote, detalle_lote = [], []
+                    print(f"\r   detalle_venta: {lineas:,}", end="", flush=True)
+            if ventas_lote:
+                cursor.executemany(sql_venta, ventas_lote)
+                cursor.executemany(sql_detalle, detalle_lote)
+                conn.commit()
+            insertadas['ventas'] = venta_id - primera_venta
+            insertadas['detalle_venta'] = lineas
+            print(f"\r   detalle_venta: {lineas:,} en {insertadas['ventas']:,} ventas "
+                  f"({time.perf_counter() - inicio:.1f} s)")
+
+            # ---------------- Pedidos y abonos ----------------
+            primer_pedido = _siguiente_id(cursor, "pedidos_cliente")
+            totales_pedido = []
+
+            def pedidos():
+                for i in range(volumenes['pedidos']):
+                    fecha = hoy - timedelta(days=rnd.randrange(DIAS_DE_HISTORIA))
+                    total = round(rnd.uniform(100, 5000), 2)
+                    totales_pedido.append(total)
+                    yield (primer_pedido + i, primer_cliente + rnd.randrange(volumenes['clientes']),
+                           fecha.strftime('%Y-%m-%d'), (fecha + timedelta(days=7)).strftime('%Y-%m-%d'),
+                           total, "Pendiente")
+
+            insertadas['pedidos_cliente'] = _insertar_lotes(conn, cursor, """
+                INSERT INTO pedidos_cliente (id, cliente_id, fecha_pedido, fecha_entrega_estimada, total, estado)
+                VALUES (%s, %s, %s, %s, %s, %s)
+            """, pedidos(), "pedidos_cliente")
+
+            insertadas['abonos'] = _insertar_lotes(conn, cursor, """
+                INSERT INTO abonos (pedido_cliente_id, fecha_abono, monto, metodo_pago, usuario_id)
+                VALUES (%s, %s, %s, %s, %s)
+            """, (
+                (primer_pedido + pedido,
+                 (hoy - timedelta(seconds=rnd.randrange(segundos_historia))).strftime('%Y-%m-%d %H:%M:%S'),
+                 round(totales_pedido[pedido] * rnd.uniform(0.05, 0.3), 2),
+                 rnd.choice(_METODOS), rnd.choice(usuarios))
+                for pedido in (rnd.randrange(len(totales_pedido)) for _ in range(volumenes['abonos']))
+            ) if totales_pedido else (), "abonos")
+
+            # ---------------- Datos derivados ----------------
+            print("   Recalculando saldos y resumen diario...")
+            migraciones._rellenar_total_abonado(cursor)
+            cursor.execute("""
+                UPDATE pedidos_cliente
+                SET estado = CASE WHEN total_abonado >= total - 0.01 THEN 'Pagado'
+                                  WHEN total_abonado > 0 THEN 'Abonado' ELSE 'Pendiente' END
+            """)
+            reconstruir_resumen_en_cursor(cursor)
+            # Las copias de proveedores, usuarios y clientes en memoria deben volver a leerse
+            for tabla in ("usuarios", "proveedores", "clientes"):
+                incrementar_version(cursor, tabla)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            try:
+                cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+            finally:
+                cursor.close()
+
+    return insertadas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--escala', type=float, default=1.0,
+                        help="Multiplica todos los volúmenes base (por defecto 1).")
+    for clave, valor in VOLUMENES_BASE.items():
+        parser.add_argument(f'--{clave}', type=int, help=f"Cantidad de {clave} (base {valor:,}).")
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--vaciar', action='store_true', help="Vacía las tablas antes de generar.")
+    parser.add_argument('--confirmar', action='store_true',
+                        help="Confirma que se pueden escribir datos de prueba en la base configurada.")
+    args = parser.parse_args(argv)
+
+    if not args.confirmar:
+        parser.error("este script escribe (y con --vaciar borra) datos; use --confirmar contra una base de pruebas.")
+
+    volumenes = {}
+    for clave, valor in VOLUMENES_BASE.items():
+        explicito = getattr(args, clave)
+        volumenes[clave] = explicito if explicito is not None else max(1, int(valor * args.escala))
+    volumenes['usuarios'] = max(1, volumenes['usuarios'])
+
+    print("Volúmenes: " + ", ".join(f"{k}={v:,}" for k, v in volumenes.items()))
+    inicio = time.perf_counter()
+    try:
+        insertadas = generar(volumenes, semilla=args.semilla, vaciar=args.vaciar)
+    except database.Error as e:
+        print(f"❌ Error de base de datos: {e}", file=sys.stderr)
+        return 1
+    print(f"✅ Datos generados en {time.perf_counter() - inicio:.1f} s: "
+          + ", ".join(f"{k}={v:,}" for k, v in insertadas.items()))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
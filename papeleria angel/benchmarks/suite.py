@@ -0,0 +1,335 @@
+# suite.py
+"""
+Benchmark de extremo a extremo de los controladores principales.
+
+Mide cada punto de entrada tal como lo llaman las vistas (catálogo, venta,
+historial paginado, pedidos, exportación...) y genera un reporte JSON que se
+puede comparar con corridas anteriores. Usa la base configurada (DB_HOST,
+DB_NAME...), normalmente una llenada con benchmarks.generador_datos.
+
+    python -m benchmarks.suite --confirmar --guardar base.json
+    python -m benchmarks.suite --confirmar --comparar base.json --tolerancia 15
+    python -m benchmarks.suite --casos catalogo historial_profundo --repeticiones 50
+
+Con DB_BACKEND=sqlite y DB_SQLITE_PATH apuntando a un archivo propio (llenado
+con el generador) la corrida es hermética: no depende de un servidor MySQL.
+
+registrar_venta y registrar_abono escriben datos reales; por eso se exige --confirmar.
+"""
+from datetime import datetime, timedelta
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+import database
+import metricas_sql
+import client_orders_controller
+import clientes_controller
+import products_controller
+import sales_controller
+import sales_history_controller
+import sales_rollup_controller
+from export_controller import exportar_filas_csv
+
+_TABLAS_CONTADAS = ["productos", "clientes", "ventas", "detalle_venta", "pedidos_cliente", "abonos"]
+
+
+class Contexto:
+    """Datos de la base que necesitan los casos (ids existentes, tokens de página...)."""
+
+    def __init__(self):
+        hoy = datetime.now()
+        self.hoy = hoy.strftime('%Y-%m-%d')
+        self.hace_30 = (hoy - timedelta(days=30)).strftime('%Y-%m-%d')
+        self.inicio_mes = hoy.replace(day=1).strftime('%Y-%m-%d')
+        self.usuario_id = None
+        self.productos_venta = []
+        self.pedido_id = None
+        self.token_profundo = None
+        self.volumenes = {}
+
+    def preparar(self, paginas_profundas):
+        with database.conexion() as conn:
+            cursor = conn.cursor(dictionary=True)
+            try:
+                for tabla in _TABLAS_CONTADAS:
+                    cursor.execute(f"SELECT COUNT(*) AS n FROM {tabla}")
+                    self.volumenes[tabla] = cursor.fetchone()['n']
+                cursor.execute("SELECT id FROM usuarios ORDER BY id LIMIT 1")
+                fila = cursor.fetchone()
+                self.usuario_id = fila['id'] if fila else None
+                cursor.execute("""
+                    SELECT id, precio_venta, sku FROM productos
+                    WHERE activo = 1 AND stock > 1000 ORDER BY stock DESC LIMIT 5
+                """)
+                self.productos_venta = cursor.fetchall()
+                # Pedido con saldo pendiente y varios abonos
+                cursor.execute("""
+                    SELECT id FROM pedidos_cliente
+                    WHERE total - total_abonado > 1 ORDER BY id DESC LIMIT 1
+                """)
+                fila = cursor.fetchone()
+                self.pedido_id = fila['id'] if fila else None
+            finally:
+                cursor.close()
+
+        # Token de una página lejana del historial completo, para medir el costo de seguir paginando
+        token = None
+        for _ in range(paginas_profundas):
+            ok, pagina = sales_history_controller.get_sales_history_page(token=token)
+            if not ok or not pagina['token_siguiente']:
+                break
+            token = pagina['token_siguiente']
+        self.token_profundo = token
+
+
+# ============================================================
+# CASOS
+# ============================================================
+# Cada caso recibe el contexto y devuelve cuántas filas produjo (o None).
+
+def caso_catalogo(ctx):
+    return len(products_controller.get_all_products())
+
+
+def caso_productos_activos(ctx):
+    return len(sales_controller.obtener_productos_activos())
+
+
+def caso_producto_por_codigo(ctx):
+    # Lo que hace la caja con cada lectura del escáner que no está entre los productos ya cargados
+    encontrados = [sales_controller.obtener_producto_por_codigo(p['sku']) for p in ctx.productos_venta if p['sku']]
+    return sum(1 for p in encontrados if p)
+
+
+def caso_clientes(ctx):
+    return len(clientes_controller.obtener_todos_clientes())
+
+
+def caso_registrar_venta(ctx):
+    if not (ctx.usuario_id and ctx.productos_venta):
+        return None
+    carrito = [{
+        'producto_id': p['id'],
+        'cantidad': 1,
+        'precio_unitario': float(p['precio_venta']),
+        'subtotal': float(p['precio_venta']),
+    } for p in ctx.productos_venta]
+    ok, mensaje = sales_controller.registrar_venta(ctx.usuario_id, carrito)
+    if not ok:
+        raise RuntimeError(mensaje)
+    return len(carrito)
+
+
+def caso_historial_primera(ctx):
+    ok, pagina = sales_history_controller.get_sales_history_page(ctx.hace_30, ctx.hoy)
+    if not ok:
+        raise RuntimeError(pagina)
+    return len(pagina['ventas'])
+
+
+def caso_historial_profundo(ctx):
+    if not ctx.token_profundo:
+        return None
+    ok, pagina = sales_history_controller.get_sales_history_page(token=ctx.token_profundo)
+    if not ok:
+        raise RuntimeError(pagina)
+    return len(pagina['ventas'])
+
+
+def caso_totales_mes(ctx):
+    return 1 if sales_rollup_controller.obtener_totales_periodo(ctx.inicio_mes, ctx.hoy) else 0
+
+
+def caso_pedidos(ctx):
+    return len(client_orders_controller.obtener_pedidos_cliente())
+
+
+def caso_abonos_pedido(ctx):
+    if not ctx.pedido_id:
+        return None
+    return len(client_orders_controller.obtener_abonos_pedido(ctx.pedido_id))
+
+
+def caso_registrar_abono(ctx):
+    if not (ctx.pedido_id and ctx.usuario_id):
+        return None
+    ok, mensaje = client_orders_controller.registrar_abono(ctx.pedido_id, 0.01, "Efectivo", ctx.usuario_id)
+    if not ok:
+        raise RuntimeError(mensaje)
+    return 1
+
+
+def caso_exportar_historial(ctx):
+    columnas = {"venta_id": "ID_Venta", "fecha_venta": "Fecha", "producto_nombre": "Producto",
+                "cantidad": "Cantidad", "total": "Total", "usuario_nombre": "Vendedor"}
+    descriptor, ruta = tempfile.mkstemp(suffix=".csv")
+    os.close(descriptor)
+    filas = sales_history_controller.iterar_historial_ventas(ctx.hace_30, ctx.hoy)
+    try:
+        ok, mensaje = exportar_filas_csv(filas, ruta, list(columnas.values()), mapa_columnas=columnas)
+        return os.path.getsize(ruta) if ok and os.path.exists(ruta) else 0
+    finally:
+        filas.close()
+        if os.path.exists(ruta):
+            os.remove(ruta)
+
+
+# (nombre, función, escribe_datos)
+CASOS = [
+    ("catalogo", caso_catalogo, False),
+    ("productos_activos", caso_productos_activos, False),
+    ("producto_por_codigo", caso_producto_por_codigo, False),
+    ("clientes", caso_clientes, False),
+    ("registrar_venta", caso_registrar_venta, True),
+    ("historial_primera", caso_historial_primera, False),
+    ("historial_profundo", caso_historial_profundo, False),
+    ("totales_mes", caso_totales_mes, False),
+    ("pedidos", caso_pedidos, False),
+    ("abonos_pedido", caso_abonos_pedido, False),
+    ("registrar_abono", caso_registrar_abono, True),
+    ("exportar_historial", caso_exportar_historial, False),
+]
+
+
+# ============================================================
+# EJECUCIÓN Y REPORTE
+# ============================================================
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[max(0, int(round(len(ordenados) * p / 100.0)) - 1)]
+
+
+def medir_caso(funcion, ctx, repeticiones, calentamiento):
+    for _ in range(calentamiento):
+        funcion(ctx)
+
+    tiempos = []
+    resultado = None
+    metricas_sql.reiniciar()
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion(ctx)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+        if resultado is None:
+            return None
+    sentencias = sum(c['ejecuciones'] for c in metricas_sql.instantanea())
+
+    return {
+        'repeticiones': repeticiones,
+        'mediana_ms': round(statistics.median(tiempos), 3),
+        'p95_ms': round(_percentil(tiempos, 95), 3),
+        'min_ms': round(min(tiempos), 3),
+        'sentencias_por_llamada': round(sentencias / repeticiones, 2) if metricas_sql.activo() else None,
+        'resultado': resultado,
+    }
+
+
+def ejecutar(nombres=None, repeticiones=10, calentamiento=1, paginas_profundas=50):
+    ctx = Contexto()
+    ctx.preparar(paginas_profundas)
+
+    casos = {}
+    for nombre, funcion, _ in CASOS:
+        if nombres and nombre not in nombres:
+            continue
+        print(f"   {nombre}...", end="", flush=True)
+        datos = medir_caso(funcion, ctx, repeticiones, calentamiento)
+        if datos is None:
+            print(" omitido (sin datos)")
+            continue
+        print(f" {datos['mediana_ms']:.2f} ms")
+        casos[nombre] = datos
+
+    return {
+        'generado_en': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'entorno': {
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'motor': database.dialecto(),
+            'replica_lectura': database.replica_configurada(),
+            'db_host': os.getenv('DB_HOST', 'localhost'),
+            'db_name': os.getenv('DB_NAME', 'papeleria_angel'),
+            'volumenes': ctx.volumenes,
+        },
+        'casos': casos,
+    }
+
+
+def comparar(actual, base, tolerancia):
+    """
+    Imprime la variación de la mediana contra un reporte anterior.
+
+    Returns:
+        list: Nombres de los casos más lentos que la tolerancia (en %).
+    """
+    if base['entorno'].get('volumenes') != actual['entorno'].get('volumenes'):
+        print("⚠️ Los volúmenes de datos difieren del reporte base; la comparación es orientativa.")
+
+    regresiones = []
+    print(f"\n{'Caso':<20} {'Base ms':>10} {'Actual ms':>10} {'Cambio':>9}")
+    for nombre, datos in actual['casos'].items():
+        anterior = base['casos'].get(nombre)
+        if not anterior:
+            print(f"{nombre:<20} {'—':>10} {datos['mediana_ms']:>10.2f} {'nuevo':>9}")
+            continue
+        cambio = (datos['mediana_ms'] - anterior['mediana_ms']) / anterior['mediana_ms'] * 100 \
+            if anterior['mediana_ms'] else 0.0
+        marca = ""
+        if cambio > tolerancia:
+            marca = " ❌"
+            regresiones.append(nombre)
+        elif cambio < -tolerancia:
+            marca = " ✅"
+        print(f"{nombre:<20} {anterior['mediana_ms']:>10.2f} {datos['mediana_ms']:>10.2f} {cambio:>+8.1f}%{marca}")
+    return regresiones
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--casos', nargs='+', choices=[nombre for nombre, _, _ in CASOS],
+                        help="Casos a ejecutar (por defecto todos).")
+    parser.add_argument('--repeticiones', type=int, default=10)
+    parser.add_argument('--calentamiento', type=int, default=1)
+    parser.add_argument('--paginas-profundas', type=int, default=50,
+                        help="Páginas del historial a recorrer para el caso historial_profundo.")
+    parser.add_argument('--guardar', help="Ruta del reporte JSON a generar.")
+    parser.add_argument('--comparar', help="Reporte JSON anterior contra el cual comparar.")
+    parser.add_argument('--tolerancia', type=float, default=10.0,
+                        help="Porcentaje de aumento de la mediana considerado regresión.")
+    parser.add_argument('--confirmar', action='store_true',
+                        help="Confirma que se pueden registrar ventas y abonos de prueba en la base configurada.")
+    args = parser.parse_args(argv)
+
+    escriben = [nombre for nombre, _, escribe in CASOS if escribe and (not args.casos or nombre in args.casos)]
+    if escriben and not args.confirmar:
+        parser.error(f"los casos {', '.join(escriben)} escriben datos reales; use --confirmar "
+                     "contra una base de pruebas o elija otros con --casos.")
+
+    try:
+        reporte = ejecutar(args.casos, args.repeticiones, args.calentamiento, args.paginas_profundas)
+    except database.Error as e:
+        print(f"❌ Error de base de datos: {e}", file=sys.stderr)
+        return 1
+
+    if args.guardar:
+        with open(args.guardar, 'w', encoding='utf-8') as archivo:
+            json.dump(reporte, archivo, ensure_ascii=False, indent=2)
+        print(f"✅ Reporte guardado en {args.guardar}")
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as archivo:
+            base = json.load(archivo)
+        if comparar(reporte, base, args.tolerancia):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,124 @@
+# verificar_transacciones.py
+"""
+Verifica la unidad de trabajo de database (transaccion() con puntos de guardado
+y al_confirmar) contra una base SQLite temporal: no toca la base configurada.
+
+    python -m benchmarks.verificar_transacciones
+
+Cada caso anida bloques transaccion() como lo hacen los controladores y
+compara los datos confirmados y las acciones ejecutadas tras el COMMIT.
+"""
+import os
+import sys
+import tempfile
+
+
+class _Falla(Exception):
+    pass
+
+
+def _preparar_base(carpeta):
+    # Antes de la primera conexión: el pool se crea con el motor configurado en ese momento
+    os.environ['DB_BACKEND'] = 'sqlite'
+    os.environ['DB_SQLITE_PATH'] = os.path.join(carpeta, 'verificacion.sqlite3')
+    os.environ.pop('DB_SQLITE_READ_PATH', None)
+    import database
+    with database.transaccion() as cursor:
+        cursor.execute("CREATE TABLE IF NOT EXISTS contadores (id INT PRIMARY KEY, valor INT NOT NULL)")
+    return database
+
+
+def _reiniciar(database):
+    with database.transaccion() as cursor:
+        cursor.execute("DELETE FROM contadores")
+        cursor.execute("INSERT INTO contadores (id, valor) VALUES (1, 0), (2, 0)")
+
+
+def _valores(database):
+    with database.transaccion() as cursor:
+        cursor.execute("SELECT id, valor FROM contadores ORDER BY id")
+        return {fila[0]: fila[1] for fila in cursor.fetchall()}
+
+
+def _comprobar(nombre, obtenido, esperado):
+    if obtenido != esperado:
+        raise _Falla(f"{nombre}: se esperaba {esperado!r} y se obtuvo {obtenido!r}")
+
+
+def caso_hermano_revertido(database):
+    """Un punto confirmado conserva su acción aunque un punto hermano posterior se deshaga."""
+    _reiniciar(database)
+    llamadas = []
+    with database.transaccion() as externo:
+        with database.transaccion() as cursor:
+            cursor.execute("UPDATE contadores SET valor = 1 WHERE id = 1")
+            database.al_confirmar(llamadas.append, "primero")
+        try:
+            with database.transaccion() as cursor:
+                cursor.execute("UPDATE contadores SET valor = 1 WHERE id = 2")
+                database.al_confirmar(llamadas.append, "segundo")
+                raise ValueError("falla del bloque hermano")
+        except ValueError:
+            pass
+        externo.execute("SELECT 1")
+    _comprobar("datos", _valores(database), {1: 1, 2: 0})
+    _comprobar("acciones", llamadas, ["primero"])
+
+
+def caso_anidado_en_hermano(database):
+    """Lo confirmado dentro de un punto ya liberado sobrevive al revertir un hermano más profundo."""
+    _reiniciar(database)
+    llamadas = []
+    with database.transaccion():
+        with database.transaccion():
+            with database.transaccion() as cursor:
+                cursor.execute("UPDATE contadores SET valor = 5 WHERE id = 1")
+                database.al_confirmar(llamadas.append, "interno")
+        with database.transaccion():
+            with database.transaccion() as cursor:
+                cursor.execute("UPDATE contadores SET valor = 5 WHERE id = 2")
+                database.al_confirmar(llamadas.append, "revertido")
+                cursor.revertir()
+    _comprobar("datos", _valores(database), {1: 5, 2: 0})
+    _comprobar("acciones", llamadas, ["interno"])
+
+
+def caso_externa_revertida(database):
+    """Si la transacción externa se deshace no se ejecuta ninguna acción."""
+    _reiniciar(database)
+    llamadas = []
+    try:
+        with database.transaccion():
+            with database.transaccion() as cursor:
+                cursor.execute("UPDATE contadores SET valor = 9 WHERE id = 1")
+                database.al_confirmar(llamadas.append, "liberado")
+            raise ValueError("falla de la transacción externa")
+    except ValueError:
+        pass
+    _comprobar("datos", _valores(database), {1: 0, 2: 0})
+    _comprobar("acciones", llamadas, [])
+
+
+CASOS = [caso_hermano_revertido, caso_anidado_en_hermano, caso_externa_revertida]
+
+
+def main(argv=None):
+    with tempfile.TemporaryDirectory() as carpeta:
+        database = _preparar_base(carpeta)
+        fallas = 0
+        try:
+            for caso in CASOS:
+                try:
+                    caso(database)
+                except _Falla as e:
+                    fallas += 1
+                    print(f"❌ {caso.__name__}: {e}")
+                else:
+                    print(f"✅ {caso.__name__}")
+        finally:
+            database.cerrar_pool()
+    return 1 if fallas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,284 @@
+# busqueda_productos.py
+"""
+Búsqueda de productos por nombre, código SKU, descripción, categoría y proveedor.
+
+Dos motores:
+  - "memoria" (por defecto): índice invertido que mantiene la caché del
+    catálogo (catalogo_cache). Cada palabra normalizada (minúsculas, sin
+    acentos) apunta a los productos que la contienen; las palabras se guardan
+    además en una lista ordenada, así un prefijo ("cuad") se resuelve con
+    bisect sobre ese rango. Responde en milisegundos con 100 mil productos.
+  - "fulltext": MATCH ... AGAINST sobre los índices FULLTEXT de la migración 6,
+    para catálogos que no conviene tener completos en memoria. Se elige con
+    BUSQUEDA_PRODUCTOS=fulltext; si el índice no existe se vuelve al de memoria.
+
+Los resultados se ordenan primero por nombres que empiezan con lo escrito,
+luego por coincidencias en el nombre o el código y al final en los demás campos.
+"""
+from bisect import bisect_left, insort
+from database import conectar, es_sqlite, Error
+import heapq
+import logging
+import os
+import re
+import unicodedata
+
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger(__name__)
+
+MOTOR_MEMORIA = "memoria"
+MOTOR_FULLTEXT = "fulltext"
+
+# Peso de cada campo al ordenar (menor = más relevante)
+_CAMPOS = (("nombre", 0), ("sku", 0), ("categoria", 1), ("proveedor_nombre", 1), ("descripcion", 2))
+_NIVELES = 3
+
+_PALABRA = re.compile(r"[a-z0-9]+")
+_FIN_PREFIJO = "\uffff"
+
+# Error de MySQL "Can't find FULLTEXT index matching the column list"
+_ER_FT_MATCHING_KEY_NOT_FOUND = 1191
+
+# {con_stock}: "" o "AND p.stock > 0"; los tres %s reciben la misma consulta booleana
+_SELECT_FULLTEXT = """
+    SELECT
+        p.id, p.nombre, p.descripcion, p.precio_compra, p.precio_venta, p.stock,
+        p.categoria, p.proveedor_id, p.fecha_ingreso, pr.nombre_empresa AS proveedor_nombre
+    FROM productos p
+    INNER JOIN proveedores pr ON p.proveedor_id = pr.id
+    WHERE p.activo = 1 {con_stock}
+      AND (MATCH(p.nombre, p.descripcion, p.categoria) AGAINST (%s IN BOOLEAN MODE)
+           OR p.proveedor_id IN (SELECT id FROM proveedores
+                                 WHERE MATCH(nombre_empresa) AGAINST (%s IN BOOLEAN MODE)))
+    ORDER BY MATCH(p.nombre, p.descripcion, p.categoria) AGAINST (%s IN BOOLEAN MODE) DESC, p.nombre
+    LIMIT %s
+"""
+# innodb_ft_min_token_size por defecto: palabras más cortas no están en el índice FULLTEXT
+_MIN_PALABRA_FULLTEXT = 3
+
+
+_SIN_ACENTOS = str.maketrans("áàäâãéèëêíìïîóòöôõúùüûñçý", "aaaaaeeeeiiiiooooouuuuncy")
+
+
+def normalizar_texto(texto):
+    """'Cuaderno Profesional Ñ' -> 'cuaderno profesional n'."""
+    texto = str(texto or "").lower().translate(_SIN_ACENTOS)
+    if texto.isascii():
+        return texto
+    # Otros signos diacríticos (poco comunes): descomposición completa
+    texto = unicodedata.normalize("NFKD", texto)
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+
+def palabras(texto):
+    return _PALABRA.findall(normalizar_texto(texto))
+
+
+class IndiceBusqueda:
+    """
+    Índice invertido con búsqueda por prefijo sobre los productos del catálogo.
+
+    Hay una lista de ocurrencias por peso de campo (nombre, categoría/proveedor,
+    descripción), así cada nivel de relevancia se obtiene con operaciones de
+    conjuntos sin puntuar producto por producto. No es seguro entre hilos por
+    sí mismo: CatalogoProductos lo usa bajo su lock.
+    """
+
+    def __init__(self, productos=()):
+        self._postings = tuple({} for _ in range(_NIVELES))   # por peso: palabra -> set(ids)
+        self._pesos = {}           # id -> {palabra: peso del mejor campo}
+        self._nombre = {}          # id -> nombre normalizado
+        self._usos = {}            # palabra -> productos que la contienen (en cualquier campo)
+        # Listas ordenadas para bisect; None = se arman en la próxima búsqueda
+        self._palabras = None
+        self._nombres = None       # (nombre normalizado, id)
+        for producto in productos:
+            self.agregar(producto)
+
+    def __len__(self):
+        return len(self._pesos)
+
+    def agregar(self, producto):
+        producto_id = producto['id']
+        self.quitar(producto_id)
+
+        pesos = {}
+        for campo, peso in _CAMPOS:
+            for palabra in palabras(producto.get(campo)):
+                if peso < pesos.get(palabra, _NIVELES):
+                    pesos[palabra] = peso
+        nombre = " ".join(palabras(producto.get('nombre')))
+        self._pesos[producto_id] = pesos
+        self._nombre[producto_id] = nombre
+
+        for palabra, peso in pesos.items():
+            self._postings[peso].setdefault(palabra, set()).add(producto_id)
+            usos = self._usos.get(palabra, 0)
+            self._usos[palabra] = usos + 1
+            if not usos and self._palabras is not None:
+                insort(self._palabras, palabra)
+        if self._nombres is not None:
+            insort(self._nombres, (nombre, producto_id))
+
+    def quitar(self, producto_id):
+        pesos = self._pesos.pop(producto_id, None)
+        if pesos is None:
+            return
+        for palabra, peso in pesos.items():
+            ids = self._postings[peso][palabra]
+            ids.discard(producto_id)
+            if not ids:
+                del self._postings[peso][palabra]
+            self._usos[palabra] -= 1
+            if not self._usos[palabra]:
+                del self._usos[palabra]
+                if self._palabras is not None:
+                    del self._palabras[bisect_left(self._palabras, palabra)]
+        nombre = self._nombre.pop(producto_id)
+        if self._nombres is not None:
+            del self._nombres[bisect_left(self._nombres, (nombre, producto_id))]
+
+    def _ordenar(self):
+        if self._palabras is None:
+            self._palabras = sorted(self._usos)
+        if self._nombres is None:
+            self._nombres = sorted((nombre, i) for i, nombre in self._nombre.items())
+
+    def _palabras_con_prefijo(self, prefijo):
+        inicio = bisect_left(self._palabras, prefijo)
+        fin = bisect_left(self._palabras, prefijo + _FIN_PREFIJO)
+        return self._palabras[inicio:fin]
+
+    def _coinciden(self, terminos, nivel):
+        """
+        Ids en los que cada término es prefijo de alguna palabra de un campo con
+        peso <= nivel. Puede devolver un set interno: no debe modificarse.
+        """
+        postings = self._postings[:nivel + 1]
+        por_termino = []
+        for extension in terminos:
+            conjuntos = [por_palabra[p] for p in extension for por_palabra in postings if p in por_palabra]
+            if not conjuntos:
+                return set()
+            por_termino.append((sum(map(len, conjuntos)), conjuntos))
+        # Se empieza por el término con menos ocurrencias: acota más rápido
+        por_termino.sort(key=lambda par: par[0])
+
+        _, conjuntos = por_termino[0]
+        candidatos = conjuntos[0] if len(conjuntos) == 1 else set().union(*conjuntos)
+        for _, conjuntos in por_termino[1:]:
+            # A ∩ (B ∪ C) = (A ∩ B) ∪ (A ∩ C): cada intersección cuesta a lo sumo |A|
+            candidatos = set().union(*(candidatos & c for c in conjuntos))
+            if not candidatos:
+                break
+        return candidatos
+
+    def _primeros_por_nombre(self, ids, cantidad, elegidos, filtro):
+        """Hasta cantidad ids de ``ids`` (no elegidos aún) en orden de nombre."""
+        if len(ids) * len(ids) > cantidad * len(self._nombres) * 4:
+            # Conjunto denso: recorrer los nombres en orden encuentra los primeros enseguida
+            resultado = []
+            for _, producto_id in self._nombres:
+                if producto_id in ids and producto_id not in elegidos and (filtro is None or filtro(producto_id)):
+                    resultado.append(producto_id)
+                    if len(resultado) == cantidad:
+                        break
+            return resultado
+        restantes = [i for i in ids if i not in elegidos and (filtro is None or filtro(i))]
+        return heapq.nsmallest(cantidad, restantes, key=lambda i: (self._nombre[i], i))
+
+    def buscar(self, consulta, limite=50, filtro=None):
+        """
+        Ids de los productos que tienen, para cada palabra de la consulta, una
+        palabra que empieza con ella (en cualquier campo).
+
+        Orden: nombres que empiezan con lo escrito; luego coincidencias solo en el
+        nombre o el código; luego en nombre, categoría o proveedor; al final en la descripción.
+        Dentro de cada grupo, por nombre.
+
+        Args:
+            consulta (str): Texto escrito por el usuario.
+            limite (int): Máximo de resultados.
+            filtro (callable, optional): id -> bool para descartar productos (p. ej. sin stock).
+
+        Returns:
+            list: Ids ordenados por relevancia.
+        """
+        terminos = palabras(consulta)
+        if not terminos or limite <= 0:
+            return []
+        self._ordenar()
+        frase = " ".join(terminos)
+
+        # Nivel 0: el nombre empieza con lo escrito (el caso típico al autocompletar)
+        resultado = []
+        inicio = bisect_left(self._nombres, (frase,))
+        fin = bisect_left(self._nombres, (frase + _FIN_PREFIJO,))
+        for _, producto_id in self._nombres[inicio:fin]:
+            if filtro is None or filtro(producto_id):
+                resultado.append(producto_id)
+                if len(resultado) == limite:
+                    return resultado
+
+        extensiones = [self._palabras_con_prefijo(t) for t in set(terminos)]
+        if not all(extensiones):
+            return resultado
+
+        elegidos = set(resultado)
+        for nivel in range(_NIVELES):
+            ids = self._coinciden(extensiones, nivel)
+            nuevos = self._primeros_por_nombre(ids, limite - len(resultado), elegidos, filtro)
+            resultado.extend(nuevos)
+            if len(resultado) == limite:
+                break
+            elegidos.update(nuevos)
+        return resultado
+
+
+# ============================================================
+# MOTOR FULLTEXT (MySQL)
+# ============================================================
+
+def motor_configurado():
+    if es_sqlite():
+        # SQLite no tiene los índices FULLTEXT de la migración 6
+        return MOTOR_MEMORIA
+    motor = os.getenv('BUSQUEDA_PRODUCTOS', MOTOR_MEMORIA).strip().lower()
+    return motor if motor in (MOTOR_MEMORIA, MOTOR_FULLTEXT) else MOTOR_MEMORIA
+
+
+def consulta_booleana(texto):
+    """'Cuad. prof' -> '+cuad* +prof*' (sin operadores del usuario ni palabras que el índice ignora)."""
+    return " ".join(f"+{t}*" for t in palabras(texto) if len(t) >= _MIN_PALABRA_FULLTEXT)
+
+
+def buscar_fulltext(texto, limite=50, solo_con_stock=False):
+    """
+    Productos activos (mismas columnas que el catálogo) por relevancia FULLTEXT,
+    buscando en nombre, descripción, categoría y nombre del proveedor.
+
+    Returns:
+        list | None: None si la consulta no es apta para FULLTEXT (solo palabras
+            muy cortas) o falta el índice; quien llama debe usar el motor de memoria.
+    """
+    booleana = consulta_booleana(texto)
+    if not booleana:
+        return None
+    conn = conectar()
+    if not conn:
+        raise Error("No se pudo conectar a la base de datos.")
+    cursor = None
+    try:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(_SELECT_FULLTEXT.format(con_stock="AND p.stock > 0" if solo_con_stock else ""),
+                       (booleana, booleana, booleana, limite))
+        return cursor.fetchall()
+    except Error as e:
+        if getattr(e, 'errno', None) == _ER_FT_MATCHING_KEY_NOT_FOUND:
+            logger.warning("Faltan los índices FULLTEXT de productos (aplique migraciones.py); "
+                           "se usa la búsqueda en memoria.")
+            return None
+        raise
+    finally:
+        if cursor: cursor.close()
+        if conn and conn.is_connected(): conn.close()
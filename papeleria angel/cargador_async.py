@@ -0,0 +1,217 @@
+# cargador_async.py
+"""
+Carga de datos en segundo plano para las vistas de Tkinter.
+
+Tk no es seguro entre hilos: solo el hilo principal puede tocar widgets. Las
+llamadas a los controladores (consultas a MySQL) se ejecutan en un pool de
+hilos acotado y compartido; sus resultados vuelven por una cola que la vista
+revisa con root.after, y los callbacks se ejecutan en el hilo principal.
+
+Cada solicitud lleva una clave: pedir otra vez la misma clave (p. ej. el usuario
+vuelve a pulsar "Cargar") cancela la anterior, y su resultado se descarta.
+
+Uso en una vista:
+    self.cargador = CargadorAsync(self.root)
+    self.cargador.ejecutar("productos", get_all_products, al_terminar=self._mostrar_productos)
+"""
+from concurrent.futures import ThreadPoolExecutor
+import atexit
+import logging
+import os
+import queue
+import threading
+import tkinter as tk
+
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger(__name__)
+
+_ejecutor = None
+_ejecutor_lock = threading.Lock()
+
+
+def obtener_ejecutor():
+    """Pool de hilos global; CARGADOR_HILOS limita las consultas simultáneas (4 por defecto)."""
+    global _ejecutor
+    if _ejecutor is None:
+        with _ejecutor_lock:
+            if _ejecutor is None:
+                try:
+                    hilos = max(1, int(os.getenv('CARGADOR_HILOS', 4)))
+                except ValueError:
+                    hilos = 4
+                _ejecutor = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="cargador")
+    return _ejecutor
+
+
+def _cerrar_ejecutor():
+    if _ejecutor is not None:
+        _ejecutor.shutdown(wait=False, cancel_futures=True)
+
+
+atexit.register(_cerrar_ejecutor)
+
+
+class Tarea:
+    """Solicitud en curso; cancelar() hace que su resultado se descarte."""
+
+    __slots__ = ('clave', 'futuro', 'cancelada', 'al_terminar', 'al_fallar')
+
+    def __init__(self, clave, al_terminar, al_fallar):
+        self.clave = clave
+        self.futuro = None
+        self.cancelada = False
+        self.al_terminar = al_terminar
+        self.al_fallar = al_fallar
+
+    def cancelar(self):
+        self.cancelada = True
+        if self.futuro is not None:
+            # Si aún no empezó, ni siquiera llega a consultar la base
+            self.futuro.cancel()
+
+
+class CargadorAsync:
+    """
+    Ejecuta funciones en segundo plano y entrega sus resultados en el hilo de Tk.
+
+    Args:
+        widget: Widget (normalmente la ventana) cuyo after() revisa la cola.
+        intervalo_ms (int): Cada cuánto se revisa la cola mientras hay tareas pendientes.
+    """
+
+    def __init__(self, widget, intervalo_ms=30):
+        self.widget = widget
+        self.intervalo_ms = intervalo_ms
+        self._cola = queue.Queue()
+        self._vigentes = {}      # clave -> Tarea más reciente
+        self._sondeo = None      # id del after() programado
+        self._cerrado = False
+
+    # -------------------- Solicitudes --------------------
+    def ejecutar(self, clave, funcion, *args, al_terminar=None, al_fallar=None, **kwargs):
+        """
+        Ejecuta funcion(*args, **kwargs) en el pool.
+
+        al_terminar(resultado) o al_fallar(excepcion) se llaman en el hilo
+        principal, salvo que la tarea haya sido reemplazada o cancelada.
+        """
+        anterior = self._vigentes.get(clave)
+        if anterior is not None:
+            anterior.cancelar()
+
+        tarea = Tarea(clave, al_terminar, al_fallar)
+        self._vigentes[clave] = tarea
+
+        def trabajo():
+            if tarea.cancelada:
+                return
+            try:
+                resultado = funcion(*args, **kwargs)
+            except Exception as e:
+                self._cola.put((tarea, False, e))
+            else:
+                self._cola.put((tarea, True, resultado))
+
+        tarea.futuro = obtener_ejecutor().submit(trabajo)
+        self._programar_sondeo()
+        return tarea
+
+    def en_hilo_principal(self, funcion, *args):
+        """Encola funcion(*args) para el hilo de Tk (útil para reportar progreso desde un hilo)."""
+        self._cola.put((None, True, (funcion, args)))
+
+    def cancelar(self, clave=None):
+        """Cancela la tarea de una clave, o todas si no se indica."""
+        claves = [clave] if clave is not None else list(self._vigentes)
+        for c in claves:
+            tarea = self._vigentes.pop(c, None)
+            if tarea is not None:
+                tarea.cancelar()
+
+    def ocupado(self, clave=None):
+        if clave is not None:
+            return clave in self._vigentes
+        return bool(self._vigentes)
+
+    @property
+    def cerrado(self):
+        return self._cerrado
+
+    def cerrar(self):
+        """Cancela todo y deja de revisar la cola (al cerrar la vista)."""
+        self._cerrado = True
+        self.cancelar()
+        if self._sondeo is not None:
+            try:
+                self.widget.after_cancel(self._sondeo)
+            except tk.TclError:
+                pass
+            self._sondeo = None
+
+    # -------------------- Entrega en el hilo principal --------------------
+    def _programar_sondeo(self):
+        if self._sondeo is None and not self._cerrado:
+            try:
+                self._sondeo = self.widget.after(self.intervalo_ms, self._sondear)
+            except tk.TclError:
+                # La ventana ya no existe
+                self._cerrado = True
+
+    def _sondear(self):
+        self._sondeo = None
+        try:
+            if not self.widget.winfo_exists():
+                self.cerrar()
+                return
+        except tk.TclError:
+            self.cerrar()
+            return
+
+        while True:
+            try:
+                tarea, exito, valor = self._cola.get_nowait()
+            except queue.Empty:
+                break
+
+            if tarea is None:
+                funcion, args = valor
+                self._llamar(funcion, *args)
+                continue
+            if tarea.cancelada or self._vigentes.get(tarea.clave) is not tarea:
+                continue  # Reemplazada por una solicitud más reciente
+            del self._vigentes[tarea.clave]
+
+            if exito:
+                if tarea.al_terminar:
+                    self._llamar(tarea.al_terminar, valor)
+            elif tarea.al_fallar:
+                self._llamar(tarea.al_fallar, valor)
+            else:
+                logger.error("Error en carga en segundo plano (%s)", tarea.clave, exc_info=valor)
+
+        if self._vigentes or not self._cola.empty():
+            self._programar_sondeo()
+
+    def _llamar(self, funcion, *args):
+        try:
+            funcion(*args)
+        except Exception:
+            logger.exception("Error en el callback de una carga en segundo plano")
+
+
+class IndicadorCarga:
+    """Etiqueta "Cargando..." superpuesta a un widget mientras llegan sus datos."""
+
+    def __init__(self, widget, texto="⏳ Cargando..."):
+        self.widget = widget
+        self.etiqueta = tk.Label(widget, text=texto, font=("Arial", 11), bg="#fff3cd", fg="#2c3e50",
+                                 padx=12, pady=6, relief="solid", bd=1)
+
+    def mostrar(self, texto=None):
+        if texto is not None:
+            self.etiqueta.config(text=texto)
+        self.etiqueta.place(relx=0.5, rely=0.5, anchor="center")
+        self.etiqueta.lift()
+
+    def ocultar(self):
+        self.etiqueta.place_forget()
@@ -0,0 +1,346 @@
+# catalogo_cache.py
+"""
+Caché en memoria del catálogo de productos, compartida por todo el proceso.
+
+El catálogo (productos activos con el nombre de su proveedor) se carga una sola
+vez; después ProductsView y VentasView lo leen de memoria. Las escrituras de
+esta terminal lo corrigen en el momento (add/update/delete_product, ventas,
+cambios de proveedor) y los cambios hechos desde otras terminales se detectan
+con una consulta por índice sobre productos.fecha_actualizacion (migración 5),
+como mucho una vez cada CATALOGO_VERIFICAR_CADA segundos. Esa consulta corre
+en un hilo aparte: las lecturas no la esperan (si la base no responde, siguen
+con la copia actual) y los cambios se ven en cuanto termina. Un proveedor
+renombrado en otra terminal se ve al recargar (invalidar_catalogo()).
+
+El catálogo mantiene también el índice de búsqueda (busqueda_productos): se
+arma con la primera búsqueda y desde ahí se actualiza con cada cambio, así que
+buscar() no consulta la base. Los códigos SKU / de barras (migración 7) tienen
+su propio diccionario: buscar_por_sku() es una sola búsqueda por hash.
+"""
+from database import conectar, Error
+from busqueda_productos import IndiceBusqueda
+from datetime import timedelta
+import logging
+import os
+import threading
+import time
+
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger(__name__)
+
+# Columnas que devuelve get_all_products
+_SELECT_CATALOGO = """
+    SELECT
+        p.id,
+        p.nombre,
+        p.descripcion,
+        p.precio_compra,
+        p.precio_venta,
+        p.stock,
+        p.categoria,
+        p.proveedor_id,
+        p.fecha_ingreso,
+        pr.nombre_empresa AS proveedor_nombre{extra}
+    FROM productos p
+    INNER JOIN proveedores pr ON p.proveedor_id = pr.id
+"""
+
+_DONDE_ACTIVOS = " WHERE p.activo = 1"
+_DONDE_CAMBIOS = " WHERE p.fecha_actualizacion >= %s"
+
+# Una transacción puede confirmarse después de otra con marca de tiempo posterior;
+# al pedir cambios se retrocede este margen para no perderla.
+_MARGEN_CAMBIOS = timedelta(seconds=5)
+
+# Error de MySQL "Unknown column": falta aplicar la migración 5 o la 7
+_ER_BAD_FIELD = 1054
+
+
+def normalizar_sku(codigo):
+    """' 750-123abc ' -> '750-123ABC'; vacío -> None. El índice único de MySQL no distingue mayúsculas."""
+    codigo = str(codigo or "").strip().upper()
+    return codigo or None
+
+
+class CatalogoProductos:
+    """
+    Catálogo de productos activos indexado por id, nombre, categoría y SKU.
+
+    Args:
+        intervalo_verificacion (float): Segundos mínimos entre consultas de cambios a la base.
+    """
+
+    def __init__(self, intervalo_verificacion=5):
+        self.intervalo_verificacion = intervalo_verificacion
+        self._por_id = {}
+        self._por_nombre = {}      # nombre en minúsculas -> set(ids)
+        self._por_categoria = {}   # categoría -> set(ids)
+        self._por_sku = {}         # SKU normalizado -> id (único en la base)
+        self._ordenados = None     # lista por nombre, se rehace solo tras cambios
+        self._busqueda = None      # IndiceBusqueda, se arma en la primera búsqueda
+        self._cargado = False
+        self._marca = None         # MAX(fecha_actualizacion) visto
+        self._con_marcas = True
+        self._con_sku = True
+        self._verificado_en = 0.0
+        self._verificando = False  # hay un hilo consultando cambios
+        self._generacion = 0       # cambia con cada carga completa o invalidación
+        self._lock = threading.RLock()
+
+    # -------------------- Índices --------------------
+    def _indexar(self, producto):
+        self._por_id[producto['id']] = producto
+        self._por_nombre.setdefault((producto['nombre'] or '').lower(), set()).add(producto['id'])
+        self._por_categoria.setdefault(producto['categoria'], set()).add(producto['id'])
+        sku = normalizar_sku(producto.get('sku'))
+        if sku:
+            self._por_sku[sku] = producto['id']
+        if self._busqueda is not None:
+            self._busqueda.agregar(producto)
+        self._ordenados = None
+
+    def _desindexar(self, producto_id):
+        producto = self._por_id.pop(producto_id, None)
+        if producto is None:
+            return
+        for indice, clave in ((self._por_nombre, (producto['nombre'] or '').lower()),
+                              (self._por_categoria, producto['categoria'])):
+            ids = indice.get(clave)
+            if ids:
+                ids.discard(producto_id)
+                if not ids:
+                    del indice[clave]
+        sku = normalizar_sku(producto.get('sku'))
+        if sku and self._por_sku.get(sku) == producto_id:
+            del self._por_sku[sku]
+        if self._busqueda is not None:
+            self._busqueda.quitar(producto_id)
+        self._ordenados = None
+
+    def _aplicar_fila(self, fila):
+        """Inserta, reemplaza o quita un producto según la fila leída de la base."""
+        marca = fila.pop('fecha_actualizacion', None)
+        activo = fila.pop('activo', 1)
+        fila.setdefault('sku', None)
+        self._desindexar(fila['id'])
+        if activo:
+            self._indexar(fila)
+        if marca is not None and (self._marca is None or marca > self._marca):
+            self._marca = marca
+
+    # -------------------- Lectura de la base --------------------
+    def _consultar(self, donde, params=(), con_marca=True):
+        # activo siempre: refrescar_productos lee por id y debe ver las bajas lógicas
+        extra = ",\n        p.activo"
+        if self._con_sku:
+            extra += ", p.sku"
+        if con_marca:
+            extra += ", p.fecha_actualizacion"
+        conn = conectar()
+        if not conn:
+            raise Error("No se pudo conectar a la base de datos.")
+        cursor = None
+        try:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(_SELECT_CATALOGO.format(extra=extra) + donde, params)
+            return cursor.fetchall()
+        finally:
+            if cursor: cursor.close()
+            if conn and conn.is_connected(): conn.close()
+
+    def _leer_todo(self):
+        """Filas de todos los productos activos; se adapta a las migraciones que falten."""
+        while True:
+            try:
+                return self._consultar(_DONDE_ACTIVOS, con_marca=self._con_marcas)
+            except Error as e:
+                if getattr(e, 'errno', None) != _ER_BAD_FIELD:
+                    raise
+                # Las migraciones se aplican en orden: si falta una columna, primero es sku (7)
+                if self._con_sku:
+                    logger.warning("productos.sku no existe (aplique migraciones.py); "
+                                   "la búsqueda por código no estará disponible.")
+                    self._con_sku = False
+                elif self._con_marcas:
+                    logger.warning("productos.fecha_actualizacion no existe (aplique migraciones.py); "
+                                   "el catálogo se recargará completo en cada verificación.")
+                    self._con_marcas = False
+                else:
+                    raise
+
+    def _reemplazar(self, filas):
+        self._por_id, self._por_nombre, self._por_categoria, self._por_sku = {}, {}, {}, {}
+        self._busqueda = None
+        self._marca = None
+        for fila in filas:
+            self._aplicar_fila(fila)
+        self._cargado = True
+        self._generacion += 1
+        self._verificado_en = time.monotonic()
+
+    def _cargar(self):
+        self._reemplazar(self._leer_todo())
+
+    def _verificar_cambios(self):
+        """
+        Hilo de verificación: consulta la base sin el candado y aplica lo leído con él.
+
+        Sin la migración 5 se relee el catálogo completo; si mientras tanto se
+        recargó o invalidó, lo leído se descarta.
+        """
+        try:
+            with self._lock:
+                generacion, marca, con_marcas = self._generacion, self._marca, self._con_marcas
+            try:
+                if not con_marcas:
+                    filas = self._leer_todo()
+                elif marca is None:
+                    filas = self._consultar(" WHERE p.fecha_actualizacion IS NOT NULL")
+                else:
+                    filas = self._consultar(_DONDE_CAMBIOS, (marca - _MARGEN_CAMBIOS,))
+            except Error:
+                # Sin conexión se sigue atendiendo con la última copia conocida
+                logger.exception("No se pudieron verificar cambios del catálogo")
+                return
+            with self._lock:
+                if not self._cargado or generacion != self._generacion:
+                    return
+                if not con_marcas:
+                    self._reemplazar(filas)
+                else:
+                    for fila in filas:
+                        self._aplicar_fila(fila)
+        finally:
+            with self._lock:
+                self._verificando = False
+                self._verificado_en = time.monotonic()
+
+    def _asegurar_vigente(self):
+        if not self._cargado:
+            self._cargar()
+        elif (not self._verificando
+              and time.monotonic() - self._verificado_en >= self.intervalo_verificacion):
+            self._verificando = True
+            threading.Thread(target=self._verificar_cambios, name="catalogo-cambios", daemon=True).start()
+
+    # -------------------- Consultas --------------------
+    def productos(self):
+        """Copia de los productos activos ordenados por nombre."""
+        with self._lock:
+            self._asegurar_vigente()
+            if self._ordenados is None:
+                self._ordenados = sorted(self._por_id.values(), key=lambda p: (p['nombre'] or '').lower())
+            return [dict(p) for p in self._ordenados]
+
+    def obtener(self, producto_id):
+        with self._lock:
+            self._asegurar_vigente()
+            producto = self._por_id.get(producto_id)
+            return dict(producto) if producto else None
+
+    def buscar_por_nombre(self, nombre):
+        """Productos cuyo nombre coincide exactamente (sin distinguir mayúsculas)."""
+        with self._lock:
+            self._asegurar_vigente()
+            ids = self._por_nombre.get((nombre or '').strip().lower(), ())
+            return [dict(self._por_id[i]) for i in ids]
+
+    def buscar_por_sku(self, sku):
+        """Producto activo con ese código SKU / de barras, o None."""
+        sku = normalizar_sku(sku)
+        with self._lock:
+            self._asegurar_vigente()
+            producto_id = self._por_sku.get(sku) if sku else None
+            return dict(self._por_id[producto_id]) if producto_id is not None else None
+
+    def por_categoria(self, categoria):
+        with self._lock:
+            self._asegurar_vigente()
+            ids = self._por_categoria.get(categoria, ())
+            return sorted((dict(self._por_id[i]) for i in ids), key=lambda p: (p['nombre'] or '').lower())
+
+    def buscar(self, texto, limite=50, solo_con_stock=False):
+        """Productos que coinciden con lo escrito (ver busqueda_productos), por relevancia."""
+        with self._lock:
+            self._asegurar_vigente()
+            if self._busqueda is None:
+                self._busqueda = IndiceBusqueda(self._por_id.values())
+            filtro = (lambda i: self._por_id[i]['stock'] > 0) if solo_con_stock else None
+            return [dict(self._por_id[i]) for i in self._busqueda.buscar(texto, limite, filtro)]
+
+    def categorias(self):
+        with self._lock:
+            self._asegurar_vigente()
+            return sorted(c for c in self._por_categoria if c)
+
+    # -------------------- Cambios de esta terminal --------------------
+    def refrescar_productos(self, ids):
+        """Vuelve a leer de la base los productos indicados (tras insertarlos o editarlos)."""
+        ids = [int(i) for i in ids]
+        with self._lock:
+            if not self._cargado or not ids:
+                return
+            marcadores = ", ".join(["%s"] * len(ids))
+            try:
+                filas = self._consultar(f" WHERE p.id IN ({marcadores})", ids, con_marca=self._con_marcas)
+            except Error:
+                logger.exception("No se pudieron refrescar productos del catálogo; se recargará completo")
+                self._cargado = False
+                return
+            encontrados = set()
+            for fila in filas:
+                encontrados.add(fila['id'])
+                self._aplicar_fila(fila)
+            for producto_id in set(ids) - encontrados:
+                self._desindexar(producto_id)
+
+    def quitar(self, producto_id):
+        with self._lock:
+            self._desindexar(int(producto_id))
+
+    def descontar_stock(self, cantidades):
+        """Resta del stock en memoria las cantidades vendidas ({producto_id: cantidad})."""
+        with self._lock:
+            for producto_id, cantidad in cantidades.items():
+                producto = self._por_id.get(producto_id)
+                if producto is not None:
+                    producto['stock'] = producto['stock'] - cantidad
+
+    def renombrar_proveedor(self, proveedor_id, nombre_empresa):
+        proveedor_id = int(proveedor_id)
+        with self._lock:
+            for producto in self._por_id.values():
+                if producto['proveedor_id'] == proveedor_id:
+                    producto['proveedor_nombre'] = nombre_empresa
+                    if self._busqueda is not None:
+                        self._busqueda.agregar(producto)
+
+    def invalidar(self):
+        """Descarta el contenido; la siguiente lectura recarga desde la base."""
+        with self._lock:
+            self._cargado = False
+            self._generacion += 1
+            self._ordenados = None
+            self._busqueda = None
+
+
+_catalogo = None
+_catalogo_lock = threading.Lock()
+
+
+def obtener_catalogo():
+    """Devuelve el catálogo global del proceso."""
+    global _catalogo
+    if _catalogo is None:
+        with _catalogo_lock:
+            if _catalogo is None:
+                try:
+                    intervalo = float(os.getenv('CATALOGO_VERIFICAR_CADA', 5))
+                except ValueError:
+                    intervalo = 5.0
+                _catalogo = CatalogoProductos(intervalo_verificacion=intervalo)
+    return _catalogo
+
+
+def invalidar_catalogo():
+    obtener_catalogo().invalidar()
@@ -1,7 +1,7 @@
 # client_orders_controller.py - VERSIÓN CORREGIDA
-import mysql.connector
-from database import conectar
+from database import conectar, ejecutar_transaccion, existe_columna, SinConexion, Error
 from datetime import datetime
+import argparse
 import logging
 
 # Configuración de logging
@@ -48,27 +48,38 @@ def _determinar_estado(total, abono, tolerancia=0.01):
 # CRUD
 # ============================================================
 
+_SELECT_PEDIDOS = """
+    SELECT
+        pc.id,
+        c.nombre AS cliente_nombre,
+        c.apellido AS cliente_apellido,
+        pc.fecha_pedido,
+        pc.fecha_entrega_estimada,
+        pc.total AS total_pedido,
+        pc.total_abonado AS abonado                   -- Saldo mantenido por registrar_abono
+    FROM pedidos_cliente pc
+    INNER JOIN clientes c ON pc.cliente_id = c.id
+    ORDER BY pc.fecha_pedido DESC
+"""
+
+_SELECT_ABONOS_PEDIDO = """
+    SELECT a.id, a.fecha_abono, a.monto, a.metodo_pago,
+           u.nombre AS usuario_cajero
+    FROM abonos a
+    INNER JOIN usuarios u ON a.usuario_id = u.id
+    WHERE a.pedido_cliente_id = %s
+    ORDER BY a.fecha_abono ASC
+"""
+
+
 def obtener_pedidos_cliente():
     conn = None
     cursor = None
     try:
-        conn = conectar()
+        conn = conectar(lectura=True)
         cursor = conn.cursor(dictionary=True)
 
-        query = """
-            SELECT
-                pc.id,
-                c.nombre AS cliente_nombre,
-                c.apellido AS cliente_apellido,
-                pc.fecha_pedido,
-                pc.fecha_entrega_estimada,
-                pc.total AS total_pedido,
-                (SELECT IFNULL(SUM(monto), 0) FROM abonos WHERE pedido_cliente_id = pc.id) AS abonado
-            FROM pedidos_cliente pc
-            INNER JOIN clientes c ON pc.cliente_id = c.id
-            ORDER BY pc.fecha_pedido DESC;
-        """
-        cursor.execute(query)
+        cursor.execute(_SELECT_PEDIDOS)
         pedidos = cursor.fetchall()
 
         for pedido in pedidos:
@@ -80,7 +91,7 @@ def obtener_pedidos_cliente():
 
         return pedidos
 
-    except mysql.connector.Error as e:
+    except Error as e:
         logger.error(f"Error MySQL: {e}")
         return []
     finally:
@@ -92,21 +103,13 @@ def obtener_abonos_pedido(pedido_id):
     conn = None
     cursor = None
     try:
-        conn = conectar()
+        conn = conectar(lectura=True)
         cursor = conn.cursor(dictionary=True)
 
-        query = """
-            SELECT a.id, a.fecha_abono, a.monto, a.metodo_pago,
-                   u.nombre AS usuario_cajero
-            FROM abonos a
-            INNER JOIN usuarios u ON a.usuario_id = u.id
-            WHERE a.pedido_cliente_id = %s
-            ORDER BY a.fecha_abono ASC;
-        """
-        cursor.execute(query, (pedido_id,))
+        cursor.execute(_SELECT_ABONOS_PEDIDO, (pedido_id,))
         return cursor.fetchall()
 
-    except mysql.connector.Error as e:
+    except Error as e:
         logger.error(f"Error MySQL: {e}")
         return []
     finally:
@@ -115,9 +118,6 @@ def obtener_abonos_pedido(pedido_id):
 
 
 def registrar_pedido_cliente(cliente_id, fecha_entrega_estimada_str, total_pedido, anticipo=0):
-    conn = None
-    cursor = None
-
     fecha_entrega = _validar_fecha(fecha_entrega_estimada_str)
     total = _safe_float(total_pedido)
     anticipo = _safe_float(anticipo)
@@ -125,63 +125,97 @@ def registrar_pedido_cliente(cliente_id, fecha_entrega_estimada_str, total_pedid
     if total <= 0:
         return False, "El total debe ser mayor a 0."
 
-    try:
-        conn = conectar()
-        cursor = conn.cursor()
-
+    def guardar(cursor):
         fecha_pedido = datetime.now().strftime('%Y-%m-%d')
 
-        # Insert sin columna inexistente "abonado"
+        # total_abonado arranca con el anticipo (si lo hay) para que coincida con abonos
+        abonado_inicial = anticipo if anticipo > 0.01 else 0
         query_pedido = """
-            INSERT INTO pedidos_cliente (cliente_id, fecha_pedido, fecha_entrega_estimada, total, estado)
-            VALUES (%s, %s, %s, %s, %s)
+            INSERT INTO pedidos_cliente (cliente_id, fecha_pedido, fecha_entrega_estimada, total, estado, total_abonado)
+            VALUES (%s, %s, %s, %s, %s, %s)
         """
-        estado_inicial = _determinar_estado(total, anticipo)
-        cursor.execute(query_pedido, (cliente_id, fecha_pedido, fecha_entrega, total, estado_inicial))
+        estado_inicial = _determinar_estado(total, abonado_inicial)
+        cursor.execute(query_pedido, (cliente_id, fecha_pedido, fecha_entrega, total, estado_inicial, abonado_inicial))
         pedido_id = cursor.lastrowid
 
         # Registrar anticipo si existe
-        if anticipo > 0.01:
+        if abonado_inicial:
             cursor.execute("""
                 INSERT INTO abonos (pedido_cliente_id, fecha_abono, monto, metodo_pago, usuario_id)
                 VALUES (%s, %s, %s, %s, %s)
             """, (pedido_id, fecha_pedido, anticipo, "Anticipo", 1))
 
-        conn.commit()
         return True, f"Pedido #{pedido_id} registrado."
 
-    except mysql.connector.Error as e:
-        conn.rollback()
+    try:
+        # Un deadlock se reintenta; una conexión perdida no (el pedido podría quedar duplicado)
+        return ejecutar_transaccion(guardar)
+    except Error as e:
         return False, f"Error MySQL: {e}"
-    finally:
-        if cursor: cursor.close()
-        if conn and conn.is_connected(): conn.close()
 
 
-def registrar_abono(pedido_id, monto, metodo, usuario_id):
-    conn = None
-    cursor = None
+# Error de MySQL "Duplicate entry" (índice único de abonos.clave_idempotencia)
+_ER_DUP_ENTRY = 1062
+# Error de MySQL "Unknown column": la migración 9 aún no se aplicó
+_ER_BAD_FIELD = 1054
+
+
+def _abono_por_clave(cursor, pedido_id, clave_idempotencia):
+    """
+    Resultado original del abono registrado con esa clave, o None si no existe.
+
+    El estado se recalcula con lo abonado hasta ese abono, así el mensaje es el
+    mismo que se devolvió la primera vez aunque después haya más abonos.
+    """
+    cursor.execute("""
+        SELECT a.pedido_cliente_id, pc.total,
+               (SELECT SUM(a2.monto) FROM abonos a2
+                WHERE a2.pedido_cliente_id = a.pedido_cliente_id AND a2.id <= a.id) AS abonado
+        FROM abonos a INNER JOIN pedidos_cliente pc ON pc.id = a.pedido_cliente_id
+        WHERE a.clave_idempotencia = %s
+        LOCK IN SHARE MODE
+    """, (clave_idempotencia,))
+    abono = cursor.fetchone()
+    if not abono:
+        return None
+    if int(abono["pedido_cliente_id"]) != int(pedido_id):
+        return False, "La clave de idempotencia ya se usó para un abono de otro pedido."
+    estado = _determinar_estado(_safe_float(abono["total"]), _safe_float(abono["abonado"]))
+    return True, f"Abono registrado. Estado: {estado}"
+
+
+def registrar_abono(pedido_id, monto, metodo, usuario_id, clave_idempotencia=None):
+    """
+    Registra un abono y actualiza el saldo y estado del pedido.
+
+    clave_idempotencia (opcional, generada por quien llama) permite reintentar
+    sin riesgo: si ya hay un abono con esa clave no se inserta otro y se
+    devuelve el resultado original (migración 9). Con clave, también se
+    reintenta solo ante una conexión perdida.
+    """
     monto = _safe_float(monto)
 
     if monto <= 0:
         return False, "El abono debe ser mayor a 0."
 
-    try:
-        conn = conectar()
-        cursor = conn.cursor(dictionary=True)
-
-        # Obtener total
-        cursor.execute("SELECT total FROM pedidos_cliente WHERE id = %s", (pedido_id,))
+    def guardar(cursor):
+        # Obtener total y saldo abonado, bloqueando el pedido para que dos cajas
+        # no puedan abonar a la vez sobre el mismo saldo
+        cursor.execute("SELECT total, total_abonado FROM pedidos_cliente WHERE id = %s FOR UPDATE",
+                       (pedido_id,))
         pedido = cursor.fetchone()
         if not pedido:
             return False, "Pedido no encontrado."
 
-        total = _safe_float(pedido["total"])
+        # Un reintento con la misma clave devuelve el resultado del abono ya registrado
+        # (se consulta con el pedido bloqueado: un reintento simultáneo espera al primero)
+        if clave_idempotencia:
+            existente = _abono_por_clave(cursor, pedido_id, clave_idempotencia)
+            if existente:
+                return existente
 
-        # SUMA REAL de abonos (fix)
-        cursor.execute("SELECT IFNULL(SUM(monto), 0) AS abonado FROM abonos WHERE pedido_cliente_id = %s",
-                       (pedido_id,))
-        abono_actual = _safe_float(cursor.fetchone()["abonado"])
+        total = _safe_float(pedido["total"])
+        abono_actual = _safe_float(pedido["total_abonado"])
 
         pendiente = total - abono_actual
         if monto > pendiente + 0.01:
@@ -189,36 +223,51 @@ def registrar_abono(pedido_id, monto, metodo, usuario_id):
 
         # Insertar el abono
         fecha = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        cursor.execute("""
-            INSERT INTO abonos (pedido_cliente_id, fecha_abono, monto, metodo_pago, usuario_id)
-            VALUES (%s, %s, %s, %s, %s)
-        """, (pedido_id, fecha, monto, metodo, usuario_id))
+        try:
+            if clave_idempotencia:
+                cursor.execute("""
+                    INSERT INTO abonos (pedido_cliente_id, fecha_abono, monto, metodo_pago, usuario_id, clave_idempotencia)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                """, (pedido_id, fecha, monto, metodo, usuario_id, clave_idempotencia))
+            else:
+                cursor.execute("""
+                    INSERT INTO abonos (pedido_cliente_id, fecha_abono, monto, metodo_pago, usuario_id)
+                    VALUES (%s, %s, %s, %s, %s)
+                """, (pedido_id, fecha, monto, metodo, usuario_id))
+        except Error as e:
+            if e.errno != _ER_DUP_ENTRY or not clave_idempotencia:
+                raise
+            # La clave ya se registró (otra conexión se adelantó): se devuelve ese resultado.
+            # Solo falló la sentencia; no se escribió nada en esta transacción.
+            existente = _abono_por_clave(cursor, pedido_id, clave_idempotencia)
+            if existente is None:
+                raise
+            return existente
 
         # Recalcular estado
         nuevo_abono = abono_actual + monto
         nuevo_estado = _determinar_estado(total, nuevo_abono)
 
-        cursor.execute("UPDATE pedidos_cliente SET estado = %s WHERE id = %s",
-                       (nuevo_estado, pedido_id))
+        cursor.execute("UPDATE pedidos_cliente SET total_abonado = total_abonado + %s, estado = %s WHERE id = %s",
+                       (monto, nuevo_estado, pedido_id))
 
-        conn.commit()
         return True, f"Abono registrado. Estado: {nuevo_estado}"
 
-    except mysql.connector.Error as e:
-        conn.rollback()
+    try:
+        return ejecutar_transaccion(guardar, dictionary=True, idempotente=bool(clave_idempotencia))
+    except SinConexion:
+        return False, "Error de conexión a la base de datos."
+    except Error as e:
+        if e.errno == _ER_BAD_FIELD and clave_idempotencia:
+            # Sin la columna no se puede garantizar que un reintento no duplique el abono:
+            # no se registra sin clave
+            logger.error("abonos.clave_idempotencia no existe (aplique migraciones.py).")
+            return False, "No se registró el abono: falta la migración 9 (aplique migraciones.py)."
         return False, f"Error MySQL: {e}"
-    finally:
-        if cursor: cursor.close()
-        if conn and conn.is_connected(): conn.close()
 
 
 def eliminar_pedido_cliente(pedido_id):
-    conn = None
-    cursor = None
-    try:
-        conn = conectar()
-        cursor = conn.cursor()
-
+    def eliminar(cursor):
         # Verificar si existe
         cursor.execute("SELECT id FROM pedidos_cliente WHERE id = %s", (pedido_id,))
         if not cursor.fetchone():
@@ -231,12 +280,128 @@ def eliminar_pedido_cliente(pedido_id):
         # Eliminar pedido
         cursor.execute("DELETE FROM pedidos_cliente WHERE id = %s", (pedido_id,))
 
-        conn.commit()
         return True, "Pedido eliminado."
 
-    except mysql.connector.Error as e:
-        conn.rollback()
+    try:
+        # Sin idempotente: si la conexión se pierde después del COMMIT, el reintento
+        # ya no encontraría el pedido y respondería "Pedido no existe." a un borrado exitoso
+        return ejecutar_transaccion(eliminar)
+    except Error as e:
+        return False, f"Error MySQL: {e}"
+
+
+# ============================================================
+# SALDOS (total_abonado)
+# ============================================================
+
+def instalar_columna_abonado():
+    """
+    Agrega pedidos_cliente.total_abonado si no existe y la rellena desde abonos.
+
+    Returns:
+        (bool, str): (éxito, mensaje)
+    """
+    conn = None
+    cursor = None
+    try:
+        conn = conectar()
+        if not conn:
+            return False, "Error de conexión a la base de datos."
+        cursor = conn.cursor()
+
+        if not existe_columna(cursor, 'pedidos_cliente', 'total_abonado'):
+            cursor.execute("""
+                ALTER TABLE pedidos_cliente
+                ADD COLUMN total_abonado DECIMAL(10, 2) NOT NULL DEFAULT 0
+            """)
+    except Error as e:
+        return False, f"Error MySQL: {e}"
+    finally:
+        if cursor: cursor.close()
+        if conn and conn.is_connected(): conn.close()
+
+    return conciliar_saldos_pedidos(corregir=True)
+
+
+def conciliar_saldos_pedidos(corregir=False):
+    """
+    Compara pedidos_cliente.total_abonado con la suma real de abonos.
+
+    Usa una tabla derivada agrupada una sola vez (no una subconsulta por pedido).
+
+    Args:
+        corregir (bool): Si es True, corrige saldos y estados que no coincidan.
+
+    Returns:
+        (bool, str): (éxito, mensaje con el resultado)
+    """
+    conn = None
+    cursor = None
+    try:
+        conn = conectar()
+        if not conn:
+            return False, "Error de conexión a la base de datos."
+        cursor = conn.cursor(dictionary=True)
+
+        cursor.execute("""
+            SELECT pc.id, pc.total, pc.total_abonado, pc.estado,
+                   IFNULL(a.suma, 0) AS abonado_real
+            FROM pedidos_cliente pc
+            LEFT JOIN (
+                SELECT pedido_cliente_id, SUM(monto) AS suma
+                FROM abonos
+                GROUP BY pedido_cliente_id
+            ) a ON a.pedido_cliente_id = pc.id
+            WHERE ABS(pc.total_abonado - IFNULL(a.suma, 0)) > 0.005
+            ORDER BY pc.id
+        """)
+        diferencias = cursor.fetchall()
+
+        if not diferencias:
+            conn.rollback()
+            return True, "Saldos correctos: todos los pedidos coinciden con sus abonos."
+
+        detalle = ", ".join(
+            f"#{d['id']} ({_safe_float(d['total_abonado']):.2f} vs {_safe_float(d['abonado_real']):.2f})"
+            for d in diferencias[:20]
+        )
+        if len(diferencias) > 20:
+            detalle += ", ..."
+
+        if not corregir:
+            conn.rollback()
+            return False, f"{len(diferencias)} pedido(s) con saldo distinto a sus abonos: {detalle}"
+
+        cursor.executemany(
+            "UPDATE pedidos_cliente SET total_abonado = %s, estado = %s WHERE id = %s",
+            [(d['abonado_real'], _determinar_estado(d['total'], d['abonado_real']), d['id']) for d in diferencias]
+        )
+        conn.commit()
+        return True, f"{len(diferencias)} pedido(s) corregidos: {detalle}"
+
+    except Error as e:
+        if conn: conn.rollback()
         return False, f"Error MySQL: {e}"
     finally:
         if cursor: cursor.close()
         if conn and conn.is_connected(): conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mantenimiento de saldos de pedidos a clientes.")
+    parser.add_argument('--instalar', action='store_true',
+                        help="Agrega la columna total_abonado (si falta) y la rellena desde abonos.")
+    parser.add_argument('--corregir', action='store_true',
+                        help="Corrige los saldos que no coincidan (por defecto solo se verifican).")
+    args = parser.parse_args(argv)
+
+    if args.instalar:
+        ok, mensaje = instalar_columna_abonado()
+    else:
+        ok, mensaje = conciliar_saldos_pedidos(corregir=args.corregir)
+    print(mensaje)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
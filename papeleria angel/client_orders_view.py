@@ -2,9 +2,12 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 from datetime import datetime
+import uuid
 
 import clientes_controller 
 import client_orders_controller 
+from tabla_virtual import TablaVirtual
+from cargador_async import CargadorAsync
 
 
 def validar_fecha(fecha_str):
@@ -29,6 +32,7 @@ class ClientOrdersView:
         self.add_pedido_window = None
         self.abono_window = None
         self.abono_history_window = None
+        self.cargador = CargadorAsync(self.root)
 
         # --- Estilos ---
         style = ttk.Style()
@@ -64,80 +68,67 @@ class ClientOrdersView:
         tree_frame = tk.Frame(root, padx=20, pady=5)
         tree_frame.pack(fill="both", expand=True)
 
-        scrollbar = ttk.Scrollbar(tree_frame)
-        scrollbar.pack(side="right", fill="y")
-
-        self.pedidos_tree = ttk.Treeview(
-            tree_frame, 
-            columns=("ID", "Cliente", "Fecha Pedido", "Fecha Entrega", "Total", "Abonado", "Pendiente", "Estado"), 
-            show="headings",
-            yscrollcommand=scrollbar.set
-        )
-        scrollbar.config(command=self.pedidos_tree.yview)
-
         # Definir Columnas
         cols = {
             "ID": 50, "Cliente": 200, "Fecha Pedido": 120, "Fecha Entrega": 120, 
             "Total": 100, "Abonado": 100, "Pendiente": 100, "Estado": 100
         }
-        for col, width in cols.items():
-            self.pedidos_tree.heading(col, text=col)
-            self.pedidos_tree.column(col, width=width, anchor="center")
-        
-        # Agregar columna oculta para el ID
-        self.pedidos_tree.column("#0", width=0, stretch=tk.NO)
+        # Tabla virtual: solo se dibujan las filas visibles aunque haya miles de pedidos
+        self.pedidos_tree = TablaVirtual(
+            tree_frame, columnas=tuple(cols), anchos=cols,
+            formatear=self._formatear_pedido, etiquetas=self._etiquetas_pedido,
+            texto_vacio="No hay pedidos registrados"
+        )
 
         self.pedidos_tree.pack(fill="both", expand=True)
-        self.pedidos_tree.bind("<Double-1>", self.open_abono_history_window)
+        self.pedidos_tree.tree.bind("<Double-1>", self.open_abono_history_window)
 
         # Cargar datos al iniciar
         self.load_pedidos()
 
 
     def cargar_clientes(self):
-        """Carga los clientes para usar en el combobox de registro."""
+        """Carga en segundo plano los clientes para usar en el combobox de registro."""
+        self.cargador.ejecutar("clientes", clientes_controller.obtener_todos_clientes,
+                               al_terminar=self._guardar_clientes)
+
+    def _guardar_clientes(self, clientes):
         self.client_id_map = {}
-        clientes = clientes_controller.obtener_todos_clientes()
         for c in clientes:
             nombre_completo = f"{c['nombre']} {c['apellido']} (ID: {c['id']})"
             self.client_id_map[nombre_completo] = c['id']
 
     def load_pedidos(self):
-        """Carga y muestra todos los pedidos en el Treeview."""
-        for item in self.pedidos_tree.get_children():
-            self.pedidos_tree.delete(item)
-            
-        pedidos_data = client_orders_controller.obtener_pedidos_cliente()
-        
-        if not pedidos_data and pedidos_data is not None: # Si la lista está vacía
-             self.pedidos_tree.insert("", "end", values=("", "No hay pedidos registrados", "", "", "", "", "", ""), tags=('Pendiente',))
-             return
-
-        for pedido in pedidos_data:
-            total = client_orders_controller._safe_float(pedido.get('total_pedido'))
-            abonado = client_orders_controller._safe_float(pedido.get('abonado'))
-            pendiente = total - abonado
-            estado = pedido.get('estado_actual', 'Pendiente')
-            
-            # Asignar tags visuales
-            tags = ()
-            if estado.lower() == "completado":
-                tags = ('Completado',)
-            elif estado.lower() == "abonado":
-                tags = ('Abonado',)
-            else:
-                tags = ('Pendiente',)
-            
-            self.pedidos_tree.insert("", "end", values=(
-                pedido['id'],
-                pedido['cliente_nombre_completo'],
-                pedido['fecha_pedido'],
-                pedido['fecha_entrega_estimada'] if pedido['fecha_entrega_estimada'] else 'N/A',
-                f"${total:.2f}",
-                f"${abonado:.2f}",
-                f"${pendiente:.2f}",
-                estado
-            ), tags=tags)
+        """Carga en segundo plano todos los pedidos y los muestra en la tabla."""
+        self.pedidos_tree.mostrar_cargando()
+        # Si la lista está vacía la tabla muestra "No hay pedidos registrados"
+        self.cargador.ejecutar("pedidos", client_orders_controller.obtener_pedidos_cliente,
+                               al_terminar=lambda pedidos: self.pedidos_tree.reemplazar_filas(pedidos or [], clave="id"))
+
+    def _formatear_pedido(self, pedido):
+        """Valores de una fila; la tabla lo llama solo para las filas visibles."""
+        total = client_orders_controller._safe_float(pedido.get('total_pedido'))
+        abonado = client_orders_controller._safe_float(pedido.get('abonado'))
+        pendiente = total - abonado
+        return (
+            pedido['id'],
+            pedido['cliente_nombre_completo'],
+            pedido['fecha_pedido'],
+            pedido['fecha_entrega_estimada'] if pedido['fecha_entrega_estimada'] else 'N/A',
+            f"${total:.2f}",
+            f"${abonado:.2f}",
+            f"${pendiente:.2f}",
+            pedido.get('estado_actual', 'Pendiente')
+        )
+
+    def _etiquetas_pedido(self, pedido):
+        # Asignar tags visuales
+        estado = pedido.get('estado_actual', 'Pendiente').lower()
+        if estado == "completado":
+            return ('Completado',)
+        elif estado == "abonado":
+            return ('Abonado',)
+        return ('Pendiente',)
 
 
     # ============================================================================
@@ -167,6 +158,10 @@ class ClientOrdersView:
         
         # Opciones del ComboBox
         cliente_nombres = list(self.client_id_map.keys())
+        if not cliente_nombres and self.cargador.ocupado("clientes"):
+            messagebox.showinfo("⏳ Cargando", "Los clientes aún se están cargando. Intente en un momento.", parent=self.root)
+            self.add_pedido_window.destroy()
+            return
         if not cliente_nombres:
             messagebox.showerror("❌ Error", "No hay clientes registrados. Registre un cliente primero.", parent=self.root)
             self.add_pedido_window.destroy()
@@ -257,12 +252,11 @@ class ClientOrdersView:
             self.abono_window.lift()
             return
 
-        selected_item = self.pedidos_tree.focus()
-        if not selected_item:
+        values = self.pedidos_tree.valores_seleccionados()
+        if not values:
             messagebox.showwarning("⚠️ Advertencia", "Seleccione un pedido para registrar un abono.")
             return
 
-        values = self.pedidos_tree.item(selected_item, 'values')
         pedido_id = int(values[0])
         cliente_nombre = values[1]
         
@@ -299,6 +293,9 @@ class ClientOrdersView:
         ttk.Label(frame, text=f"Abonado: ${abonado:.2f}").grid(row=2, column=0, padx=5, pady=2, sticky="w")
         ttk.Label(frame, text=f"Pendiente: ${pendiente_pago:.2f}", font=("Arial", 11, "bold")).grid(row=3, column=0, columnspan=2, padx=5, pady=5, sticky="w")
 
+        # Clave del abono: si la red falla y se vuelve a pulsar "Registrar", no se duplica
+        clave_abono = str(uuid.uuid4())
+
         # Variables de control
         monto_var = tk.StringVar(self.abono_window)
         metodo_var = tk.StringVar(self.abono_window, value="Efectivo")
@@ -334,7 +331,8 @@ class ClientOrdersView:
                 pedido_id, 
                 monto_abono, 
                 metodo, 
-                usuario_id
+                usuario_id,
+                clave_idempotencia=clave_abono
             )
 
             if exito:
@@ -357,12 +355,11 @@ class ClientOrdersView:
             self.abono_history_window.lift()
             return
             
-        selected_item = self.pedidos_tree.focus()
-        if not selected_item:
+        values = self.pedidos_tree.valores_seleccionados()
+        if not values:
             messagebox.showwarning("⚠️ Advertencia", "Seleccione un pedido para ver el historial de abonos.")
             return
 
-        values = self.pedidos_tree.item(selected_item, 'values')
         pedido_id = values[0]
         cliente_nombre = values[1]
 
@@ -414,12 +411,11 @@ class ClientOrdersView:
 
     def delete_pedido_action(self):
         """Elimina el pedido seleccionado."""
-        selected_item = self.pedidos_tree.focus()
-        if not selected_item:
+        values = self.pedidos_tree.valores_seleccionados()
+        if not values:
             messagebox.showwarning("⚠️ Advertencia", "Seleccione un pedido para eliminar.")
             return
 
-        values = self.pedidos_tree.item(selected_item, 'values')
         pedido_id = values[0]
         cliente_nombre = values[1]
         estado = values[7].lower()
@@ -446,6 +442,7 @@ class ClientOrdersView:
     
     def back_to_dashboard(self):
         """Cierra la vista actual y regresa al Dashboard."""
+        self.cargador.cerrar()
         self.root.destroy()
         try:
             # Importar de forma local para evitar problemas de dependencia circular
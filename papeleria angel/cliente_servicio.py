@@ -0,0 +1,234 @@
+# cliente_servicio.py
+"""
+Cliente del servicio HTTP (servicio_http) para que las vistas de Tk no se
+conecten directamente a la base.
+
+Con SERVICIO_URL definida (p. ej. http://192.168.1.10:8765), main.py llama a
+instalar_si_configurado() antes de importar las vistas: cada función listada
+en protocolo_servicio se reemplaza en su módulo de controlador por una
+llamada al servicio, con los mismos argumentos y el mismo resultado. Las
+vistas no cambian.
+
+Las lecturas van por GET y se recuerdan con su ETag: si los datos no
+cambiaron, el servicio responde 304 sin cuerpo y se reutiliza la copia
+local. Si el servicio no responde, o falla con un error 5xx, cada función
+devuelve lo mismo que su controlador sin conexión a la base (FALLAS en
+protocolo_servicio: [] en las listas, (False, "... conexión ...") en las
+escrituras). registrar_venta_en_base en cambio lanza database.SinConexion,
+así la caja sigue vendiendo con el diario local (ventas_offline) igual que
+cuando la base no responde.
+
+La importación de productos desde CSV lee un archivo de la caja y sigue
+usando la conexión directa; hágala desde el equipo del servicio.
+"""
+from collections import OrderedDict
+from urllib.parse import urlsplit, urlencode
+import copy
+import functools
+import http.client
+import importlib
+import logging
+import os
+import threading
+
+from database import Error, SinConexion
+from protocolo_servicio import (LECTURAS, FUNCIONES, FALLAS, PREFIJO_API, ENCABEZADO_TOKEN,
+                                codificar, decodificar)
+
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger(__name__)
+
+
+class ErrorServicio(Error):
+    """Respuesta de error del servicio; ``estado`` es el código HTTP."""
+
+    def __init__(self, msg=None, errno=None, estado=None):
+        super().__init__(msg=msg, errno=errno)
+        self.estado = estado
+
+
+class ClienteServicio:
+    """
+    Llama a las funciones del servicio; una conexión persistente por hilo.
+
+    Args:
+        url (str): Dirección base del servicio, p. ej. 'http://127.0.0.1:8765'.
+        token (str, optional): Valor de SERVICIO_TOKEN configurado en el servicio.
+        timeout (float): Segundos de espera por respuesta.
+        max_etags (int): Respuestas de lecturas que se recuerdan para pedirlas con If-None-Match.
+    """
+
+    def __init__(self, url, token=None, timeout=15, max_etags=256):
+        partes = urlsplit(url)
+        if partes.scheme not in ('http', 'https') or not partes.hostname:
+            raise ValueError(f"URL del servicio inválida: {url}")
+        self.url = url
+        self._https = partes.scheme == 'https'
+        self._host = partes.hostname
+        self._puerto = partes.port
+        self._base = partes.path.rstrip('/')
+        self.token = token
+        self.timeout = timeout
+        self.max_etags = max_etags
+        self._etags = OrderedDict()   # ruta -> (etag, resultado)
+        self._etags_lock = threading.Lock()
+        self._hilo = threading.local()
+
+    # -------------------- HTTP --------------------
+    def _conexion(self):
+        conn = getattr(self._hilo, 'conn', None)
+        if conn is None:
+            clase = http.client.HTTPSConnection if self._https else http.client.HTTPConnection
+            conn = clase(self._host, self._puerto, timeout=self.timeout)
+            self._hilo.conn = conn
+        return conn
+
+    def _cerrar_conexion(self):
+        conn = getattr(self._hilo, 'conn', None)
+        self._hilo.conn = None
+        if conn is not None:
+            conn.close()
+
+    def _solicitud(self, metodo, ruta, cuerpo=None, encabezados=None):
+        encabezados = dict(encabezados or {})
+        if self.token:
+            encabezados[ENCABEZADO_TOKEN] = self.token
+        if cuerpo is not None:
+            encabezados['Content-Type'] = 'application/json; charset=utf-8'
+        # Una conexión persistente que el servicio cerró por inactividad falla en el
+        # primer uso; se reintenta una vez con una conexión nueva
+        for intento in range(2):
+            try:
+                conn = self._conexion()
+                conn.request(metodo, ruta, body=cuerpo, headers=encabezados)
+                respuesta = conn.getresponse()
+                return respuesta.status, respuesta.getheader('ETag'), respuesta.read()
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError) as e:
+                self._cerrar_conexion()
+                if intento or metodo != 'GET':
+                    raise SinConexion(msg=f"Se perdió la conexión con el servicio {self.url}: {e}",
+                                      errno=2013) from e
+            except (OSError, http.client.HTTPException) as e:
+                self._cerrar_conexion()
+                raise SinConexion(msg=f"No se pudo contactar el servicio {self.url}: {e}", errno=2003) from e
+
+    def _lanzar(self, estado, cuerpo):
+        try:
+            datos = decodificar(cuerpo)
+            mensaje, errno = datos.get('error'), datos.get('errno')
+        except (ValueError, AttributeError):
+            mensaje, errno = cuerpo.decode('utf-8', 'replace')[:200], None
+        mensaje = f"Servicio ({estado}): {mensaje}"
+        if estado == 503:
+            raise SinConexion(msg=mensaje, errno=errno)
+        raise ErrorServicio(msg=mensaje, errno=errno, estado=estado)
+
+    # -------------------- Llamadas --------------------
+    def llamar(self, nombre, *args, **kwargs):
+        """Ejecuta la función ``nombre`` en el servicio y devuelve su resultado."""
+        if nombre not in FUNCIONES:
+            raise ValueError(f"El servicio no publica {nombre}")
+        ruta = f"{self._base}{PREFIJO_API}{nombre}"
+        if nombre in LECTURAS:
+            return self._leer(ruta, args, kwargs)
+
+        estado, _, cuerpo = self._solicitud('POST', ruta, codificar({'args': args, 'kwargs': kwargs}))
+        if estado != 200:
+            self._lanzar(estado, cuerpo)
+        return decodificar(cuerpo)
+
+    def _leer(self, ruta, args, kwargs):
+        parametros = {}
+        if args:
+            parametros['args'] = codificar(args).decode('utf-8')
+        if kwargs:
+            parametros['kwargs'] = codificar(kwargs).decode('utf-8')
+        if parametros:
+            ruta += "?" + urlencode(parametros)
+
+        with self._etags_lock:
+            guardada = self._etags.get(ruta)
+        encabezados = {'If-None-Match': guardada[0]} if guardada else None
+
+        estado, etag, cuerpo = self._solicitud('GET', ruta, encabezados=encabezados)
+        if estado == 304 and guardada:
+            resultado = guardada[1]
+        elif estado == 200:
+            resultado = decodificar(cuerpo)
+            if etag:
+                with self._etags_lock:
+                    self._etags[ruta] = (etag, resultado)
+                    self._etags.move_to_end(ruta)
+                    while len(self._etags) > self.max_etags:
+                        self._etags.popitem(last=False)
+        else:
+            self._lanzar(estado, cuerpo)
+        # Las vistas pueden modificar lo que reciben; la copia recordada no debe cambiar
+        return copy.deepcopy(resultado)
+
+    def funcion(self, nombre):
+        """Función equivalente a la del controlador, que se ejecuta en el servicio."""
+        modulo, _ = FUNCIONES[nombre]
+        original = getattr(importlib.import_module(modulo), nombre)
+
+        @functools.wraps(original)
+        def remota(*args, **kwargs):
+            if nombre not in FALLAS:
+                return self.llamar(nombre, *args, **kwargs)
+            try:
+                return self.llamar(nombre, *args, **kwargs)
+            except ErrorServicio as e:
+                if e.estado < 500:
+                    raise
+                logger.error(f"{nombre}: {e}")
+            except SinConexion as e:
+                logger.error(f"{nombre}: {e}")
+            return copy.deepcopy(FALLAS[nombre])
+        remota.remota = True
+        return remota
+
+    def iterar_historial_ventas(self, fecha_inicio=None, fecha_fin=None, tam_lote=1000):
+        """Como sales_history_controller.iterar_historial_ventas, por páginas del servicio."""
+        token = None
+        while True:
+            exito, pagina = self.llamar('get_sales_history_page', fecha_inicio, fecha_fin, tam_lote, token)
+            if not exito:
+                raise Error(msg=pagina)
+            yield from pagina['ventas']
+            token = pagina['token_siguiente']
+            if not token:
+                break
+
+
+_cliente = None
+
+
+def obtener_cliente():
+    """Cliente instalado con instalar(), o None si las vistas usan la base directamente."""
+    return _cliente
+
+
+def instalar(url, token=None):
+    """
+    Reemplaza las funciones publicadas de los controladores por llamadas al servicio.
+
+    Debe llamarse antes de importar las vistas (importan las funciones por nombre).
+    """
+    global _cliente
+    cliente = ClienteServicio(url, token)
+    for nombre, (modulo, _) in FUNCIONES.items():
+        funcion = getattr(importlib.import_module(modulo), nombre)
+        if not getattr(funcion, 'remota', False):
+            setattr(importlib.import_module(modulo), nombre, cliente.funcion(nombre))
+    importlib.import_module('sales_history_controller').iterar_historial_ventas = cliente.iterar_historial_ventas
+    _cliente = cliente
+    logger.info(f"Controladores conectados al servicio {url}")
+    return cliente
+
+
+def instalar_si_configurado():
+    """instalar() con SERVICIO_URL y SERVICIO_TOKEN si SERVICIO_URL está definida."""
+    url = os.getenv('SERVICIO_URL')
+    if not url:
+        return None
+    return instalar(url, os.getenv('SERVICIO_TOKEN'))
@@ -1,8 +1,8 @@
-from database import conectar
+from database import transaccion, SinConexion, Error
+from versiones_tablas import incrementar_version, consultar_si_cambio, CacheVersionada
 import re
 import logging
 from email.utils import parseaddr
-import mysql.connector
 
 # Configure logging
 logging.basicConfig(level=logging.WARNING)
@@ -10,6 +10,8 @@ logger = logging.getLogger(__name__)
 
 TABLE_NAME = "clientes"
 
+_SELECT_CLIENTES = f"SELECT id, nombre, apellido, telefono, direccion, email FROM {TABLE_NAME} ORDER BY nombre, apellido ASC"
+
 # --- Funciones de Utilidad y Validación ---
 
 def _sanitize_input(value):
@@ -65,55 +67,47 @@ def add_client(nombre, apellido, telefono, direccion, email):
     # 2. Sanitización de Inputs antes de DB
     nombre, apellido, telefono, direccion, email = map(_sanitize_input, (nombre, apellido, telefono, direccion, email))
     
-    conexion = None
-    cursor = None
     try:
-        conexion = conectar()
-        if not conexion:
-            return False, "❌ Error de conexión a la base de datos."
-        
-        cursor = conexion.cursor()
-        query = f"""
-        INSERT INTO {TABLE_NAME} (nombre, apellido, telefono, direccion, email)
-        VALUES (%s, %s, %s, %s, %s)
-        """
-        cursor.execute(query, (nombre, apellido, telefono, direccion, email))
-        conexion.commit()
+        with transaccion() as cursor:
+            query = f"""
+            INSERT INTO {TABLE_NAME} (nombre, apellido, telefono, direccion, email)
+            VALUES (%s, %s, %s, %s, %s)
+            """
+            cursor.execute(query, (nombre, apellido, telefono, direccion, email))
+            incrementar_version(cursor, TABLE_NAME)
         return True, "✅ Cliente agregado exitosamente."
         
-    except mysql.connector.Error as e:
-        if conexion:
-            conexion.rollback()
+    except SinConexion:
+        return False, "❌ Error de conexión a la base de datos."
+    except Error as e:
         logger.exception("Error al agregar cliente")
         # 1062 es código de error para duplicado (e.g., email único)
         if e.errno == 1062:
             return False, "❌ Error: Ya existe un cliente con ese correo o teléfono."
         return False, f"❌ Error al agregar cliente: {str(e)}"
-    finally:
-        if cursor: cursor.close()
-        if conexion and conexion.is_connected(): conexion.close()
 
-def obtener_todos_clientes():
-    """Obtiene todos los clientes de la base de datos, retornando diccionarios."""
-    conexion = None
-    cursor = None
+def obtener_todos_clientes_si_cambio(version_conocida=None):
+    """
+    Lectura condicional de los clientes (ver versiones_tablas).
+
+    Returns:
+        (int|None, list|None): (versión, clientes), o (versión, None) si version_conocida sigue vigente.
+    """
     try:
-        conexion = conectar()
-        if not conexion:
-            return [] 
-        
-        cursor = conexion.cursor(dictionary=True) 
-        query = f"SELECT id, nombre, apellido, telefono, direccion, email FROM {TABLE_NAME} ORDER BY nombre, apellido ASC"
-        cursor.execute(query)
-        clientes = cursor.fetchall()
-        return clientes 
+        with transaccion(dictionary=True) as cursor:
+            return consultar_si_cambio(cursor, TABLE_NAME, version_conocida, _SELECT_CLIENTES)
         
+    except SinConexion:
+        return None, []
     except Exception as e:
         logger.exception("Error al obtener todos los clientes")
-        return []
-    finally:
-        if cursor: cursor.close()
-        if conexion and conexion.is_connected(): conexion.close()
+        return None, []
+
+_cache_clientes = CacheVersionada(obtener_todos_clientes_si_cambio)
+
+def obtener_todos_clientes():
+    """Obtiene todos los clientes (diccionarios); sin cambios desde la última lectura solo consulta su versión."""
+    return _cache_clientes.obtener()
         
 def update_client(client_id, nombre, apellido, telefono, direccion, email):
     """Actualiza un cliente existente con validación."""
@@ -129,82 +123,59 @@ def update_client(client_id, nombre, apellido, telefono, direccion, email):
     # 2. Sanitización de Inputs
     nombre, apellido, telefono, direccion, email = map(_sanitize_input, (nombre, apellido, telefono, direccion, email))
 
-    conexion = None
-    cursor = None
     try:
-        conexion = conectar()
-        if not conexion:
-            return False, "❌ Error de conexión a la base de datos."
-        
-        cursor = conexion.cursor()
-        query = f"""
-        UPDATE {TABLE_NAME} SET 
-            nombre = %s, apellido = %s, telefono = %s, direccion = %s, email = %s
-        WHERE id = %s
-        """
-        cursor.execute(query, (nombre, apellido, telefono, direccion, email, client_id))
-        conexion.commit()
-        
-        if cursor.rowcount == 0:
-            return False, "❌ No se encontró el cliente con ese ID para actualizar."
+        with transaccion() as cursor:
+            query = f"""
+            UPDATE {TABLE_NAME} SET 
+                nombre = %s, apellido = %s, telefono = %s, direccion = %s, email = %s
+            WHERE id = %s
+            """
+            cursor.execute(query, (nombre, apellido, telefono, direccion, email, client_id))
+            
+            if cursor.rowcount == 0:
+                return False, "❌ No se encontró el cliente con ese ID para actualizar."
+            incrementar_version(cursor, TABLE_NAME)
 
         return True, "✅ Cliente actualizado exitosamente."
-    except mysql.connector.Error as e:
-        if conexion:
-            conexion.rollback()
+    except SinConexion:
+        return False, "❌ Error de conexión a la base de datos."
+    except Error as e:
         logger.exception("Error al actualizar cliente")
         if e.errno == 1062:
             return False, "❌ Error: Ya existe otro cliente con ese correo o teléfono."
         return False, f"❌ Error al actualizar cliente: {str(e)}"
-    finally:
-        if cursor: cursor.close()
-        if conexion and conexion.is_connected(): conexion.close()
 
 def delete_client(client_id):
     """Elimina un cliente de la base de datos usando su ID, verificando dependencias."""
     if not client_id or not str(client_id).isdigit():
         return False, "❌ ID de cliente inválido."
 
-    conexion = None
-    cursor = None
     try:
-        conexion = conectar()
-        if not conexion:
-            return False, "❌ Error de conexión."
-
-        cursor = conexion.cursor()
-
-        # 🔒 Revisar si tiene pedidos asociados (Integridad referencial)
-        # Asumo que tienes una tabla 'pedidos_cliente' o una columna 'cliente_id' en 'ventas'
-        try:
-            # (Si no existe 'pedidos_cliente', puedes comentar o cambiar esta sección)
-            cursor.execute("SELECT COUNT(*) FROM ventas WHERE cliente_id = %s", (client_id,))
-            tiene_ventas = cursor.fetchone()[0] > 0
-            if tiene_ventas:
-                return False, "❌ No se puede eliminar: el cliente tiene ventas registradas. Considere desactivarlo en su lugar."
-        except Exception:
-             # Si la tabla 'ventas' no tiene 'cliente_id', continúa.
-             pass 
-
-        query = f"DELETE FROM {TABLE_NAME} WHERE id = %s"
-        cursor.execute(query, (client_id,))
-
-        if cursor.rowcount == 0:
-            return False, "❌ Cliente no encontrado."
-
-        conexion.commit()
+        with transaccion() as cursor:
+            # 🔒 Revisar si tiene pedidos asociados (Integridad referencial)
+            # Asumo que tienes una tabla 'pedidos_cliente' o una columna 'cliente_id' en 'ventas'
+            try:
+                # (Si no existe 'pedidos_cliente', puedes comentar o cambiar esta sección)
+                cursor.execute("SELECT COUNT(*) FROM ventas WHERE cliente_id = %s", (client_id,))
+                tiene_ventas = cursor.fetchone()[0] > 0
+                if tiene_ventas:
+                    return False, "❌ No se puede eliminar: el cliente tiene ventas registradas. Considere desactivarlo en su lugar."
+            except Error:
+                 # Si la tabla 'ventas' no tiene 'cliente_id', continúa.
+                 pass 
+
+            query = f"DELETE FROM {TABLE_NAME} WHERE id = %s"
+            cursor.execute(query, (client_id,))
+
+            if cursor.rowcount == 0:
+                cursor.revertir()
+                return False, "❌ Cliente no encontrado."
+            incrementar_version(cursor, TABLE_NAME)
+
         return True, "✅ Cliente eliminado con éxito."
 
+    except SinConexion:
+        return False, "❌ Error de conexión."
     except Exception as e:
-        if conexion: conexion.rollback()
         logger.exception("Error al eliminar cliente")
-        return False, f"❌ Error al eliminar: {str(e)}"
-    finally:
-        # Cerrado robusto de conexión y cursor
-        if cursor:
-            try: cursor.close()
-            except Exception: pass
-        if conexion:
-            try: 
-                if conexion.is_connected(): conexion.close()
-            except Exception: pass
\ No newline at end of file
+        return False, f"❌ Error al eliminar: {str(e)}"
\ No newline at end of file
@@ -1,6 +1,8 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 from clientes_controller import add_client, obtener_todos_clientes, update_client, delete_client
+from tabla_virtual import TablaVirtual
+from cargador_async import CargadorAsync
 
 class ClientsView:
     # 🔹 Bandera para controlar si hay una ventana de clientes abierta
@@ -23,6 +25,7 @@ class ClientsView:
         self.root.protocol("WM_DELETE_WINDOW", self.back_to_dashboard)
         
         self.active_edit_window = None
+        self.cargador = CargadorAsync(self.root)
         
         self._setup_styles()
         self._setup_ui()
@@ -92,26 +95,26 @@ class ClientsView:
 
     def _create_treeview(self, parent):
         cols = ("ID", "Nombre", "Apellido", "Teléfono", "Dirección", "Email")
-        tree = ttk.Treeview(parent, columns=cols, show="headings")
-        for col in cols:
-            tree.heading(col, text=col)
-            tree.column(col, width=100 if col != "ID" else 40, anchor="center")
-        scrollbar = ttk.Scrollbar(parent, orient="vertical", command=tree.yview)
-        tree.configure(yscrollcommand=scrollbar.set)
-        scrollbar.pack(side="right", fill="y")
-        tree.pack(fill="both", expand=True)
-        return tree
+        # Tabla virtual: solo se dibujan las filas visibles
+        tabla = TablaVirtual(
+            parent, columnas=cols, anchos={"ID": 40},
+            formatear=lambda c: (c['id'], c['nombre'], c['apellido'], c['telefono'], c['direccion'], c['email'])
+        )
+        tabla.pack(fill="both", expand=True)
+        return tabla
 
     # ------------------- Funciones de clientes -------------------
     def load_clients(self):
-        for item in self.clients_tree.get_children():
-            self.clients_tree.delete(item)
-        clientes = obtener_todos_clientes()
+        # La consulta corre en segundo plano; _mostrar_clientes llena la tabla al llegar
+        self.clients_tree.mostrar_cargando()
+        self.cargador.ejecutar("clientes", obtener_todos_clientes, al_terminar=self._mostrar_clientes)
+
+    def _mostrar_clientes(self, clientes):
         if clientes is None:
+            self.clients_tree.limpiar()
             messagebox.showerror("❌ Error de Carga", "No se pudo cargar los clientes.", parent=self.root)
             return
-        for c in clientes:
-            self.clients_tree.insert("", "end", values=(c['id'], c['nombre'], c['apellido'], c['telefono'], c['direccion'], c['email']))
+        self.clients_tree.reemplazar_filas(clientes, clave="id")
 
     def add_client_action(self):
         nombre = self.vars['nombre'].get().strip()
@@ -132,15 +135,14 @@ class ClientsView:
             messagebox.showerror("❌ Error al Agregar", mensaje, parent=self.root)
 
     def edit_client_action(self):
-        selected_item = self.clients_tree.focus()
-        if not selected_item:
+        values = self.clients_tree.valores_seleccionados()
+        if not values:
             messagebox.showwarning("⚠️ Advertencia", "Seleccione un cliente para editar.", parent=self.root)
             return
         if self.active_edit_window and self.active_edit_window.winfo_exists():
             self.active_edit_window.focus()
             messagebox.showwarning("⚠️ Advertencia", "Ya hay una ventana de edición abierta.", parent=self.root)
             return
-        values = self.clients_tree.item(selected_item, 'values')
         client_id = values[0]
 
         edit_window = tk.Toplevel(self.root)
@@ -199,11 +201,10 @@ class ClientsView:
         self.active_edit_window = None
 
     def delete_client_action(self):
-        selected_item = self.clients_tree.focus()
-        if not selected_item:
+        values = self.clients_tree.valores_seleccionados()
+        if not values:
             messagebox.showwarning("⚠️ Advertencia", "Seleccione un cliente para eliminar.", parent=self.root)
             return
-        values = self.clients_tree.item(selected_item, 'values')
         client_id, nombre = values[0], values[1]
         if not messagebox.askyesno("❓ Confirmar eliminación", f"¿Eliminar cliente '{nombre}' (ID: {client_id})?", parent=self.root):
             return
@@ -219,6 +220,7 @@ class ClientsView:
         """Vuelve al Dashboard y destruye la ventana actual"""
         ClientsView.ventana_abierta = False  # 🔹 Liberar bandera
         from dashboard_view import DashboardView
+        self.cargador.cerrar()
         self.root.destroy()
         root = tk.Tk()
         DashboardView(root, self.usuario)
@@ -1,7 +1,6 @@
 #Dashboard_View.py
 import tkinter as tk
 from tkinter import ttk, messagebox
-import threading
 
 # Importaciones inmediatas (seguras)
 from products_view import ProductsView
@@ -9,6 +8,9 @@ from user_view import UserView
 from suppliers_view import ProveedoresView
 from sales_view import VentasView
 from sales_history_view import SalesHistoryView
+from sales_rollup_controller import obtener_totales_periodo
+from cargador_async import CargadorAsync
+from datetime import datetime, timedelta
 
 
 class DashboardView:
@@ -17,6 +19,7 @@ class DashboardView:
         self.usuario = usuario
         self.active_subwindow = None  
         self.loading_overlay = None
+        self.cargador = CargadorAsync(root)
 
         self.root.title(f"📦 Papelería Ángel - Dashboard | {usuario['nombre']}")
         self.root.geometry("1080x680")
@@ -46,6 +49,15 @@ class DashboardView:
             width=12
         ).pack(side="right", padx=20, pady=20)
 
+        # Indicadores de ventas (leídos del resumen diario, no del historial completo)
+        kpi_frame = tk.Frame(root, bg="#ecf0f1")
+        kpi_frame.pack(fill="x")
+        self.kpi_hoy = tk.Label(kpi_frame, text="", font=("Arial", 11, "bold"), fg="#2c3e50", bg="#ecf0f1")
+        self.kpi_hoy.pack(side="left", padx=20, pady=8)
+        self.kpi_mes = tk.Label(kpi_frame, text="", font=("Arial", 11), fg="#2c3e50", bg="#ecf0f1")
+        self.kpi_mes.pack(side="left", padx=20, pady=8)
+        self._cargar_indicadores()
+
         content = tk.Frame(root, bg="#f5f7fa")
         content.pack(fill="both", expand=True, padx=40, pady=30)
 
@@ -92,6 +104,32 @@ class DashboardView:
         )
         footer.pack(side="bottom", fill="x", ipady=8)
 
+    def _cargar_indicadores(self):
+        """Pide en segundo plano las ventas de hoy y de los últimos 30 días."""
+        hoy = datetime.now().strftime('%Y-%m-%d')
+        hace_30 = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
+
+        def consultar():
+            return obtener_totales_periodo(hoy, hoy), obtener_totales_periodo(hace_30, hoy)
+
+        self.kpi_hoy.config(text="⏳ Cargando indicadores...")
+        self.cargador.ejecutar("indicadores", consultar, al_terminar=self._mostrar_indicadores)
+
+    def _mostrar_indicadores(self, totales):
+        totales_hoy, totales_mes = totales
+        if totales_hoy is None or totales_mes is None:
+            self.kpi_hoy.config(text="📊 Indicadores de ventas no disponibles")
+            self.kpi_mes.config(text="")
+            return
+
+        texto_hoy = f"📊 Hoy: ${totales_hoy['ingresos']:,.2f} · {int(totales_hoy['unidades'])} unidades"
+        texto_mes = f"Últimos 30 días: ${totales_mes['ingresos']:,.2f} · {int(totales_mes['unidades'])} unidades"
+        if self.usuario.get('rol') == 'admin':
+            texto_hoy += f" · Margen ${totales_hoy['margen']:,.2f}"
+            texto_mes += f" · Margen ${totales_mes['margen']:,.2f}"
+        self.kpi_hoy.config(text=texto_hoy)
+        self.kpi_mes.config(text=texto_mes)
+
     def _lighten_color(self, hex_color):
         hex_color = hex_color.lstrip('#')
         r, g, b = tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
@@ -135,9 +173,12 @@ class DashboardView:
         self._show_loading()
         self.root.update_idletasks()
 
+        # Tk solo admite widgets creados en el hilo principal: la ventana se construye
+        # aquí, después de pintar el aviso; las consultas de cada vista ya corren en
+        # segundo plano con su propio CargadorAsync.
         window = None
 
-        def load_in_thread():
+        def construir_vista():
             nonlocal window
             try:
                 window = tk.Toplevel(self.root)
@@ -164,7 +205,7 @@ class DashboardView:
                     self._on_close_window(window)
                 self.root.after(100, self._hide_loading)
 
-        threading.Thread(target=load_in_thread, daemon=True).start()
+        self.root.after(10, construir_vista)
 
     def _finalize_view_display(self, window):
         if window and window.winfo_exists():
@@ -225,6 +266,7 @@ class DashboardView:
 
     def logout(self):
         if messagebox.askyesno("❓ Cerrar sesión", "¿Está seguro que desea cerrar sesión?", parent=self.root):
+            self.cargador.cerrar()
             self.root.destroy()
             try:
                 from login import LoginView
@@ -1,28 +1,796 @@
 # database.py
-import mysql.connector
-from mysql.connector import Error
+"""
+Conexiones a la base de datos: pool, transacciones, reintentos y dialecto.
+
+DB_BACKEND elige el motor: "mysql" (por defecto, servidor MySQL con DB_HOST,
+DB_NAME...) o "sqlite" (base embebida en un archivo, ver motor_sqlite). Los
+controladores escriben SQL de MySQL; con SQLite se traduce al ejecutarlo.
+
+Lecturas en réplica: con DB_READ_HOST (MySQL) o DB_SQLITE_READ_PATH (SQLite)
+las consultas pesadas de solo lectura (historial, pedidos, reportes) piden
+conectar(lectura=True) y van a la réplica, así un reporte no frena a las
+cajas que escriben en la principal. Tras una escritura de este proceso, las
+lecturas siguen en la principal durante DB_READ_STICKY_SECONDS (5 por
+defecto; 0 lo desactiva) para que el usuario vea lo que acaba de guardar
+aunque la réplica vaya atrasada.
+"""
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+import atexit
+import logging
+import metricas_sql
 import os
+import random
+import threading
+import time
+
+try:
+    import mysql.connector
+    from mysql.connector import Error
+except ImportError:
+    # Una caja con DB_BACKEND=sqlite no necesita el conector de MySQL instalado
+    mysql = None
+
+    class Error(Exception):
+        """Error de base de datos (misma interfaz que mysql.connector.Error)."""
+
+        def __init__(self, msg=None, errno=None, values=None, sqlstate=None):
+            super().__init__(msg)
+            self.msg = msg
+            self.errno = errno
+            self.sqlstate = sqlstate
+
+        def __str__(self):
+            if self.errno is not None:
+                return f"{self.errno}: {self.msg}"
+            return str(self.msg)
+
+logger = logging.getLogger(__name__)
+
+DIALECTO_MYSQL = "mysql"
+DIALECTO_SQLITE = "sqlite"
+
+
+def _env_int(nombre, defecto):
+    try:
+        return int(os.getenv(nombre, defecto))
+    except (TypeError, ValueError):
+        return defecto
+
+
+def _env_bool(nombre, defecto):
+    valor = os.getenv(nombre)
+    if valor is None:
+        return defecto
+    return valor.strip().lower() in ("1", "true", "si", "sí", "yes", "on")
+
+
+def dialecto():
+    """Motor configurado con DB_BACKEND: DIALECTO_MYSQL (por defecto) o DIALECTO_SQLITE."""
+    motor = os.getenv('DB_BACKEND', DIALECTO_MYSQL).strip().lower()
+    return DIALECTO_SQLITE if motor == DIALECTO_SQLITE else DIALECTO_MYSQL
+
+
+def es_sqlite():
+    return dialecto() == DIALECTO_SQLITE
+
+
+def replica_configurada():
+    """True si hay una base de lectura aparte (DB_READ_HOST o DB_SQLITE_READ_PATH)."""
+    return bool(os.getenv('DB_SQLITE_READ_PATH' if es_sqlite() else 'DB_READ_HOST'))
+
+
+def _crear_conexion():
+    """Abre una conexión nueva con el motor configurado (la usa el pool)."""
+    if es_sqlite():
+        import motor_sqlite
+        return motor_sqlite.crear_conexion()
+    if mysql is None:
+        raise Error(msg="mysql-connector-python no está instalado (use DB_BACKEND=sqlite o instálelo).")
+    return _crear_conexion_mysql()
+
+
+def _crear_conexion_lectura():
+    """Abre una conexión con la réplica, en modo solo lectura (un descuido no escribe en ella)."""
+    if es_sqlite():
+        import motor_sqlite
+        ruta = os.getenv('DB_SQLITE_READ_PATH')
+        # Una réplica que no existe no se crea vacía: se lee de la principal
+        if not os.path.exists(ruta):
+            raise Error(msg=f"No existe la réplica de lectura {ruta}", errno=2003)
+        conn = motor_sqlite.crear_conexion(ruta)
+        sentencia = "PRAGMA query_only = ON"
+    else:
+        if mysql is None:
+            raise Error(msg="mysql-connector-python no está instalado (use DB_BACKEND=sqlite o instálelo).")
+        conn = _crear_conexion_mysql(lectura=True)
+        sentencia = "SET SESSION TRANSACTION READ ONLY"
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sentencia)
+    finally:
+        cursor.close()
+    return conn
+
+
+def _crear_conexion_mysql(lectura=False):
+    """
+    Abre una conexión nueva (TCP + autenticación) con el servidor MySQL.
+
+    Con lectura=True usa DB_READ_HOST, DB_READ_PORT, DB_READ_USER,
+    DB_READ_PASSWORD y DB_READ_NAME; los que falten se toman de la principal.
+    """
+    def valor(nombre, defecto):
+        principal = os.getenv(f'DB_{nombre}', defecto)
+        return os.getenv(f'DB_READ_{nombre}', principal) if lectura else principal
+
+    return mysql.connector.connect(
+        host=valor('HOST', 'localhost'),
+        port=valor('PORT', 3306),
+        user=valor('USER', 'root'),
+        password=valor('PASSWORD', ''),
+        database=valor('NAME', 'papeleria_angel')
+    )
+
+
+class PoolAgotado(Error):
+    """No hubo una conexión libre dentro del tiempo de espera configurado."""
+
+
+class SinConexion(Error):
+    """No fue posible obtener una conexión con la base de datos."""
+
+
+class ConexionPool:
+    """
+    Conexión prestada por el pool.
+
+    Se comporta como la conexión original, pero close() la devuelve al pool
+    en lugar de cerrar el socket, así el código existente
+    (``if conn and conn.is_connected(): conn.close()``) sigue funcionando.
+    """
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+        self._devuelta = False
+
+    def __getattr__(self, nombre):
+        if nombre.startswith('_'):
+            raise AttributeError(nombre)
+        return getattr(self._conn, nombre)
+
+    def cursor(self, *args, **kwargs):
+        cursor = self._conn.cursor(*args, **kwargs)
+        if metricas_sql.activo():
+            return metricas_sql.CursorInstrumentado(cursor)
+        return cursor
+
+    def commit(self):
+        if not self._pool.lectura:
+            marcar_escritura()
+        if not metricas_sql.activo():
+            return self._conn.commit()
+        inicio = time.perf_counter()
+        try:
+            return self._conn.commit()
+        finally:
+            metricas_sql.medir("COMMIT", time.perf_counter() - inicio)
+
+    def is_connected(self):
+        if self._devuelta:
+            return False
+        try:
+            return self._conn.is_connected()
+        except Exception:
+            return False
+
+    def close(self):
+        """Devuelve la conexión al pool (una sola vez)."""
+        if self._devuelta:
+            return
+        self._devuelta = True
+        self._pool.devolver(self._conn)
+
+    def descartar(self):
+        """Cierra la conexión real sin devolverla al pool (p. ej. con resultados sin leer)."""
+        if self._devuelta:
+            return
+        self._devuelta = True
+        self._pool.descartar(self._conn)
+
+    def __del__(self):
+        # Red de seguridad: una conexión olvidada no debe agotar el pool
+        try:
+            self.descartar()
+        except Exception:
+            pass
+
+
+class PoolConexiones:
+    """
+    Pool de conexiones reutilizables, seguro entre hilos.
+
+    Args:
+        fabrica (callable): Función que abre una conexión nueva.
+        tamano (int): Conexiones que se mantienen abiertas en reposo.
+        max_desborde (int): Conexiones extra permitidas en picos; se cierran al devolverse.
+        inactividad_max (int): Segundos tras los cuales una conexión libre se descarta.
+        verificar_al_prestar (bool): Hace ping antes de prestar una conexión que estuvo inactiva.
+        verificar_tras (int): Segundos de inactividad a partir de los cuales se hace el ping.
+        espera_max (int): Segundos máximos esperando una conexión libre.
+        lectura (bool): Pool de la réplica de lectura (sus commits no cuentan como escrituras).
+    """
+
+    def __init__(self, fabrica, tamano=5, max_desborde=10, inactividad_max=300,
+                 verificar_al_prestar=True, verificar_tras=5, espera_max=10, lectura=False):
+        self._fabrica = fabrica
+        self.lectura = lectura
+        self.tamano = max(1, tamano)
+        self.max_desborde = max(0, max_desborde)
+        self.inactividad_max = inactividad_max
+        self.verificar_al_prestar = verificar_al_prestar
+        self.verificar_tras = verificar_tras
+        self.espera_max = espera_max
+
+        self._libres = deque()  # (conexion, momento_de_devolucion)
+        self._abiertas = 0
+        self._cond = threading.Condition(threading.Lock())
+
+    # -------------------- Préstamo --------------------
+    def obtener(self):
+        """Presta una conexión sana, abriendo una nueva si hace falta."""
+        limite = time.monotonic() + self.espera_max
+        while True:
+            conn, inactiva, crear = None, 0.0, False
+            with self._cond:
+                while True:
+                    if self._libres:
+                        conn, devuelta_en = self._libres.pop()
+                        inactiva = time.monotonic() - devuelta_en
+                        break
+                    if self._abiertas < self.tamano + self.max_desborde:
+                        self._abiertas += 1
+                        crear = True
+                        break
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        raise PoolAgotado("No hay conexiones disponibles en el pool.")
+                    self._cond.wait(restante)
+
+            if crear:
+                try:
+                    conn = self._fabrica()
+                except Exception:
+                    self._liberar_cupo()
+                    raise
+                return ConexionPool(self, conn)
+
+            if self.inactividad_max and inactiva > self.inactividad_max:
+                self.descartar(conn)
+                continue
+            if self.verificar_al_prestar and inactiva > self.verificar_tras and not self._esta_viva(conn):
+                self.descartar(conn)
+                continue
+            return ConexionPool(self, conn)
+
+    def _esta_viva(self, conn):
+        try:
+            if hasattr(conn, 'ping'):
+                conn.ping(reconnect=False)
+                return True
+            return conn.is_connected()
+        except Exception:
+            return False
+
+    # -------------------- Devolución --------------------
+    def devolver(self, conn):
+        """Recibe una conexión prestada; deshace transacciones abiertas antes de guardarla."""
+        try:
+            # Sin autocommit, hasta un SELECT deja abierta una transacción (y su snapshot)
+            if getattr(conn, 'in_transaction', True):
+                conn.rollback()
+        except Exception:
+            self.descartar(conn)
+            return
+
+        with self._cond:
+            if len(self._libres) < self.tamano:
+                self._libres.append((conn, time.monotonic()))
+                self._cond.notify()
+                return
+        # Conexión de desborde: no se conserva
+        self.descartar(conn)
+
+    def descartar(self, conn):
+        """Cierra una conexión y libera su cupo en el pool."""
+        try:
+            conn.close()
+        except Exception:
+            pass
+        self._liberar_cupo()
+
+    def _liberar_cupo(self):
+        with self._cond:
+            self._abiertas = max(0, self._abiertas - 1)
+            self._cond.notify()
+
+    def cerrar(self):
+        """Cierra todas las conexiones libres (las prestadas se cierran al devolverse)."""
+        with self._cond:
+            libres = list(self._libres)
+            self._libres.clear()
+        for conn, _ in libres:
+            self.descartar(conn)
+
+    def estadisticas(self):
+        with self._cond:
+            return {
+                'abiertas': self._abiertas,
+                'libres': len(self._libres),
+                'prestadas': self._abiertas - len(self._libres),
+            }
+
+
+_pool = None
+_pool_lectura = None
+_pool_lock = threading.Lock()
+
+# Momento (time.monotonic) del último COMMIT de este proceso en la base principal
+_ultima_escritura = None
+
+
+def _nuevo_pool(fabrica, lectura=False):
+    return PoolConexiones(
+        fabrica,
+        tamano=_env_int('DB_POOL_SIZE', 5),
+        max_desborde=_env_int('DB_POOL_MAX_OVERFLOW', 10),
+        inactividad_max=_env_int('DB_POOL_IDLE_TIMEOUT', 300),
+        verificar_al_prestar=_env_bool('DB_POOL_PRE_PING', True),
+        verificar_tras=_env_int('DB_POOL_PING_AFTER', 5),
+        espera_max=_env_int('DB_POOL_TIMEOUT', 10),
+        lectura=lectura,
+    )
+
+
+def obtener_pool(lectura=False):
+    """
+    Devuelve el pool global (o el de la réplica con lectura=True), creándolo
+    con la configuración de entorno la primera vez.
+    """
+    global _pool, _pool_lectura
+    if lectura:
+        if _pool_lectura is None:
+            with _pool_lock:
+                if _pool_lectura is None:
+                    _pool_lectura = _nuevo_pool(_crear_conexion_lectura, lectura=True)
+        return _pool_lectura
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = _nuevo_pool(_crear_conexion)
+    return _pool
+
+
+def cerrar_pool():
+    """Cierra las conexiones de los pools globales (se llama también al salir)."""
+    global _pool, _pool_lectura
+    with _pool_lock:
+        pools = (_pool, _pool_lectura)
+        _pool = _pool_lectura = None
+    for pool in pools:
+        if pool:
+            pool.cerrar()
+
+
+atexit.register(cerrar_pool)
+
+
+def marcar_escritura():
+    """Anota que este proceso acaba de escribir (las lecturas siguen en la principal un rato)."""
+    global _ultima_escritura
+    _ultima_escritura = time.monotonic()
+
+
+def _leer_de_principal():
+    """True mientras dure la ventana de lectura-de-lo-escrito tras la última escritura."""
+    if _ultima_escritura is None:
+        return False
+    try:
+        ventana = float(os.getenv('DB_READ_STICKY_SECONDS', 5))
+    except ValueError:
+        ventana = 5.0
+    return time.monotonic() - _ultima_escritura < ventana
+
 
-def conectar():
-    """Establece una conexión a la base de datos MySQL."""
-    try:
-        conn = mysql.connector.connect(
-            host=os.getenv('DB_HOST', 'localhost'),
-            port=os.getenv('DB_PORT', 3306),
-            user=os.getenv('DB_USER', 'root'),
-            password=os.getenv('DB_PASSWORD', ''),
-            database=os.getenv('DB_NAME', 'papeleria_angel')
-        )
-        if conn.is_connected():
-            return conn
+def _prestar(pool):
+    conn = pool.obtener()
+    if conn.is_connected():
+        return conn
+    conn.descartar()
+    return None
+
+
+def conectar(lectura=False):
+    """
+    Obtiene una conexión a la base prestada por el pool (close() la devuelve).
+
+    Args:
+        lectura (bool): La conexión solo se usará para leer; si hay réplica
+            configurada (y no se acaba de escribir) se presta una de la réplica.
+            Si la réplica no responde se usa la principal.
+    """
+    if lectura and replica_configurada() and not _leer_de_principal():
+        try:
+            conn = _prestar(obtener_pool(lectura=True))
+            if conn:
+                return conn
+        except Exception as e:
+            logger.warning(f"Réplica de lectura no disponible, se lee de la principal: {e}")
+    try:
+        return _prestar(obtener_pool())
     except Error as e:
-        print(f"Error al conectar a MySQL: {e}")
+        print(f"Error al conectar a la base de datos: {e}")
         return None
     except Exception as e:
         print(f"Error inesperado al conectar: {e}")
         return None
 
 
+@contextmanager
+def conexion(lectura=False):
+    """
+    Presta una conexión del pool durante el bloque ``with`` y la devuelve al salir.
+
+    Lanza SinConexion (un database.Error) si no es posible conectar.
+    """
+    conn = conectar(lectura=lectura)
+    if not conn:
+        raise SinConexion("No se pudo conectar a la base de datos.")
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+# ============================================================
+# CATÁLOGO DEL ESQUEMA (según el motor)
+# ============================================================
+
+def existe_columna(cursor, tabla, columna):
+    """True si la tabla tiene la columna (information_schema en MySQL, pragma_table_info en SQLite)."""
+    if es_sqlite():
+        cursor.execute("SELECT COUNT(*) FROM pragma_table_info(%s) WHERE name = %s", (tabla, columna))
+    else:
+        cursor.execute("""
+            SELECT COUNT(*) FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+        """, (tabla, columna))
+    return cursor.fetchone()[0] > 0
+
+
+def existe_indice(cursor, tabla, indice):
+    """True si la tabla tiene un índice con ese nombre."""
+    if es_sqlite():
+        cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'index' AND tbl_name = %s AND name = %s",
+                       (tabla, indice))
+    else:
+        cursor.execute("""
+            SELECT COUNT(*) FROM information_schema.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+        """, (tabla, indice))
+    return cursor.fetchone()[0] > 0
+
+
+# ============================================================
+# REINTENTOS ANTE ERRORES TRANSITORIOS
+# ============================================================
+
+# La transacción se deshizo por completo: repetirla no puede duplicar nada
+ERRORES_REINTENTABLES = {
+    1205,  # ER_LOCK_WAIT_TIMEOUT (quien llama debe hacer rollback antes de propagar)
+    1213,  # ER_LOCK_DEADLOCK: InnoDB eligió esta transacción como víctima
+}
+# Se perdió la conexión: si fue durante el COMMIT no se sabe si se confirmó,
+# así que solo se reintenta cuando la operación es idempotente
+ERRORES_CONEXION_PERDIDA = {
+    2006,  # CR_SERVER_GONE_ERROR
+    2013,  # CR_SERVER_LOST
+    2055,  # CR_SERVER_LOST_EXTENDED
+}
+
+
+def es_reintentable(error, idempotente=False):
+    """
+    True si vale la pena repetir la transacción que falló con ``error``.
+
+    No conseguir conexión (SinConexion, PoolAgotado) siempre es reintentable:
+    no llegó a escribirse nada.
+    """
+    if isinstance(error, (SinConexion, PoolAgotado)):
+        return True
+    errno = getattr(error, 'errno', None)
+    if errno in ERRORES_REINTENTABLES:
+        return True
+    return idempotente and errno in ERRORES_CONEXION_PERDIDA
+
+
+class PoliticaReintentos:
+    """
+    Backoff exponencial con jitter completo y un presupuesto total de tiempo.
+
+    La espera antes del intento n (desde 1) es un valor al azar entre 0 y
+    min(espera_max, espera_base * 2**(n-1)); el azar evita que dos cajas que
+    chocaron en un deadlock vuelvan a chocar al reintentar a la vez.
+
+    Args:
+        intentos (int): Intentos en total (el primero incluido).
+        espera_base (float): Segundos de la primera espera máxima.
+        espera_max (float): Tope de cada espera.
+        presupuesto (float): Segundos máximos entre el primer intento y el último reintento.
+    """
+
+    def __init__(self, intentos=4, espera_base=0.05, espera_max=1.0, presupuesto=3.0):
+        self.intentos = max(1, intentos)
+        self.espera_base = espera_base
+        self.espera_max = espera_max
+        self.presupuesto = presupuesto
+
+    def espera(self, intento):
+        return random.uniform(0, min(self.espera_max, self.espera_base * (2 ** (intento - 1))))
+
+
+def politica_por_defecto():
+    """Política configurada con DB_RETRY_ATTEMPTS, DB_RETRY_BASE_MS, DB_RETRY_MAX_MS y DB_RETRY_BUDGET_MS."""
+    return PoliticaReintentos(
+        intentos=_env_int('DB_RETRY_ATTEMPTS', 4),
+        espera_base=_env_int('DB_RETRY_BASE_MS', 50) / 1000,
+        espera_max=_env_int('DB_RETRY_MAX_MS', 1000) / 1000,
+        presupuesto=_env_int('DB_RETRY_BUDGET_MS', 3000) / 1000,
+    )
+
+
+def con_reintentos(funcion, *args, idempotente=False, politica=None, **kwargs):
+    """
+    Ejecuta funcion(*args, **kwargs) repitiéndola ante errores transitorios de MySQL.
+
+    ``funcion`` debe ser una transacción completa (obtiene su conexión, confirma
+    y, si falla, hace rollback y deja pasar la excepción). Lo que no es
+    reintentable, o el último error si se agotan los intentos o el presupuesto,
+    se propaga a quien llama.
+
+    Dentro de una transacción ya abierta (transaccion()) no se reintenta: un
+    deadlock deshace la transacción completa y es la externa la que debe repetirse.
+
+    Args:
+        idempotente (bool): Repetir también ante conexión perdida (p. ej. con clave de idempotencia).
+        politica (PoliticaReintentos, optional): Por defecto, la configurada por entorno.
+    """
+    if en_transaccion():
+        return funcion(*args, **kwargs)
+    politica = politica or politica_por_defecto()
+    inicio = time.monotonic()
+    intento = 1
+    while True:
+        try:
+            return funcion(*args, **kwargs)
+        except Error as e:
+            if intento >= politica.intentos or not es_reintentable(e, idempotente):
+                raise
+            espera = politica.espera(intento)
+            if time.monotonic() - inicio + espera > politica.presupuesto:
+                raise
+            logger.warning("%s falló (%s); reintento %d de %d en %.0f ms",
+                           getattr(funcion, '__name__', funcion), e, intento, politica.intentos - 1,
+                           espera * 1000)
+            time.sleep(espera)
+            intento += 1
+
+
+def reintentar(funcion=None, *, idempotente=False, politica=None):
+    """
+    Decorador de con_reintentos: ``@reintentar`` o ``@reintentar(idempotente=True)``.
+    """
+    def decorar(f):
+        @wraps(f)
+        def envoltura(*args, **kwargs):
+            return con_reintentos(f, *args, idempotente=idempotente, politica=politica, **kwargs)
+        return envoltura
+
+    if funcion is not None:
+        return decorar(funcion)
+    return decorar
+
+
+# ============================================================
+# UNIDAD DE TRABAJO (TRANSACCIONES)
+# ============================================================
+
+_hilo = threading.local()
+
+
+class UnidadTrabajo:
+    """
+    Transacción en curso del hilo: una conexión del pool y los puntos de guardado abiertos.
+
+    Solo la crea transaccion(); el código de los controladores recibe un
+    CursorTransaccion.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.nivel = 0              # 0 = transacción externa; n = SAVEPOINT anidado n
+        self._al_confirmar = []     # (nivel, función) a llamar tras el COMMIT
+
+
+class CursorTransaccion:
+    """
+    Cursor de una transacción (se usa igual que un cursor de mysql.connector).
+
+    revertir() pide deshacer este nivel al salir del ``with`` sin lanzar una
+    excepción (p. ej. el controlador devuelve (False, mensaje) por stock insuficiente).
+    """
+
+    def __init__(self, unidad, cursor):
+        self._unidad = unidad
+        self._cursor = cursor
+        self._revertir = False
+
+    def __getattr__(self, nombre):
+        if nombre.startswith('_'):
+            raise AttributeError(nombre)
+        return getattr(self._cursor, nombre)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    @property
+    def conexion(self):
+        return self._unidad.conn
+
+    def revertir(self):
+        self._revertir = True
+
+
+def en_transaccion():
+    """True si el hilo actual está dentro de un ``with transaccion()``."""
+    return getattr(_hilo, 'unidad', None) is not None
+
+
+def al_confirmar(funcion, *args):
+    """
+    Llama a funcion(*args) cuando la transacción del hilo se confirme (enseguida si no hay una).
+
+    Sirve para efectos fuera de la base que solo deben ocurrir si los cambios
+    quedan guardados, como actualizar la caché del catálogo. Si el punto de
+    guardado donde se registró se deshace, la llamada se descarta.
+    """
+    unidad = getattr(_hilo, 'unidad', None)
+    if unidad is None:
+        funcion(*args)
+    else:
+        unidad._al_confirmar.append((unidad.nivel, lambda: funcion(*args)))
+
+
+@contextmanager
+def transaccion(dictionary=False):
+    """
+    Unidad de trabajo: ``with transaccion() as cursor:`` confirma al salir o deshace si hay excepción.
+
+    Dentro de otra transacción del mismo hilo no abre una conexión nueva: usa
+    un SAVEPOINT, así varias operaciones de controladores (que a su vez usan
+    transaccion()) se confirman juntas con un solo COMMIT. Un error en el
+    bloque anidado deshace solo su parte; la excepción sigue su curso y la
+    transacción externa decide.
+
+    Lanza SinConexion si no es posible conectar.
+    """
+    unidad = getattr(_hilo, 'unidad', None)
+    if unidad is not None:
+        with _punto_de_guardado(unidad, dictionary) as cursor:
+            yield cursor
+        return
+
+    conn = conectar()
+    if not conn:
+        raise SinConexion("No se pudo conectar a la base de datos.")
+    unidad = UnidadTrabajo(conn)
+    cursor = CursorTransaccion(unidad, conn.cursor(dictionary=dictionary))
+    _hilo.unidad = unidad
+    try:
+        try:
+            yield cursor
+        except BaseException:
+            _deshacer(conn)
+            raise
+        if cursor._revertir:
+            _deshacer(conn)
+            pendientes = []
+        else:
+            conn.commit()
+            pendientes = unidad._al_confirmar
+    finally:
+        _hilo.unidad = None
+        try:
+            cursor._cursor.close()
+        except Exception:
+            pass
+        conn.close()
+
+    for _, funcion in pendientes:
+        try:
+            funcion()
+        except Exception:
+            logger.exception("Error en una acción posterior al COMMIT")
+
+
+@contextmanager
+def _punto_de_guardado(unidad, dictionary):
+    unidad.nivel += 1
+    nivel = unidad.nivel
+    nombre = f"sp_{nivel}"
+    cursor = CursorTransaccion(unidad, unidad.conn.cursor(dictionary=dictionary))
+    try:
+        cursor.execute(f"SAVEPOINT {nombre}")
+        try:
+            yield cursor
+        except BaseException:
+            _volver_al_punto(unidad, cursor, nombre, nivel)
+            raise
+        if cursor._revertir:
+            _volver_al_punto(unidad, cursor, nombre, nivel)
+        else:
+            cursor.execute(f"RELEASE SAVEPOINT {nombre}")
+            # Sus cambios ya son del nivel de arriba: las acciones también, así un punto
+            # hermano que se deshaga después no las descarta
+            unidad._al_confirmar = [(min(n, nivel - 1), f) for n, f in unidad._al_confirmar]
+    finally:
+        unidad.nivel = nivel - 1
+        try:
+            cursor._cursor.close()
+        except Exception:
+            pass
+
+
+def _volver_al_punto(unidad, cursor, nombre, nivel):
+    unidad._al_confirmar = [(n, f) for n, f in unidad._al_confirmar if n < nivel]
+    try:
+        cursor.execute(f"ROLLBACK TO SAVEPOINT {nombre}")
+    except Error:
+        # Un deadlock ya deshizo toda la transacción (y sus savepoints); la externa lo verá
+        logger.warning("No se pudo volver al punto de guardado %s", nombre, exc_info=True)
+
+
+def _deshacer(conn):
+    try:
+        conn.rollback()
+    except Exception:
+        pass
+
+
+def ejecutar_transaccion(trabajo, dictionary=False, idempotente=False, politica=None):
+    """
+    Ejecuta trabajo(cursor) dentro de transaccion(), con reintentos (con_reintentos).
+
+    Si ``trabajo`` devuelve (False, ...) —el formato (éxito, mensaje) de los
+    controladores— se deshace en lugar de confirmar. Dentro de una transacción
+    ya abierta, trabajo corre en un SAVEPOINT de esa transacción.
+
+    Returns:
+        Lo que devuelva ``trabajo`` en el intento que terminó.
+    """
+    def intento():
+        with transaccion(dictionary=dictionary) as cursor:
+            resultado = trabajo(cursor)
+            if isinstance(resultado, tuple) and resultado and resultado[0] is False:
+                cursor.revertir()
+            return resultado
+
+    intento.__name__ = getattr(trabajo, '__name__', 'transaccion')
+    return con_reintentos(intento, idempotente=idempotente, politica=politica)
+
+
 def cerrar_conexion(conn):
     """Cierra de forma segura una conexión a la base de datos si existe."""
     try:
@@ -39,4 +807,4 @@ def cerrar_conexion(conn):
                 except Exception:
                     pass
     except Exception:
-        pass
\ No newline at end of file
+        pass
@@ -0,0 +1,114 @@
+# datos_async.py
+"""
+Acceso a datos para código asyncio (un futuro front end web o API).
+
+Cada función *_async es la gemela de la función del controlador: mismos
+argumentos y mismo resultado, pero se espera con ``await`` sin bloquear el
+bucle de eventos. La llamada se ejecuta completa en un hilo de un ejecutor
+acotado, así las transacciones, los reintentos y el pool de conexiones de
+database funcionan igual que en la versión síncrona (la unidad de trabajo es
+por hilo y nunca queda repartida entre dos).
+
+El ejecutor tiene tantos hilos como conexiones puede abrir el pool principal
+(DB_POOL_SIZE + DB_POOL_MAX_OVERFLOW) o los que indique DATOS_ASYNC_HILOS: más
+hilos solo esperarían una conexión libre. Las solicitudes que lleguen mientras
+todos están ocupados esperan su turno en el bucle, sin ocupar un hilo.
+
+Cancelar la tarea que espera no detiene una escritura que ya empezó: la venta
+o el abono se confirman igual. Por eso registrar_venta_async y
+registrar_abono_async aceptan la misma clave de idempotencia que las síncronas.
+
+Uso:
+    productos = await get_all_products_async()
+    ok, mensaje = await registrar_venta_async(usuario_id, carrito, clave_idempotencia=clave)
+"""
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import atexit
+import functools
+import logging
+import os
+import threading
+
+import database
+import client_orders_controller
+import products_controller
+import sales_controller
+import sales_history_controller
+import sales_rollup_controller
+
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger(__name__)
+
+_ejecutor = None
+_ejecutor_lock = threading.Lock()
+
+
+def _hilos_configurados():
+    try:
+        hilos = int(os.getenv('DATOS_ASYNC_HILOS', 0))
+    except ValueError:
+        hilos = 0
+    if hilos > 0:
+        return hilos
+    pool = database.obtener_pool()
+    return pool.tamano + pool.max_desborde
+
+
+def obtener_ejecutor():
+    """Pool de hilos donde corren las llamadas a la base de las funciones *_async."""
+    global _ejecutor
+    if _ejecutor is None:
+        with _ejecutor_lock:
+            if _ejecutor is None:
+                _ejecutor = ThreadPoolExecutor(max_workers=_hilos_configurados(),
+                                               thread_name_prefix="datos_async")
+    return _ejecutor
+
+
+def cerrar_ejecutor():
+    global _ejecutor
+    with _ejecutor_lock:
+        ejecutor, _ejecutor = _ejecutor, None
+    if ejecutor is not None:
+        ejecutor.shutdown(wait=False, cancel_futures=True)
+
+
+atexit.register(cerrar_ejecutor)
+
+
+async def ejecutar(funcion, *args, **kwargs):
+    """Ejecuta funcion(*args, **kwargs) en el ejecutor y devuelve su resultado sin bloquear el bucle."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(obtener_ejecutor(), functools.partial(funcion, *args, **kwargs))
+
+
+def _gemela(funcion):
+    """Versión async de una función de controlador, con el mismo nombre más _async."""
+    @functools.wraps(funcion)
+    async def gemela(*args, **kwargs):
+        return await ejecutar(funcion, *args, **kwargs)
+    gemela.__name__ = gemela.__qualname__ = f"{funcion.__name__}_async"
+    return gemela
+
+
+# Productos
+get_all_products_async = _gemela(products_controller.get_all_products)
+buscar_productos_async = _gemela(products_controller.buscar_productos)
+
+# Ventas
+registrar_venta_async = _gemela(sales_controller.registrar_venta)
+obtener_producto_por_codigo_async = _gemela(sales_controller.obtener_producto_por_codigo)
+
+# Historial y reportes
+get_sales_history_async = _gemela(sales_history_controller.get_sales_history)
+get_sales_history_page_async = _gemela(sales_history_controller.get_sales_history_page)
+obtener_resumen_ventas_async = _gemela(sales_rollup_controller.obtener_resumen_ventas)
+obtener_totales_periodo_async = _gemela(sales_rollup_controller.obtener_totales_periodo)
+
+# Pedidos de clientes
+obtener_pedidos_cliente_async = _gemela(client_orders_controller.obtener_pedidos_cliente)
+obtener_abonos_pedido_async = _gemela(client_orders_controller.obtener_abonos_pedido)
+registrar_pedido_cliente_async = _gemela(client_orders_controller.registrar_pedido_cliente)
+registrar_abono_async = _gemela(client_orders_controller.registrar_abono)
+eliminar_pedido_cliente_async = _gemela(client_orders_controller.eliminar_pedido_cliente)
@@ -38,13 +38,41 @@ def generar_ruta_csv(nombre_base, extension="csv"):
     return os.path.join(documentos, nombre_archivo)
 
 
-def exportar_a_csv(datos, ruta_archivo, encabezados):
-    """
-    Exporta datos a CSV con soporte completo para Excel (Windows/macOS/Linux).
+def _limpiar_valor(v):
+    """Convierte un valor de la base de datos en texto apto para CSV/Excel."""
+    if v is None:
+        return ""
+    elif isinstance(v, (int, float)):
+        if isinstance(v, float):
+            return f"{v:.2f}"
+        else:
+            return str(v)
+    elif hasattr(v, 'strftime'):  # datetime
+        return v.strftime('%Y-%m-%d %H:%M:%S')
+    else:
+        return str(v).strip()
+
+
+def exportar_filas_csv(filas, ruta_archivo, encabezados, mapa_columnas=None, tam_lote=500, progreso=None):
     """
-    if not datos:
-        return False, "⚠️ No hay datos para exportar."
+    Exporta a CSV cualquier iterable de filas (dicts) sin cargarlo completo en memoria.
+
+    Las filas se convierten y escriben por lotes de ``tam_lote``, así que al combinarlo
+    con un generador (p. ej. un cursor sin búfer leído con fetchmany) la memoria usada
+    es constante sin importar cuántas filas se exporten.
+
+    Args:
+        filas (iterable): Diccionarios con los datos.
+        ruta_archivo (str): Ruta del CSV a generar.
+        encabezados (list): Columnas del CSV.
+        mapa_columnas (dict, optional): {clave_origen: encabezado} para renombrar al vuelo.
+        tam_lote (int): Filas escritas por bloque.
+        progreso (callable, optional): Se llama con el total de filas escritas tras cada lote.
 
+    Returns:
+        (bool, str): (éxito, mensaje)
+    """
+    escritas = 0
     try:
         with open(ruta_archivo, mode='w', newline='', encoding='utf-8-sig') as file:
             writer = csv.DictWriter(
@@ -55,28 +83,36 @@ def exportar_a_csv(datos, ruta_archivo, encabezados):
                 escapechar='\\'
             )
             writer.writeheader()
-            
-            filas_limpias = []
-            for fila in datos:
-                fila_limpia = {}
-                for k, v in fila.items():
-                    if v is None:
-                        fila_limpia[k] = ""
-                    elif isinstance(v, (int, float)):
-                        if isinstance(v, float):
-                            fila_limpia[k] = f"{v:.2f}"
-                        else:
-                            fila_limpia[k] = str(v)
-                    elif hasattr(v, 'strftime'):  # datetime
-                        fila_limpia[k] = v.strftime('%Y-%m-%d %H:%M:%S')
-                    else:
-                        fila_limpia[k] = str(v).strip()
-                filas_limpias.append(fila_limpia)
-            
-            writer.writerows(filas_limpias)
-        
+
+            lote = []
+            for fila in filas:
+                if mapa_columnas:
+                    lote.append({mapa_columnas[k]: _limpiar_valor(v) for k, v in fila.items() if k in mapa_columnas})
+                else:
+                    lote.append({k: _limpiar_valor(v) for k, v in fila.items()})
+
+                if len(lote) >= tam_lote:
+                    writer.writerows(lote)
+                    escritas += len(lote)
+                    lote.clear()
+                    if progreso:
+                        progreso(escritas)
+
+            if lote:
+                writer.writerows(lote)
+                escritas += len(lote)
+                if progreso:
+                    progreso(escritas)
+
+        if escritas == 0:
+            try:
+                os.remove(ruta_archivo)
+            except OSError:
+                pass
+            return False, "⚠️ No hay datos para exportar."
+
         if os.path.exists(ruta_archivo) and os.path.getsize(ruta_archivo) > 0:
-            return True, f"✅ Exportado exitosamente:\n{ruta_archivo}"
+            return True, f"✅ Exportado exitosamente ({escritas} filas):\n{ruta_archivo}"
         else:
             return False, "❌ Error: El archivo CSV está vacío o no se creó."
 
@@ -87,4 +123,14 @@ def exportar_a_csv(datos, ruta_archivo, encabezados):
             "→ Intente guardar en otra carpeta (ej. Escritorio)."
         )
     except Exception as e:
-        return False, f"❌ Error al exportar:\n{str(e)}"
\ No newline at end of file
+        return False, f"❌ Error al exportar:\n{str(e)}"
+
+
+def exportar_a_csv(datos, ruta_archivo, encabezados):
+    """
+    Exporta datos a CSV con soporte completo para Excel (Windows/macOS/Linux).
+    """
+    if not datos:
+        return False, "⚠️ No hay datos para exportar."
+
+    return exportar_filas_csv(datos, ruta_archivo, encabezados)
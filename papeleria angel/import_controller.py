@@ -0,0 +1,93 @@
+# import_controller.py
+"""
+Lectura de archivos CSV/TSV para importaciones masivas.
+
+El archivo se recorre como flujo (una fila a la vez), así que un catálogo de
+decenas de miles de líneas no se carga completo en memoria. Se detecta la
+codificación (UTF-8, con o sin BOM, o la de Excel en Windows) y el separador
+(coma, punto y coma, tabulador o barra vertical).
+"""
+import codecs
+import csv
+import os
+import unicodedata
+
+_SEPARADORES = ",;\t|"
+_TAM_MUESTRA = 64 * 1024
+
+
+class ColumnasFaltantes(ValueError):
+    """El encabezado del archivo no trae todas las columnas requeridas."""
+
+    def __init__(self, faltantes):
+        super().__init__(f"Faltan columnas en el archivo: {', '.join(faltantes)}")
+        self.faltantes = faltantes
+
+
+def _detectar_codificacion(ruta):
+    """UTF-8 si todo el archivo lo es; si no, cp1252 (CSV guardado por Excel en Windows)."""
+    decodificador = codecs.getincrementaldecoder('utf-8')()
+    try:
+        with open(ruta, 'rb') as archivo:
+            for bloque in iter(lambda: archivo.read(_TAM_MUESTRA), b''):
+                decodificador.decode(bloque)
+            decodificador.decode(b'', final=True)
+    except UnicodeDecodeError:
+        return 'cp1252'
+    return 'utf-8-sig'
+
+
+def _detectar_separador(muestra, ruta):
+    try:
+        return csv.Sniffer().sniff(muestra, delimiters=_SEPARADORES).delimiter
+    except csv.Error:
+        return '\t' if os.path.splitext(ruta)[1].lower() in ('.tsv', '.tab') else ','
+
+
+def normalizar_encabezado(texto):
+    """'Precio Compra ' -> 'precio_compra', 'Categoría' -> 'categoria'."""
+    texto = unicodedata.normalize('NFKD', str(texto or '').strip().lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return "_".join(texto.replace('.', ' ').split())
+
+
+def leer_filas_csv(ruta, alias=None, requeridas=()):
+    """
+    Recorre un CSV/TSV devolviendo (número_de_línea, dict) por fila.
+
+    Los encabezados se normalizan con normalizar_encabezado y, si se indica,
+    se traducen con ``alias`` ({encabezado_normalizado: columna}). Las líneas
+    vacías se omiten y los valores llegan sin espacios sobrantes.
+
+    ``requeridas`` son las columnas que debe traer el encabezado; un elemento
+    puede ser una tupla de alternativas (basta con una). Se comprueban al leer
+    el encabezado, antes de devolver la primera fila.
+
+    Raises:
+        ValueError: Si el archivo no tiene encabezados.
+        ColumnasFaltantes: Si falta alguna columna requerida.
+    """
+    alias = alias or {}
+    codificacion = _detectar_codificacion(ruta)
+    with open(ruta, newline='', encoding=codificacion) as archivo:
+        separador = _detectar_separador(archivo.read(_TAM_MUESTRA), ruta)
+        archivo.seek(0)
+        # Mismo escape que usa export_controller al generar los CSV
+        lector = csv.reader(archivo, delimiter=separador, escapechar='\\')
+
+        encabezados = next(lector, None)
+        if not encabezados or not any(e.strip() for e in encabezados):
+            raise ValueError("El archivo no tiene encabezados.")
+        columnas = [alias.get(normalizar_encabezado(e), normalizar_encabezado(e)) for e in encabezados]
+        faltantes = []
+        for requerida in requeridas:
+            opciones = requerida if isinstance(requerida, tuple) else (requerida,)
+            if not any(c in columnas for c in opciones):
+                faltantes.append(" o ".join(opciones))
+        if faltantes:
+            raise ColumnasFaltantes(faltantes)
+
+        for valores in lector:
+            if not any(v.strip() for v in valores):
+                continue
+            yield lector.line_num, {c: v.strip() for c, v in zip(columnas, valores) if c}
@@ -1,5 +1,11 @@
 # main.py
 import tkinter as tk
+import cliente_servicio
+
+# Con SERVICIO_URL las vistas usan el servicio HTTP en lugar de conectarse a la base;
+# debe instalarse antes de importar las vistas
+cliente_servicio.instalar_si_configurado()
+
 from login import LoginView
 
 def main(usuario_logueado=None):
@@ -0,0 +1,355 @@
+# metricas_sql.py
+"""
+Instrumentación de consultas SQL: latencia, filas y origen de cada sentencia.
+
+database.py envuelve cada cursor prestado por el pool con CursorInstrumentado,
+que registra por (SQL normalizado, función que llama) el número de ejecuciones,
+las filas y un histograma de latencias con precisión relativa constante
+(estilo HDR). Las sentencias más lentas que DB_SLOW_QUERY_MS se escriben en el log.
+
+Configuración por variables de entorno:
+    DB_METRICS=0              desactiva la instrumentación (activa por defecto)
+    DB_SLOW_QUERY_MS=500      umbral del log de consultas lentas
+    DB_METRICS_JSON=ruta      vuelca las métricas a JSON al cerrar la aplicación
+
+Ver un volcado desde la línea de comandos:
+    python metricas_sql.py metricas.json [--top 20] [--orden total|p99|ejecuciones]
+"""
+from functools import lru_cache
+import argparse
+import atexit
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_ACTIVO = os.getenv('DB_METRICS', '1').strip().lower() not in ('0', 'false', 'no', 'off')
+try:
+    UMBRAL_LENTA_MS = float(os.getenv('DB_SLOW_QUERY_MS', 500))
+except ValueError:
+    UMBRAL_LENTA_MS = 500.0
+
+# Módulos que no cuentan como "quien llama" al buscar el origen de una consulta
+_MODULOS_INTERNOS = {__name__, 'database', 'contextlib'}
+
+
+def activo():
+    return _ACTIVO
+
+
+def activar(valor=True):
+    """Activa o desactiva la instrumentación en tiempo de ejecución."""
+    global _ACTIVO
+    _ACTIVO = bool(valor)
+
+
+# ============================================================
+# HISTOGRAMA
+# ============================================================
+
+class HistogramaLatencia:
+    """
+    Histograma de latencias en microsegundos con cubetas logarítmicas.
+
+    Cada potencia de dos se divide en 32 sub-cubetas, así que cualquier
+    percentil se reporta con un error relativo menor a ~3 % usando memoria
+    constante, sin guardar las muestras.
+    """
+
+    SUB_CUBETAS = 32
+    _BITS = 5  # log2(SUB_CUBETAS)
+
+    __slots__ = ('cubetas', 'cuenta', 'total_us', 'min_us', 'max_us')
+
+    def __init__(self):
+        self.cubetas = {}
+        self.cuenta = 0
+        self.total_us = 0
+        self.min_us = None
+        self.max_us = 0
+
+    def _indice(self, valor):
+        if valor < self.SUB_CUBETAS:
+            return valor
+        desplazamiento = valor.bit_length() - self._BITS - 1
+        return (desplazamiento + 1) * self.SUB_CUBETAS + (valor >> desplazamiento) - self.SUB_CUBETAS
+
+    def _valor(self, indice):
+        """Límite superior (aproximado) de la cubeta."""
+        if indice < self.SUB_CUBETAS:
+            return indice
+        desplazamiento = indice // self.SUB_CUBETAS - 1
+        mantisa = indice % self.SUB_CUBETAS + self.SUB_CUBETAS
+        return ((mantisa + 1) << desplazamiento) - 1
+
+    def registrar(self, microsegundos):
+        valor = max(0, int(microsegundos))
+        indice = self._indice(valor)
+        self.cubetas[indice] = self.cubetas.get(indice, 0) + 1
+        self.cuenta += 1
+        self.total_us += valor
+        if self.min_us is None or valor < self.min_us:
+            self.min_us = valor
+        if valor > self.max_us:
+            self.max_us = valor
+
+    def percentil(self, p):
+        if not self.cuenta:
+            return 0
+        objetivo = max(1, int(round(self.cuenta * p / 100.0)))
+        acumulado = 0
+        for indice in sorted(self.cubetas):
+            acumulado += self.cubetas[indice]
+            if acumulado >= objetivo:
+                return min(self._valor(indice), self.max_us)
+        return self.max_us
+
+    def resumen(self):
+        return {
+            'ejecuciones': self.cuenta,
+            'total_ms': round(self.total_us / 1000.0, 3),
+            'media_ms': round(self.total_us / 1000.0 / self.cuenta, 3) if self.cuenta else 0,
+            'min_ms': round((self.min_us or 0) / 1000.0, 3),
+            'p50_ms': round(self.percentil(50) / 1000.0, 3),
+            'p90_ms': round(self.percentil(90) / 1000.0, 3),
+            'p99_ms': round(self.percentil(99) / 1000.0, 3),
+            'max_ms': round(self.max_us / 1000.0, 3),
+        }
+
+
+# ============================================================
+# REGISTRO GLOBAL
+# ============================================================
+
+class _Estadistica:
+    __slots__ = ('histograma', 'filas')
+
+    def __init__(self):
+        self.histograma = HistogramaLatencia()
+        self.filas = 0
+
+
+_registro = {}
+_lock = threading.Lock()
+
+
+_RE_COMENTARIO = re.compile(r'--[^\n]*')
+_RE_CADENA = re.compile(r"'(?:[^'\\]|\\.)*'")
+_RE_NUMERO = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?\b')
+_RE_MARCADOR = re.compile(r'%s|%\(\w+\)s')
+_RE_LISTA = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_RE_VALUES = re.compile(r'(\(\.\.\.\))(?:\s*,\s*\(\.\.\.\))+')
+_RE_CASOS = re.compile(r'(WHEN \? THEN \?)(?:\s+WHEN \? THEN \?)+', re.IGNORECASE)
+_RE_ESPACIOS = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=4096)
+def normalizar_sql(sql):
+    """
+    Reduce una sentencia a su forma "plantilla" para agrupar ejecuciones.
+
+    Quita comentarios y literales, y colapsa listas variables (IN (...),
+    VALUES múltiples, CASE ... WHEN) para que un carrito de 3 o de 40 líneas
+    cuenten como la misma consulta.
+    """
+    if isinstance(sql, (bytes, bytearray)):
+        sql = sql.decode('utf-8', 'replace')
+    sql = _RE_COMENTARIO.sub(' ', sql)
+    sql = _RE_CADENA.sub('?', sql)
+    sql = _RE_MARCADOR.sub('?', sql)
+    sql = _RE_NUMERO.sub('?', sql)
+    sql = _RE_ESPACIOS.sub(' ', sql).strip()
+    sql = _RE_LISTA.sub('(...)', sql)
+    sql = _RE_VALUES.sub(r'\1', sql)
+    sql = _RE_CASOS.sub(r'\1 ...', sql)
+    return sql
+
+
+def _llamador():
+    """Devuelve 'modulo.funcion' del primer marco fuera de la capa de base de datos."""
+    marco = sys._getframe(2)
+    while marco is not None:
+        modulo = marco.f_globals.get('__name__', '')
+        if modulo not in _MODULOS_INTERNOS:
+            return f"{modulo}.{marco.f_code.co_name}"
+        marco = marco.f_back
+    return "?"
+
+
+def registrar(sql_normalizado, llamador, segundos, filas):
+    """Agrega una ejecución al registro y la escribe en el log si fue lenta."""
+    clave = (sql_normalizado, llamador)
+    with _lock:
+        estadistica = _registro.get(clave)
+        if estadistica is None:
+            estadistica = _registro[clave] = _Estadistica()
+        estadistica.histograma.registrar(segundos * 1_000_000)
+        if filas and filas > 0:
+            estadistica.filas += filas
+
+    milisegundos = segundos * 1000
+    if milisegundos >= UMBRAL_LENTA_MS:
+        logger.warning("Consulta lenta (%.1f ms, %s filas) en %s: %s",
+                       milisegundos, filas if filas is not None and filas >= 0 else "?",
+                       llamador, sql_normalizado)
+
+
+def instantanea():
+    """Copia de las métricas actuales, ordenada por tiempo total descendente."""
+    with _lock:
+        filas = []
+        for (sql, llamador), estadistica in _registro.items():
+            datos = estadistica.histograma.resumen()
+            datos.update({'sql': sql, 'llamador': llamador, 'filas': estadistica.filas})
+            filas.append(datos)
+    filas.sort(key=lambda d: d['total_ms'], reverse=True)
+    return filas
+
+
+def reiniciar():
+    with _lock:
+        _registro.clear()
+
+
+def volcar_json(ruta):
+    """Escribe las métricas actuales en un archivo JSON. Devuelve (éxito, mensaje)."""
+    try:
+        with open(ruta, 'w', encoding='utf-8') as archivo:
+            json.dump({
+                'generado_en': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'umbral_lenta_ms': UMBRAL_LENTA_MS,
+                'consultas': instantanea(),
+            }, archivo, ensure_ascii=False, indent=2)
+        return True, f"✅ Métricas guardadas en {ruta}"
+    except OSError as e:
+        return False, f"❌ No se pudieron guardar las métricas: {e}"
+
+
+def _volcar_al_salir():
+    ruta = os.getenv('DB_METRICS_JSON')
+    if ruta and _registro:
+        volcar_json(ruta)
+
+
+atexit.register(_volcar_al_salir)
+
+
+# ============================================================
+# CURSOR INSTRUMENTADO
+# ============================================================
+
+class CursorInstrumentado:
+    """
+    Envoltura de un cursor que mide cada sentencia.
+
+    El tiempo de una sentencia incluye su execute y los fetch posteriores
+    (con cursores sin búfer las filas llegan durante el fetch); se registra
+    al ejecutar la siguiente sentencia o al cerrar el cursor.
+    """
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._pendiente = None  # [sql_normalizado, llamador, segundos, filas, contar_al_leer]
+
+    def __getattr__(self, nombre):
+        if nombre.startswith('_'):
+            raise AttributeError(nombre)
+        return getattr(self._cursor, nombre)
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def _finalizar(self):
+        pendiente, self._pendiente = self._pendiente, None
+        if pendiente:
+            registrar(*pendiente[:4])
+
+    def _ejecutar(self, metodo, operacion, args, kwargs):
+        self._finalizar()
+        llamador = _llamador()
+        inicio = time.perf_counter()
+        try:
+            return metodo(operacion, *args, **kwargs)
+        finally:
+            duracion = time.perf_counter() - inicio
+            try:
+                filas = self._cursor.rowcount
+            except Exception:
+                filas = -1
+            self._pendiente = [normalizar_sql(operacion), llamador, duracion, filas, filas < 0]
+
+    def execute(self, operacion, *args, **kwargs):
+        return self._ejecutar(self._cursor.execute, operacion, args, kwargs)
+
+    def executemany(self, operacion, *args, **kwargs):
+        return self._ejecutar(self._cursor.executemany, operacion, args, kwargs)
+
+    def _leer(self, metodo, *args):
+        inicio = time.perf_counter()
+        resultado = metodo(*args)
+        pendiente = self._pendiente
+        if pendiente:
+            pendiente[2] += time.perf_counter() - inicio
+            # Con cursor sin búfer rowcount vale -1 al ejecutar: se cuentan las filas leídas
+            if pendiente[4] and resultado is not None:
+                leidas = len(resultado) if isinstance(resultado, list) else 1
+                pendiente[3] = max(pendiente[3], 0) + leidas
+        return resultado
+
+    def fetchone(self):
+        return self._leer(self._cursor.fetchone)
+
+    def fetchmany(self, *args):
+        return self._leer(self._cursor.fetchmany, *args)
+
+    def fetchall(self):
+        return self._leer(self._cursor.fetchall)
+
+    def close(self):
+        self._finalizar()
+        return self._cursor.close()
+
+    def __del__(self):
+        try:
+            self._finalizar()
+        except Exception:
+            pass
+
+
+def medir(sql, segundos, filas=-1):
+    """Registra una operación medida fuera de un cursor (p. ej. COMMIT)."""
+    registrar(normalizar_sql(sql), _llamador(), segundos, filas)
+
+
+# ============================================================
+# LÍNEA DE COMANDOS
+# ============================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Muestra un volcado JSON de métricas SQL.")
+    parser.add_argument('archivo', help="Archivo generado con DB_METRICS_JSON o volcar_json().")
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--orden', choices=['total', 'p99', 'ejecuciones'], default='total')
+    args = parser.parse_args(argv)
+
+    with open(args.archivo, encoding='utf-8') as archivo:
+        consultas = json.load(archivo).get('consultas', [])
+
+    clave = {'total': 'total_ms', 'p99': 'p99_ms', 'ejecuciones': 'ejecuciones'}[args.orden]
+    consultas.sort(key=lambda d: d[clave], reverse=True)
+
+    print(f"{'Total ms':>10} {'Ejec.':>7} {'p50':>8} {'p99':>8} {'Filas':>8}  Origen / SQL")
+    for c in consultas[:args.top]:
+        print(f"{c['total_ms']:>10.1f} {c['ejecuciones']:>7} {c['p50_ms']:>8.2f} {c['p99_ms']:>8.2f} "
+              f"{c['filas']:>8}  {c['llamador']}")
+        print(f"{'':>46}{c['sql'][:140]}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,453 @@
+# migraciones.py
+"""
+Migraciones versionadas del esquema de la base de datos.
+
+Cada migración tiene un número de versión, una descripción y una lista de pasos
+(sentencias SQL o funciones que reciben el cursor). Todos los pasos son
+idempotentes, así que volver a ejecutar una migración interrumpida es seguro.
+Las versiones aplicadas se registran en la tabla schema_migraciones.
+
+Uso desde la línea de comandos (en la carpeta de la aplicación):
+    python migraciones.py                     # aplica las migraciones pendientes
+    python migraciones.py --estado            # muestra versiones aplicadas y pendientes
+    python migraciones.py --verificar-indices # EXPLAIN de las consultas principales
+"""
+from database import conexion, es_sqlite, existe_columna, existe_indice, Error
+from sales_rollup_controller import SQL_CREAR_TABLA_RESUMEN, TABLA_RESUMEN, reconstruir_resumen_en_cursor
+from versiones_tablas import SQL_CREAR_TABLA_VERSIONES
+from datetime import datetime
+import argparse
+import logging
+
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger(__name__)
+
+TABLA_MIGRACIONES = "schema_migraciones"
+
+
+# ============================================================
+# UTILIDADES IDEMPOTENTES
+# ============================================================
+
+def agregar_columna(tabla, columna, definicion):
+    """Paso que agrega una columna solo si no existe."""
+    def paso(cursor):
+        if not existe_columna(cursor, tabla, columna):
+            cursor.execute(f"ALTER TABLE {tabla} ADD COLUMN {columna} {definicion}")
+    paso.__doc__ = f"Columna {tabla}.{columna}"
+    return paso
+
+
+def crear_indice(tabla, indice, columnas, tipo="INDEX"):
+    """
+    Paso que crea un índice solo si no existe un índice con ese nombre.
+
+    En SQLite no hay índices FULLTEXT: el paso no hace nada (la búsqueda usa
+    el índice en memoria de busqueda_productos).
+    """
+    def paso(cursor):
+        if existe_indice(cursor, tabla, indice):
+            return
+        if not es_sqlite():
+            cursor.execute(f"ALTER TABLE {tabla} ADD {tipo} {indice} ({columnas})")
+        elif tipo != "FULLTEXT":
+            unico = "UNIQUE " if tipo == "UNIQUE" else ""
+            cursor.execute(f"CREATE {unico}INDEX {indice} ON {tabla} ({columnas})")
+    paso.__doc__ = f"Índice {tabla}.{indice} ({columnas})"
+    return paso
+
+
+# ============================================================
+# PASOS CON DATOS
+# ============================================================
+
+def _rellenar_resumen(cursor):
+    """Genera el resumen diario desde las ventas si la tabla está vacía."""
+    cursor.execute(f"SELECT COUNT(*) FROM {TABLA_RESUMEN}")
+    if cursor.fetchone()[0] == 0:
+        reconstruir_resumen_en_cursor(cursor)
+
+
+def _rellenar_total_abonado(cursor):
+    """Calcula total_abonado de cada pedido desde abonos en una sola sentencia."""
+    if es_sqlite():
+        # SQLite no admite UPDATE ... JOIN; con idx_abonos_pedido cada suma es una búsqueda por índice
+        cursor.execute("""
+            UPDATE pedidos_cliente
+            SET total_abonado = IFNULL((SELECT SUM(monto) FROM abonos
+                                        WHERE abonos.pedido_cliente_id = pedidos_cliente.id), 0)
+        """)
+        return
+    cursor.execute("""
+        UPDATE pedidos_cliente pc
+        LEFT JOIN (
+            SELECT pedido_cliente_id, SUM(monto) AS suma
+            FROM abonos
+            GROUP BY pedido_cliente_id
+        ) a ON a.pedido_cliente_id = pc.id
+        SET pc.total_abonado = IFNULL(a.suma, 0)
+    """)
+
+
+def _marca_de_actualizacion(cursor):
+    """
+    productos.fecha_actualizacion: la pone el motor en cada INSERT/UPDATE.
+
+    MySQL lo hace con ON UPDATE CURRENT_TIMESTAMP(6); SQLite no lo tiene (ni
+    admite un DEFAULT no constante al agregar la columna), así que usa triggers.
+    """
+    if not es_sqlite():
+        agregar_columna("productos", "fecha_actualizacion",
+                        "TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)")(cursor)
+        return
+    ahora = "strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')"
+    if not existe_columna(cursor, "productos", "fecha_actualizacion"):
+        cursor.execute("ALTER TABLE productos ADD COLUMN fecha_actualizacion TIMESTAMP NULL")
+        cursor.execute(f"UPDATE productos SET fecha_actualizacion = {ahora}")
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_productos_marca_insert AFTER INSERT ON productos
+        BEGIN
+            UPDATE productos SET fecha_actualizacion = {ahora} WHERE id = NEW.id;
+        END
+    """)
+    # Solo si la sentencia no fijó la marca ella misma (así el trigger no se llama en cadena)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_productos_marca_update AFTER UPDATE ON productos
+        WHEN NEW.fecha_actualizacion IS OLD.fecha_actualizacion
+        BEGIN
+            UPDATE productos SET fecha_actualizacion = {ahora} WHERE id = NEW.id;
+        END
+    """)
+
+
+# ============================================================
+# MIGRACIONES
+# ============================================================
+
+ESQUEMA_BASE = [
+    """
+    CREATE TABLE IF NOT EXISTS usuarios (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        nombre VARCHAR(100) NOT NULL,
+        correo VARCHAR(150) NOT NULL,
+        contraseña VARCHAR(64) NOT NULL,
+        rol VARCHAR(20) NOT NULL DEFAULT 'cajero'
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS proveedores (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        nombre_empresa VARCHAR(150) NOT NULL,
+        contacto VARCHAR(150),
+        telefono VARCHAR(30),
+        correo VARCHAR(150)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS productos (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        nombre VARCHAR(150) NOT NULL,
+        descripcion TEXT,
+        precio_compra DECIMAL(10, 2) NOT NULL DEFAULT 0,
+        precio_venta DECIMAL(10, 2) NOT NULL DEFAULT 0,
+        stock INT NOT NULL DEFAULT 0,
+        categoria VARCHAR(100),
+        proveedor_id INT NOT NULL,
+        fecha_ingreso DATE,
+        activo TINYINT(1) NOT NULL DEFAULT 1,
+        FOREIGN KEY (proveedor_id) REFERENCES proveedores(id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS clientes (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        nombre VARCHAR(100) NOT NULL,
+        apellido VARCHAR(100),
+        telefono VARCHAR(30),
+        direccion VARCHAR(255),
+        email VARCHAR(150)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS ventas (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        usuario_id INT NOT NULL,
+        cliente_id INT NULL,
+        fecha_venta DATETIME NOT NULL,
+        total DECIMAL(12, 2) NOT NULL DEFAULT 0,
+        FOREIGN KEY (usuario_id) REFERENCES usuarios(id),
+        FOREIGN KEY (cliente_id) REFERENCES clientes(id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS detalle_venta (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        venta_id INT NOT NULL,
+        producto_id INT NOT NULL,
+        cantidad INT NOT NULL,
+        precio_unitario DECIMAL(10, 2) NOT NULL,
+        subtotal DECIMAL(12, 2) NOT NULL,
+        FOREIGN KEY (venta_id) REFERENCES ventas(id),
+        FOREIGN KEY (producto_id) REFERENCES productos(id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS pedidos_cliente (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        cliente_id INT NOT NULL,
+        fecha_pedido DATE NOT NULL,
+        fecha_entrega_estimada DATE NULL,
+        total DECIMAL(10, 2) NOT NULL,
+        estado VARCHAR(20) NOT NULL DEFAULT 'Pendiente',
+        FOREIGN KEY (cliente_id) REFERENCES clientes(id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS detalle_pedido_cliente (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        pedido_id INT NOT NULL,
+        producto_id INT NULL,
+        descripcion VARCHAR(255),
+        cantidad INT NOT NULL DEFAULT 1,
+        precio_unitario DECIMAL(10, 2) NOT NULL DEFAULT 0,
+        subtotal DECIMAL(12, 2) NOT NULL DEFAULT 0,
+        FOREIGN KEY (pedido_id) REFERENCES pedidos_cliente(id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS abonos (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        pedido_cliente_id INT NOT NULL,
+        fecha_abono DATETIME NOT NULL,
+        monto DECIMAL(10, 2) NOT NULL,
+        metodo_pago VARCHAR(30),
+        usuario_id INT NOT NULL,
+        FOREIGN KEY (pedido_cliente_id) REFERENCES pedidos_cliente(id),
+        FOREIGN KEY (usuario_id) REFERENCES usuarios(id)
+    )
+    """,
+]
+
+MIGRACIONES = [
+    (1, "Esquema base", ESQUEMA_BASE),
+    (2, "Resumen diario de ventas", [SQL_CREAR_TABLA_RESUMEN, _rellenar_resumen]),
+    (3, "Saldo abonado en pedidos_cliente", [
+        agregar_columna("pedidos_cliente", "total_abonado", "DECIMAL(10, 2) NOT NULL DEFAULT 0"),
+        _rellenar_total_abonado,
+    ]),
+    (4, "Índices de las consultas principales", [
+        # Catálogo: WHERE activo = 1 ORDER BY nombre
+        crear_indice("productos", "idx_productos_activo_nombre", "activo, nombre"),
+        # Historial: rango y orden por fecha (el PK id va implícito en el índice)
+        crear_indice("ventas", "idx_ventas_fecha", "fecha_venta"),
+        # Historial: cubre la unión con detalle_venta sin leer la fila completa
+        crear_indice("detalle_venta", "idx_detalle_venta_venta", "venta_id, producto_id, cantidad, subtotal"),
+        # Abonos de un pedido y sumas por pedido (conciliación)
+        crear_indice("abonos", "idx_abonos_pedido", "pedido_cliente_id, monto"),
+        # Inicio de sesión por correo
+        crear_indice("usuarios", "idx_usuarios_correo", "correo"),
+        # Listado y búsqueda de clientes por nombre
+        crear_indice("clientes", "idx_clientes_nombre_apellido", "nombre, apellido"),
+        # Listado de pedidos ordenado por fecha
+        crear_indice("pedidos_cliente", "idx_pedidos_cliente_fecha", "fecha_pedido"),
+    ]),
+    (5, "Marca de actualización de productos (caché del catálogo)", [
+        _marca_de_actualizacion,
+        crear_indice("productos", "idx_productos_actualizacion", "fecha_actualizacion"),
+    ]),
+    (6, "Índices FULLTEXT para la búsqueda de productos", [
+        # Motor "fulltext" de busqueda_productos (BUSQUEDA_PRODUCTOS=fulltext)
+        crear_indice("productos", "ft_productos_texto", "nombre, descripcion, categoria", tipo="FULLTEXT"),
+        crear_indice("proveedores", "ft_proveedores_empresa", "nombre_empresa", tipo="FULLTEXT"),
+    ]),
+    (7, "Código SKU / de barras de productos", [
+        # NULL permitido: los productos sin código no chocan con el índice único
+        agregar_columna("productos", "sku", "VARCHAR(64) NULL"),
+        crear_indice("productos", "uq_productos_sku", "sku", tipo="UNIQUE"),
+    ]),
+    (8, "Clave de idempotencia de ventas (ventas sin conexión)", [
+        # La caja genera la clave; reenviar una venta ya registrada no la duplica
+        agregar_columna("ventas", "clave_idempotencia", "VARCHAR(36) NULL"),
+        crear_indice("ventas", "uq_ventas_clave_idempotencia", "clave_idempotencia", tipo="UNIQUE"),
+    ]),
+    (9, "Clave de idempotencia de abonos", [
+        agregar_columna("abonos", "clave_idempotencia", "VARCHAR(36) NULL"),
+        crear_indice("abonos", "uq_abonos_clave_idempotencia", "clave_idempotencia", tipo="UNIQUE"),
+    ]),
+    (10, "Versiones de tablas de referencia (lecturas condicionales)", [SQL_CREAR_TABLA_VERSIONES]),
+]
+
+
+# ============================================================
+# EJECUCIÓN
+# ============================================================
+
+def _asegurar_tabla_migraciones(cursor):
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {TABLA_MIGRACIONES} (
+            version INT PRIMARY KEY,
+            descripcion VARCHAR(200) NOT NULL,
+            aplicada_en DATETIME NOT NULL
+        )
+    """)
+
+
+def versiones_aplicadas():
+    """Devuelve el conjunto de versiones ya registradas."""
+    with conexion() as conn:
+        cursor = conn.cursor()
+        try:
+            _asegurar_tabla_migraciones(cursor)
+            cursor.execute(f"SELECT version FROM {TABLA_MIGRACIONES}")
+            return {fila[0] for fila in cursor.fetchall()}
+        finally:
+            cursor.close()
+
+
+def aplicar_migraciones(hasta=None):
+    """
+    Aplica en orden las migraciones pendientes.
+
+    Args:
+        hasta (int, optional): Última versión a aplicar (por defecto todas).
+
+    Returns:
+        (bool, str): (éxito, mensaje)
+    """
+    aplicadas_ahora = []
+    try:
+        aplicadas = versiones_aplicadas()
+        with conexion() as conn:
+            cursor = conn.cursor()
+            try:
+                for version, descripcion, pasos in MIGRACIONES:
+                    if version in aplicadas or (hasta is not None and version > hasta):
+                        continue
+                    for paso in pasos:
+                        if callable(paso):
+                            paso(cursor)
+                        else:
+                            cursor.execute(paso)
+                    cursor.execute(
+                        f"INSERT INTO {TABLA_MIGRACIONES} (version, descripcion, aplicada_en) VALUES (%s, %s, %s)",
+                        (version, descripcion, datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+                    )
+                    conn.commit()
+                    aplicadas_ahora.append(version)
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+    except Error as e:
+        logger.exception("Error al aplicar migraciones")
+        hechas = f" Aplicadas antes del error: {aplicadas_ahora}." if aplicadas_ahora else ""
+        return False, f"❌ Error al aplicar migraciones: {e}.{hechas}"
+
+    if not aplicadas_ahora:
+        return True, "✅ El esquema ya está actualizado."
+    return True, f"✅ Migraciones aplicadas: {', '.join(map(str, aplicadas_ahora))}."
+
+
+# ============================================================
+# VERIFICACIÓN DE ÍNDICES (EXPLAIN)
+# ============================================================
+
+def _consultas_a_verificar():
+    """
+    Consultas principales de los controladores y las tablas (alias) que deben usar índice.
+
+    Los textos son las constantes que ejecutan los controladores, para que la
+    verificación no se desincronice del código.
+    """
+    from auth_controller import _SELECT_LOGIN
+    from busqueda_productos import _SELECT_FULLTEXT
+    from catalogo_cache import _SELECT_CATALOGO, _DONDE_ACTIVOS, _DONDE_CAMBIOS
+    from client_orders_controller import _SELECT_PEDIDOS, _SELECT_ABONOS_PEDIDO
+    from clientes_controller import _SELECT_CLIENTES
+    from products_controller import _SELECT_ID_POR_SKU
+    from sales_history_controller import _SELECT_HISTORIAL, _filtro_fechas
+    from sales_rollup_controller import _SELECT_TOTALES, _rango
+
+    catalogo = _SELECT_CATALOGO.format(extra="")
+    condiciones, params = _filtro_fechas('2000-01-01', '2000-01-31')
+    condiciones_resumen, params_resumen = _rango('2000-01-01', '2000-01-31')
+    return [
+        ("Catálogo de productos", catalogo + _DONDE_ACTIVOS, (), ("p", "pr")),
+        ("Historial de ventas por fechas",
+         _SELECT_HISTORIAL + condiciones + " ORDER BY v.fecha_venta DESC, v.id DESC, dv.id DESC LIMIT 201",
+         tuple(params), ("v", "dv", "p", "u")),
+        ("Abonos de un pedido", _SELECT_ABONOS_PEDIDO, (1,), ("a", "u")),
+        ("Pedidos con cliente", _SELECT_PEDIDOS, (), ("c",)),
+        ("Inicio de sesión", _SELECT_LOGIN, ("x@x.com", "x"), ("usuarios",)),
+        ("Listado de clientes", _SELECT_CLIENTES, (), ("clientes",)),
+        ("Cambios del catálogo", catalogo + _DONDE_CAMBIOS, ("2000-01-01 00:00:00",), ("p", "pr")),
+        ("Productos por código (SKU)", _SELECT_ID_POR_SKU.format(marcadores="%s"),
+         ("7501234567890",), ("productos",)),
+        ("Búsqueda FULLTEXT de productos", _SELECT_FULLTEXT.format(con_stock=""),
+         ("+cuaderno*",) * 3 + (50,), ("p",)),
+        ("Resumen por período", _SELECT_TOTALES + condiciones_resumen, tuple(params_resumen), ("r",)),
+    ]
+
+
+def verificar_indices():
+    """
+    Ejecuta EXPLAIN sobre cada consulta principal y comprueba que las tablas
+    indicadas usen un índice (columna ``key`` no nula).
+
+    Con tablas casi vacías MySQL puede preferir un recorrido completo; ejecútelo
+    sobre una base con datos representativos.
+
+    Returns:
+        (bool, list): (todas_usan_indice, [(consulta, tabla, indice_o_None)])
+    """
+    resultados = []
+    with conexion() as conn:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            for nombre, sql, params, tablas in _consultas_a_verificar():
+                cursor.execute("EXPLAIN " + sql, params)
+                plan = {fila['table']: fila.get('key') for fila in cursor.fetchall()}
+                for tabla in tablas:
+                    resultados.append((nombre, tabla, plan.get(tabla)))
+        finally:
+            cursor.close()
+    return all(indice for _, _, indice in resultados), resultados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Migraciones del esquema de Papelería Ángel.")
+    parser.add_argument('--estado', action='store_true', help="Muestra las versiones aplicadas y pendientes.")
+    parser.add_argument('--hasta', type=int, help="Aplica solo hasta esta versión.")
+    parser.add_argument('--verificar-indices', action='store_true',
+                        help="Comprueba con EXPLAIN que las consultas principales usen índices.")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.estado:
+            aplicadas = versiones_aplicadas()
+            for version, descripcion, _ in MIGRACIONES:
+                marca = "✅" if version in aplicadas else "⏳"
+                print(f"{marca} {version:>3}  {descripcion}")
+            return 0
+
+        if args.verificar_indices:
+            if es_sqlite():
+                print("❌ --verificar-indices usa EXPLAIN de MySQL; no aplica con DB_BACKEND=sqlite.")
+                return 1
+            ok, resultados = verificar_indices()
+            for nombre, tabla, indice in resultados:
+                marca = "✅" if indice else "❌"
+                print(f"{marca} {nombre:<32} {tabla:<10} {indice or 'SIN ÍNDICE (recorrido completo)'}")
+            return 0 if ok else 1
+    except Error as e:
+        print(f"❌ Error de base de datos: {e}")
+        return 1
+
+    ok, mensaje = aplicar_migraciones(args.hasta)
+    print(mensaje)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,353 @@
+# motor_sqlite.py
+"""
+Motor SQLite embebido, intercambiable con MySQL (DB_BACKEND=sqlite).
+
+Pensado para cajas que trabajan solas (sin servidor MySQL) y para benchmarks
+herméticos. database.conectar() presta estas conexiones desde el mismo pool,
+con la misma interfaz que mysql.connector: cursor(dictionary=True) devuelve
+diccionarios, commit()/rollback(), is_connected(), ping(), lastrowid y rowcount.
+
+Las consultas de los controladores se escriben en el dialecto de MySQL y se
+traducen aquí una sola vez por texto (caché):
+  - marcadores %s -> ?
+  - SELECT ... FOR UPDATE / LOCK IN SHARE MODE: se quita el bloqueo; la
+    transacción se abre con BEGIN IMMEDIATE (SQLite bloquea la base entera
+    para escribir, así que el efecto es el mismo o más estricto)
+  - INSERT ... ON DUPLICATE KEY UPDATE c = VALUES(c) -> ON CONFLICT DO UPDATE SET c = excluded.c
+  - CREATE TABLE: INT AUTO_INCREMENT PRIMARY KEY y los KEY internos (como CREATE INDEX aparte)
+  - SET FOREIGN_KEY_CHECKS y TRUNCATE TABLE
+
+Como en MySQL, una sentencia DDL (CREATE, ALTER, DROP, TRUNCATE) confirma la
+transacción abierta y se confirma sola.
+
+Los errores de sqlite3 se convierten en database.Error con el errno de MySQL
+equivalente (1062 clave duplicada, 1054 columna desconocida, 1205 base
+bloqueada...), así el manejo de errores de los controladores no cambia.
+
+Configuración: DB_SQLITE_PATH (por defecto ~/.papeleria_angel/papeleria.sqlite3),
+DB_SQLITE_SYNCHRONOUS (FULL por defecto: una venta confirmada sobrevive a un
+corte de luz) y DB_SQLITE_CACHE_MB.
+"""
+from database import Error
+from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache
+import logging
+import os
+import re
+import sqlite3
+
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger(__name__)
+
+# Segundos que una escritura espera a que se libere el bloqueo antes de fallar con 1205
+_ESPERA_BLOQUEO = 10
+
+
+def ruta_base():
+    ruta = os.getenv('DB_SQLITE_PATH')
+    if ruta:
+        return ruta
+    return os.path.join(os.path.expanduser("~"), ".papeleria_angel", "papeleria.sqlite3")
+
+
+# ============================================================
+# TIPOS: mismos valores de Python que devuelve mysql.connector
+# ============================================================
+
+def _convertir_fecha_hora(valor):
+    texto = valor.decode()
+    try:
+        return datetime.fromisoformat(texto)
+    except ValueError:
+        return texto
+
+
+def _convertir_fecha(valor):
+    texto = valor.decode()
+    try:
+        return date.fromisoformat(texto[:10])
+    except ValueError:
+        return texto
+
+
+sqlite3.register_adapter(Decimal, float)
+sqlite3.register_adapter(datetime, lambda valor: valor.isoformat(" "))
+sqlite3.register_adapter(date, lambda valor: valor.isoformat())
+sqlite3.register_converter("DATETIME", _convertir_fecha_hora)
+sqlite3.register_converter("TIMESTAMP", _convertir_fecha_hora)
+sqlite3.register_converter("DATE", _convertir_fecha)
+
+
+# ============================================================
+# DIALECTO
+# ============================================================
+
+_BLOQUEO = re.compile(r"\s+(FOR\s+UPDATE|LOCK\s+IN\s+SHARE\s+MODE)\b", re.IGNORECASE)
+_DUPLICADO = re.compile(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\b", re.IGNORECASE)
+_VALOR_NUEVO = re.compile(r"\bVALUES\((\w+)\)", re.IGNORECASE)
+_CREAR_TABLA = re.compile(r"^\s*CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)", re.IGNORECASE)
+_AUTOINCREMENTAL = re.compile(r"\bINT\s+AUTO_INCREMENT\s+PRIMARY\s+KEY\b", re.IGNORECASE)
+_INDICE_EN_TABLA = re.compile(r",\s*(UNIQUE\s+)?(?:KEY|INDEX)\s+(\w+)\s*\(([^)]*)\)", re.IGNORECASE)
+_REVISAR_FK = re.compile(r"^\s*SET\s+FOREIGN_KEY_CHECKS\s*=\s*(\d)\s*$", re.IGNORECASE)
+_VACIAR = re.compile(r"^\s*TRUNCATE\s+TABLE\s+(\w+)\s*$", re.IGNORECASE)
+_INSERTAR_IGNORANDO = re.compile(r"^\s*INSERT\s+IGNORE\b", re.IGNORECASE)
+# Sentencias que abren la transacción reservando la escritura (BEGIN IMMEDIATE)
+_ESCRITURA = re.compile(r"^\s*(INSERT|UPDATE|DELETE|REPLACE|SAVEPOINT)\b", re.IGNORECASE)
+_DDL = re.compile(r"^\s*(CREATE|ALTER|DROP|TRUNCATE)\b", re.IGNORECASE)
+
+MODO_LECTURA = "lectura"       # BEGIN (instantánea, sin bloquear)
+MODO_ESCRITURA = "escritura"   # BEGIN IMMEDIATE
+MODO_DDL = "ddl"               # confirma lo pendiente y se ejecuta fuera de transacción
+
+# Sentencias que no deben abrir una transacción
+_FUERA_DE_TRANSACCION = re.compile(r"^\s*(PRAGMA|BEGIN|COMMIT|ROLLBACK|RELEASE|VACUUM)\b", re.IGNORECASE)
+
+
+@lru_cache(maxsize=1024)
+def traducir_sql(sql):
+    """
+    Traduce una sentencia del dialecto de MySQL al de SQLite.
+
+    Returns:
+        (tuple, str): (sentencias, modo). Casi siempre una sola sentencia; un
+            CREATE TABLE con índices agrega un CREATE INDEX por índice. ``modo``
+            (MODO_LECTURA, MODO_ESCRITURA o MODO_DDL) indica cómo abrir la transacción.
+    """
+    if _DDL.match(sql):
+        modo = MODO_DDL
+    elif _ESCRITURA.match(sql):
+        modo = MODO_ESCRITURA
+    else:
+        modo = MODO_LECTURA
+    sql, bloqueos = _BLOQUEO.subn("", sql)
+    if bloqueos and modo == MODO_LECTURA:
+        modo = MODO_ESCRITURA
+
+    revisar_fk = _REVISAR_FK.match(sql)
+    if revisar_fk:
+        return (f"PRAGMA foreign_keys = {'ON' if revisar_fk.group(1) == '1' else 'OFF'}",), MODO_LECTURA
+    vaciar = _VACIAR.match(sql)
+    if vaciar:
+        return (f"DELETE FROM {vaciar.group(1)}",), MODO_DDL
+    sql = _INSERTAR_IGNORANDO.sub("INSERT OR IGNORE", sql)
+
+    duplicado = _DUPLICADO.search(sql)
+    if duplicado:
+        # Sin destino de conflicto: cualquier índice único, igual que en MySQL
+        sql = (sql[:duplicado.start()] + "ON CONFLICT DO UPDATE SET"
+               + _VALOR_NUEVO.sub(r"excluded.\1", sql[duplicado.end():]))
+
+    extra = []
+    tabla = _CREAR_TABLA.match(sql)
+    if tabla:
+        sql = _AUTOINCREMENTAL.sub("INTEGER PRIMARY KEY AUTOINCREMENT", sql)
+        for unico, indice, columnas in _INDICE_EN_TABLA.findall(sql):
+            extra.append(f"CREATE {'UNIQUE ' if unico else ''}INDEX IF NOT EXISTS {indice} "
+                         f"ON {tabla.group(1)} ({columnas})")
+        sql = _INDICE_EN_TABLA.sub("", sql)
+
+    return (sql.replace("%s", "?"),) + tuple(extra), modo
+
+
+# ============================================================
+# ERRORES
+# ============================================================
+
+# (texto del mensaje de SQLite, errno de MySQL equivalente)
+_ERRORES_EQUIVALENTES = (
+    ("unique constraint failed", 1062),       # ER_DUP_ENTRY
+    ("not null constraint failed", 1048),     # ER_BAD_NULL_ERROR
+    ("no such column", 1054),                 # ER_BAD_FIELD_ERROR
+    ("has no column named", 1054),
+    ("no such table", 1146),                  # ER_NO_SUCH_TABLE
+    ("duplicate column name", 1060),          # ER_DUP_FIELDNAME
+    ("already exists", 1050),                 # ER_TABLE_EXISTS_ERROR
+    ("syntax error", 1064),                   # ER_PARSE_ERROR
+)
+_SQLITE_BUSY, _SQLITE_LOCKED = 5, 6
+
+
+def _error_equivalente(error, sentencia=""):
+    """database.Error con el errno de MySQL que corresponde al error de sqlite3."""
+    mensaje = str(error)
+    minusculas = mensaje.lower()
+    errno = None
+    if (getattr(error, 'sqlite_errorcode', 0) & 0xFF) in (_SQLITE_BUSY, _SQLITE_LOCKED) or "locked" in minusculas:
+        errno = 1205   # ER_LOCK_WAIT_TIMEOUT: se reintenta como en MySQL
+    elif "foreign key constraint failed" in minusculas:
+        # 1451: se borra una fila referenciada; 1452: se referencia una fila que no existe
+        errno = 1451 if sentencia.lstrip()[:6].upper() == "DELETE" else 1452
+    else:
+        for texto, codigo in _ERRORES_EQUIVALENTES:
+            if texto in minusculas:
+                errno = codigo
+                break
+    return Error(msg=mensaje, errno=errno)
+
+
+# ============================================================
+# CONEXIÓN Y CURSOR
+# ============================================================
+
+class CursorSQLite:
+    """Cursor con la interfaz de mysql.connector (dictionary=True -> filas como dict)."""
+
+    def __init__(self, conexion, dictionary=False):
+        self._conexion = conexion
+        self._cursor = conexion._conn.cursor()
+        self._dictionary = dictionary
+        self._columnas = None
+
+    def _ejecutar(self, metodo, operacion, parametros):
+        sentencias, modo = traducir_sql(operacion)
+        try:
+            self._conexion._comenzar(sentencias[0], modo)
+            metodo(sentencias[0], parametros)
+            for sentencia in sentencias[1:]:
+                self._conexion._conn.execute(sentencia)
+        except sqlite3.Error as e:
+            raise _error_equivalente(e, sentencias[0]) from e
+        self._columnas = None
+
+    def execute(self, operacion, params=None, multi=False):
+        self._ejecutar(self._cursor.execute, operacion, params if params is not None else ())
+
+    def executemany(self, operacion, seq_params):
+        self._ejecutar(self._cursor.executemany, operacion, seq_params)
+
+    def _fila(self, fila):
+        if fila is None or not self._dictionary:
+            return fila
+        if self._columnas is None:
+            self._columnas = [d[0] for d in self._cursor.description]
+        return dict(zip(self._columnas, fila))
+
+    def fetchone(self):
+        try:
+            return self._fila(self._cursor.fetchone())
+        except sqlite3.Error as e:
+            raise _error_equivalente(e) from e
+
+    def fetchmany(self, size=None):
+        try:
+            filas = self._cursor.fetchmany(size if size is not None else self._cursor.arraysize)
+        except sqlite3.Error as e:
+            raise _error_equivalente(e) from e
+        return [self._fila(f) for f in filas] if self._dictionary else filas
+
+    def fetchall(self):
+        try:
+            filas = self._cursor.fetchall()
+        except sqlite3.Error as e:
+            raise _error_equivalente(e) from e
+        return [self._fila(f) for f in filas] if self._dictionary else filas
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def column_names(self):
+        return tuple(d[0] for d in self._cursor.description or ())
+
+    def close(self):
+        self._cursor.close()
+
+
+class ConexionSQLite:
+    """
+    Conexión a la base SQLite con la interfaz de mysql.connector.
+
+    Como en MySQL sin autocommit, la primera sentencia abre una transacción que
+    dura hasta commit()/rollback(): BEGIN para lecturas (instantánea del WAL,
+    no bloquea a nadie) y BEGIN IMMEDIATE si empieza escribiendo o bloqueando
+    filas. Si una transacción de lectura pasa a escribir mientras otra escribe,
+    falla con 1205 y con_reintentos la repite, igual que un deadlock de InnoDB.
+    """
+
+    def __init__(self, ruta):
+        carpeta = os.path.dirname(ruta)
+        if carpeta and ruta != ":memory:":
+            os.makedirs(carpeta, exist_ok=True)
+        # isolation_level=None: las transacciones las abre _comenzar(), no el módulo sqlite3
+        self._conn = sqlite3.connect(ruta, timeout=_ESPERA_BLOQUEO, isolation_level=None,
+                                     check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES)
+        self._abierta = True
+        try:
+            cache_mb = int(os.getenv('DB_SQLITE_CACHE_MB', 64))
+        except ValueError:
+            cache_mb = 64
+        sincronizacion = os.getenv('DB_SQLITE_SYNCHRONOUS', 'FULL').strip().upper()
+        if sincronizacion not in ('OFF', 'NORMAL', 'FULL', 'EXTRA'):
+            sincronizacion = 'FULL'
+        for pragma in (
+            "journal_mode = WAL",             # lectores y un escritor a la vez
+            f"synchronous = {sincronizacion}",
+            "foreign_keys = ON",              # integridad referencial como InnoDB
+            f"cache_size = {-cache_mb * 1024}",
+            "temp_store = MEMORY",            # ORDER BY / GROUP BY grandes sin archivos temporales
+            "mmap_size = 268435456",          # lecturas por memoria mapeada (256 MB)
+        ):
+            self._conn.execute(f"PRAGMA {pragma}")
+
+    @property
+    def in_transaction(self):
+        return self._conn.in_transaction
+
+    def _comenzar(self, sentencia, modo):
+        if modo == MODO_DDL:
+            # Commit implícito, como MySQL antes de una sentencia DDL
+            if self._conn.in_transaction:
+                self._conn.commit()
+        elif not self._conn.in_transaction and not _FUERA_DE_TRANSACCION.match(sentencia):
+            self._conn.execute("BEGIN IMMEDIATE" if modo == MODO_ESCRITURA else "BEGIN")
+
+    def cursor(self, dictionary=False, buffered=None, **_):
+        if not self._abierta:
+            raise Error(msg="La conexión SQLite está cerrada.", errno=2006)
+        return CursorSQLite(self, dictionary)
+
+    def commit(self):
+        try:
+            self._conn.commit()
+        except sqlite3.Error as e:
+            raise _error_equivalente(e) from e
+
+    def rollback(self):
+        try:
+            self._conn.rollback()
+        except sqlite3.Error as e:
+            raise _error_equivalente(e) from e
+
+    def is_connected(self):
+        return self._abierta
+
+    def ping(self, reconnect=False, attempts=1, delay=0):
+        if not self._abierta:
+            raise Error(msg="La conexión SQLite está cerrada.", errno=2006)
+        self._conn.execute("SELECT 1")
+
+    def close(self):
+        if self._abierta:
+            self._abierta = False
+            self._conn.close()
+
+
+def crear_conexion(ruta=None):
+    """Abre una conexión a la base SQLite (DB_SQLITE_PATH si no se indica la ruta)."""
+    try:
+        return ConexionSQLite(ruta or ruta_base())
+    except sqlite3.Error as e:
+        raise _error_equivalente(e) from e
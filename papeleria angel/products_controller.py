@@ -1,5 +1,8 @@
-import mysql.connector
-from database import conectar
+from database import conectar, con_reintentos, ejecutar_transaccion, al_confirmar, SinConexion, Error
+from catalogo_cache import obtener_catalogo, normalizar_sku
+from import_controller import leer_filas_csv, ColumnasFaltantes
+from busqueda_productos import MOTOR_FULLTEXT, motor_configurado, buscar_fulltext
+from decimal import Decimal, InvalidOperation
 import logging
 from datetime import datetime
 
@@ -9,149 +12,442 @@ logger = logging.getLogger(__name__)
 
 
 def get_all_products():
-    """Obtiene todos los productos activos, incluyendo el nombre del proveedor."""
-    conn = None
-    cursor = None
-    try:
-        conn = conectar()
-        if not conn:
-            logger.error("No se pudo conectar a la base de datos en get_all_products")
-            return []
-
-        cursor = conn.cursor(dictionary=True)
-        query = """
-            SELECT 
-                p.id,
-                p.nombre,
-                p.descripcion,
-                p.precio_compra,
-                p.precio_venta,
-                p.stock,
-                p.categoria,
-                p.proveedor_id,
-                p.fecha_ingreso,
-                pr.nombre_empresa AS proveedor_nombre
-            FROM productos p
-            INNER JOIN proveedores pr ON p.proveedor_id = pr.id
-            WHERE p.activo = 1
-            ORDER BY p.nombre ASC
-        """
-        cursor.execute(query)
-        productos = cursor.fetchall()
-        return productos
+    """
+    Obtiene todos los productos activos, incluyendo el nombre del proveedor.
 
+    Se leen de la caché del catálogo (catalogo_cache); la base solo se consulta
+    la primera vez y para detectar cambios de otras terminales.
+    """
+    try:
+        return obtener_catalogo().productos()
     except Exception as e:
         logger.exception("Error al obtener productos")
         return []
-    finally:
-        if cursor:
-            cursor.close()
-        if conn and conn.is_connected():
-            conn.close()
 
 
-def add_product(nombre, descripcion, precio_compra, precio_venta, stock, categoria, proveedor_id, fecha_ingreso):
-    """Inserta un nuevo producto en la base de datos."""
+def buscar_productos(texto, limite=50, solo_con_stock=False):
+    """
+    Busca productos activos por nombre, descripción, categoría o proveedor.
+
+    Cada palabra escrita se toma como prefijo ("cuad prof" encuentra "Cuaderno
+    Profesional"). Usa el índice en memoria del catálogo, o MySQL FULLTEXT si
+    BUSQUEDA_PRODUCTOS=fulltext (ver busqueda_productos).
+
+    Returns:
+        list: Productos (mismas columnas que get_all_products) por relevancia.
+    """
+    try:
+        if motor_configurado() == MOTOR_FULLTEXT:
+            productos = buscar_fulltext(texto, limite, solo_con_stock)
+            if productos is not None:
+                return productos
+        return obtener_catalogo().buscar(texto, limite, solo_con_stock)
+    except Exception:
+        logger.exception("Error al buscar productos")
+        return []
+
+
+_LARGO_SKU = 64  # VARCHAR(64), migración 7
+
+# Error de MySQL "Duplicate entry" (índice único uq_productos_sku)
+_ER_DUP_ENTRY = 1062
+
+
+def _validar_sku(sku):
+    """Normaliza el código; None o vacío quedan como None (sin código)."""
+    sku = normalizar_sku(sku)
+    if sku and len(sku) > _LARGO_SKU:
+        raise ValueError(f"El código SKU supera los {_LARGO_SKU} caracteres.")
+    return sku
+
+
+def add_product(nombre, descripcion, precio_compra, precio_venta, stock, categoria, proveedor_id, fecha_ingreso,
+                sku=None):
+    """Inserta un nuevo producto en la base de datos (sku: código SKU / de barras, opcional)."""
     if stock < 0:
         return False, "El stock inicial no puede ser negativo."
-    
-    conn = None
-    cursor = None
     try:
-        conn = conectar()
-        if not conn:
-            return False, "❌ No se pudo conectar a la base de datos."
-        
-        cursor = conn.cursor()
-        query = """
-        INSERT INTO productos (nombre, descripcion, precio_compra, precio_venta, stock, categoria, proveedor_id, fecha_ingreso, activo)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, 1)
+        sku = _validar_sku(sku)
+    except ValueError as e:
+        return False, f"❌ {e}"
+
+    def insertar(cursor):
+        # La columna sku solo se menciona si hay código (bases sin la migración 7 siguen funcionando)
+        query = f"""
+        INSERT INTO productos (nombre, descripcion, precio_compra, precio_venta, stock, categoria, proveedor_id, fecha_ingreso{", sku" if sku else ""}, activo)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s{", %s" if sku else ""}, 1)
         """
-        cursor.execute(query, (nombre, descripcion, precio_compra, precio_venta, stock, categoria, proveedor_id, fecha_ingreso))
-        conn.commit()
+        valores = [nombre, descripcion, precio_compra, precio_venta, stock, categoria, proveedor_id, fecha_ingreso]
+        if sku:
+            valores.append(sku)
+        cursor.execute(query, valores)
+        return cursor.lastrowid
+
+    try:
+        producto_id = ejecutar_transaccion(insertar)
+        # La caché lee el producto de la base: solo tiene sentido una vez confirmado
+        al_confirmar(obtener_catalogo().refrescar_productos, [producto_id])
         return True, "✅ Producto agregado exitosamente."
-        
-    except mysql.connector.Error as e:
-        if conn:
-            conn.rollback()
+
+    except SinConexion:
+        return False, "❌ No se pudo conectar a la base de datos."
+    except Error as e:
         logger.exception("Error al agregar producto")
+        if e.errno == _ER_DUP_ENTRY:
+            return False, f"❌ El código {sku} ya está asignado a otro producto."
         # Captura errores de MySQL como FK no encontrada o duplicados
         return False, f"❌ Error de base de datos al agregar el producto: {str(e)}"
     except Exception as e:
-        if conn:
-            conn.rollback()
         logger.exception("Error al agregar producto")
         return False, f"❌ Error al agregar el producto: {str(e)}"
-    finally:
-        if cursor:
-            cursor.close()
-        if conn and conn.is_connected():
-            conn.close()
 
 
-def update_product(producto_id, nombre, descripcion, precio_compra, precio_venta, stock, categoria, proveedor_id):
-    """Actualiza la información de un producto existente."""
-    conn = None
-    cursor = None
+def update_product(producto_id, nombre, descripcion, precio_compra, precio_venta, stock, categoria, proveedor_id,
+                   sku=None):
+    """
+    Actualiza la información de un producto existente.
+
+    sku=None deja el código como está; una cadena vacía lo quita.
+    """
     try:
-        conn = conectar()
-        if not conn:
-            return False, "❌ No se pudo conectar a la base de datos."
-        
-        cursor = conn.cursor()
-        query = """
-        UPDATE productos SET nombre=%s, descripcion=%s, precio_compra=%s, precio_venta=%s, stock=%s, categoria=%s, proveedor_id=%s
+        cambiar_sku = sku is not None
+        sku = _validar_sku(sku)
+    except ValueError as e:
+        return False, f"❌ {e}"
+
+    def actualizar(cursor):
+        query = f"""
+        UPDATE productos SET nombre=%s, descripcion=%s, precio_compra=%s, precio_venta=%s, stock=%s, categoria=%s, proveedor_id=%s{", sku=%s" if cambiar_sku else ""}
         WHERE id=%s
         """
-        cursor.execute(query, (nombre, descripcion, precio_compra, precio_venta, stock, categoria, proveedor_id, producto_id))
-        
+        valores = [nombre, descripcion, precio_compra, precio_venta, stock, categoria, proveedor_id]
+        if cambiar_sku:
+            valores.append(sku)
+        cursor.execute(query, valores + [producto_id])
+
         if cursor.rowcount == 0:
-            conn.rollback()
             return False, "❌ No se encontró el producto para actualizar o los datos eran idénticos."
-
-        conn.commit()
         return True, "✅ Producto actualizado exitosamente."
-        
+
+    try:
+        # Escribir los mismos valores dos veces no cambia nada: se reintenta también ante conexión perdida
+        exito, mensaje = ejecutar_transaccion(actualizar, idempotente=True)
+        if exito:
+            al_confirmar(obtener_catalogo().refrescar_productos, [producto_id])
+        return exito, mensaje
+
+    except SinConexion:
+        return False, "❌ No se pudo conectar a la base de datos."
+    except Error as e:
+        logger.exception("Error al actualizar producto")
+        if e.errno == _ER_DUP_ENTRY:
+            return False, f"❌ El código {sku} ya está asignado a otro producto."
+        return False, f"❌ Error al actualizar el producto: {str(e)}"
     except Exception as e:
-        if conn:
-            conn.rollback()
         logger.exception("Error al actualizar producto")
         return False, f"❌ Error al actualizar el producto: {str(e)}"
-    finally:
-        if cursor:
-            cursor.close()
-        if conn and conn.is_connected():
-            conn.close()
 
 
 def delete_product(producto_id):
     """Desactiva un producto (soft delete)."""
+    def desactivar(cursor):
+        # Solo desactiva si está activo (evita doble eliminación)
+        query = "UPDATE productos SET activo = 0 WHERE id = %s AND activo = 1"
+        cursor.execute(query, (producto_id,))
+
+        if cursor.rowcount == 0:
+            return False, "❌ Producto no encontrado o ya fue eliminado."
+        return True, "✅ Producto eliminado correctamente."
+
+    try:
+        exito, mensaje = ejecutar_transaccion(desactivar)
+        if exito:
+            al_confirmar(obtener_catalogo().quitar, producto_id)
+        return exito, mensaje
+
+    except SinConexion:
+        return False, "❌ No se pudo conectar a la base de datos."
+    except Exception as e:
+        logger.exception("Error al eliminar producto")
+        return False, f"❌ Error al eliminar el producto: {str(e)}"
+
+
+# ============================================================
+# IMPORTACIÓN MASIVA (CSV/TSV)
+# ============================================================
+
+TAM_LOTE_IMPORTACION = 1000
+
+# Encabezados aceptados además de los nombres de columna (incluye los del CSV exportado)
+_ALIAS_IMPORTACION = {
+    "p_compra": "precio_compra",
+    "p_venta": "precio_venta",
+    "proveedor": "proveedor_nombre",
+    "empresa": "proveedor_nombre",
+    "f_ingreso": "fecha_ingreso",
+    "codigo": "sku",
+    "codigo_barras": "sku",
+    "codigo_de_barras": "sku",
+}
+
+_COLUMNAS_UPSERT = ("id", "nombre", "descripcion", "precio_compra", "precio_venta",
+                    "stock", "categoria", "proveedor_id", "fecha_ingreso", "sku")
+_POS_SKU = _COLUMNAS_UPSERT.index("sku")
+
+# id NULL inserta un producto nuevo; un id existente actualiza (y reactiva) ese producto.
+# Las filas sin id pero con un SKU ya registrado se resuelven antes al id de ese producto.
+# fecha_ingreso se conserva en las actualizaciones, y el SKU también si la celda viene vacía.
+_SQL_UPSERT = """
+    INSERT INTO productos (id, nombre, descripcion, precio_compra, precio_venta,
+                           stock, categoria, proveedor_id, fecha_ingreso, sku, activo)
+    VALUES {valores}
+    ON DUPLICATE KEY UPDATE
+        nombre = VALUES(nombre),
+        descripcion = VALUES(descripcion),
+        precio_compra = VALUES(precio_compra),
+        precio_venta = VALUES(precio_venta),
+        stock = VALUES(stock),
+        categoria = VALUES(categoria),
+        proveedor_id = VALUES(proveedor_id),
+        sku = COALESCE(VALUES(sku), sku),
+        activo = 1
+"""
+_MARCADORES_FILA = "(" + ", ".join(["%s"] * len(_COLUMNAS_UPSERT)) + ", 1)"
+
+_SELECT_ID_POR_SKU = "SELECT sku, id FROM productos WHERE sku IN ({marcadores})"
+
+_COLUMNAS_OBLIGATORIAS = ("nombre", "precio_compra", "precio_venta", "stock",
+                          ("proveedor_id", "proveedor_nombre"))
+
+_PRECIO_MAXIMO = Decimal("99999999.99")  # DECIMAL(10, 2)
+
+
+def _leer_precio(texto, campo):
+    """'$1,234.50' / '12,50' / '99' -> Decimal con 2 decimales."""
+    limpio = (texto or "").replace("$", "").replace(" ", "")
+    if "," in limpio and "." in limpio:
+        limpio = limpio.replace(",", "")
+    else:
+        limpio = limpio.replace(",", ".")
+    try:
+        valor = Decimal(limpio).quantize(Decimal("0.01"))
+    except InvalidOperation:
+        raise ValueError(f"{campo} no es un número válido: '{texto}'")
+    if valor < 0 or valor > _PRECIO_MAXIMO:
+        raise ValueError(f"{campo} fuera de rango: {texto}")
+    return valor
+
+
+def _leer_entero(texto, campo):
+    try:
+        valor = Decimal((texto or "").replace(",", ""))
+    except InvalidOperation:
+        raise ValueError(f"{campo} no es un número entero: '{texto}'")
+    if valor != valor.to_integral_value():
+        raise ValueError(f"{campo} no es un número entero: '{texto}'")
+    return int(valor)
+
+
+def _validar_fila_importacion(fila, proveedores_ids, proveedores_por_nombre, hoy):
+    """
+    Convierte una fila del archivo en la tupla de _COLUMNAS_UPSERT.
+
+    Raises:
+        ValueError: Con el motivo por el que la fila se rechaza.
+    """
+    nombre = fila.get("nombre", "")
+    if not nombre:
+        raise ValueError("El nombre es obligatorio.")
+    if len(nombre) > 150:
+        raise ValueError("El nombre supera los 150 caracteres.")
+    categoria = fila.get("categoria") or None
+    if categoria and len(categoria) > 100:
+        raise ValueError("La categoría supera los 100 caracteres.")
+
+    producto_id = _leer_entero(fila["id"], "id") if fila.get("id") else None
+    precio_compra = _leer_precio(fila.get("precio_compra"), "precio_compra")
+    precio_venta = _leer_precio(fila.get("precio_venta"), "precio_venta")
+    stock = _leer_entero(fila.get("stock"), "stock")
+    if stock < 0:
+        raise ValueError("El stock no puede ser negativo.")
+
+    if fila.get("proveedor_id"):
+        proveedor_id = _leer_entero(fila["proveedor_id"], "proveedor_id")
+        if proveedor_id not in proveedores_ids:
+            raise ValueError(f"No existe el proveedor con id {proveedor_id}.")
+    elif fila.get("proveedor_nombre"):
+        proveedor_id = proveedores_por_nombre.get(fila["proveedor_nombre"].lower())
+        if proveedor_id is None:
+            raise ValueError(f"No existe el proveedor '{fila['proveedor_nombre']}'.")
+    else:
+        raise ValueError("Falta el proveedor (proveedor_id o proveedor_nombre).")
+
+    fecha_ingreso = hoy
+    if fila.get("fecha_ingreso"):
+        # También acepta el formato con hora del CSV exportado
+        try:
+            fecha_ingreso = datetime.strptime(fila["fecha_ingreso"][:10], "%Y-%m-%d").date()
+        except ValueError:
+            raise ValueError(f"fecha_ingreso debe tener formato YYYY-MM-DD: '{fila['fecha_ingreso']}'")
+
+    sku = _validar_sku(fila.get("sku"))
+
+    return (producto_id, nombre, fila.get("descripcion") or None, precio_compra, precio_venta,
+            stock, categoria, proveedor_id, fecha_ingreso, sku)
+
+
+def _procesar_lote_importacion(conn, cursor, lote, resumen):
+    """
+    Resuelve SKUs, valida ids existentes y guarda un lote en una sola transacción.
+
+    Si el INSERT de varias filas falla, se revierte y el lote se reintenta fila
+    por fila para aislar las filas con error sin perder las demás.
+    """
+    skus = sorted({valores[_POS_SKU] for _, valores in lote if valores[_POS_SKU]})
+    if skus:
+        # Un SKU ya registrado convierte la fila en actualización de ese producto
+        cursor.execute(_SELECT_ID_POR_SKU.format(marcadores=", ".join(["%s"] * len(skus))), skus)
+        id_por_sku = {normalizar_sku(sku): producto_id for sku, producto_id in cursor.fetchall()}
+        resueltas = []
+        for linea, valores in lote:
+            dueno = id_por_sku.get(valores[_POS_SKU])
+            if dueno is None or valores[0] == dueno:
+                resueltas.append((linea, valores))
+            elif valores[0] is None:
+                resueltas.append((linea, (dueno,) + valores[1:]))
+            else:
+                resumen['errores'].append(
+                    (linea, f"El código {valores[_POS_SKU]} ya pertenece al producto con id {dueno}."))
+        lote = resueltas
+
+    ids = sorted({valores[0] for _, valores in lote if valores[0] is not None})
+    existentes = set()
+    if ids:
+        cursor.execute(f"SELECT id FROM productos WHERE id IN ({', '.join(['%s'] * len(ids))})", ids)
+        existentes = {fila[0] for fila in cursor.fetchall()}
+
+    validas = []
+    for linea, valores in lote:
+        if valores[0] is not None and valores[0] not in existentes:
+            resumen['errores'].append((linea, f"No existe el producto con id {valores[0]}."))
+        else:
+            validas.append((linea, valores))
+    if not validas:
+        return
+
+    def guardar(filas):
+        try:
+            parametros = [v for _, valores in filas for v in valores]
+            cursor.execute(_SQL_UPSERT.format(valores=", ".join([_MARCADORES_FILA] * len(filas))), parametros)
+            conn.commit()
+        except Error:
+            conn.rollback()
+            raise
+
+    # Un deadlock con las cajas (que descuentan stock de las mismas filas) se reintenta
+    # con backoff; cualquier otro error aísla las filas culpables guardando una por una
+    try:
+        con_reintentos(guardar, validas)
+        guardadas = validas
+    except Error:
+        logger.warning("Lote de importación rechazado; se reintenta fila por fila", exc_info=True)
+        guardadas = []
+        for fila in validas:
+            try:
+                con_reintentos(guardar, [fila])
+                guardadas.append(fila)
+            except Error as e:
+                resumen['errores'].append((fila[0], f"Error de base de datos: {str(e)}"))
+
+    for _, valores in guardadas:
+        if valores[0] is None:
+            resumen['insertados'] += 1
+        else:
+            resumen['actualizados'] += 1
+
+
+def importar_productos_csv(ruta_archivo, tam_lote=TAM_LOTE_IMPORTACION, progreso=None):
+    """
+    Importa (o actualiza) productos desde un CSV/TSV.
+
+    Columnas: nombre, precio_compra, precio_venta, stock y proveedor_id o
+    proveedor_nombre (obligatorias); id, sku, descripcion, categoria y
+    fecha_ingreso (opcionales). Las filas con id, o con el SKU de un producto
+    existente, actualizan ese producto; las demás se insertan.
+    El archivo se lee como flujo y se guarda por lotes de ``tam_lote`` filas,
+    cada uno con un INSERT ... ON DUPLICATE KEY UPDATE de varias filas en su
+    propia transacción. Una fila inválida no detiene la importación: se anota
+    en el reporte de errores.
+
+    Args:
+        ruta_archivo (str): Archivo a importar.
+        tam_lote (int): Filas por transacción.
+        progreso (callable, optional): Se llama con las filas leídas tras cada lote.
+
+    Returns:
+        (bool, dict|str): (True, resumen) con 'leidas', 'insertados',
+            'actualizados' y 'errores' [(línea, motivo)], o (False, mensaje)
+            si el archivo o la conexión fallaron.
+    """
+    resumen = {'leidas': 0, 'insertados': 0, 'actualizados': 0, 'errores': []}
     conn = None
     cursor = None
     try:
         conn = conectar()
         if not conn:
             return False, "❌ No se pudo conectar a la base de datos."
-
         cursor = conn.cursor()
-        # Solo desactiva si está activo (evita doble eliminación)
-        query = "UPDATE productos SET activo = 0 WHERE id = %s AND activo = 1"
-        cursor.execute(query, (producto_id,))
-        
-        if cursor.rowcount == 0:
-            conn.rollback()
-            return False, "❌ Producto no encontrado o ya fue eliminado."
-        
-        conn.commit()
-        return True, "✅ Producto eliminado correctamente."
 
+        cursor.execute("SELECT id, nombre_empresa FROM proveedores")
+        proveedores = cursor.fetchall()
+        proveedores_ids = {fila[0] for fila in proveedores}
+        proveedores_por_nombre = {(fila[1] or "").strip().lower(): fila[0] for fila in proveedores}
+        hoy = datetime.now().date()
+
+        lote = []
+        skus_vistos = {}   # SKU -> línea donde apareció (un código no puede repetirse en el archivo)
+        for linea, fila in leer_filas_csv(ruta_archivo, alias=_ALIAS_IMPORTACION,
+                                          requeridas=_COLUMNAS_OBLIGATORIAS):
+            resumen['leidas'] += 1
+            try:
+                valores = _validar_fila_importacion(fila, proveedores_ids, proveedores_por_nombre, hoy)
+                sku = valores[_POS_SKU]
+                if sku and sku in skus_vistos:
+                    raise ValueError(f"El código {sku} ya aparece en la línea {skus_vistos[sku]}.")
+                if sku:
+                    skus_vistos[sku] = linea
+                lote.append((linea, valores))
+            except ValueError as e:
+                resumen['errores'].append((linea, str(e)))
+
+            if len(lote) >= tam_lote:
+                _procesar_lote_importacion(conn, cursor, lote, resumen)
+                lote.clear()
+                if progreso:
+                    progreso(resumen['leidas'])
+
+        if lote:
+            _procesar_lote_importacion(conn, cursor, lote, resumen)
+        if progreso:
+            progreso(resumen['leidas'])
+
+        resumen['errores'].sort()
+        return True, resumen
+
+    except ColumnasFaltantes as e:
+        return False, f"❌ {e}"
+    except (OSError, ValueError) as e:
+        return False, f"❌ No se pudo leer el archivo:\n{str(e)}"
     except Exception as e:
         if conn:
             conn.rollback()
-        logger.exception("Error al eliminar producto")
-        return False, f"❌ Error al eliminar el producto: {str(e)}"
+        logger.exception("Error al importar productos")
+        return False, f"❌ Error al importar productos: {str(e)}"
     finally:
         if cursor:
             cursor.close()
         if conn and conn.is_connected():
-            conn.close()
\ No newline at end of file
+            conn.close()
+        if resumen['insertados'] or resumen['actualizados']:
+            # Muchos productos cambiaron a la vez: más barato recargar que refrescar uno a uno
+            obtener_catalogo().invalidar()
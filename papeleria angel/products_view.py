@@ -1,9 +1,14 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
-from products_controller import get_all_products, add_product, update_product, delete_product
+from tkinter import ttk, messagebox, filedialog
+from products_controller import (get_all_products, add_product, update_product, delete_product,
+                                 importar_productos_csv, buscar_productos)
 from suppliers_controller import obtener_todos_proveedores
 from datetime import datetime
-from export_controller import exportar_a_csv
+from export_controller import exportar_a_csv, exportar_filas_csv, generar_ruta_csv
+from tabla_virtual import TablaVirtual
+from cargador_async import CargadorAsync, IndicadorCarga
+
+LIMITE_BUSQUEDA = 500
 
 
 class ProductsView:
@@ -13,6 +18,7 @@ class ProductsView:
         self.root.title("📦 Gestión de Productos - Papelería Ángel")
         self.root.geometry("1250x700")
         self.root.configure(bg="#f5f7fa")
+        self.cargador = CargadorAsync(self.root)
 
         # ---- TOP BAR ----
         top_bar = tk.Frame(root, bg="#2c3e50", height=60)
@@ -47,28 +53,43 @@ class ProductsView:
                    command=self.delete_selected_product).pack(side="left", padx=5)
         ttk.Button(buttons, text="⬇️ Exportar CSV",
                    command=self.export_to_csv).pack(side="right", padx=5)
+        self.import_button = ttk.Button(buttons, text="⬆️ Importar CSV",
+                                        command=self.import_from_csv)
+        self.import_button.pack(side="right", padx=5)
+
+        # ---- BÚSQUEDA ----
+        search_frame = tk.Frame(main_frame, bg="#f5f7fa")
+        search_frame.pack(fill="x", pady=(0, 10))
+        tk.Label(search_frame, text="🔍 Buscar:", font=("Arial", 11),
+                 bg="#f5f7fa").pack(side="left", padx=5)
+        self.busqueda_var = tk.StringVar()
+        search_entry = ttk.Entry(search_frame, textvariable=self.busqueda_var, width=50)
+        search_entry.pack(side="left", padx=5)
+        search_entry.bind("<Escape>", lambda e: self.busqueda_var.set(""))
+        self.busqueda_info = tk.Label(search_frame, text="", font=("Arial", 10),
+                                      fg="#7f8c8d", bg="#f5f7fa")
+        self.busqueda_info.pack(side="left", padx=10)
+        self._busqueda_programada = None
+        self._texto_mostrado = None
+        self.busqueda_var.trace_add("write", self._on_busqueda)
 
         # ---- TABLA ----
-        self.products_tree = ttk.Treeview(
-            main_frame,
-            columns=("ID", "Nombre", "Descripción", "P. Compra", "P. Venta",
-                     "Stock", "Categoría", "Proveedor", "F. Ingreso"),
-            show="headings"
-        )
-        self.products_tree.pack(fill="both", expand=True)
-
         col_widths = {
-            "ID": 40, "Nombre": 180, "Descripción": 200,
+            "ID": 40, "Código": 110, "Nombre": 180, "Descripción": 200,
             "P. Compra": 90, "P. Venta": 90,
             "Stock": 60, "Categoría": 100,
             "Proveedor": 120, "F. Ingreso": 100
         }
 
-        for col, width in col_widths.items():
-            self.products_tree.heading(col, text=col)
-            self.products_tree.column(col, width=width, anchor=tk.CENTER)
+        # Tabla virtual: solo se dibujan las filas visibles aunque haya miles de productos
+        self.products_table = TablaVirtual(
+            main_frame, columnas=tuple(col_widths), anchos=col_widths,
+            formatear=self._formatear_producto, ancla=tk.CENTER
+        )
+        self.products_table.pack(fill="both", expand=True)
 
-        self.products_tree.bind("<Double-1>", self._on_double_click)
+        self.products_table.tree.bind("<Double-1>", self._on_double_click)
+        self.indicador_importacion = IndicadorCarga(self.products_table)
 
         self.load_products()
 
@@ -76,40 +97,73 @@ class ProductsView:
     # Cargar productos en tabla
     # -------------------------------------------------------------------
     def load_products(self):
-        for item in self.products_tree.get_children():
-            self.products_tree.delete(item)
-
-        productos = get_all_products()
-        if not productos:
-            return
-
-        for p in productos:
-            fecha = p["fecha_ingreso"]
-
-            if isinstance(fecha, datetime):
-                fecha = fecha.strftime("%Y-%m-%d")
+        # La primera carga del catálogo consulta la base: se hace fuera del hilo de Tk.
+        # Con texto en el buscador se recargan solo las coincidencias.
+        texto = self.busqueda_var.get().strip()
+        self.products_table.mostrar_cargando()
+        if texto:
+            self.cargador.ejecutar("productos", buscar_productos, texto, LIMITE_BUSQUEDA,
+                                   al_terminar=lambda productos: self._mostrar_productos(productos, texto))
+        else:
+            self.cargador.ejecutar("productos", get_all_products,
+                                   al_terminar=lambda productos: self._mostrar_productos(productos, ""))
+
+    def _mostrar_productos(self, productos, texto):
+        if texto != self._texto_mostrado:
+            # Búsqueda nueva: resultados desde el principio
+            self.products_table.establecer_filas(productos)
+            self._texto_mostrado = texto
+        else:
+            # Tras editar un producto la tabla conserva selección y posición, y solo
+            # se reescriben las filas visibles que cambiaron
+            self.products_table.reemplazar_filas(productos, clave="id")
+        if not texto:
+            self.busqueda_info.config(text="")
+        elif len(productos) >= LIMITE_BUSQUEDA:
+            self.busqueda_info.config(text=f"Primeras {LIMITE_BUSQUEDA} coincidencias")
+        else:
+            self.busqueda_info.config(text=f"{len(productos)} coincidencias")
+
+    def _on_busqueda(self, *args):
+        # Se espera a que el usuario deje de escribir; cada búsqueda reemplaza a la anterior
+        if self._busqueda_programada is not None:
+            self.root.after_cancel(self._busqueda_programada)
+        self._busqueda_programada = self.root.after(150, self._buscar)
+
+    def _buscar(self):
+        self._busqueda_programada = None
+        self.load_products()
 
-            self.products_tree.insert("", "end", values=(
-                p["id"],
-                p["nombre"],
-                p["descripcion"][:30] + "..." if len(p["descripcion"]) > 30 else p["descripcion"],
-                f"${p['precio_compra']:.2f}",
-                f"${p['precio_venta']:.2f}",
-                p["stock"],
-                p["categoria"],
-                p["proveedor_nombre"],
-                fecha if fecha else "N/A"
-            ))
+    def _formatear_producto(self, p):
+        """Valores de una fila; la tabla lo llama solo para las filas visibles."""
+        fecha = p["fecha_ingreso"]
+
+        if isinstance(fecha, datetime):
+            fecha = fecha.strftime("%Y-%m-%d")
+
+        descripcion = p["descripcion"] or ""
+        return (
+            p["id"],
+            p.get("sku") or "",
+            p["nombre"],
+            descripcion[:30] + "..." if len(descripcion) > 30 else descripcion,
+            f"${p['precio_compra']:.2f}",
+            f"${p['precio_venta']:.2f}",
+            p["stock"],
+            p["categoria"],
+            p["proveedor_nombre"],
+            fecha if fecha else "N/A"
+        )
 
     # -------------------------------------------------------------------
     # Obtener producto seleccionado
     # -------------------------------------------------------------------
     def _get_selected_product_id(self):
-        selected = self.products_tree.focus()
-        if not selected:
+        producto = self.products_table.fila_seleccionada()
+        if not producto:
             messagebox.showwarning("Advertencia", "Seleccione un producto.")
             return None
-        return self.products_tree.item(selected, "values")[0]
+        return producto["id"]
 
     # -------------------------------------------------------------------
     # Agregar producto
@@ -141,13 +195,13 @@ class ProductsView:
 
         win = tk.Toplevel(self.root)
         win.title("Agregar Producto" if mode == "add" else "Editar Producto")
-        win.geometry("400x550")
+        win.geometry("400x600")
         win.grab_set()
 
         proveedores = obtener_todos_proveedores()
         proveedor_dict = {p["nombre_empresa"]: p["id"] for p in proveedores}
 
-        campos = ["Nombre", "Descripción", "Precio Compra", "Precio Venta",
+        campos = ["Código (SKU / barras)", "Nombre", "Descripción", "Precio Compra", "Precio Venta",
                   "Stock", "Categoría", "Proveedor", "Fecha Ingreso (YYYY-MM-DD)"]
 
         entries = {}
@@ -164,6 +218,7 @@ class ProductsView:
                 e = tk.Entry(win)
                 if mode == "edit":
                     key_map = {
+                        "Código (SKU / barras)": "sku",
                         "Nombre": "nombre",
                         "Descripción": "descripcion",
                         "Precio Compra": "precio_compra",
@@ -172,7 +227,9 @@ class ProductsView:
                         "Categoría": "categoria",
                         "Fecha Ingreso (YYYY-MM-DD)": "fecha_ingreso"
                     }
-                    valor = producto.get(key_map[campo], "")
+                    valor = producto.get(key_map[campo])
+                    if valor is None:
+                        valor = ""
                     if isinstance(valor, datetime):
                         valor = valor.strftime("%Y-%m-%d")
                     e.insert(0, valor)
@@ -184,6 +241,7 @@ class ProductsView:
 
         def guardar():
             try:
+                sku = entries["Código (SKU / barras)"].get()
                 nombre = entries["Nombre"].get()
                 descripcion = entries["Descripción"].get()
                 precio_compra = float(entries["Precio Compra"].get())
@@ -200,12 +258,11 @@ class ProductsView:
 
                 if mode == "add":
                     ok, msg = add_product(nombre, descripcion, precio_compra,
-                                          precio_venta, stock, categoria, prov_id, fecha)
+                                          precio_venta, stock, categoria, prov_id, fecha, sku=sku)
                 else:
-                    # Corregido: solo 8 argumentos para update_product
                     ok, msg = update_product(producto_id, nombre, descripcion,
                                              precio_compra, precio_venta,
-                                             stock, categoria, prov_id)
+                                             stock, categoria, prov_id, sku=sku)
 
                 if ok:
                     messagebox.showinfo("Éxito", msg)
@@ -224,13 +281,12 @@ class ProductsView:
     # Eliminar
     # -------------------------------------------------------------------
     def delete_selected_product(self):
-        selected = self.products_tree.selection()
-        if not selected:
+        producto = self.products_table.fila_seleccionada()
+        if not producto:
             messagebox.showwarning("⚠️ Selección requerida", "Seleccione un producto para eliminar.")
             return
 
-        item = self.products_tree.item(selected[0])
-        product_id = item["values"][0]
+        product_id = producto["id"]
 
         if messagebox.askyesno("🗑 Eliminar", "¿Desea eliminar este producto?"):
             success, msg = delete_product(product_id)
@@ -244,14 +300,91 @@ class ProductsView:
     # Exportar CSV
     # -------------------------------------------------------------------
     def export_to_csv(self):
-        exportar_a_csv()
-        messagebox.showinfo("Éxito", "Archivo CSV generado correctamente.")
+        productos = get_all_products()
+        if not productos:
+            messagebox.showwarning("Advertencia", "No hay productos para exportar.")
+            return
+
+        ruta_guardado = filedialog.asksaveasfilename(
+            defaultextension=".csv",
+            initialfile=generar_ruta_csv("Reporte_Productos"),
+            filetypes=[("Archivos CSV", "*.csv")]
+        )
+        if not ruta_guardado:
+            return
+
+        encabezados = ["id", "sku", "nombre", "descripcion", "precio_compra", "precio_venta",
+                       "stock", "categoria", "proveedor_nombre", "fecha_ingreso"]
+        exito, mensaje = exportar_a_csv(productos, ruta_guardado, encabezados)
+        if exito:
+            messagebox.showinfo("Éxito", mensaje)
+        else:
+            messagebox.showerror("Error", mensaje)
+
+    # -------------------------------------------------------------------
+    # Importar CSV / TSV
+    # -------------------------------------------------------------------
+    def import_from_csv(self):
+        ruta = filedialog.askopenfilename(
+            title="Importar productos",
+            filetypes=[("CSV / TSV", "*.csv *.tsv *.txt"), ("Todos los archivos", "*.*")]
+        )
+        if not ruta:
+            return
+        if not messagebox.askyesno(
+            "Importar productos",
+            "Las filas con ID actualizan ese producto y las demás se agregan como nuevas.\n¿Continuar?"
+        ):
+            return
+
+        def mostrar_progreso(filas):
+            # Se llama desde el hilo de la importación
+            self.cargador.en_hilo_principal(
+                self.indicador_importacion.mostrar, f"⏳ Importando... {filas} filas leídas"
+            )
+
+        self.import_button.config(state="disabled")
+        self.indicador_importacion.mostrar("⏳ Importando...")
+        self.cargador.ejecutar("importar", importar_productos_csv, ruta, progreso=mostrar_progreso,
+                               al_terminar=self._importacion_terminada,
+                               al_fallar=lambda e: self._importacion_terminada((False, f"❌ Error al importar:\n{e}")))
+
+    def _importacion_terminada(self, resultado):
+        self.import_button.config(state="normal")
+        self.indicador_importacion.ocultar()
+        exito, datos = resultado
+        if not exito:
+            messagebox.showerror("Error", datos)
+            return
+
+        mensaje = (f"✅ Filas leídas: {datos['leidas']}\n"
+                   f"Agregados: {datos['insertados']} · Actualizados: {datos['actualizados']}")
+        errores = datos['errores']
+        if errores:
+            mensaje += f"\n\n⚠️ {len(errores)} filas con errores:\n"
+            mensaje += "\n".join(f"Línea {linea}: {motivo}" for linea, motivo in errores[:10])
+            if len(errores) > 10:
+                mensaje += "\n..."
+            ruta_reporte = generar_ruta_csv("Errores_Importacion_Productos")
+            ok, _ = exportar_filas_csv(
+                ({"linea": linea, "error": motivo} for linea, motivo in errores),
+                ruta_reporte, ["linea", "error"]
+            )
+            if ok:
+                mensaje += f"\n\nReporte completo:\n{ruta_reporte}"
+            messagebox.showwarning("Importación con errores", mensaje)
+        else:
+            messagebox.showinfo("Éxito", mensaje)
+
+        if datos['insertados'] or datos['actualizados']:
+            self.load_products()
 
     # -------------------------------------------------------------------
     # Cerrar ventana
     # -------------------------------------------------------------------
     def confirmar_cierre(self):
         if messagebox.askyesno("Cerrar sesión", "¿Deseas cerrar sesión?"):
+            self.cargador.cerrar()
             self.root.destroy()
 
     # -------------------------------------------------------------------
@@ -259,6 +392,7 @@ class ProductsView:
     # -------------------------------------------------------------------
     def back_to_dashboard(self):
         from dashboard_view import DashboardView
+        self.cargador.cerrar()
         self.root.destroy()
         root = tk.Tk()
         DashboardView(root, self.usuario)
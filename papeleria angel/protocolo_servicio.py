@@ -0,0 +1,160 @@
+# protocolo_servicio.py
+"""
+Lo que comparten el servicio HTTP (servicio_http) y su cliente (cliente_servicio):
+las funciones de controlador expuestas y la codificación JSON de sus resultados.
+
+Cada función se publica en /api/<nombre>. Las lecturas aceptan GET (con ETag
+y caché) y declaran las tablas de las que dependen; las escrituras solo POST y
+declaran las tablas que modifican, para invalidar las lecturas afectadas.
+
+JSON no tiene fechas, Decimal, tuplas ni diccionarios con claves numéricas;
+se envían como objetos marcados ({"$fecha_hora": "..."}) y el cliente los
+reconstruye, así las vistas reciben los mismos tipos que con el controlador
+local.
+
+FALLAS guarda lo que cada función devuelve cuando no llega a la base; el
+cliente devuelve ese mismo valor si el servicio no responde.
+"""
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+import json
+
+PREFIJO_API = "/api/"
+ENCABEZADO_TOKEN = "X-Papeleria-Token"
+
+# nombre -> (módulo del controlador, tablas de las que depende)
+LECTURAS = {
+    'get_all_products': ('products_controller', ('productos', 'proveedores')),
+    'buscar_productos': ('products_controller', ('productos', 'proveedores')),
+    'obtener_productos_activos': ('sales_controller', ('productos', 'proveedores')),
+    'obtener_producto_por_codigo': ('sales_controller', ('productos', 'proveedores')),
+    'get_sales_history': ('sales_history_controller', ('ventas',)),
+    'get_sales_history_page': ('sales_history_controller', ('ventas',)),
+    'obtener_totales_periodo': ('sales_rollup_controller', ('ventas',)),
+    'obtener_resumen_ventas': ('sales_rollup_controller', ('ventas',)),
+    'obtener_pedidos_cliente': ('client_orders_controller', ('pedidos_cliente', 'clientes')),
+    'obtener_abonos_pedido': ('client_orders_controller', ('pedidos_cliente',)),
+    'obtener_todos_clientes': ('clientes_controller', ('clientes',)),
+    'obtener_todos_clientes_si_cambio': ('clientes_controller', ('clientes',)),
+    'obtener_todos_proveedores': ('suppliers_controller', ('proveedores',)),
+    'obtener_todos_proveedores_si_cambio': ('suppliers_controller', ('proveedores',)),
+    'get_all_users': ('user_controller', ('usuarios',)),
+    'get_all_users_si_cambio': ('user_controller', ('usuarios',)),
+}
+
+# nombre -> (módulo del controlador, tablas que modifica)
+ESCRITURAS = {
+    'login': ('auth_controller', ()),
+    'registrar_usuario': ('auth_controller', ('usuarios',)),
+    'add_user': ('user_controller', ('usuarios',)),
+    'update_user': ('user_controller', ('usuarios',)),
+    'delete_user': ('user_controller', ('usuarios',)),
+    'add_product': ('products_controller', ('productos',)),
+    'update_product': ('products_controller', ('productos',)),
+    'delete_product': ('products_controller', ('productos',)),
+    'registrar_venta': ('sales_controller', ('productos', 'ventas')),
+    'registrar_venta_en_base': ('sales_controller', ('productos', 'ventas')),
+    'registrar_pedido_cliente': ('client_orders_controller', ('pedidos_cliente',)),
+    'registrar_abono': ('client_orders_controller', ('pedidos_cliente',)),
+    'eliminar_pedido_cliente': ('client_orders_controller', ('pedidos_cliente',)),
+    'add_client': ('clientes_controller', ('clientes',)),
+    'update_client': ('clientes_controller', ('clientes',)),
+    'delete_client': ('clientes_controller', ('clientes',)),
+    'agregar_proveedor': ('suppliers_controller', ('proveedores',)),
+    'actualizar_proveedor': ('suppliers_controller', ('proveedores',)),
+    'eliminar_proveedor': ('suppliers_controller', ('proveedores',)),
+}
+
+FUNCIONES = {**LECTURAS, **ESCRITURAS}
+
+_SIN_CONEXION = "❌ Error de conexión a la base de datos."
+
+# nombre -> resultado del controlador local cuando no hay conexión con la base.
+# registrar_venta_en_base no está: lanza SinConexion para que la venta vaya al
+# diario local (ventas_offline).
+FALLAS = {
+    'get_all_products': [],
+    'buscar_productos': [],
+    'obtener_productos_activos': [],
+    'obtener_producto_por_codigo': None,
+    'get_sales_history': (False, "❌ Error: No se pudo conectar a la base de datos."),
+    'get_sales_history_page': (False, "❌ Error: No se pudo conectar a la base de datos."),
+    'obtener_totales_periodo': None,
+    'obtener_resumen_ventas': [],
+    'obtener_pedidos_cliente': [],
+    'obtener_abonos_pedido': [],
+    'obtener_todos_clientes': [],
+    'obtener_todos_clientes_si_cambio': (None, []),
+    'obtener_todos_proveedores': [],
+    'obtener_todos_proveedores_si_cambio': (None, []),
+    'get_all_users': [],
+    'get_all_users_si_cambio': (None, []),
+    'login': (False, "Error de conexión"),
+    'registrar_usuario': (False, "Error de conexión"),
+    'add_user': (False, "Error de conexión"),
+    'update_user': (False, "Error de conexión"),
+    'delete_user': (False, "Error de conexión"),
+    'add_product': (False, "❌ No se pudo conectar a la base de datos."),
+    'update_product': (False, "❌ No se pudo conectar a la base de datos."),
+    'delete_product': (False, "❌ No se pudo conectar a la base de datos."),
+    'registrar_venta': (False, _SIN_CONEXION),
+    'registrar_pedido_cliente': (False, "Error de conexión a la base de datos."),
+    'registrar_abono': (False, "Error de conexión a la base de datos."),
+    'eliminar_pedido_cliente': (False, "Error de conexión a la base de datos."),
+    'add_client': (False, _SIN_CONEXION),
+    'update_client': (False, _SIN_CONEXION),
+    'delete_client': (False, "❌ Error de conexión."),
+    'agregar_proveedor': (False, _SIN_CONEXION),
+    'actualizar_proveedor': (False, _SIN_CONEXION),
+    'eliminar_proveedor': (False, _SIN_CONEXION),
+}
+
+
+def _empaquetar(valor):
+    if isinstance(valor, dict):
+        if all(isinstance(k, str) for k in valor):
+            return {k: _empaquetar(v) for k, v in valor.items()}
+        return {"$dict": [[_empaquetar(k), _empaquetar(v)] for k, v in valor.items()]}
+    if isinstance(valor, tuple):
+        # (éxito, mensaje) y demás tuplas llegan como tuplas, no como listas
+        return {"$tupla": [_empaquetar(v) for v in valor]}
+    if isinstance(valor, list):
+        return [_empaquetar(v) for v in valor]
+    if isinstance(valor, datetime):
+        return {"$fecha_hora": valor.isoformat()}
+    if isinstance(valor, date):
+        return {"$fecha": valor.isoformat()}
+    if isinstance(valor, Decimal):
+        return {"$decimal": str(valor)}
+    if isinstance(valor, timedelta):
+        return {"$segundos": valor.total_seconds()}
+    return valor
+
+
+def _desempaquetar(objeto):
+    if len(objeto) == 1:
+        (marca, valor), = objeto.items()
+        if marca == "$fecha_hora":
+            return datetime.fromisoformat(valor)
+        if marca == "$fecha":
+            return date.fromisoformat(valor)
+        if marca == "$decimal":
+            return Decimal(valor)
+        if marca == "$segundos":
+            return timedelta(seconds=valor)
+        if marca == "$tupla":
+            return tuple(valor)
+        if marca == "$dict":
+            return {k: v for k, v in valor}
+    return objeto
+
+
+def codificar(valor):
+    """Valor de Python -> bytes JSON (UTF-8)."""
+    return json.dumps(_empaquetar(valor), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def decodificar(datos):
+    """bytes JSON -> valor de Python con fechas, Decimal y claves numéricas reconstruidas."""
+    return json.loads(datos.decode("utf-8") if isinstance(datos, bytes) else datos,
+                      object_hook=_desempaquetar)
@@ -1,8 +1,9 @@
 # sales_controller.py - VERSIÓN PERFECCIONADA
 
-from database import conectar
+from database import transaccion, al_confirmar, con_reintentos, SinConexion, Error
+from catalogo_cache import obtener_catalogo
+from sales_rollup_controller import actualizar_resumen_venta
 from datetime import datetime
-import mysql.connector
 import logging
 
 # Configurar logging para registrar errores en un archivo o consola
@@ -10,110 +11,156 @@ logging.basicConfig(level=logging.ERROR)
 logger = logging.getLogger(__name__)
 
 
-def obtener_productos_activos():
-    """Obtiene productos activos con stock > 0 para la venta, asegurando tipos numéricos."""
-    conn = None
-    cursor = None
-    try:
-        conn = conectar()
-        if not conn:
-            return []
-
-        cursor = conn.cursor(dictionary=True)
-        query = """
-        SELECT id, nombre, precio_venta, stock
-        FROM productos
-        WHERE activo = 1 AND stock > 0
-        ORDER BY nombre ASC
-        """
-        cursor.execute(query)
-        productos = cursor.fetchall()
+def _producto_para_venta(p):
+    # Asegurar tipos numéricos para evitar errores en la interfaz
+    return {
+        'id': p['id'],
+        'nombre': p['nombre'],
+        'sku': p.get('sku'),
+        'precio_venta': float(p.get('precio_venta') or 0),
+        'stock': int(p.get('stock') or 0),
+    }
 
-        # Asegurar tipos numéricos para evitar errores en la interfaz
-        for p in productos:
-            p['precio_venta'] = float(p.get('precio_venta', 0))
-            p['stock'] = int(p.get('stock', 0))
 
-        return productos
+def obtener_productos_activos():
+    """
+    Obtiene productos activos con stock > 0 para la venta, asegurando tipos numéricos.
+
+    Se leen de la caché del catálogo, así abrir el punto de venta no consulta la base.
+    """
+    try:
+        return [_producto_para_venta(p) for p in obtener_catalogo().productos() if int(p.get('stock') or 0) > 0]
     except Exception as e:
         logger.error(f"Error al obtener productos activos: {e}")
         return []
-    finally:
-        # Cerrar la conexión y el cursor de forma segura
-        if cursor:
-            cursor.close()
-        if conn and conn.is_connected():
-            conn.close()
 
 
-def registrar_venta(usuario_id, items_vendidos, cliente_id=None):
+def obtener_producto_por_codigo(codigo):
     """
-    Registra una venta con múltiples ítems, actualiza el stock y maneja la transacción.
+    Producto activo por código SKU / de barras (mismo formato que obtener_productos_activos).
+
+    Returns:
+        dict | None: None si ningún producto activo tiene ese código.
+    """
+    try:
+        producto = obtener_catalogo().buscar_por_sku(codigo)
+        return _producto_para_venta(producto) if producto else None
+    except Exception as e:
+        logger.error(f"Error al buscar producto por código: {e}")
+        return None
+
+
+# Error de MySQL "Duplicate entry" (índice único de ventas.clave_idempotencia)
+_ER_DUP_ENTRY = 1062
 
-    Args:
-        usuario_id (int): ID del usuario/cajero.
-        items_vendidos (list): Lista de dicts con {'producto_id', 'cantidad', 'precio_unitario', 'subtotal'}.
-        cliente_id (int, optional): ID del cliente. Defaults to None (público general).
+
+def _venta_por_clave(cursor, clave_idempotencia, bloquear=False):
+    """Resultado original de la venta registrada con esa clave, o None si no existe."""
+    # bloquear: lectura con bloqueo compartido, ve la última versión confirmada aunque
+    # la transacción ya tenga su snapshot
+    cursor.execute("SELECT id, total FROM ventas WHERE clave_idempotencia = %s"
+                   + (" LOCK IN SHARE MODE" if bloquear else ""), (clave_idempotencia,))
+    venta = cursor.fetchone()
+    if not venta:
+        return None
+    return True, f"✅ Venta {venta[0]} registrada con éxito. Total: ${venta[1]:.2f}", None
+
+
+def registrar_venta_en_base(usuario_id, items_vendidos, cliente_id=None, clave_idempotencia=None, fecha_venta=None):
+    """
+    Registra la venta en una transacción (database.transaccion) y deja que los errores de la base se propaguen.
+
+    Es el núcleo de registrar_venta; ventas_offline lo usa para distinguir una
+    venta rechazada (stock, producto inactivo) de una base inalcanzable. Dentro
+    de una transacción ya abierta se registra en un punto de guardado de ella.
 
     Returns:
-        (bool, str): (éxito, mensaje)
+        (bool, str, dict|None): (éxito, mensaje, {producto_id: cantidad} descontadas).
+            Las cantidades son None si la venta ya estaba registrada con esa clave.
+
+    Raises:
+        database.Error: Errores de la base (SinConexion si no hay conexión).
     """
     if not items_vendidos:
-        return False, "❌ La venta no tiene ítems."
+        return False, "❌ La venta no tiene ítems.", None
+
+    with transaccion() as cursor:
+        # 0. Una venta reenviada (misma clave) no se registra dos veces: se devuelve el resultado original
+        if clave_idempotencia:
+            existente = _venta_por_clave(cursor, clave_idempotencia)
+            if existente:
+                cursor.revertir()
+                return existente
+
+        # 1. Agrupar cantidades por producto (un producto puede repetirse en el carrito)
+        cantidades = {}
+        for item in items_vendidos:
+            producto_id = int(item['producto_id'])
+            cantidades[producto_id] = cantidades.get(producto_id, 0) + item['cantidad']
 
-    conn = None
-    cursor = None
-    try:
-        conn = conectar()
-        if not conn:
-            return False, "❌ Error de conexión a la base de datos."
-        
-        cursor = conn.cursor()
+        ids = list(cantidades)
+        marcadores = ", ".join(["%s"] * len(ids))
 
-        # 1. Validar Stock antes de la transacción: Chequeo preventivo
-        for item in items_vendidos:
-            producto_id = item['producto_id']
-            cantidad_solicitada = item['cantidad']
+        # 2. Validar stock de todo el carrito en una sola consulta, bloqueando las filas
+        #    (FOR UPDATE) para que otra caja no pueda vender el mismo stock a la vez
+        cursor.execute(
+            f"SELECT id, stock, nombre, precio_compra FROM productos WHERE id IN ({marcadores}) AND activo = 1 FOR UPDATE",
+            ids
+        )
+        productos = {fila[0]: fila for fila in cursor.fetchall()}
+
+        for producto_id, cantidad_solicitada in cantidades.items():
+            producto = productos.get(producto_id)
 
-            cursor.execute("SELECT stock, nombre FROM productos WHERE id = %s AND activo = 1", (producto_id,))
-            producto = cursor.fetchone()
-            
             if not producto:
-                return False, f"❌ Producto con ID {producto_id} no encontrado o inactivo."
-            
-            stock_actual = producto[0]
-            nombre_producto = producto[1]
+                cursor.revertir()
+                return False, f"❌ Producto con ID {producto_id} no encontrado o inactivo.", None
+
+            stock_actual = producto[1]
+            nombre_producto = producto[2]
 
             if stock_actual < cantidad_solicitada:
-                # Retorna error sin hacer rollback, ya que no se inició la transacción
-                return False, f"❌ Stock insuficiente para {nombre_producto}. Disponible: {stock_actual}, Solicitado: {cantidad_solicitada}."
+                # Al deshacer se liberan los bloqueos tomados por el SELECT ... FOR UPDATE
+                cursor.revertir()
+                return False, f"❌ Stock insuficiente para {nombre_producto}. Disponible: {stock_actual}, Solicitado: {cantidad_solicitada}.", None
 
-        # 2. Registrar la venta principal (ventas)
+        # 3. Registrar la venta principal (ventas)
         total_venta = sum(item['subtotal'] for item in items_vendidos)
-        fecha_venta = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-
-        query_venta = """
-        INSERT INTO ventas (usuario_id, cliente_id, fecha_venta, total)
-        VALUES (%s, %s, %s, %s)
-        """
-        # Usar cliente_id (puede ser NULL si es público general)
-        cursor.execute(query_venta, (usuario_id, cliente_id, fecha_venta, total_venta))
+        fecha_venta = fecha_venta or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+        # Usar cliente_id (puede ser NULL si es público general); la clave solo si se indicó,
+        # así las bases sin la migración 8 siguen registrando ventas normales
+        columnas = "usuario_id, cliente_id, fecha_venta, total"
+        valores = [usuario_id, cliente_id, fecha_venta, total_venta]
+        if clave_idempotencia:
+            columnas += ", clave_idempotencia"
+            valores.append(clave_idempotencia)
+        try:
+            cursor.execute(f"INSERT INTO ventas ({columnas}) VALUES ({', '.join(['%s'] * len(valores))})", valores)
+        except Error as e:
+            if e.errno != _ER_DUP_ENTRY or not clave_idempotencia:
+                raise
+            # Otra caja (o un reintento) la registró entre la verificación y el INSERT
+            existente = _venta_por_clave(cursor, clave_idempotencia, bloquear=True)
+            if existente is None:
+                raise
+            cursor.revertir()
+            return existente
         venta_id = cursor.lastrowid
-        
-        detalle_data = []
-        
-        # 3. Registrar el detalle y actualizar stock
-        for item in items_vendidos:
-            producto_id = item['producto_id']
-            cantidad = item['cantidad']
-            precio = item['precio_unitario']
-            subtotal = item['subtotal']
 
-            detalle_data.append((venta_id, producto_id, cantidad, precio, subtotal))
+        # 4. Descontar el stock de todo el carrito con una sola sentencia
+        casos = " ".join(["WHEN %s THEN %s"] * len(ids))
+        params_stock = [valor for producto_id in ids for valor in (producto_id, cantidades[producto_id])]
+        cursor.execute(
+            f"UPDATE productos SET stock = stock - CASE id {casos} END WHERE id IN ({marcadores})",
+            params_stock + ids
+        )
 
-            # Actualizar stock
-            query_stock = "UPDATE productos SET stock = stock - %s WHERE id = %s"
-            cursor.execute(query_stock, (cantidad, producto_id))
+        # 5. Registrar el detalle (executemany envía un único INSERT multi-fila)
+        detalle_data = [
+            (venta_id, item['producto_id'], item['cantidad'], item['precio_unitario'], item['subtotal'])
+            for item in items_vendidos
+        ]
 
         query_detalle = """
         INSERT INTO detalle_venta (venta_id, producto_id, cantidad, precio_unitario, subtotal)
@@ -121,25 +168,49 @@ def registrar_venta(usuario_id, items_vendidos, cliente_id=None):
         """
         cursor.executemany(query_detalle, detalle_data)
 
-        # Confirmar todos los cambios
-        conn.commit()
-        return True, f"✅ Venta {venta_id} registrada con éxito. Total: ${total_venta:.2f}"
-        
-    except mysql.connector.Error as e:
-        # En caso de error de MySQL, se realiza un rollback
-        if conn:
-            conn.rollback()
+        # 6. Mantener el resumen diario en la misma transacción (costo con precio_compra)
+        actualizar_resumen_venta(cursor, fecha_venta, usuario_id, [
+            (int(item['producto_id']), item['cantidad'], item['subtotal'], productos[int(item['producto_id'])][3])
+            for item in items_vendidos
+        ])
+
+        # Al salir del with se confirman todos los cambios
+        return True, f"✅ Venta {venta_id} registrada con éxito. Total: ${total_venta:.2f}", cantidades
+
+
+def registrar_venta(usuario_id, items_vendidos, cliente_id=None, clave_idempotencia=None, fecha_venta=None):
+    """
+    Registra una venta con múltiples ítems, actualiza el stock y el resumen diario en una sola transacción.
+
+    Args:
+        usuario_id (int): ID del usuario/cajero.
+        items_vendidos (list): Lista de dicts con {'producto_id', 'cantidad', 'precio_unitario', 'subtotal'}.
+        cliente_id (int, optional): ID del cliente. Defaults to None (público general).
+        clave_idempotencia (str, optional): Identificador único de la venta generado por quien llama;
+            si ya existe una venta con esa clave no se registra otra y se devuelve el resultado
+            original, así la llamada puede reintentarse sin duplicar la venta (migración 8).
+        fecha_venta (str, optional): 'YYYY-MM-DD HH:MM:SS'; por defecto, ahora.
+
+    Returns:
+        (bool, str): (éxito, mensaje)
+    """
+    try:
+        # Un deadlock con otra caja se reintenta sin que el cajero lo note; con clave de
+        # idempotencia también una conexión perdida (repetir no puede duplicar la venta)
+        exito, mensaje, cantidades = con_reintentos(
+            registrar_venta_en_base, usuario_id, items_vendidos, cliente_id, clave_idempotencia, fecha_venta,
+            idempotente=bool(clave_idempotencia)
+        )
+    except SinConexion:
+        return False, "❌ Error de conexión a la base de datos."
+    except Error as e:
         logger.error(f"Error de base de datos al registrar venta: {str(e)}", exc_info=True)
         return False, f"❌ Error de base de datos al registrar venta. Consulte logs para detalles."
     except Exception as e:
-        # En caso de cualquier otro error, se realiza un rollback
-        if conn:
-            conn.rollback()
         logger.error(f"Error inesperado al registrar venta: {str(e)}", exc_info=True)
         return False, f"❌ Error inesperado al registrar venta. Error: {str(e)}"
-    finally:
-        # Asegurar el cierre de la conexión y el cursor
-        if cursor:
-            cursor.close()
-        if conn and conn.is_connected():
-            conn.close()
\ No newline at end of file
+
+    if cantidades:
+        # Si la venta es parte de una transacción mayor, la caché se toca al confirmarse esta
+        al_confirmar(obtener_catalogo().descontar_stock, cantidades)
+    return exito, mensaje
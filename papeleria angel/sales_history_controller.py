@@ -1,64 +1,102 @@
 # sales_history_controller.py - CÓDIGO PERFECCIONADO
-from database import conectar
+from database import conectar, Error
 from datetime import datetime, timedelta
+import base64
+import json
 import logging
 
 # Configura logging para mejor manejo de errores
 logging.basicConfig(level=logging.WARNING)
 logger = logging.getLogger(__name__)
 
+# Tamaño de página por defecto para la paginación por cursor (keyset)
+TAMANO_PAGINA = 200
+
+# Consulta base: une ventas con detalle_venta y productos para obtener el historial de items
+_SELECT_HISTORIAL = """
+    SELECT
+        v.id AS venta_id,
+        dv.id AS detalle_id,
+        v.fecha_venta,
+        p.nombre AS producto_nombre,
+        dv.cantidad,                                  -- Cantidad de este producto
+        dv.subtotal AS total,                         -- Subtotal (precio * cantidad) de este item vendido
+        u.nombre AS usuario_nombre,
+        'Público General' AS cliente_nombre           -- Asume cliente genérico si no hay un sistema de clientes en ventas
+    FROM
+        ventas v
+    INNER JOIN
+        detalle_venta dv ON v.id = dv.venta_id
+    INNER JOIN
+        productos p ON dv.producto_id = p.id
+    INNER JOIN
+        usuarios u ON v.usuario_id = u.id
+    WHERE 1=1
+"""
+
+
+def _filtro_fechas(fecha_inicio, fecha_fin):
+    """
+    Construye el filtro de fechas como rangos sobre la columna original.
+
+    Comparar v.fecha_venta directamente (sin DATE()) permite usar el índice
+    sobre fecha_venta. La fecha final se toma como exclusiva al día siguiente,
+    así se incluye todo el último día sin depender de '23:59:59'.
+    """
+    condiciones = ""
+    params = []
+    if fecha_inicio:
+        condiciones += " AND v.fecha_venta >= %s"
+        params.append(f"{fecha_inicio} 00:00:00")
+    if fecha_fin:
+        dia_siguiente = datetime.strptime(str(fecha_fin)[:10], '%Y-%m-%d') + timedelta(days=1)
+        condiciones += " AND v.fecha_venta < %s"
+        params.append(dia_siguiente.strftime('%Y-%m-%d %H:%M:%S'))
+    return condiciones, params
+
+
+def _codificar_token(fila):
+    """Genera el token opaco de continuación a partir de la última fila de la página."""
+    fecha = fila['fecha_venta']
+    if hasattr(fecha, 'strftime'):
+        fecha = fecha.strftime('%Y-%m-%d %H:%M:%S')
+    datos = json.dumps([str(fecha), fila['venta_id'], fila['detalle_id']])
+    return base64.urlsafe_b64encode(datos.encode('utf-8')).decode('ascii')
+
+
+def _decodificar_token(token):
+    """Devuelve (fecha_venta, venta_id, detalle_id) o lanza ValueError si el token no es válido."""
+    try:
+        fecha, venta_id, detalle_id = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+        return str(fecha), int(venta_id), int(detalle_id)
+    except Exception as e:
+        raise ValueError("Token de paginación inválido") from e
+
+
 def get_sales_history(fecha_inicio=None, fecha_fin=None, limit=None, offset=0):
     """
     Obtiene el historial de ventas, listando cada producto vendido como una línea (detalle_venta).
     Soporta filtrado por fecha, límite y paginación.
+
+    Para recorrer historiales grandes use get_sales_history_page, que no se
+    vuelve más lenta en páginas profundas como OFFSET.
     """
     conn = None
     cursor = None
-    
+
     # Manejo de límite por defecto si no se especifica
     if limit is None:
         limit = 1000
 
     try:
-        conn = conectar()
+        conn = conectar(lectura=True)
         if not conn:
             return False, "❌ Error: No se pudo conectar a la base de datos."
 
         cursor = conn.cursor(dictionary=True)
 
-        # Consulta corregida: Une ventas con detalle_venta y productos para obtener el historial de items
-        query = """
-            SELECT
-                v.id AS venta_id,
-                v.fecha_venta,
-                p.nombre AS producto_nombre,
-                dv.cantidad,                                  -- Cantidad de este producto
-                dv.subtotal AS total,                         -- Subtotal (precio * cantidad) de este item vendido
-                u.nombre AS usuario_nombre,
-                'Público General' AS cliente_nombre           -- Asume cliente genérico si no hay un sistema de clientes en ventas
-            FROM
-                ventas v
-            INNER JOIN
-                detalle_venta dv ON v.id = dv.venta_id
-            INNER JOIN
-                productos p ON dv.producto_id = p.id
-            INNER JOIN
-                usuarios u ON v.usuario_id = u.id
-            WHERE 1=1
-        """
-
-        params = []
-
-        if fecha_inicio:
-            # Filtra por la fecha de inicio (solo el día)
-            query += " AND DATE(v.fecha_venta) >= %s"
-            params.append(fecha_inicio)
-        if fecha_fin:
-            # Filtra hasta el final del día de la fecha final (más robusto)
-            query += " AND v.fecha_venta <= %s" 
-            params.append(f"{fecha_fin} 23:59:59")
-
-        query += " ORDER BY v.fecha_venta DESC"
+        condiciones, params = _filtro_fechas(fecha_inicio, fecha_fin)
+        query = _SELECT_HISTORIAL + condiciones + " ORDER BY v.fecha_venta DESC, v.id DESC, dv.id DESC"
 
         # Paginación/Límite
         if limit > 0:
@@ -67,7 +105,7 @@ def get_sales_history(fecha_inicio=None, fecha_fin=None, limit=None, offset=0):
         if offset and offset > 0:
             query += " OFFSET %s"
             params.append(offset)
-            
+
         cursor.execute(query, params)
         ventas = cursor.fetchall()
 
@@ -90,6 +128,116 @@ def get_sales_history(fecha_inicio=None, fecha_fin=None, limit=None, offset=0):
                 pass
 
 
+def get_sales_history_page(fecha_inicio=None, fecha_fin=None, tamano_pagina=TAMANO_PAGINA, token=None):
+    """
+    Obtiene una página del historial usando paginación por cursor (keyset).
+
+    Las filas se ordenan por (fecha_venta, venta_id, detalle_id) descendente y cada
+    página continúa justo después de la última fila de la anterior, por lo que el
+    costo es el mismo en la primera página que en la milésima.
+
+    Args:
+        fecha_inicio (str, optional): 'YYYY-MM-DD' inclusive.
+        fecha_fin (str, optional): 'YYYY-MM-DD' inclusive.
+        tamano_pagina (int): Filas por página.
+        token (str, optional): Token devuelto por la página anterior; None para la primera.
+
+    Returns:
+        (bool, dict|str): (True, {'ventas': [...], 'token_siguiente': str|None}) o (False, mensaje)
+    """
+    conn = None
+    cursor = None
+    try:
+        condiciones, params = _filtro_fechas(fecha_inicio, fecha_fin)
+
+        if token:
+            fecha, venta_id, detalle_id = _decodificar_token(token)
+            # Equivale a (fecha_venta, venta_id, detalle_id) < (%s, %s, %s), escrito de
+            # forma expandida para que el optimizador use el índice de fecha_venta
+            condiciones += """
+                AND (v.fecha_venta < %s
+                     OR (v.fecha_venta = %s AND (v.id < %s OR (v.id = %s AND dv.id < %s))))
+            """
+            params.extend([fecha, fecha, venta_id, venta_id, detalle_id])
+
+        conn = conectar(lectura=True)
+        if not conn:
+            return False, "❌ Error: No se pudo conectar a la base de datos."
+
+        cursor = conn.cursor(dictionary=True)
+        query = (_SELECT_HISTORIAL + condiciones
+                 + " ORDER BY v.fecha_venta DESC, v.id DESC, dv.id DESC LIMIT %s")
+        # Se pide una fila extra para saber si existe una página siguiente
+        params.append(tamano_pagina + 1)
+
+        cursor.execute(query, params)
+        ventas = cursor.fetchall()
+
+        token_siguiente = None
+        if len(ventas) > tamano_pagina:
+            ventas = ventas[:tamano_pagina]
+            token_siguiente = _codificar_token(ventas[-1])
+
+        return True, {'ventas': ventas, 'token_siguiente': token_siguiente}
+
+    except ValueError as e:
+        return False, f"❌ {e}."
+    except Exception as e:
+        logger.exception(f"Error al cargar la página del historial de ventas: {e}")
+        return False, f"❌ Error al cargar el historial: {str(e)}"
+    finally:
+        if cursor:
+            try:
+                cursor.close()
+            except Exception:
+                pass
+        if conn and hasattr(conn, 'is_connected') and conn.is_connected():
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+
+def iterar_historial_ventas(fecha_inicio=None, fecha_fin=None, tam_lote=1000):
+    """
+    Genera las líneas del historial una por una, leyendo del servidor por lotes.
+
+    Usa un cursor sin búfer (el servidor envía las filas a medida que se piden con
+    fetchmany), por lo que la memoria usada no depende del tamaño del período.
+    Pensado para exportaciones: recorra el generador completo o ciérrelo.
+
+    Raises:
+        database.Error: Si no es posible conectar o falla la consulta.
+    """
+    conn = conectar(lectura=True)
+    if not conn:
+        raise Error("No se pudo conectar a la base de datos.")
+
+    cursor = None
+    completo = False
+    try:
+        cursor = conn.cursor(dictionary=True, buffered=False)
+        condiciones, params = _filtro_fechas(fecha_inicio, fecha_fin)
+        cursor.execute(_SELECT_HISTORIAL + condiciones + " ORDER BY v.fecha_venta DESC, v.id DESC, dv.id DESC", params)
+
+        while True:
+            filas = cursor.fetchmany(tam_lote)
+            if not filas:
+                break
+            yield from filas
+        completo = True
+    finally:
+        if completo:
+            cursor.close()
+            conn.close()
+        else:
+            # Quedan filas sin leer en el socket: la conexión no puede volver al pool
+            if hasattr(conn, 'descartar'):
+                conn.descartar()
+            else:
+                conn.close()
+
+
 def get_sales_history_simple():
     """Función para cargar datos por defecto (últimos 30 días, 1000 registros)."""
     hace_30 = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
@@ -99,4 +247,4 @@ def get_sales_history_simple():
         fecha_inicio=hace_30,
         fecha_fin=hoy,
         limit=1000
-    )
\ No newline at end of file
+    )
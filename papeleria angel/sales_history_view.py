@@ -1,9 +1,12 @@
 # sales_history_view.py - CÓDIGO PERFECCIONADO
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-from export_controller import exportar_a_csv, generar_ruta_csv
-# Importamos la función principal para poder usar filtros
-from sales_history_controller import get_sales_history 
+from export_controller import exportar_filas_csv, generar_ruta_csv
+# Historial paginado por cursor: cada página continúa donde terminó la anterior
+from sales_history_controller import get_sales_history_page, iterar_historial_ventas
+from sales_rollup_controller import obtener_totales_periodo
+from tabla_virtual import TablaVirtual, FuentePaginada
+from cargador_async import CargadorAsync
 from datetime import datetime, timedelta
 
 class SalesHistoryView:
@@ -20,7 +23,10 @@ class SalesHistoryView:
         hace_30 = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
         self.fecha_inicio_var = tk.StringVar(value=hace_30)
         self.fecha_fin_var = tk.StringVar(value=hoy)
-        self.all_sales_data = [] # Para almacenar los datos cargados para exportación
+        self.filtro_actual = (hace_30, hoy)
+        self._avisar_sin_resultados = False
+        # Consultas en segundo plano: la ventana no se congela mientras responde MySQL
+        self.cargador = CargadorAsync(self.root)
 
         style = ttk.Style()
         style.configure("T.Green.TButton", background="#2ecc71", foreground="white", font=("Arial", 10, "bold"))
@@ -57,22 +63,23 @@ class SalesHistoryView:
         # Botón de Exportar
         ttk.Button(filter_frame, text="📄 Exportar a CSV", command=self.export_data, style="T.Green.TButton").grid(row=0, column=5, padx=15, pady=5, sticky="w")
 
-        # --- Treeview de Historial ---
-        tree_frame = tk.Frame(main_frame)
-        tree_frame.pack(fill="both", expand=True)
-
-        tree_scroll = ttk.Scrollbar(tree_frame)
-        tree_scroll.pack(side="right", fill="y")
-
-        # Columnas del Treeview
-        self.tree = ttk.Treeview(
-            tree_frame, 
-            columns=("ID", "Fecha", "Producto", "Cantidad", "Subtotal Item", "Vendedor"),
-            show="headings", 
-            yscrollcommand=tree_scroll.set
+        # Totales del período (resumen diario) y estado de la paginación
+        self.totales_label = ttk.Label(main_frame, text="", font=("Arial", 11, "bold"))
+        self.totales_label.pack(anchor="w", pady=(0, 2))
+        self.estado_label = ttk.Label(main_frame, text="")
+        self.estado_label.pack(anchor="w", pady=(0, 5))
+
+        # --- Tabla virtual de Historial ---
+        # Solo se dibujan las filas visibles; la siguiente página se pide al acercarse al final
+        self.tabla = TablaVirtual(
+            main_frame,
+            columnas=("ID", "Fecha", "Producto", "Cantidad", "Subtotal Item", "Vendedor"),
+            formatear=self._formatear_venta, cargador=self.cargador
         )
-        self.tree.pack(fill="both", expand=True)
-        tree_scroll.config(command=self.tree.yview)
+        self.tabla.pack(fill="both", expand=True)
+        self.tabla.bind("<<FilasCargadas>>", self._on_filas_cargadas)
+        self.tabla.bind("<<ErrorCarga>>", self._on_error_carga)
+        self.tree = self.tabla.tree
 
         # Definición de encabezados
         self.tree.heading("ID", text="ID Venta", anchor=tk.W)
@@ -94,10 +101,7 @@ class SalesHistoryView:
         self.load_history()
 
     def load_history(self):
-        """Carga el historial de ventas aplicando los filtros de fecha."""
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-            
+        """Carga la primera página del historial de ventas aplicando los filtros de fecha."""
         fecha_inicio = self.fecha_inicio_var.get().strip()
         fecha_fin = self.fecha_fin_var.get().strip()
         
@@ -105,25 +109,67 @@ class SalesHistoryView:
             messagebox.showerror("❌ Error de Filtro", "El formato de fecha debe ser YYYY-MM-DD.")
             return
 
-        # Usar la función principal del controlador con filtros
-        success, data = get_sales_history(fecha_inicio=fecha_inicio, fecha_fin=fecha_fin, limit=None)
-        self.all_sales_data = data # Guardar la data para la exportación
-        
-        if success:
-            for venta in data:
-                # venta['total'] es ahora el subtotal del item
-                self.tree.insert("", "end", values=(
-                    venta['venta_id'],
-                    venta['fecha_venta'],
-                    venta['producto_nombre'],
-                    venta['cantidad'],
-                    f"${venta['total']:.2f}", # Subtotal Item formateado
-                    venta['usuario_nombre']
-                ))
-            if not data:
+        self.filtro_actual = (fecha_inicio, fecha_fin)
+        self._avisar_sin_resultados = True
+        self.totales_label.config(text="⏳ Calculando totales...")
+        self.cargador.ejecutar("totales", obtener_totales_periodo, fecha_inicio, fecha_fin,
+                               al_terminar=self._mostrar_totales)
+
+        # La tabla pide la primera página (y las siguientes) en segundo plano;
+        # un filtro nuevo cancela las páginas pendientes del anterior
+        self.tabla.establecer_fuente(FuentePaginada(
+            lambda token: self._cargar_pagina(fecha_inicio, fecha_fin, token)
+        ))
+        self.estado_label.config(text="⏳ Cargando historial...")
+
+    def _on_filas_cargadas(self, event=None):
+        self._actualizar_estado()
+        if self._avisar_sin_resultados:
+            self._avisar_sin_resultados = False
+            if not self.tabla.total():
                 messagebox.showinfo("ℹ️ Sin Resultados", "No se encontraron ventas para el período seleccionado.")
+
+    def _on_error_carga(self, event=None):
+        self._avisar_sin_resultados = False
+        self._actualizar_estado()
+        messagebox.showerror("❌ Error de Carga", str(self.tabla.ultimo_error))
+
+    def _mostrar_totales(self, totales):
+        """Muestra los totales del período leídos del resumen diario."""
+        if totales is None:
+            self.totales_label.config(text="")
+            return
+        texto = f"Total del período: ${totales['ingresos']:,.2f} · {int(totales['unidades'])} unidades"
+        if self.usuario.get('rol') == 'admin':
+            texto += f" · Costo ${totales['costo']:,.2f} · Margen ${totales['margen']:,.2f}"
+        self.totales_label.config(text=texto)
+
+    def _cargar_pagina(self, fecha_inicio, fecha_fin, token=None):
+        """Pide una página al controlador (en un hilo del cargador, sin tocar widgets)."""
+        success, data = get_sales_history_page(fecha_inicio=fecha_inicio, fecha_fin=fecha_fin, token=token)
+
+        if not success:
+            raise RuntimeError(data)
+
+        return data['ventas'], data['token_siguiente']
+
+    def _formatear_venta(self, venta):
+        # venta['total'] es ahora el subtotal del item
+        return (
+            venta['venta_id'],
+            venta['fecha_venta'],
+            venta['producto_nombre'],
+            venta['cantidad'],
+            f"${venta['total']:.2f}", # Subtotal Item formateado
+            venta['usuario_nombre']
+        )
+
+    def _actualizar_estado(self):
+        total = self.tabla.total()
+        if self.tabla.fuente.hay_mas():
+            self.estado_label.config(text=f"Mostrando {total} líneas · desplácese hacia abajo para cargar más")
         else:
-            messagebox.showerror("❌ Error de Carga", data)
+            self.estado_label.config(text=f"Mostrando {total} líneas")
 
     def _validate_date_format(self, date_str):
         """Valida que la cadena tenga formato YYYY-MM-DD."""
@@ -134,10 +180,8 @@ class SalesHistoryView:
             return False
 
     def export_data(self):
-        """Exporta los datos actualmente cargados a un archivo CSV."""
-        data = self.all_sales_data
-        
-        if not data:
+        """Exporta todo el período filtrado a CSV, leyendo y escribiendo por lotes."""
+        if not self.tabla.total():
             messagebox.showwarning("⚠️ Advertencia", "No hay datos de ventas para exportar. Por favor, cargue la información primero.")
             return
 
@@ -151,15 +195,6 @@ class SalesHistoryView:
             "usuario_nombre": "Vendedor",
             "cliente_nombre": "Cliente"
         }
-        
-        # Crear la lista de diccionarios para exportar con los encabezados en español
-        data_to_export = []
-        raw_keys = list(export_map.keys())
-        encabezados_csv = list(export_map.values())
-        
-        for row in data:
-            new_row = {export_map[key]: row[key] for key in raw_keys}
-            data_to_export.append(new_row)
 
         ruta_sugerida = generar_ruta_csv("Reporte_Ventas")
         
@@ -169,16 +204,45 @@ class SalesHistoryView:
             filetypes=[("Archivos CSV", "*.csv")]
         )
 
-        if ruta_guardado:
-            # Ahora usamos data_to_export con los encabezados en español
-            exito, mensaje = exportar_a_csv(data_to_export, ruta_guardado, encabezados_csv)
-            
+        if not ruta_guardado:
+            return
+
+        def mostrar_progreso(filas):
+            # Se llama desde el hilo de la exportación: el texto se actualiza en el hilo de Tk
+            self.cargador.en_hilo_principal(
+                lambda: self.estado_label.config(text=f"⏳ Exportando... {filas} líneas escritas")
+            )
+
+        # Se exporta el período completo desde la base de datos (no solo las páginas cargadas)
+        fecha_inicio, fecha_fin = self.filtro_actual
+
+        def exportar():
+            filas = iterar_historial_ventas(fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)
+            try:
+                return exportar_filas_csv(
+                    filas, ruta_guardado, list(export_map.values()),
+                    mapa_columnas=export_map, progreso=mostrar_progreso
+                )
+            finally:
+                filas.close()
+
+        def terminar(resultado):
+            exito, mensaje = resultado
+            self._actualizar_estado()
             if exito:
                 messagebox.showinfo("✅ Exportación Exitosa", mensaje)
             else:
                 messagebox.showerror("❌ Error de Exportación", mensaje)
 
+        def fallar(e):
+            self._actualizar_estado()
+            messagebox.showerror("❌ Error de Exportación", f"❌ Error al exportar:\n{str(e)}")
+
+        self.estado_label.config(text="⏳ Exportando...")
+        self.cargador.ejecutar("exportar", exportar, al_terminar=terminar, al_fallar=fallar)
+
     def back_to_dashboard(self):
+        self.cargador.cerrar()
         self.root.destroy()
         # Se requiere la importación dentro de la función o fuera de la clase para evitar dependencia circular
         from dashboard_view import DashboardView
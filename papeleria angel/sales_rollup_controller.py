@@ -0,0 +1,300 @@
+# sales_rollup_controller.py
+"""
+Resumen diario de ventas por producto y cajero (tabla resumen_ventas_diarias).
+
+registrar_venta lo actualiza dentro de su propia transacción, así que los
+reportes y el Dashboard pueden leer totales con búsquedas por índice en lugar
+de volver a unir ventas, detalle_venta, productos y usuarios.
+
+La tabla se crea (y se rellena) con la migración 2 de migraciones.py.
+
+Uso desde la línea de comandos (en la carpeta de la aplicación):
+    python sales_rollup_controller.py --crear-tabla
+    python sales_rollup_controller.py --reconstruir [--desde 2024-01-01] [--hasta 2024-12-31]
+"""
+from database import conectar
+from datetime import datetime, timedelta
+import argparse
+import logging
+
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger(__name__)
+
+TABLA_RESUMEN = "resumen_ventas_diarias"
+
+SQL_CREAR_TABLA_RESUMEN = f"""
+CREATE TABLE IF NOT EXISTS {TABLA_RESUMEN} (
+    fecha DATE NOT NULL,
+    producto_id INT NOT NULL,
+    usuario_id INT NOT NULL,
+    unidades INT NOT NULL DEFAULT 0,
+    ingresos DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    costo DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    lineas INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (fecha, producto_id, usuario_id),
+    KEY idx_resumen_producto (producto_id, fecha),
+    KEY idx_resumen_usuario (usuario_id, fecha)
+)
+"""
+
+# Columnas agregadas comunes a todas las consultas de lectura
+_AGREGADOS = """
+    SUM(r.unidades) AS unidades,
+    SUM(r.ingresos) AS ingresos,
+    SUM(r.costo) AS costo,
+    SUM(r.ingresos) - SUM(r.costo) AS margen,
+    SUM(r.lineas) AS lineas
+"""
+
+_SELECT_TOTALES = f"SELECT {_AGREGADOS} FROM {TABLA_RESUMEN} r WHERE 1=1"
+
+_AGRUPACIONES = {
+    'dia': ("r.fecha", "r.fecha", "r.fecha DESC"),
+    'producto': ("r.producto_id, p.nombre AS producto_nombre", "r.producto_id, p.nombre", "ingresos DESC"),
+    'cajero': ("r.usuario_id, u.nombre AS usuario_nombre", "r.usuario_id, u.nombre", "ingresos DESC"),
+}
+
+
+def _rango(fecha_inicio, fecha_fin, alias="r."):
+    condiciones = ""
+    params = []
+    if fecha_inicio:
+        condiciones += f" AND {alias}fecha >= %s"
+        params.append(str(fecha_inicio)[:10])
+    if fecha_fin:
+        condiciones += f" AND {alias}fecha <= %s"
+        params.append(str(fecha_fin)[:10])
+    return condiciones, params
+
+
+def actualizar_resumen_venta(cursor, fecha_venta, usuario_id, lineas):
+    """
+    Suma una venta al resumen usando el cursor (y la transacción) de quien llama.
+
+    Args:
+        cursor: Cursor de la transacción de la venta.
+        fecha_venta (str|datetime): Fecha de la venta.
+        usuario_id (int): Cajero que registró la venta.
+        lineas (list): Tuplas (producto_id, cantidad, subtotal, costo_unitario).
+    """
+    if not lineas:
+        return
+
+    fecha = fecha_venta.strftime('%Y-%m-%d') if hasattr(fecha_venta, 'strftime') else str(fecha_venta)[:10]
+
+    # Un producto puede venir en varias líneas: se agrega antes de enviar
+    por_producto = {}
+    for producto_id, cantidad, subtotal, costo_unitario in lineas:
+        acumulado = por_producto.setdefault(producto_id, [0, 0.0, 0.0, 0])
+        acumulado[0] += cantidad
+        acumulado[1] += float(subtotal)
+        acumulado[2] += float(costo_unitario or 0) * cantidad
+        acumulado[3] += 1
+
+    valores = []
+    for producto_id, (unidades, ingresos, costo, num_lineas) in por_producto.items():
+        valores.extend([fecha, producto_id, usuario_id, unidades, round(ingresos, 2), round(costo, 2), num_lineas])
+
+    marcadores = ", ".join(["(%s, %s, %s, %s, %s, %s, %s)"] * len(por_producto))
+    cursor.execute(f"""
+        INSERT INTO {TABLA_RESUMEN} (fecha, producto_id, usuario_id, unidades, ingresos, costo, lineas)
+        VALUES {marcadores}
+        ON DUPLICATE KEY UPDATE
+            unidades = unidades + VALUES(unidades),
+            ingresos = ingresos + VALUES(ingresos),
+            costo = costo + VALUES(costo),
+            lineas = lineas + VALUES(lineas)
+    """, valores)
+
+
+def crear_tabla_resumen():
+    """Crea la tabla de resumen si no existe."""
+    conn = None
+    cursor = None
+    try:
+        conn = conectar()
+        if not conn:
+            return False, "❌ Error de conexión a la base de datos."
+        cursor = conn.cursor()
+        cursor.execute(SQL_CREAR_TABLA_RESUMEN)
+        conn.commit()
+        return True, f"✅ Tabla {TABLA_RESUMEN} lista."
+    except Exception as e:
+        logger.exception("Error al crear la tabla de resumen")
+        return False, f"❌ Error al crear la tabla de resumen: {str(e)}"
+    finally:
+        if cursor: cursor.close()
+        if conn and conn.is_connected(): conn.close()
+
+
+def reconstruir_resumen_en_cursor(cursor, fecha_inicio=None, fecha_fin=None):
+    """
+    Recalcula el resumen del rango usando el cursor (y la transacción) de quien llama.
+
+    Returns:
+        int: Filas de resumen generadas.
+    """
+    condiciones_resumen, params_resumen = _rango(fecha_inicio, fecha_fin, alias="")
+    cursor.execute(f"DELETE FROM {TABLA_RESUMEN} WHERE 1=1{condiciones_resumen}", params_resumen)
+
+    # Filtro por rango sobre la columna original para aprovechar el índice de fecha_venta
+    condiciones = ""
+    params = []
+    if fecha_inicio:
+        condiciones += " AND v.fecha_venta >= %s"
+        params.append(f"{str(fecha_inicio)[:10]} 00:00:00")
+    if fecha_fin:
+        dia_siguiente = datetime.strptime(str(fecha_fin)[:10], '%Y-%m-%d') + timedelta(days=1)
+        condiciones += " AND v.fecha_venta < %s"
+        params.append(dia_siguiente.strftime('%Y-%m-%d %H:%M:%S'))
+
+    cursor.execute(f"""
+        INSERT INTO {TABLA_RESUMEN} (fecha, producto_id, usuario_id, unidades, ingresos, costo, lineas)
+        SELECT
+            DATE(v.fecha_venta),
+            dv.producto_id,
+            v.usuario_id,
+            SUM(dv.cantidad),
+            SUM(dv.subtotal),
+            SUM(dv.cantidad * IFNULL(p.precio_compra, 0)),
+            COUNT(*)
+        FROM ventas v
+        INNER JOIN detalle_venta dv ON v.id = dv.venta_id
+        INNER JOIN productos p ON dv.producto_id = p.id
+        WHERE 1=1{condiciones}
+        GROUP BY DATE(v.fecha_venta), dv.producto_id, v.usuario_id
+    """, params)
+    return cursor.rowcount
+
+
+def reconstruir_resumen(fecha_inicio=None, fecha_fin=None):
+    """
+    Recalcula el resumen desde ventas/detalle_venta para el rango indicado (o todo).
+
+    El costo se calcula con el precio_compra actual de cada producto, ya que
+    detalle_venta no guarda el costo histórico.
+
+    Returns:
+        (bool, str): (éxito, mensaje)
+    """
+    conn = None
+    cursor = None
+    try:
+        conn = conectar()
+        if not conn:
+            return False, "❌ Error de conexión a la base de datos."
+        cursor = conn.cursor()
+
+        filas = reconstruir_resumen_en_cursor(cursor, fecha_inicio, fecha_fin)
+
+        conn.commit()
+        return True, f"✅ Resumen reconstruido ({filas} filas)."
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        logger.exception("Error al reconstruir el resumen de ventas")
+        return False, f"❌ Error al reconstruir el resumen: {str(e)}"
+    finally:
+        if cursor: cursor.close()
+        if conn and conn.is_connected(): conn.close()
+
+
+def obtener_resumen_ventas(fecha_inicio=None, fecha_fin=None, agrupar_por='dia'):
+    """
+    Lee totales agregados del resumen.
+
+    Args:
+        agrupar_por (str): 'dia', 'producto' o 'cajero'.
+
+    Returns:
+        list: Diccionarios con unidades, ingresos, costo, margen y lineas por grupo.
+    """
+    if agrupar_por not in _AGRUPACIONES:
+        raise ValueError(f"Agrupación no soportada: {agrupar_por}")
+
+    columnas, grupo, orden = _AGRUPACIONES[agrupar_por]
+    conn = None
+    cursor = None
+    try:
+        conn = conectar(lectura=True)
+        if not conn:
+            return []
+        cursor = conn.cursor(dictionary=True)
+
+        condiciones, params = _rango(fecha_inicio, fecha_fin)
+        uniones = ""
+        if agrupar_por == 'producto':
+            uniones = "INNER JOIN productos p ON r.producto_id = p.id"
+        elif agrupar_por == 'cajero':
+            uniones = "INNER JOIN usuarios u ON r.usuario_id = u.id"
+
+        cursor.execute(f"""
+            SELECT {columnas}, {_AGREGADOS}
+            FROM {TABLA_RESUMEN} r
+            {uniones}
+            WHERE 1=1{condiciones}
+            GROUP BY {grupo}
+            ORDER BY {orden}
+        """, params)
+        return cursor.fetchall()
+    except Exception:
+        logger.exception("Error al leer el resumen de ventas")
+        return []
+    finally:
+        if cursor: cursor.close()
+        if conn and conn.is_connected(): conn.close()
+
+
+def obtener_totales_periodo(fecha_inicio=None, fecha_fin=None):
+    """
+    Totales de un período (unidades, ingresos, costo, margen, lineas).
+
+    Returns:
+        dict|None: Totales (en cero si no hubo ventas) o None si hubo un error.
+    """
+    conn = None
+    cursor = None
+    try:
+        conn = conectar(lectura=True)
+        if not conn:
+            return None
+        cursor = conn.cursor(dictionary=True)
+        condiciones, params = _rango(fecha_inicio, fecha_fin)
+        cursor.execute(_SELECT_TOTALES + condiciones, params)
+        fila = cursor.fetchone() or {}
+        return {clave: float(fila.get(clave) or 0) for clave in ('unidades', 'ingresos', 'costo', 'margen', 'lineas')}
+    except Exception:
+        logger.exception("Error al leer los totales del resumen")
+        return None
+    finally:
+        if cursor: cursor.close()
+        if conn and conn.is_connected(): conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mantenimiento del resumen diario de ventas.")
+    parser.add_argument('--crear-tabla', action='store_true', help="Crea la tabla de resumen si no existe.")
+    parser.add_argument('--reconstruir', action='store_true', help="Recalcula el resumen desde las ventas.")
+    parser.add_argument('--desde', help="Fecha inicial YYYY-MM-DD (inclusive).")
+    parser.add_argument('--hasta', help="Fecha final YYYY-MM-DD (inclusive).")
+    args = parser.parse_args(argv)
+
+    if not (args.crear_tabla or args.reconstruir):
+        parser.print_help()
+        return 1
+
+    if args.crear_tabla:
+        ok, mensaje = crear_tabla_resumen()
+        print(mensaje)
+        if not ok:
+            return 1
+    if args.reconstruir:
+        ok, mensaje = reconstruir_resumen(args.desde, args.hasta)
+        print(mensaje)
+        if not ok:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
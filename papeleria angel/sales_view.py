@@ -7,7 +7,15 @@ try:
 except ImportError:
     def obtener_todos_clientes(): return []
 
-from sales_controller import registrar_venta, obtener_productos_activos
+from sales_controller import obtener_productos_activos, obtener_producto_por_codigo
+from ventas_offline import registrar_venta_o_guardar, reenviar_pendientes, contar_pendientes
+from products_controller import buscar_productos
+from catalogo_cache import normalizar_sku
+from cargador_async import CargadorAsync
+from tabla_virtual import SincronizadorTreeview
+
+RESULTADOS_BUSQUEDA = 50
+REENVIO_CADA_MS = 30000  # Intento de reenvío de ventas hechas sin conexión
 
 class VentasView:
     ventana_abierta = False  # 🔹 Control de ventana única
@@ -30,17 +38,24 @@ class VentasView:
         # --- Datos ---
         self.productos_list = []
         self.producto_id_map = {}
+        self.producto_por_sku = {}    # código normalizado -> producto (lectora de códigos)
+        self.resultados = []          # productos mostrados en la lista de búsqueda
+        self.producto_actual = None
+        self._busqueda_programada = None
+        self._reenvio_programado = None   # id del after() del próximo reenvío de ventas sin conexión
         self.carrito = {}
         self.total_venta = tk.DoubleVar(value=0.00)
         self.registrando = False
-
-        self.cargar_productos()
-        self.clientes_list = self.cargar_clientes()
+        self.clientes_list = []
         self.cliente_seleccionado = tk.StringVar(value="Público General")
-        self.cliente_id_map = {f"{c.get('nombre', '')} {c.get('apellido', '')}".strip(): c['id'] for c in self.clientes_list}
-        self.cliente_id_map["Público General"] = None
+        self.cliente_id_map = {"Público General": None}
+        self.cargador = CargadorAsync(self.root)
 
+        # La ventana se muestra de inmediato; productos y clientes llegan en segundo plano
         self._setup_ui()
+        self.cargar_productos()
+        self.cargar_clientes()
+        self._reenviar_ventas()
 
     # -------------------- UI --------------------
     def _setup_ui(self):
@@ -55,6 +70,8 @@ class VentasView:
         top_bar = tk.Frame(self.root, bg="#2c3e50", height=60)
         top_bar.pack(fill="x")
         tk.Label(top_bar, text="💰 Punto de Venta", font=("Arial", 18, "bold"), fg="white", bg="#2c3e50").pack(side="left", padx=20, pady=10)
+        self.pendientes_label = tk.Label(top_bar, text="", font=("Arial", 10, "bold"), fg="#f1c40f", bg="#2c3e50")
+        self.pendientes_label.pack(side="left", padx=10)
         tk.Button(top_bar, text="🚪 Cerrar Sesión", command=self.confirmar_cierre, bg="#e74c3c", fg="white", font=("Arial", 10, "bold"), relief="flat", padx=10).pack(side="right", padx=20, pady=10)
 
         # Frames principales
@@ -67,9 +84,22 @@ class VentasView:
         right_frame = ttk.LabelFrame(main_frame, text="Carrito de Compras", padding="10")
         right_frame.pack(side="left", fill="both", expand=True, padx=10, pady=10)
 
-        # Combobox de productos
-        self.product_combobox = self._create_combobox(left_frame, "Producto:", 0, list(self.producto_id_map.keys()))
-        self.product_combobox.bind("<<ComboboxSelected>>", self.on_product_selected)
+        # Búsqueda de productos (nombre, categoría, descripción o proveedor)
+        ttk.Label(left_frame, text="Buscar producto:").grid(row=0, column=0, sticky="w", padx=5, pady=5)
+        self.busqueda_var = tk.StringVar()
+        self.search_entry = ttk.Entry(left_frame, textvariable=self.busqueda_var, width=30)
+        self.search_entry.grid(row=0, column=1, padx=5, pady=5)
+        self.search_entry.bind("<Return>", self._on_enter_busqueda)
+        self.search_entry.bind("<Down>", self._ir_a_resultados)
+        self.search_entry.bind("<Escape>", lambda e: self.busqueda_var.set(""))
+        self.busqueda_var.trace_add("write", self._on_busqueda)
+
+        self.results_listbox = tk.Listbox(left_frame, height=8, width=45, exportselection=False,
+                                          font=("Arial", 10))
+        self.results_listbox.grid(row=1, column=0, columnspan=2, padx=5, pady=(0, 10), sticky="ew")
+        self.results_listbox.bind("<<ListboxSelect>>", self.on_product_selected)
+        self.results_listbox.bind("<Return>", lambda e: self.add_to_cart())
+        self.results_listbox.bind("<Double-1>", lambda e: self.add_to_cart())
 
         self.stock_label = ttk.Label(left_frame, text="Stock Disponible: 0")
         self.stock_label.grid(row=2, column=0, columnspan=2, sticky="w", pady=(0, 10))
@@ -90,6 +120,17 @@ class VentasView:
         self.client_combobox['values'] = ["Público General"] + sorted(list(self.cliente_id_map.keys())[1:])
         self.client_combobox.grid(row=6, column=1, padx=5, pady=5, sticky="ew")
 
+        # Lectora de códigos: escribe el código y envía Enter; cada lectura agrega al carrito
+        scan_frame = tk.Frame(right_frame)
+        scan_frame.pack(fill="x", pady=(0, 8))
+        ttk.Label(scan_frame, text="📷 Código:").pack(side="left", padx=(0, 5))
+        self.codigo_var = tk.StringVar()
+        self.codigo_entry = ttk.Entry(scan_frame, textvariable=self.codigo_var, width=28)
+        self.codigo_entry.pack(side="left")
+        self.codigo_entry.bind("<Return>", self._on_codigo_escaneado)
+        self.codigo_info = ttk.Label(scan_frame, text="", foreground="#7f8c8d")
+        self.codigo_info.pack(side="left", padx=10)
+
         # Carrito Treeview
         columns = ("ID", "Producto", "Cantidad", "P. Unitario", "Subtotal")
         self.cart_tree = ttk.Treeview(right_frame, columns=columns, show="headings")
@@ -109,10 +150,18 @@ class VentasView:
         ttk.Button(bottom_frame, text="🗑️ Vaciar Carrito", command=self.clear_cart, style="Red.TButton").pack(side="right", padx=5)
 
         self.cart_tree.bind('<Delete>', self.remove_selected_from_cart)
+        self.carrito_sync = SincronizadorTreeview(
+            self.cart_tree, clave='producto_id',
+            formatear=lambda i: (i['producto_id'], i['nombre'], i['cantidad'],
+                                 f"${i['precio_unitario']:.2f}", f"${i['subtotal']:.2f}")
+        )
+        self.codigo_entry.focus_set()
 
     # -------------------- Métodos generales --------------------
     def volver_dashboard(self):
         VentasView.ventana_abierta = False
+        self._cancelar_reenvio()
+        self.cargador.cerrar()
         self.root.destroy()
         try:
             from dashboard_view import DashboardView
@@ -124,6 +173,8 @@ class VentasView:
     def confirmar_cierre(self):
         if messagebox.askyesno("❓ Cerrar sesión", f"¿Desea cerrar sesión como {self.usuario.get('nombre', 'Usuario')}?"):
             VentasView.ventana_abierta = False
+            self._cancelar_reenvio()
+            self.cargador.cerrar()
             self.root.destroy()
             try:
                 from login import LoginView
@@ -147,22 +198,241 @@ class VentasView:
         return entry
 
     def cargar_productos(self):
-        productos = obtener_productos_activos()
+        if not self.productos_list:
+            self._mostrar_resultados([], "⏳ Cargando productos...")
+        self.cargador.ejecutar("productos", obtener_productos_activos, al_terminar=self._mostrar_productos)
+
+    def _mostrar_productos(self, productos):
         self.productos_list = productos
-        self.producto_id_map = {p['nombre']: p for p in productos}
-        if hasattr(self, 'product_combobox'):
-            nombres = sorted(list(self.producto_id_map.keys()))
-            self.product_combobox['values'] = nombres
-            if nombres:
-                self.product_combobox.set(nombres[0])
-                self.on_product_selected()
-            else:
-                self.product_combobox.set("")
-                self.stock_label.config(text="Stock Disponible: 0")
-                self.precio_unitario.set(0.00)
+        self.producto_id_map = {p['id']: p for p in productos}
+        self.producto_por_sku = {normalizar_sku(p['sku']): p for p in productos if p.get('sku')}
+        if self.busqueda_var.get().strip():
+            self._buscar()
+        else:
+            self._mostrar_resultados(productos[:RESULTADOS_BUSQUEDA])
 
-    def cargar_clientes(self):
+    # -------------------- Búsqueda --------------------
+    def _on_busqueda(self, *args):
+        # Se espera a que el cajero deje de escribir; cada búsqueda reemplaza a la anterior
+        if self._busqueda_programada is not None:
+            self.root.after_cancel(self._busqueda_programada)
+        self._busqueda_programada = self.root.after(120, self._buscar)
+
+    def _buscar(self):
+        self._busqueda_programada = None
+        texto = self.busqueda_var.get().strip()
+        if not texto:
+            self.cargador.cancelar("busqueda")
+            self._mostrar_resultados(self.productos_list[:RESULTADOS_BUSQUEDA])
+            return
+        self.cargador.ejecutar("busqueda", buscar_productos, texto, RESULTADOS_BUSQUEDA, solo_con_stock=True,
+                               al_terminar=self._mostrar_resultados)
+
+    def _mostrar_resultados(self, productos, aviso=None):
+        self.resultados = productos
+        self.results_listbox.delete(0, tk.END)
+        if aviso:
+            self.results_listbox.insert(tk.END, aviso)
+            return
+        for p in productos:
+            self.results_listbox.insert(
+                tk.END, f"{p['nombre']}  ·  ${float(p['precio_venta']):.2f}  ·  stock {int(p['stock'])}"
+            )
+        if not productos and self.busqueda_var.get().strip():
+            self.results_listbox.insert(tk.END, "Sin coincidencias")
+        elif productos:
+            self.results_listbox.selection_set(0)
+            self.on_product_selected()
+
+    def _on_enter_busqueda(self, event=None):
+        if self._busqueda_programada is not None:
+            return "break"  # Aún no llegan los resultados de lo último escrito
+        if self.resultados:
+            self.add_to_cart()
+        return "break"
+
+    def _ir_a_resultados(self, event=None):
+        if self.resultados:
+            self.results_listbox.focus_set()
+            self.results_listbox.activate(self.results_listbox.curselection()[0] if self.results_listbox.curselection() else 0)
+        return "break"
+
+    # -------------------- Lectora de códigos --------------------
+    def _on_codigo_escaneado(self, event=None):
+        codigo = normalizar_sku(self.codigo_var.get())
+        self.codigo_var.set("")
+        if not codigo:
+            return "break"
+        # Caso normal: el código está entre los productos cargados, sin consultar nada
+        producto = self.producto_por_sku.get(codigo)
+        if producto is not None:
+            self._codigo_resuelto(codigo, producto)
+        else:
+            # Producto sin stock al abrir la caja o dado de alta después: se pregunta al catálogo
+            self.cargador.ejecutar(f"codigo:{codigo}", obtener_producto_por_codigo, codigo,
+                                   al_terminar=lambda p: self._codigo_resuelto(codigo, p))
+        return "break"
+
+    def _codigo_resuelto(self, codigo, producto):
+        if producto is None:
+            self.root.bell()
+            self.codigo_info.config(text=f"❌ Código {codigo} no registrado", foreground="#e74c3c")
+            return
+        if self._agregar_al_carrito(producto):
+            self.codigo_info.config(text=f"✅ {producto['nombre']}", foreground="#27ae60")
+        self.codigo_entry.focus_set()
+
+    # -------------------- Carrito --------------------
+    def _en_carrito(self, producto_id):
+        item = self.carrito.get(producto_id)
+        return item['cantidad'] if item else 0
+
+    def on_product_selected(self, event=None):
+        seleccion = self.results_listbox.curselection()
+        if not seleccion or seleccion[0] >= len(self.resultados):
+            return
+        producto = self.resultados[seleccion[0]]
+        self.producto_actual = producto
+        disponible = int(producto['stock']) - self._en_carrito(producto['id'])
+        self.stock_label.config(text=f"Stock Disponible: {disponible}")
+        self.precio_unitario.set(round(float(producto['precio_venta']), 2))
+
+    def add_to_cart(self):
+        producto = self.producto_actual
+        if producto is None:
+            messagebox.showwarning("⚠️ Producto", "Busque y seleccione un producto.", parent=self.root)
+            return
+        if self._agregar_al_carrito(producto):
+            self.busqueda_var.set("")
+            self.search_entry.focus_set()
+
+    def _agregar_al_carrito(self, producto):
+        """Suma la cantidad indicada del producto al carrito; False si no se pudo."""
         try:
-            return obtener_todos_clientes()
-        except Exception:
-            return []
+            cantidad = int(self.cantidad_entry_var.get())
+        except ValueError:
+            cantidad = 0
+        if cantidad <= 0:
+            messagebox.showwarning("⚠️ Cantidad", "La cantidad debe ser un número entero mayor a 0.", parent=self.root)
+            return False
+
+        disponible = int(producto['stock']) - self._en_carrito(producto['id'])
+        if cantidad > disponible:
+            messagebox.showwarning("⚠️ Stock insuficiente",
+                                   f"Solo hay {disponible} unidades disponibles de {producto['nombre']}.",
+                                   parent=self.root)
+            return False
+
+        precio = round(float(producto['precio_venta']), 2)
+        item = self.carrito.setdefault(producto['id'], {
+            'producto_id': producto['id'], 'nombre': producto['nombre'],
+            'cantidad': 0, 'precio_unitario': precio, 'subtotal': 0.0,
+        })
+        item['cantidad'] += cantidad
+        item['subtotal'] = round(item['cantidad'] * precio, 2)
+
+        self._refrescar_carrito()
+        self.cantidad_entry_var.set("1")
+        return True
+
+    def remove_selected_from_cart(self, event=None):
+        for iid in self.cart_tree.selection():
+            self.carrito.pop(int(iid), None)
+        self._refrescar_carrito()
+
+    def clear_cart(self):
+        self.carrito.clear()
+        self._refrescar_carrito()
+
+    def _refrescar_carrito(self):
+        self.carrito_sync.aplicar(list(self.carrito.values()))
+        self.total_venta.set(round(sum(i['subtotal'] for i in self.carrito.values()), 2))
+        self.on_product_selected()
+
+    def registrar_venta_action(self):
+        if self.registrando:
+            return
+        if not self.carrito:
+            messagebox.showwarning("⚠️ Carrito vacío", "Agregue productos antes de registrar la venta.", parent=self.root)
+            return
+
+        cliente_id = self.cliente_id_map.get(self.cliente_seleccionado.get())
+        items = [dict(i) for i in self.carrito.values()]
+        self.registrando = True
+        self.registrar_btn.config(state="disabled")
+        # La venta se registra en segundo plano: la caja no se congela si la base tarda.
+        # Sin conexión queda en el diario local de la caja (ventas_offline)
+        self.cargador.ejecutar("venta", registrar_venta_o_guardar, self.usuario.get('id'), items, cliente_id,
+                               al_terminar=self._venta_registrada,
+                               al_fallar=lambda e: self._venta_registrada((False, f"❌ Error al registrar la venta:\n{e}")))
+
+    def _venta_registrada(self, resultado):
+        self.registrando = False
+        self.registrar_btn.config(state="normal")
+        exito, mensaje = resultado
+        if exito:
+            messagebox.showinfo("✅ Venta registrada", mensaje, parent=self.root)
+            self.clear_cart()
+            self.cliente_seleccionado.set("Público General")
+            self.cargar_productos()
+            self._mostrar_pendientes()
+        else:
+            messagebox.showerror("❌ Error", mensaje, parent=self.root)
+
+    # -------------------- Ventas sin conexión --------------------
+    def _mostrar_pendientes(self, pendientes=None):
+        if pendientes is None:
+            try:
+                pendientes = contar_pendientes()
+            except Exception:
+                pendientes = 0
+        self.pendientes_label.config(text=f"📴 {pendientes} venta(s) por enviar" if pendientes else "")
+
+    def _reenviar_ventas(self):
+        self._reenvio_programado = None
+        if self.cargador.cerrado:
+            return
+        if not self.cargador.ocupado("reenvio"):
+            self.cargador.ejecutar("reenvio", reenviar_pendientes, al_terminar=self._reenvio_terminado,
+                                   al_fallar=lambda e: self._programar_reenvio())
+
+    def _programar_reenvio(self):
+        # Con la ventana cerrada no se vuelve a programar (cada apertura inicia su propio ciclo)
+        if self.cargador.cerrado or self._reenvio_programado is not None:
+            return
+        try:
+            self._reenvio_programado = self.root.after(REENVIO_CADA_MS, self._reenviar_ventas)
+        except tk.TclError:
+            pass
+
+    def _cancelar_reenvio(self):
+        if self._reenvio_programado is not None:
+            try:
+                self.root.after_cancel(self._reenvio_programado)
+            except tk.TclError:
+                pass
+            self._reenvio_programado = None
+
+    def _reenvio_terminado(self, resumen):
+        self._mostrar_pendientes(resumen['pendientes'])
+        if resumen['conflictos']:
+            detalle = "\n".join(f"• {v['fecha_venta']}: {v['mensaje']}" for v in resumen['conflictos'][:10])
+            messagebox.showwarning(
+                "⚠️ Ventas sin conexión con conflictos",
+                f"{len(resumen['conflictos'])} venta(s) hechas sin conexión no se pudieron registrar "
+                f"y quedaron para revisión:\n\n{detalle}",
+                parent=self.root
+            )
+        if resumen['registradas']:
+            self.cargar_productos()
+        self._programar_reenvio()
+
+    def cargar_clientes(self):
+        self.cargador.ejecutar("clientes", obtener_todos_clientes,
+                               al_terminar=self._mostrar_clientes, al_fallar=lambda e: self._mostrar_clientes([]))
+
+    def _mostrar_clientes(self, clientes):
+        self.clientes_list = clientes
+        self.cliente_id_map = {f"{c.get('nombre', '')} {c.get('apellido', '')}".strip(): c['id'] for c in clientes}
+        self.cliente_id_map["Público General"] = None
+        self.client_combobox['values'] = ["Público General"] + sorted(k for k in self.cliente_id_map if k != "Público General")
@@ -0,0 +1,310 @@
+# servicio_http.py
+"""
+Servicio HTTP/JSON que atiende a todas las cajas desde un solo proceso.
+
+Publica las funciones de los controladores listadas en protocolo_servicio
+(catálogo, ventas, historial, pedidos, clientes, proveedores, usuarios). Las
+cajas ya no necesitan credenciales de la base: se conectan con SERVICIO_URL
+(ver cliente_servicio) y este proceso concentra el pool de conexiones, la
+caché del catálogo y las demás cachés.
+
+    python servicio_http.py --host 0.0.0.0 --puerto 8765
+
+    GET  /api/<lectura>?args=[...]&kwargs={...}   respuesta con ETag; If-None-Match -> 304
+    POST /api/<función>  {"args": [...], "kwargs": {...}}
+    GET  /salud                                   estado del servicio y del pool
+
+Las respuestas de las lecturas se guardan en memoria hasta que una escritura
+hecha por el servicio toca sus tablas, o como mucho SERVICIO_CACHE_SEGUNDOS
+(5 por defecto; cubre cambios hechos directamente en la base).
+
+Configuración: SERVICIO_HOST (127.0.0.1), SERVICIO_PUERTO (8765),
+SERVICIO_TOKEN (si se define, cada solicitud debe traerlo en el encabezado
+X-Papeleria-Token) y SERVICIO_SOLICITUDES_POR_S (límite por dirección IP,
+0 = sin límite).
+"""
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+import argparse
+import hashlib
+import hmac
+import importlib
+import inspect
+import logging
+import os
+import threading
+import time
+
+import database
+from protocolo_servicio import (LECTURAS, ESCRITURAS, FUNCIONES, PREFIJO_API, ENCABEZADO_TOKEN,
+                                codificar, decodificar)
+
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger(__name__)
+
+_MAX_CUERPO = 1024 * 1024
+
+
+def _env_float(nombre, defecto):
+    try:
+        return float(os.getenv(nombre, defecto))
+    except ValueError:
+        return defecto
+
+
+class CacheRespuestas:
+    """
+    Respuestas de lecturas ya codificadas, por función y argumentos.
+
+    Args:
+        segundos (float): Vigencia máxima de una respuesta.
+        max_entradas (int): Al superarse se descartan las menos usadas.
+    """
+
+    def __init__(self, segundos=5.0, max_entradas=512):
+        self.segundos = segundos
+        self.max_entradas = max_entradas
+        self._entradas = OrderedDict()   # clave -> (momento, etag, cuerpo, tablas)
+        self._lock = threading.Lock()
+
+    def obtener(self, clave):
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                return None
+            if time.monotonic() - entrada[0] > self.segundos:
+                del self._entradas[clave]
+                return None
+            self._entradas.move_to_end(clave)
+            return entrada[1], entrada[2]
+
+    def guardar(self, clave, etag, cuerpo, tablas):
+        if self.segundos <= 0:
+            return
+        with self._lock:
+            self._entradas[clave] = (time.monotonic(), etag, cuerpo, frozenset(tablas))
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def invalidar(self, tablas):
+        """Descarta las respuestas que dependen de alguna de las tablas."""
+        tablas = set(tablas)
+        if not tablas:
+            return
+        with self._lock:
+            for clave in [c for c, e in self._entradas.items() if e[3] & tablas]:
+                del self._entradas[clave]
+
+
+class LimitadorSolicitudes:
+    """Cubeta de fichas por dirección IP: por_segundo sostenidas, ráfagas de hasta 2x."""
+
+    def __init__(self, por_segundo):
+        self.por_segundo = por_segundo
+        self.capacidad = max(1.0, por_segundo * 2)
+        self._cubetas = {}   # ip -> (fichas, momento)
+        self._lock = threading.Lock()
+
+    def permitir(self, ip):
+        if self.por_segundo <= 0:
+            return True
+        ahora = time.monotonic()
+        with self._lock:
+            fichas, momento = self._cubetas.get(ip, (self.capacidad, ahora))
+            fichas = min(self.capacidad, fichas + (ahora - momento) * self.por_segundo)
+            if fichas < 1:
+                self._cubetas[ip] = (fichas, ahora)
+                return False
+            self._cubetas[ip] = (fichas - 1, ahora)
+            return True
+
+
+def _etag(cuerpo):
+    return '"' + hashlib.sha1(cuerpo).hexdigest()[:20] + '"'
+
+
+def _resolver_funciones():
+    """{nombre: función del controlador} de todo lo publicado."""
+    funciones = {}
+    for nombre, (modulo, _) in FUNCIONES.items():
+        funcion = getattr(importlib.import_module(modulo), nombre)
+        # Si en este proceso se instaló el cliente, se usa la función original
+        funciones[nombre] = funcion.__wrapped__ if getattr(funcion, 'remota', False) else funcion
+    return funciones
+
+
+class ManejadorServicio(BaseHTTPRequestHandler):
+    """Atiende /api/<función> y /salud; el servidor aporta funciones, caché, limitador y token."""
+
+    protocol_version = "HTTP/1.1"   # conexiones persistentes: las cajas no reconectan en cada llamada
+    server_version = "PapeleriaAngel/1.0"
+
+    # -------------------- Respuestas --------------------
+    def _responder(self, estado, cuerpo=b"", encabezados=()):
+        self.send_response(estado)
+        if cuerpo or estado != 304:
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        for nombre, valor in encabezados:
+            self.send_header(nombre, valor)
+        self.end_headers()
+        if cuerpo and self.command != "HEAD":
+            self.wfile.write(cuerpo)
+
+    def _error(self, estado, mensaje, errno=None, encabezados=()):
+        self._responder(estado, codificar({'error': mensaje, 'errno': errno}), encabezados)
+
+    def log_message(self, formato, *args):
+        logger.info("%s - %s", self.address_string(), formato % args)
+
+    # -------------------- Validación --------------------
+    def _autorizado(self):
+        token = self.server.token
+        if not token:
+            return True
+        recibido = self.headers.get(ENCABEZADO_TOKEN, "")
+        return hmac.compare_digest(recibido.encode("utf-8"), token.encode("utf-8"))
+
+    def _admitir(self):
+        """Token y límite de solicitudes; responde el error y devuelve False si no pasa."""
+        if not self._autorizado():
+            self._error(401, "Token del servicio inválido o ausente.")
+            return False
+        if not self.server.limitador.permitir(self.client_address[0]):
+            self._error(429, "Demasiadas solicitudes; intente de nuevo en un momento.",
+                        encabezados=[("Retry-After", "1")])
+            return False
+        return True
+
+    def _nombre_funcion(self, ruta):
+        if not ruta.startswith(PREFIJO_API):
+            return None
+        nombre = ruta[len(PREFIJO_API):]
+        return nombre if nombre in FUNCIONES else None
+
+    # -------------------- Ejecución --------------------
+    def _llamar(self, nombre, args, kwargs):
+        """(estado, cuerpo) de llamar a la función del controlador."""
+        funcion = self.server.funciones[nombre]
+        try:
+            inspect.signature(funcion).bind(*args, **kwargs)
+        except TypeError as e:
+            return 400, codificar({'error': f"Argumentos inválidos para {nombre}: {e}", 'errno': None})
+        try:
+            resultado = funcion(*args, **kwargs)
+        except database.Error as e:
+            logger.exception(f"Error de base de datos en {nombre}")
+            estado = 503 if isinstance(e, database.SinConexion) else 500
+            return estado, codificar({'error': str(e), 'errno': getattr(e, 'errno', None)})
+        except Exception as e:
+            logger.exception(f"Error inesperado en {nombre}")
+            return 500, codificar({'error': f"Error inesperado: {e}", 'errno': None})
+        return 200, codificar(resultado)
+
+    def do_GET(self):
+        partes = urlsplit(self.path)
+        if partes.path == "/salud":
+            self._responder(200, codificar({'ok': True, 'pool': database.obtener_pool().estadisticas()}))
+            return
+        if not self._admitir():
+            return
+        nombre = self._nombre_funcion(partes.path)
+        if nombre is None:
+            self._error(404, f"No existe {partes.path}")
+            return
+        if nombre not in LECTURAS:
+            self._error(405, f"{nombre} modifica datos: use POST.", encabezados=[("Allow", "POST")])
+            return
+
+        consulta = parse_qs(partes.query)
+        try:
+            args = decodificar(consulta.get('args', ['[]'])[0])
+            kwargs = decodificar(consulta.get('kwargs', ['{}'])[0])
+        except ValueError:
+            self._error(400, "Parámetros args/kwargs con JSON inválido.")
+            return
+
+        clave = (nombre, partes.query)
+        guardada = self.server.cache.obtener(clave)
+        if guardada is None:
+            estado, cuerpo = self._llamar(nombre, args, kwargs)
+            if estado != 200:
+                self._responder(estado, cuerpo)
+                return
+            etag = _etag(cuerpo)
+            self.server.cache.guardar(clave, etag, cuerpo, LECTURAS[nombre][1])
+        else:
+            etag, cuerpo = guardada
+
+        encabezados = [("ETag", etag), ("Cache-Control", "no-cache")]
+        if etag in (e.strip() for e in self.headers.get("If-None-Match", "").split(",")):
+            self._responder(304, encabezados=encabezados)
+        else:
+            self._responder(200, cuerpo, encabezados)
+
+    def do_POST(self):
+        if not self._admitir():
+            return
+        nombre = self._nombre_funcion(urlsplit(self.path).path)
+        if nombre is None:
+            self._error(404, f"No existe {self.path}")
+            return
+        try:
+            largo = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            largo = -1
+        if largo < 0 or largo > _MAX_CUERPO:
+            self._error(413, "Cuerpo de la solicitud ausente o demasiado grande.")
+            return
+        try:
+            solicitud = decodificar(self.rfile.read(largo) or b"{}")
+            args, kwargs = solicitud.get('args', []), solicitud.get('kwargs', {})
+        except (ValueError, AttributeError):
+            self._error(400, "Cuerpo JSON inválido.")
+            return
+
+        estado, cuerpo = self._llamar(nombre, args, kwargs)
+        if nombre in ESCRITURAS:
+            # Se invalida aunque la escritura haya fallado: pudo confirmarse antes del error
+            self.server.cache.invalidar(ESCRITURAS[nombre][1])
+        self._responder(estado, cuerpo)
+
+
+def crear_servidor(host=None, puerto=None, token=None):
+    """ThreadingHTTPServer listo para serve_forever(); un hilo por conexión de caja."""
+    host = host or os.getenv('SERVICIO_HOST', '127.0.0.1')
+    puerto = int(puerto or os.getenv('SERVICIO_PUERTO', 8765))
+    servidor = ThreadingHTTPServer((host, puerto), ManejadorServicio)
+    servidor.daemon_threads = True
+    servidor.funciones = _resolver_funciones()
+    servidor.token = token if token is not None else os.getenv('SERVICIO_TOKEN')
+    servidor.cache = CacheRespuestas(segundos=_env_float('SERVICIO_CACHE_SEGUNDOS', 5.0))
+    servidor.limitador = LimitadorSolicitudes(_env_float('SERVICIO_SOLICITUDES_POR_S', 0))
+    return servidor
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', help="Dirección donde escuchar (SERVICIO_HOST, 127.0.0.1).")
+    parser.add_argument('--puerto', type=int, help="Puerto (SERVICIO_PUERTO, 8765).")
+    args = parser.parse_args(argv)
+
+    servidor = crear_servidor(args.host, args.puerto)
+    host, puerto = servidor.server_address[:2]
+    if not servidor.token and host not in ('127.0.0.1', 'localhost'):
+        logger.warning("El servicio escucha en la red sin SERVICIO_TOKEN: cualquier equipo puede usarlo.")
+    print(f"✅ Servicio escuchando en http://{host}:{puerto}{PREFIJO_API}")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        database.cerrar_pool()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,42 +1,51 @@
 # suppliers_controller.py - VERSIÓN PERFECTA
-import mysql.connector
-from database import conectar
+from database import transaccion, al_confirmar, SinConexion, Error
+from catalogo_cache import obtener_catalogo
+from versiones_tablas import incrementar_version, consultar_si_cambio, CacheVersionada
 import logging
 
 # Configuración básica de logging
 logging.basicConfig(level=logging.ERROR)
 logger = logging.getLogger(__name__)
 
+_SQL_PROVEEDORES = "SELECT * FROM proveedores ORDER BY nombre_empresa ASC"
 
-def obtener_todos_proveedores():
+
+def obtener_todos_proveedores_si_cambio(version_conocida=None):
     """
-    Obtiene todos los proveedores de la base de datos.
+    Lectura condicional de los proveedores (ver versiones_tablas).
+
+    Args:
+        version_conocida (int, optional): Versión de la copia que ya tiene quien llama.
 
     Returns:
-        list: Lista de diccionarios con la información de los proveedores.
+        (int|None, list|None): (versión, proveedores), o (versión, None) si la copia sigue vigente.
     """
-    conn = None
-    cursor = None
     try:
-        conn = conectar()
-        if not conn:
-            logger.error("No se pudo conectar a la base de datos.")
-            return []
-            
-        cursor = conn.cursor(dictionary=True)
-        query = "SELECT * FROM proveedores ORDER BY nombre_empresa ASC"
-        cursor.execute(query)
-        proveedores = cursor.fetchall()
-        return proveedores
-        
+        with transaccion(dictionary=True) as cursor:
+            return consultar_si_cambio(cursor, "proveedores", version_conocida, _SQL_PROVEEDORES)
+
+    except SinConexion:
+        logger.error("No se pudo conectar a la base de datos.")
+        return None, []
     except Exception as e:
         logger.exception("Error al obtener proveedores")
-        return []
-    finally:
-        if cursor:
-            cursor.close()
-        if conn and conn.is_connected():
-            conn.close()
+        return None, []
+
+
+_cache_proveedores = CacheVersionada(obtener_todos_proveedores_si_cambio)
+
+
+def obtener_todos_proveedores():
+    """
+    Obtiene todos los proveedores de la base de datos.
+
+    Si no cambiaron desde la última lectura de este proceso solo se consulta su versión.
+
+    Returns:
+        list: Lista de diccionarios con la información de los proveedores.
+    """
+    return _cache_proveedores.obtener()
 
 
 def agregar_proveedor(nombre_empresa, contacto, telefono, correo):
@@ -46,36 +55,27 @@ def agregar_proveedor(nombre_empresa, contacto, telefono, correo):
     Returns:
         (bool, str): (éxito, mensaje)
     """
-    conn = None
-    cursor = None
     try:
-        conn = conectar()
-        if not conn:
-            return False, "❌ Error de conexión a la base de datos."
-            
-        cursor = conn.cursor()
-        query = """
-        INSERT INTO proveedores (nombre_empresa, contacto, telefono, correo) 
-        VALUES (%s, %s, %s, %s)
-        """
-        cursor.execute(query, (nombre_empresa, contacto, telefono, correo))
-        conn.commit()
+        with transaccion() as cursor:
+            query = """
+            INSERT INTO proveedores (nombre_empresa, contacto, telefono, correo) 
+            VALUES (%s, %s, %s, %s)
+            """
+            cursor.execute(query, (nombre_empresa, contacto, telefono, correo))
+            incrementar_version(cursor, "proveedores")
         return True, "✅ Proveedor agregado exitosamente."
         
-    except mysql.connector.Error as e:
-        if conn: conn.rollback()
+    except SinConexion:
+        return False, "❌ Error de conexión a la base de datos."
+    except Error as e:
         logger.exception("Error al agregar proveedor")
         # Capturar error de duplicidad, si aplica
         if e.errno == 1062: # Código de error de duplicidad en MySQL
             return False, "❌ Error: Ya existe un proveedor con esa información (nombre/correo)."
         return False, f"❌ Error de base de datos al agregar: {str(e)}"
     except Exception as e:
-        if conn: conn.rollback()
         logger.exception("Error desconocido al agregar proveedor")
         return False, f"❌ Error inesperado: {str(e)}"
-    finally:
-        if cursor: cursor.close()
-        if conn and conn.is_connected(): conn.close()
 
 
 def actualizar_proveedor(id_proveedor, nombre_empresa, contacto, telefono, correo):
@@ -85,40 +85,32 @@ def actualizar_proveedor(id_proveedor, nombre_empresa, contacto, telefono, corre
     Returns:
         (bool, str): (éxito, mensaje)
     """
-    conn = None
-    cursor = None
     try:
-        conn = conectar()
-        if not conn:
-            return False, "❌ Error de conexión a la base de datos."
+        with transaccion() as cursor:
+            query = """
+            UPDATE proveedores 
+            SET nombre_empresa = %s, contacto = %s, telefono = %s, correo = %s 
+            WHERE id = %s
+            """
+            cursor.execute(query, (nombre_empresa, contacto, telefono, correo, id_proveedor))
             
-        cursor = conn.cursor()
-        query = """
-        UPDATE proveedores 
-        SET nombre_empresa = %s, contacto = %s, telefono = %s, correo = %s 
-        WHERE id = %s
-        """
-        cursor.execute(query, (nombre_empresa, contacto, telefono, correo, id_proveedor))
-        
-        if cursor.rowcount == 0:
-            # No se actualizó ninguna fila (ID no encontrado o datos idénticos)
-            conn.rollback() 
-            return False, "❌ No se encontró el proveedor para actualizar o no hubo cambios."
-        
-        conn.commit()
+            if cursor.rowcount == 0:
+                # No se actualizó ninguna fila (ID no encontrado o datos idénticos)
+                cursor.revertir()
+                return False, "❌ No se encontró el proveedor para actualizar o no hubo cambios."
+            
+            incrementar_version(cursor, "proveedores")
+            al_confirmar(obtener_catalogo().renombrar_proveedor, id_proveedor, nombre_empresa)
         return True, "✅ Proveedor actualizado exitosamente."
         
-    except mysql.connector.Error as e:
-        if conn: conn.rollback()
+    except SinConexion:
+        return False, "❌ Error de conexión a la base de datos."
+    except Error as e:
         logger.exception("Error al actualizar proveedor")
         return False, f"❌ Error de base de datos al actualizar: {str(e)}"
     except Exception as e:
-        if conn: conn.rollback()
         logger.exception("Error desconocido al actualizar proveedor")
         return False, f"❌ Error inesperado: {str(e)}"
-    finally:
-        if cursor: cursor.close()
-        if conn and conn.is_connected(): conn.close()
 
 
 def eliminar_proveedor(id_proveedor):
@@ -128,42 +120,28 @@ def eliminar_proveedor(id_proveedor):
     Returns:
         (bool, str): (éxito, mensaje)
     """
-    conn = None
-    cursor = None
     try:
-        conn = conectar()
-        if not conn:
-            return False, "❌ Error de conexión a la base de datos."
+        with transaccion(dictionary=True) as cursor: # dictionary=True para la verificación de productos
+            # 1. Verificar si hay productos asociados
+            cursor.execute("SELECT COUNT(*) AS total FROM productos WHERE proveedor_id = %s AND activo = 1", (id_proveedor,))
+            resultado = cursor.fetchone()
             
-        cursor = conn.cursor(dictionary=True) # Usamos dictionary=True para la verificación de productos
-        
-        # 1. Verificar si hay productos asociados
-        cursor.execute("SELECT COUNT(*) AS total FROM productos WHERE proveedor_id = %s AND activo = 1", (id_proveedor,))
-        resultado = cursor.fetchone()
-        
-        if resultado and resultado.get('total', 0) > 0:
-            conn.rollback()
-            return False, f"❌ No se puede eliminar: hay {resultado['total']} productos activos asociados a este proveedor."
-
-        # 2. Eliminar el proveedor
-        # Se requiere un nuevo cursor si el anterior era dictionary=True (depende de la implementación de conectar)
-        # Para mayor seguridad y compatibilidad, cierro el anterior y abro uno simple
-        cursor.close() 
-        cursor = conn.cursor()
-        
-        cursor.execute("DELETE FROM proveedores WHERE id = %s", (id_proveedor,))
-        
-        if cursor.rowcount == 0:
-            conn.rollback()
-            return False, "❌ Proveedor no encontrado."
+            if resultado and resultado.get('total', 0) > 0:
+                cursor.revertir()
+                return False, f"❌ No se puede eliminar: hay {resultado['total']} productos activos asociados a este proveedor."
+
+            # 2. Eliminar el proveedor (el conteo y el borrado van en la misma transacción)
+            cursor.execute("DELETE FROM proveedores WHERE id = %s", (id_proveedor,))
             
-        conn.commit()
+            if cursor.rowcount == 0:
+                cursor.revertir()
+                return False, "❌ Proveedor no encontrado."
+            incrementar_version(cursor, "proveedores")
+                
         return True, "✅ Proveedor eliminado exitosamente."
         
+    except SinConexion:
+        return False, "❌ Error de conexión a la base de datos."
     except Exception as e:
-        if conn: conn.rollback()
         logger.exception("Error al eliminar proveedor")
-        return False, f"❌ Error al eliminar proveedor: {str(e)}"
-    finally:
-        if cursor: cursor.close()
-        if conn and conn.is_connected(): conn.close()
\ No newline at end of file
+        return False, f"❌ Error al eliminar proveedor: {str(e)}"
\ No newline at end of file
@@ -4,6 +4,8 @@ from tkinter import ttk, messagebox, filedialog
 from suppliers_controller import obtener_todos_proveedores, agregar_proveedor, actualizar_proveedor, eliminar_proveedor
 # Importamos utilidades de exportación (asumiendo que las tienes)
 from export_controller import exportar_a_csv, generar_ruta_csv 
+from cargador_async import CargadorAsync, IndicadorCarga
+from tabla_virtual import SincronizadorTreeview
 
 
 class ProveedoresView:
@@ -13,6 +15,7 @@ class ProveedoresView:
         self.root.title("🏭 Gestión de Proveedores - Papelería Ángel")
         self.root.geometry("1000x650")
         self.root.configure(bg="#f5f7fa")
+        self.cargador = CargadorAsync(self.root)
         
         # Configuración de estilos
         style = ttk.Style()
@@ -68,6 +71,12 @@ class ProveedoresView:
             self.proveedores_tree.heading(col, text=col)
             self.proveedores_tree.column(col, width=width, anchor=tk.CENTER)
 
+        self.indicador_carga = IndicadorCarga(self.proveedores_tree)
+        # Al recargar tras agregar/editar/eliminar solo se tocan las filas que cambiaron
+        self.sincronizador = SincronizadorTreeview(
+            self.proveedores_tree, clave='id',
+            formatear=lambda p: (p['id'], p['nombre_empresa'], p['contacto'], p['telefono'], p['correo'])
+        )
         self.cargar_proveedores()
         
         # Enlazar doble clic para editar
@@ -88,23 +97,19 @@ class ProveedoresView:
 
 
     def cargar_proveedores(self):
-        """Carga y muestra los proveedores en el Treeview."""
-        for item in self.proveedores_tree.get_children():
-            self.proveedores_tree.delete(item)
+        """Pide los proveedores en segundo plano; la ventana sigue respondiendo mientras llegan."""
+        self.indicador_carga.mostrar()
+        self.cargador.ejecutar("proveedores", obtener_todos_proveedores,
+                               al_terminar=self._mostrar_proveedores, al_fallar=self._error_proveedores)
 
-        proveedores = obtener_todos_proveedores()
-        if proveedores:
-            for p in proveedores:
-                self.proveedores_tree.insert("", "end", values=(
-                    p['id'],
-                    p['nombre_empresa'],
-                    p['contacto'],
-                    p['telefono'],
-                    p['correo']
-                ))
-        else:
-            # Opción: Mostrar un mensaje en la tabla si no hay datos
-            pass
+    def _error_proveedores(self, error):
+        self.indicador_carga.ocultar()
+        messagebox.showerror("❌ Error de Carga", f"No se pudieron cargar los proveedores:\n{error}", parent=self.root)
+
+    def _mostrar_proveedores(self, proveedores):
+        """Muestra los proveedores en el Treeview."""
+        self.indicador_carga.ocultar()
+        self.sincronizador.aplicar(proveedores or [])
 
     def _validate_fields(self, window, nombre, contacto, telefono, correo):
         """Valida que los campos no estén vacíos y tengan un formato básico."""
@@ -301,6 +306,7 @@ class ProveedoresView:
         except:
             # En caso de que se haya abierto directamente sin Dashboard
             pass
+        self.cargador.cerrar()
         self.root.destroy() 
 
 
@@ -0,0 +1,510 @@
+# tabla_virtual.py
+"""
+Tabla virtual para listados grandes (productos, historial, clientes, pedidos).
+
+Un ttk.Treeview normal guarda un ítem de Tk por fila: borrar e insertar 100 mil
+filas congela la ventana varios segundos. TablaVirtual mantiene solo tantos
+ítems como filas caben en pantalla ("ranuras") y al desplazarse reescribe sus
+valores con la ventana visible de la fuente de filas. Las filas se formatean
+solo cuando se muestran, y una fuente paginada pide más datos al acercarse al final
+(en segundo plano si la tabla recibe un CargadorAsync).
+
+Para los Treeview comunes (listas cortas como proveedores o usuarios),
+SincronizadorTreeview aplica una lista nueva comparándola por clave primaria con
+lo que ya se muestra: solo inserta, actualiza, mueve o borra las filas que
+cambiaron, así la selección y el desplazamiento se conservan.
+"""
+from bisect import bisect_left
+import tkinter as tk
+from tkinter import ttk
+
+
+# ============================================================
+# FUENTES DE FILAS
+# ============================================================
+
+class FuenteLista:
+    """Filas ya cargadas en memoria (lista de dicts o tuplas)."""
+
+    def __init__(self, filas=None):
+        self.filas = list(filas or [])
+
+    def __len__(self):
+        return len(self.filas)
+
+    def fila(self, indice):
+        return self.filas[indice]
+
+    def hay_mas(self):
+        return False
+
+
+class FuentePaginada(FuenteLista):
+    """
+    Filas que llegan por páginas (p. ej. paginación por cursor del historial).
+
+    La primera página se pide cuando la fuente se asigna a una tabla.
+
+    Args:
+        cargar_pagina (callable): Recibe el token de continuación (None para la
+            primera página) y devuelve (filas, token_siguiente). token_siguiente
+            None indica que no hay más páginas. Puede ejecutarse en otro hilo,
+            así que no debe tocar widgets; ante un error debe lanzar una excepción.
+    """
+
+    def __init__(self, cargar_pagina):
+        super().__init__()
+        self.cargar_pagina = cargar_pagina
+        self.token_siguiente = None
+        self._agotada = False
+
+    def hay_mas(self):
+        return not self._agotada
+
+    def agregar_pagina(self, filas, token_siguiente):
+        """Agrega una página ya leída (en el hilo de Tk)."""
+        self.filas.extend(filas)
+        self.token_siguiente = token_siguiente
+        if not token_siguiente:
+            self._agotada = True
+        return len(filas)
+
+    def detener(self):
+        """No pedir más páginas (p. ej. tras un error)."""
+        self._agotada = True
+
+
+# ============================================================
+# WIDGET
+# ============================================================
+
+class TablaVirtual(tk.Frame):
+    """
+    Treeview con barra de desplazamiento propia que solo materializa las filas visibles.
+
+    Args:
+        master: Contenedor.
+        columnas (sequence): Identificadores de columna (también usados como encabezado).
+        anchos (dict, optional): {columna: ancho}.
+        formatear (callable, optional): fila -> tupla de valores a mostrar. Sin él,
+            las filas se muestran tal cual (deben ser tuplas).
+        etiquetas (callable, optional): fila -> tupla de tags del Treeview.
+        texto_vacio (str, optional): Texto mostrado cuando no hay filas.
+        ancla (str): Alineación por defecto de las columnas.
+        precarga (int): Filas restantes bajo la ventana visible a partir de las cuales
+            se pide la siguiente página a una fuente paginada.
+        cargador (CargadorAsync, optional): Si se indica, las páginas se piden en
+            segundo plano sin bloquear la ventana.
+
+    Eventos virtuales: <<FilasCargadas>> tras agregar una página y <<ErrorCarga>>
+    si falló (la excepción queda en ``ultimo_error``).
+    """
+
+    def __init__(self, master, columnas, anchos=None, formatear=None, etiquetas=None,
+                 texto_vacio=None, ancla="center", precarga=100, cargador=None, **kwargs):
+        super().__init__(master, **kwargs)
+        self.columnas = tuple(columnas)
+        self.formatear = formatear or tuple
+        self.etiquetas = etiquetas
+        self.texto_vacio = texto_vacio
+        self.precarga = precarga
+        self.cargador = cargador
+        self.ultimo_error = None
+
+        self.fuente = FuenteLista()
+        self._inicio = 0            # índice de la primera fila visible
+        self._ranuras = []          # iids de los ítems reutilizados
+        self._seleccionado = None   # índice (en la fuente) de la fila seleccionada
+        self._mostrado = {}         # iid -> (valores, tags) escritos en la ranura
+        self._cargando = False
+        self._mensaje = None        # texto temporal mientras la tabla está vacía
+
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self._on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+        self.tree = ttk.Treeview(self, columns=self.columnas, show="headings", selectmode="browse")
+        self.tree.pack(side="left", fill="both", expand=True)
+
+        anchos = anchos or {}
+        for col in self.columnas:
+            self.tree.heading(col, text=col)
+            self.tree.column(col, width=anchos.get(col, 100), anchor=ancla)
+
+        self.tree.bind("<Configure>", self._on_configure)
+        self.tree.bind("<Button-1>", self._on_click)
+        self.tree.bind("<MouseWheel>", self._on_rueda)
+        self.tree.bind("<Button-4>", lambda e: self._desplazar(-3))
+        self.tree.bind("<Button-5>", lambda e: self._desplazar(3))
+        for tecla, paso in (("<Up>", -1), ("<Down>", 1)):
+            self.tree.bind(tecla, lambda e, p=paso: self._mover_seleccion(p))
+        self.tree.bind("<Prior>", lambda e: self._mover_seleccion(-self._visibles()))
+        self.tree.bind("<Next>", lambda e: self._mover_seleccion(self._visibles()))
+        self.tree.bind("<Home>", lambda e: self._ir_a(0))
+        self.tree.bind("<End>", lambda e: self._ir_a(len(self.fuente) - 1))
+
+    # -------------------- Datos --------------------
+    def establecer_fuente(self, fuente):
+        """Cambia la fuente de filas y vuelve al inicio."""
+        if self.cargador is not None:
+            # Una página pendiente de la fuente anterior ya no interesa
+            self.cargador.cancelar(self._clave_carga())
+        self._cargando = False
+        self._mensaje = None
+        self.fuente = fuente
+        self._inicio = 0
+        self._seleccionado = None
+        self._renderizar()
+
+    def mostrar_cargando(self, texto="⏳ Cargando..."):
+        """Indica que vienen datos en camino; se ve mientras la tabla esté vacía."""
+        self._mensaje = texto
+        self._renderizar()
+
+    def establecer_filas(self, filas):
+        """Atajo para mostrar una lista en memoria."""
+        self.establecer_fuente(FuenteLista(filas))
+
+    def reemplazar_filas(self, filas, clave="id"):
+        """
+        Muestra una versión nueva de la lista sin perder la posición del usuario.
+
+        A diferencia de establecer_filas, la fila seleccionada y la primera fila
+        visible se ubican por clave en la lista nueva; si siguen existiendo, la
+        tabla queda donde estaba y solo se reescriben las ranuras que cambiaron.
+        """
+        filas = list(filas)
+        anterior = self.fuente
+        seleccionada = self.fila_seleccionada()
+        primera = anterior.fila(self._inicio) if self._inicio < len(anterior) else None
+
+        claves = {}
+        for indice, fila in enumerate(filas):
+            claves.setdefault(fila[clave], indice)
+
+        if self.cargador is not None:
+            self.cargador.cancelar(self._clave_carga())
+        self._cargando = False
+        self._mensaje = None
+        self.fuente = FuenteLista(filas)
+        self._seleccionado = claves.get(seleccionada[clave]) if seleccionada is not None else None
+        if primera is not None and primera[clave] in claves:
+            self._inicio = claves[primera[clave]]
+        self._renderizar()
+
+    def limpiar(self):
+        self.establecer_fuente(FuenteLista())
+
+    def refrescar(self):
+        """Vuelve a dibujar la ventana visible (p. ej. tras modificar filas de la fuente)."""
+        self._renderizar()
+
+    def total(self):
+        return len(self.fuente)
+
+    # -------------------- Selección --------------------
+    def indice_seleccionado(self):
+        return self._seleccionado
+
+    def fila_seleccionada(self):
+        """Fila original (sin formatear) seleccionada, o None."""
+        if self._seleccionado is None or self._seleccionado >= len(self.fuente):
+            return None
+        return self.fuente.fila(self._seleccionado)
+
+    def valores_seleccionados(self):
+        """Valores mostrados de la fila seleccionada (como los de Treeview.item(...)['values'])."""
+        fila = self.fila_seleccionada()
+        return tuple(self.formatear(fila)) if fila is not None else None
+
+    def seleccionar(self, indice):
+        if not len(self.fuente):
+            return
+        self._seleccionado = max(0, min(indice, len(self.fuente) - 1))
+        self.ver(self._seleccionado)
+
+    def ver(self, indice):
+        """Desplaza lo mínimo necesario para que la fila quede visible."""
+        visibles = self._visibles()
+        if indice < self._inicio:
+            self._inicio = indice
+        elif indice >= self._inicio + visibles:
+            self._inicio = indice - visibles + 1
+        self._renderizar()
+
+    # -------------------- Geometría --------------------
+    def _alto_fila(self):
+        try:
+            alto = int(ttk.Style().lookup("Treeview", "rowheight") or 0)
+        except (tk.TclError, ValueError):
+            alto = 0
+        return alto or 20
+
+    def _visibles(self):
+        return max(1, len(self._ranuras))
+
+    def _on_configure(self, event):
+        alto_fila = self._alto_fila()
+        # Se descuenta el encabezado (aprox. una fila)
+        visibles = max(1, (event.height - alto_fila - 4) // alto_fila)
+        if visibles != len(self._ranuras):
+            self._ajustar_ranuras(visibles)
+            self._renderizar()
+
+    def _ajustar_ranuras(self, cantidad):
+        while len(self._ranuras) < cantidad:
+            iid = str(len(self._ranuras))
+            self.tree.insert("", "end", iid=iid, values=())
+            self._ranuras.append(iid)
+            self._mostrado[iid] = ((), ())
+        while len(self._ranuras) > cantidad:
+            iid = self._ranuras.pop()
+            self.tree.delete(iid)
+            self._mostrado.pop(iid, None)
+
+    def _escribir_ranura(self, iid, valores, tags):
+        """Actualiza el ítem de Tk solo si su contenido cambió."""
+        if self._mostrado.get(iid) != (valores, tags):
+            self.tree.item(iid, values=valores, tags=tags)
+            self._mostrado[iid] = (valores, tags)
+
+    # -------------------- Dibujo --------------------
+    def _renderizar(self):
+        total = len(self.fuente)
+        visibles = self._visibles()
+        self._inicio = max(0, min(self._inicio, total - visibles))
+        mensaje = self._mensaje or ("⏳ Cargando..." if self._cargando else None)
+
+        seleccion = ()
+        for posicion, iid in enumerate(self._ranuras):
+            indice = self._inicio + posicion
+            if indice < total:
+                fila = self.fuente.fila(indice)
+                tags = tuple(self.etiquetas(fila)) if self.etiquetas else ()
+                self._escribir_ranura(iid, tuple(self.formatear(fila)), tags)
+                if indice == self._seleccionado:
+                    seleccion = (iid,)
+            elif indice == 0 and (mensaje or self.texto_vacio):
+                texto = mensaje or self.texto_vacio
+                self._escribir_ranura(iid, ("", texto) if len(self.columnas) > 1 else (texto,), ())
+            else:
+                self._escribir_ranura(iid, (), ())
+        if self.tree.selection() != seleccion:
+            self.tree.selection_set(seleccion)
+
+        if total:
+            self.scrollbar.set(self._inicio / total, min(1.0, (self._inicio + visibles) / total))
+        else:
+            self.scrollbar.set(0, 1)
+
+        self._precargar()
+
+    def _clave_carga(self):
+        return f"tabla-{id(self)}"
+
+    def _precargar(self):
+        """Pide la siguiente página cuando quedan pocas filas bajo la ventana visible."""
+        if self._cargando or not self.fuente.hay_mas():
+            return
+        if self._inicio + self._visibles() + self.precarga < len(self.fuente):
+            return
+        self._cargando = True
+        fuente = self.fuente
+        if self.cargador is not None and hasattr(fuente, 'cargar_pagina'):
+            self.cargador.ejecutar(
+                self._clave_carga(), fuente.cargar_pagina, fuente.token_siguiente,
+                al_terminar=lambda pagina: self._pagina_recibida(fuente, *pagina),
+                al_fallar=lambda error: self._pagina_fallida(fuente, error)
+            )
+        else:
+            # Fuera del evento de desplazamiento para no bloquear el redibujado
+            self.after_idle(self._cargar_mas)
+
+    def _cargar_mas(self):
+        fuente = self.fuente
+        try:
+            filas, token = fuente.cargar_pagina(fuente.token_siguiente)
+        except Exception as e:
+            self._pagina_fallida(fuente, e)
+        else:
+            self._pagina_recibida(fuente, filas, token)
+
+    def _pagina_recibida(self, fuente, filas, token_siguiente):
+        if fuente is not self.fuente:
+            return
+        self._cargando = False
+        fuente.agregar_pagina(filas, token_siguiente)
+        self._renderizar()
+        self.event_generate("<<FilasCargadas>>")
+
+    def _pagina_fallida(self, fuente, error):
+        if fuente is not self.fuente:
+            return
+        self._cargando = False
+        # Sin detenerla, cada desplazamiento volvería a intentar la misma página
+        fuente.detener()
+        self.ultimo_error = error
+        self._renderizar()
+        self.event_generate("<<ErrorCarga>>")
+
+    # -------------------- Desplazamiento --------------------
+    def _desplazar(self, filas):
+        self._inicio += filas
+        self._renderizar()
+        return "break"
+
+    def _ir_a(self, indice):
+        self.seleccionar(indice)
+        return "break"
+
+    def _mover_seleccion(self, paso):
+        if self._seleccionado is None:
+            self.seleccionar(self._inicio)
+        else:
+            self.seleccionar(self._seleccionado + paso)
+        return "break"
+
+    def _on_rueda(self, event):
+        # Windows envía múltiplos de 120; macOS valores pequeños
+        paso = -event.delta // 120 if abs(event.delta) >= 120 else -event.delta
+        return self._desplazar(paso * 3)
+
+    def _on_scrollbar(self, accion, *args):
+        total = len(self.fuente)
+        visibles = self._visibles()
+        if accion == "moveto":
+            self._inicio = int(float(args[0]) * total)
+        elif accion == "scroll":
+            cantidad, unidad = int(args[0]), args[1]
+            self._inicio += cantidad * (visibles if unidad == "pages" else 1)
+        self._renderizar()
+
+    def _on_click(self, event):
+        if self.tree.identify_region(event.x, event.y) not in ("cell", "tree"):
+            return None
+        iid = self.tree.identify_row(event.y)
+        if not iid:
+            return None
+        indice = self._inicio + self._ranuras.index(iid)
+        self._seleccionado = indice if indice < len(self.fuente) else None
+        self.tree.focus_set()
+        self._renderizar()
+        return None
+
+
+# ============================================================
+# TREEVIEW COMÚN CON CAMBIOS INCREMENTALES
+# ============================================================
+
+def _subsecuencia_creciente(valores):
+    """Posiciones de una subsecuencia creciente más larga de valores (O(n log n))."""
+    colas = []       # colas[k]: menor valor final de una subsecuencia de largo k+1
+    indices = []     # posición en valores de cada colas[k]
+    previo = [-1] * len(valores)
+    for posicion, valor in enumerate(valores):
+        k = bisect_left(colas, valor)
+        if k == len(colas):
+            colas.append(valor)
+            indices.append(posicion)
+        else:
+            colas[k] = valor
+            indices[k] = posicion
+        previo[posicion] = indices[k - 1] if k else -1
+
+    resultado = set()
+    posicion = indices[-1] if indices else -1
+    while posicion != -1:
+        resultado.add(posicion)
+        posicion = previo[posicion]
+    return resultado
+
+
+class SincronizadorTreeview:
+    """
+    Mantiene un ttk.Treeview (de un solo nivel) igual a una lista de filas con el
+    mínimo de operaciones de Tk.
+
+    Los ítems usan la clave primaria como iid. aplicar() borra los que ya no
+    están, inserta los nuevos, reescribe solo los que cambiaron y mueve la menor
+    cantidad posible: las filas que conservan su orden relativo (la subsecuencia
+    creciente más larga) no se tocan. Como los ítems no se recrean, Tk conserva
+    la selección, el foco y el desplazamiento.
+
+    Args:
+        tree (ttk.Treeview): Treeview a mantener.
+        clave (str): Campo de la fila con la clave primaria.
+        formatear (callable): fila -> tupla de valores a mostrar.
+        etiquetas (callable, optional): fila -> tupla de tags.
+    """
+
+    def __init__(self, tree, clave, formatear, etiquetas=None):
+        self.tree = tree
+        self.clave = clave
+        self.formatear = formatear
+        self.etiquetas = etiquetas
+        self._mostrado = {}   # iid -> (valores, tags) escritos en Tk
+
+    def aplicar(self, filas):
+        """
+        Muestra filas en el orden dado.
+
+        Returns:
+            dict: Cantidad de filas insertadas, actualizadas, movidas y eliminadas.
+        """
+        conteo = {'insertadas': 0, 'actualizadas': 0, 'movidas': 0, 'eliminadas': 0}
+        seleccion = self.tree.selection()
+
+        nuevas = {}
+        orden = []
+        for fila in filas:
+            iid = str(fila[self.clave])
+            if iid in nuevas:
+                continue
+            tags = tuple(self.etiquetas(fila)) if self.etiquetas else ()
+            nuevas[iid] = (tuple(self.formatear(fila)), tags)
+            orden.append(iid)
+
+        # 1. Borrar lo que ya no está (incluidos ítems insertados por fuera del sincronizador)
+        actuales = self.tree.get_children("")
+        sobrantes = [iid for iid in actuales if iid not in nuevas]
+        if sobrantes:
+            self.tree.delete(*sobrantes)
+            for iid in sobrantes:
+                self._mostrado.pop(iid, None)
+            conteo['eliminadas'] = len(sobrantes)
+
+        # 2. Las filas que ya estaban y conservan su orden relativo quedan fijas
+        posicion = {iid: i for i, iid in enumerate(i for i in actuales if i in nuevas)}
+        presentes = [iid for iid in orden if iid in posicion]
+        fijas = {presentes[i] for i in _subsecuencia_creciente([posicion[iid] for iid in presentes])}
+
+        # 3. Recorrer el orden nuevo colocando cada fila no fija justo después de la anterior.
+        #    Cuando ya no quedan ítems previos sin recorrer, la anterior es la última del
+        #    árbol y se puede insertar al final sin que Tk cuente posiciones.
+        pendientes = len(posicion)
+        anterior = None
+        for iid in orden:
+            valores, tags = nuevas[iid]
+            if iid in posicion:
+                pendientes -= 1
+                if iid not in fijas:
+                    # Separado primero, el índice no depende de dónde estaba
+                    self.tree.detach(iid)
+                    self.tree.move(iid, "", self._indice_despues(anterior))
+                    conteo['movidas'] += 1
+                if self._mostrado.get(iid) != (valores, tags):
+                    self.tree.item(iid, values=valores, tags=tags)
+                    conteo['actualizadas'] += 1
+            else:
+                indice = "end" if not pendientes else self._indice_despues(anterior)
+                self.tree.insert("", indice, iid=iid, values=valores, tags=tags)
+                conteo['insertadas'] += 1
+            self._mostrado[iid] = (valores, tags)
+            anterior = iid
+
+        # Según la versión de Tk, separar un ítem lo quita de la selección
+        seleccion = tuple(iid for iid in seleccion if iid in nuevas)
+        if conteo['movidas'] and tuple(self.tree.selection()) != seleccion:
+            self.tree.selection_set(seleccion)
+        return conteo
+
+    def _indice_despues(self, iid):
+        return 0 if iid is None else self.tree.index(iid) + 1
@@ -0,0 +1,61 @@
+# conftest.py
+"""
+Fixtures de las pruebas. Cada prueba que toca la base usa un archivo SQLite
+propio (DB_BACKEND=sqlite en tmp_path): no hace falta MySQL ni se toca la
+base configurada.
+
+    cd "papeleria angel"
+    python -m pytest -q
+"""
+import os
+import sys
+
+import pytest
+
+# Los módulos de la aplicación se importan por nombre (import database), como en main.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+
+
+@pytest.fixture
+def base_sqlite(tmp_path, monkeypatch):
+    """Base SQLite vacía; el pool se cierra antes y después para que tome la ruta de esta prueba."""
+    monkeypatch.setenv('DB_BACKEND', 'sqlite')
+    monkeypatch.setenv('DB_SQLITE_PATH', str(tmp_path / 'pruebas.sqlite3'))
+    monkeypatch.delenv('DB_SQLITE_READ_PATH', raising=False)
+    database.cerrar_pool()
+    _vaciar_caches()
+    yield database
+    database.cerrar_pool()
+    _vaciar_caches()
+
+
+def _vaciar_caches():
+    """Las cachés son del proceso: lo leído de la base de otra prueba no debe verse en esta."""
+    import catalogo_cache
+    import clientes_controller
+    import suppliers_controller
+    import user_controller
+    catalogo_cache.invalidar_catalogo()
+    for cache in (clientes_controller._cache_clientes, suppliers_controller._cache_proveedores,
+                  user_controller._cache_usuarios):
+        cache.invalidar()
+
+
+@pytest.fixture
+def base_migrada(base_sqlite):
+    """Base con todas las migraciones, un usuario, un proveedor y dos productos (ids 1 y 2)."""
+    import migraciones
+    ok, mensaje = migraciones.aplicar_migraciones()
+    assert ok, mensaje
+    with database.transaccion() as cursor:
+        cursor.execute("INSERT INTO usuarios (nombre, correo, contraseña, rol) VALUES (%s, %s, %s, %s)",
+                       ("Ana", "ana@papeleria.mx", "x", "admin"))
+        cursor.execute("INSERT INTO proveedores (nombre_empresa) VALUES (%s)", ("Papelera del Norte",))
+        cursor.executemany("""
+            INSERT INTO productos (nombre, precio_compra, precio_venta, stock, categoria, proveedor_id)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, [("Cuaderno profesional", 20, 35, 10, "Cuadernos", 1),
+              ("Lápiz HB", 2, 5, 100, "Escritura", 1)])
+    return database
@@ -0,0 +1,48 @@
+# test_catalogo.py
+"""Caché del catálogo: bajas lógicas y verificación de cambios en segundo plano."""
+import threading
+import time
+
+from catalogo_cache import CatalogoProductos
+
+
+def _nombres(catalogo):
+    return {p['nombre'] for p in catalogo.productos()}
+
+
+def test_refrescar_un_producto_dado_de_baja_lo_quita(base_migrada):
+    catalogo = CatalogoProductos(intervalo_verificacion=3600)
+    catalogo._con_marcas = False   # como una base sin la migración 5
+    assert _nombres(catalogo) == {"Cuaderno profesional", "Lápiz HB"}
+    with base_migrada.transaccion() as cursor:
+        cursor.execute("UPDATE productos SET activo = 0 WHERE id = 1")
+    catalogo.refrescar_productos([1])
+    assert _nombres(catalogo) == {"Lápiz HB"}
+    assert catalogo.obtener(1) is None
+
+
+def test_lecturas_no_esperan_la_verificacion_de_cambios(base_migrada):
+    catalogo = CatalogoProductos(intervalo_verificacion=0)
+    catalogo.productos()
+
+    consultar = catalogo._consultar
+    liberar = threading.Event()
+
+    def consulta_lenta(*args, **kwargs):
+        liberar.wait(5)   # como una base que no responde
+        return consultar(*args, **kwargs)
+
+    catalogo._consultar = consulta_lenta
+    with base_migrada.transaccion() as cursor:
+        cursor.execute("UPDATE productos SET stock = 99, fecha_actualizacion = CURRENT_TIMESTAMP WHERE id = 1")
+
+    inicio = time.monotonic()
+    assert catalogo.obtener(1)['stock'] == 10        # copia actual mientras se verifica
+    assert catalogo.buscar("lapiz")[0]['id'] == 2
+    assert time.monotonic() - inicio < 1
+
+    liberar.set()
+    limite = time.monotonic() + 5
+    while catalogo.obtener(1)['stock'] != 99 and time.monotonic() < limite:
+        time.sleep(0.01)
+    assert catalogo.obtener(1)['stock'] == 99
@@ -0,0 +1,69 @@
+# test_historial.py
+"""Paginación por cursor (keyset) del historial de ventas."""
+import pytest
+
+import sales_history_controller
+from sales_history_controller import _codificar_token, _decodificar_token, get_sales_history_page
+
+
+def test_token_ida_y_vuelta():
+    token = _codificar_token({'fecha_venta': '2024-03-01 10:00:00', 'venta_id': 7, 'detalle_id': 12})
+    assert _decodificar_token(token) == ('2024-03-01 10:00:00', 7, 12)
+
+
+@pytest.mark.parametrize("token", ["no-es-base64!", "W10=", "WyJhIiwgIngiLCAxXQ=="])
+def test_token_invalido(token):
+    with pytest.raises(ValueError):
+        _decodificar_token(token)
+
+
+@pytest.fixture
+def ventas(base_migrada):
+    """Cinco ventas de dos renglones; dos comparten fecha para probar el desempate por id."""
+    fechas = ["2024-03-01 09:00:00", "2024-03-01 09:00:00", "2024-03-02 12:30:00",
+              "2024-03-03 18:00:00", "2024-03-05 08:15:00"]
+    with base_migrada.transaccion() as cursor:
+        for fecha in fechas:
+            cursor.execute("INSERT INTO ventas (usuario_id, fecha_venta, total) VALUES (1, %s, 40)", (fecha,))
+            venta_id = cursor.lastrowid
+            cursor.executemany("""
+                INSERT INTO detalle_venta (venta_id, producto_id, cantidad, precio_unitario, subtotal)
+                VALUES (%s, %s, %s, %s, %s)
+            """, [(venta_id, 1, 1, 35, 35), (venta_id, 2, 1, 5, 5)])
+    return base_migrada
+
+
+def _todas_las_paginas(tamano, **filtro):
+    filas, token, paginas = [], None, 0
+    while True:
+        exito, pagina = get_sales_history_page(tamano_pagina=tamano, token=token, **filtro)
+        assert exito, pagina
+        filas.extend(pagina['ventas'])
+        paginas += 1
+        token = pagina['token_siguiente']
+        if not token:
+            return filas, paginas
+
+
+@pytest.mark.parametrize("tamano", [1, 3, 4, 10])
+def test_paginas_sin_huecos_ni_repetidos(ventas, tamano):
+    filas, _ = _todas_las_paginas(tamano)
+    claves = [(str(f['fecha_venta']), f['venta_id'], f['detalle_id']) for f in filas]
+    assert len(claves) == 10
+    assert len(set(claves)) == 10
+    assert claves == sorted(claves, reverse=True)
+
+
+def test_paginas_con_filtro_de_fechas(ventas):
+    filas, _ = _todas_las_paginas(2, fecha_inicio='2024-03-01', fecha_fin='2024-03-02')
+    assert {f['venta_id'] for f in filas} == {1, 2, 3}
+
+
+def test_token_invalido_devuelve_error(ventas):
+    exito, mensaje = get_sales_history_page(token="no-es-base64!")
+    assert exito is False
+    assert "inválido" in mensaje
+
+
+def test_iterar_historial_recorre_todo(ventas):
+    assert len(list(sales_history_controller.iterar_historial_ventas(tam_lote=3))) == 10
@@ -0,0 +1,64 @@
+# test_importacion.py
+"""Lectura de CSV (import_controller) e importación de productos."""
+import pytest
+
+from import_controller import leer_filas_csv, ColumnasFaltantes
+from products_controller import importar_productos_csv
+
+
+def _archivo(tmp_path, contenido, nombre="productos.csv", codificacion="utf-8"):
+    ruta = tmp_path / nombre
+    ruta.write_bytes(contenido.encode(codificacion))
+    return str(ruta)
+
+
+def test_encabezados_normalizados_y_separador(tmp_path):
+    ruta = _archivo(tmp_path, "Nombre;Precio Venta;Categoría\nCuaderno; 35 ;Cuadernos\n\n")
+    assert list(leer_filas_csv(ruta)) == [
+        (2, {'nombre': 'Cuaderno', 'precio_venta': '35', 'categoria': 'Cuadernos'}),
+    ]
+
+
+def test_csv_de_excel_en_cp1252(tmp_path):
+    ruta = _archivo(tmp_path, "nombre,categoria\nLápiz,Escritura\n", codificacion="cp1252")
+    assert [fila for _, fila in leer_filas_csv(ruta)] == [{'nombre': 'Lápiz', 'categoria': 'Escritura'}]
+
+
+def test_columnas_requeridas_se_validan_con_el_encabezado(tmp_path):
+    ruta = _archivo(tmp_path, "nombre,precio\n")
+    with pytest.raises(ColumnasFaltantes) as error:
+        list(leer_filas_csv(ruta, requeridas=("nombre", "stock", ("proveedor_id", "proveedor_nombre"))))
+    assert error.value.faltantes == ["stock", "proveedor_id o proveedor_nombre"]
+
+
+def test_archivo_sin_encabezados(tmp_path):
+    with pytest.raises(ValueError):
+        list(leer_filas_csv(_archivo(tmp_path, "")))
+
+
+@pytest.mark.parametrize("contenido", [
+    "nombre,precio\n",                          # solo encabezado, columnas incorrectas
+    "producto,costo,venta\nCuaderno,1,2\n",     # encabezado incorrecto con datos
+    "nombre,precio_compra,precio_venta,stock\nCuaderno,1,2,3\n",   # falta el proveedor
+])
+def test_importacion_rechaza_encabezado_incompleto(base_migrada, tmp_path, contenido):
+    exito, mensaje = importar_productos_csv(_archivo(tmp_path, contenido))
+    assert exito is False
+    assert "Faltan columnas" in mensaje
+
+
+def test_importacion_inserta_actualiza_y_reporta_errores(base_migrada, tmp_path):
+    ruta = _archivo(tmp_path, (
+        "nombre,precio_compra,precio_venta,stock,proveedor_nombre,sku\n"
+        "Carpeta oficio,8,15,40,Papelera del Norte,CARP-01\n"
+        "Marcador negro,6,12,abc,Papelera del Norte,MARC-01\n"
+        "Carpeta oficio azul,8,16,30,Papelera del Norte,carp-01\n"
+    ))
+    exito, resumen = importar_productos_csv(ruta)
+    assert exito, resumen
+    assert resumen['leidas'] == 3
+    assert [linea for linea, _ in resumen['errores']] == [3, 4]
+
+    with base_migrada.transaccion() as cursor:
+        cursor.execute("SELECT nombre, stock FROM productos WHERE sku = %s", ("CARP-01",))
+        assert cursor.fetchall() == [("Carpeta oficio", 40)]
@@ -0,0 +1,62 @@
+# test_motor_sqlite.py
+"""Traducción del SQL de MySQL al de SQLite y errores con el errno de MySQL."""
+import pytest
+
+from motor_sqlite import traducir_sql, MODO_LECTURA, MODO_ESCRITURA, MODO_DDL
+
+
+def test_marcadores_y_modo_de_lectura():
+    sentencias, modo = traducir_sql("SELECT id FROM productos WHERE id = %s AND activo = %s")
+    assert sentencias == ("SELECT id FROM productos WHERE id = ? AND activo = ?",)
+    assert modo == MODO_LECTURA
+
+
+def test_for_update_abre_transaccion_de_escritura():
+    sentencias, modo = traducir_sql("SELECT stock FROM productos WHERE id = %s FOR UPDATE")
+    assert "FOR UPDATE" not in sentencias[0]
+    assert modo == MODO_ESCRITURA
+
+
+def test_on_duplicate_key_update():
+    sentencias, modo = traducir_sql(
+        "INSERT INTO versiones_tablas (tabla, version) VALUES (%s, 1) "
+        "ON DUPLICATE KEY UPDATE version = VALUES(version) + 1")
+    assert "ON CONFLICT DO UPDATE SET" in sentencias[0]
+    assert "excluded.version" in sentencias[0]
+    assert modo == MODO_ESCRITURA
+
+
+def test_insert_ignore():
+    sentencias, _ = traducir_sql("INSERT IGNORE INTO clientes (id, nombre) VALUES (%s, %s)")
+    assert sentencias[0].startswith("INSERT OR IGNORE INTO clientes")
+
+
+def test_create_table_con_indices():
+    sentencias, modo = traducir_sql("""
+        CREATE TABLE IF NOT EXISTS resumen (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            fecha DATE NOT NULL,
+            UNIQUE KEY uq_resumen_fecha (fecha),
+            KEY idx_resumen_id_fecha (id, fecha)
+        )
+    """)
+    assert modo == MODO_DDL
+    assert "INTEGER PRIMARY KEY AUTOINCREMENT" in sentencias[0]
+    assert "KEY" not in sentencias[0].replace("PRIMARY KEY", "")
+    assert sentencias[1:] == (
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_resumen_fecha ON resumen (fecha)",
+        "CREATE INDEX IF NOT EXISTS idx_resumen_id_fecha ON resumen (id, fecha)",
+    )
+
+
+@pytest.mark.parametrize("sql, errno", [
+    ("SELECT * FROM tabla_que_no_existe", 1146),
+    ("SELECT columna_que_no_existe FROM productos", 1054),
+    ("INSERT INTO proveedores (id, nombre_empresa) VALUES (1, 'Repetido')", 1062),
+    ("INSERT INTO productos (nombre, proveedor_id) VALUES ('Sin proveedor', 999)", 1452),
+])
+def test_errores_con_errno_de_mysql(base_migrada, sql, errno):
+    with pytest.raises(base_migrada.Error) as error:
+        with base_migrada.transaccion() as cursor:
+            cursor.execute(sql)
+    assert error.value.errno == errno
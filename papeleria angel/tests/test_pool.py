@@ -0,0 +1,74 @@
+# test_pool.py
+"""PoolConexiones con conexiones falsas: reutilización, desborde y límite de espera."""
+import pytest
+
+from database import PoolConexiones, PoolAgotado
+
+
+class ConexionFalsa:
+    def __init__(self):
+        self.cerrada = False
+        self.rollbacks = 0
+        self.in_transaction = True
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.cerrada = True
+
+    def is_connected(self):
+        return not self.cerrada
+
+
+@pytest.fixture
+def creadas():
+    return []
+
+
+@pytest.fixture
+def fabrica(creadas):
+    def crear():
+        conn = ConexionFalsa()
+        creadas.append(conn)
+        return conn
+    return crear
+
+
+def test_reutiliza_la_conexion_devuelta(fabrica, creadas):
+    pool = PoolConexiones(fabrica, tamano=1, max_desborde=0)
+    pool.obtener().close()
+    pool.obtener().close()
+    assert len(creadas) == 1
+    # Al devolverse se deshace la transacción que hubiera quedado abierta
+    assert creadas[0].rollbacks == 2
+    assert pool.estadisticas() == {'abiertas': 1, 'libres': 1, 'prestadas': 0}
+
+
+def test_conexion_de_desborde_se_cierra_al_devolverse(fabrica, creadas):
+    pool = PoolConexiones(fabrica, tamano=1, max_desborde=1)
+    primera, segunda = pool.obtener(), pool.obtener()
+    primera.close()
+    segunda.close()
+    assert [c.cerrada for c in creadas] == [False, True]
+    assert pool.estadisticas()['abiertas'] == 1
+
+
+def test_pool_agotado(fabrica):
+    pool = PoolConexiones(fabrica, tamano=1, max_desborde=0, espera_max=0)
+    prestada = pool.obtener()
+    with pytest.raises(PoolAgotado):
+        pool.obtener()
+    prestada.close()
+    pool.obtener().close()
+
+
+def test_falla_de_la_fabrica_libera_el_cupo():
+    def fabrica_rota():
+        raise OSError("sin red")
+
+    pool = PoolConexiones(fabrica_rota, tamano=1, max_desborde=0, espera_max=0)
+    for _ in range(2):
+        with pytest.raises(OSError):
+            pool.obtener()
+    assert pool.estadisticas()['abiertas'] == 0
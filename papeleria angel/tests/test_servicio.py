@@ -0,0 +1,87 @@
+# test_servicio.py
+"""Codificación del protocolo y contrato de resultados del cliente del servicio HTTP."""
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+import socket
+import threading
+
+import pytest
+
+from cliente_servicio import ClienteServicio
+from protocolo_servicio import FUNCIONES, FALLAS, codificar, decodificar
+import servicio_http
+
+
+def test_ida_y_vuelta_conserva_los_tipos():
+    valor = {
+        'exito': (True, "✅ Venta 5 registrada"),
+        'fecha': date(2024, 3, 1),
+        'momento': datetime(2024, 3, 1, 9, 30),
+        'total': Decimal("70.50"),
+        'duracion': timedelta(hours=2),
+        'por_producto': {1: 2, 2: 3},
+        'filas': [(1, "Cuaderno"), (2, "Lápiz")],
+    }
+    assert decodificar(codificar(valor)) == valor
+    assert isinstance(decodificar(codificar((False, "x"))), tuple)
+
+
+def test_toda_funcion_publicada_tiene_valor_de_falla_salvo_registrar_venta_en_base():
+    assert set(FALLAS) == set(FUNCIONES) - {'registrar_venta_en_base'}
+
+
+def _puerto_cerrado():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def cliente_sin_servicio():
+    return ClienteServicio(f"http://127.0.0.1:{_puerto_cerrado()}", timeout=2)
+
+
+@pytest.mark.parametrize("nombre, args", [
+    ('login', ("ana@papeleria.mx", "x")),
+    ('obtener_productos_activos', ()),
+    ('obtener_todos_clientes', ()),
+    ('registrar_venta', (1, [])),
+    ('get_sales_history_page', ()),
+])
+def test_sin_servicio_devuelve_el_valor_de_falla_local(cliente_sin_servicio, nombre, args):
+    assert cliente_sin_servicio.funcion(nombre)(*args) == FALLAS[nombre]
+
+
+def test_sin_servicio_registrar_venta_en_base_lanza_sin_conexion(cliente_sin_servicio):
+    from database import SinConexion
+    with pytest.raises(SinConexion):
+        cliente_sin_servicio.funcion('registrar_venta_en_base')(1, [])
+
+
+@pytest.fixture
+def servicio(base_migrada):
+    servidor = servicio_http.crear_servidor('127.0.0.1', _puerto_cerrado(), token="secreto")
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def test_resultados_remotos_iguales_a_los_locales(servicio):
+    host, puerto = servicio.server_address[:2]
+    cliente = ClienteServicio(f"http://{host}:{puerto}", token="secreto")
+    assert cliente.funcion('login')("nadie@papeleria.mx", "x") == (False, "Correo o contraseña incorrectos")
+    productos = cliente.funcion('obtener_productos_activos')()
+    assert {p['nombre'] for p in productos} == {"Cuaderno profesional", "Lápiz HB"}
+    # La segunda lectura se responde con 304 y la copia local
+    assert cliente.funcion('obtener_productos_activos')() == productos
+
+
+def test_token_incorrecto_se_rechaza(servicio):
+    from cliente_servicio import ErrorServicio
+    host, puerto = servicio.server_address[:2]
+    cliente = ClienteServicio(f"http://{host}:{puerto}", token="otro")
+    with pytest.raises(ErrorServicio) as error:
+        cliente.funcion('obtener_productos_activos')()
+    assert error.value.estado == 401
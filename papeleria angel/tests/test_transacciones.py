@@ -0,0 +1,117 @@
+# test_transacciones.py
+"""transaccion() anidada (puntos de guardado), al_confirmar y ejecutar_transaccion."""
+import pytest
+
+
+@pytest.fixture
+def db(base_sqlite):
+    with base_sqlite.transaccion() as cursor:
+        cursor.execute("CREATE TABLE IF NOT EXISTS contadores (id INT PRIMARY KEY, valor INT NOT NULL)")
+    with base_sqlite.transaccion() as cursor:
+        cursor.execute("INSERT INTO contadores (id, valor) VALUES (1, 0), (2, 0)")
+    return base_sqlite
+
+
+def _valores(db):
+    with db.transaccion() as cursor:
+        cursor.execute("SELECT id, valor FROM contadores ORDER BY id")
+        return {fila[0]: fila[1] for fila in cursor.fetchall()}
+
+
+def test_excepcion_en_bloque_anidado_solo_deshace_su_punto(db):
+    with db.transaccion() as externo:
+        externo.execute("UPDATE contadores SET valor = 1 WHERE id = 1")
+        with pytest.raises(ValueError):
+            with db.transaccion() as cursor:
+                cursor.execute("UPDATE contadores SET valor = 1 WHERE id = 2")
+                raise ValueError("falla del bloque anidado")
+    assert _valores(db) == {1: 1, 2: 0}
+
+
+def test_revertir_en_bloque_anidado_conserva_la_externa(db):
+    with db.transaccion() as externo:
+        externo.execute("UPDATE contadores SET valor = 3 WHERE id = 1")
+        with db.transaccion() as cursor:
+            cursor.execute("UPDATE contadores SET valor = 3 WHERE id = 2")
+            cursor.revertir()
+    assert _valores(db) == {1: 3, 2: 0}
+
+
+def test_al_confirmar_espera_al_commit_de_la_externa(db):
+    llamadas = []
+    with db.transaccion():
+        with db.transaccion() as cursor:
+            cursor.execute("UPDATE contadores SET valor = 1 WHERE id = 1")
+            db.al_confirmar(llamadas.append, "liberado")
+        assert llamadas == []
+    assert llamadas == ["liberado"]
+
+
+def test_punto_liberado_conserva_su_accion_si_un_hermano_se_deshace(db):
+    llamadas = []
+    with db.transaccion() as externo:
+        with db.transaccion() as cursor:
+            cursor.execute("UPDATE contadores SET valor = 1 WHERE id = 1")
+            db.al_confirmar(llamadas.append, "primero")
+        with pytest.raises(ValueError):
+            with db.transaccion() as cursor:
+                cursor.execute("UPDATE contadores SET valor = 1 WHERE id = 2")
+                db.al_confirmar(llamadas.append, "segundo")
+                raise ValueError("falla del bloque hermano")
+        externo.execute("SELECT 1")
+    assert _valores(db) == {1: 1, 2: 0}
+    assert llamadas == ["primero"]
+
+
+def test_punto_liberado_dentro_de_otro_sobrevive_a_un_hermano_mas_profundo(db):
+    llamadas = []
+    with db.transaccion():
+        with db.transaccion():
+            with db.transaccion() as cursor:
+                cursor.execute("UPDATE contadores SET valor = 5 WHERE id = 1")
+                db.al_confirmar(llamadas.append, "interno")
+        with db.transaccion():
+            with db.transaccion() as cursor:
+                cursor.execute("UPDATE contadores SET valor = 5 WHERE id = 2")
+                db.al_confirmar(llamadas.append, "revertido")
+                cursor.revertir()
+    assert _valores(db) == {1: 5, 2: 0}
+    assert llamadas == ["interno"]
+
+
+def test_externa_revertida_no_ejecuta_acciones(db):
+    llamadas = []
+    with pytest.raises(ValueError):
+        with db.transaccion():
+            with db.transaccion() as cursor:
+                cursor.execute("UPDATE contadores SET valor = 9 WHERE id = 1")
+                db.al_confirmar(llamadas.append, "liberado")
+            raise ValueError("falla de la transacción externa")
+    assert _valores(db) == {1: 0, 2: 0}
+    assert llamadas == []
+
+
+def test_ejecutar_transaccion_deshace_si_el_trabajo_devuelve_false(db):
+    def trabajo(cursor):
+        cursor.execute("UPDATE contadores SET valor = 7 WHERE id = 1")
+        return False, "rechazado"
+
+    assert db.ejecutar_transaccion(trabajo) == (False, "rechazado")
+    assert _valores(db) == {1: 0, 2: 0}
+
+
+def test_ejecutar_transaccion_reintenta_un_bloqueo(db):
+    intentos = []
+
+    def trabajo(cursor):
+        intentos.append(1)
+        cursor.execute("UPDATE contadores SET valor = valor + 1 WHERE id = 1")
+        if len(intentos) == 1:
+            raise db.Error(msg="Lock wait timeout exceeded", errno=1205)
+        return True, "ok"
+
+    politica = db.PoliticaReintentos(intentos=3, espera_base=0, espera_max=0)
+    assert db.ejecutar_transaccion(trabajo, politica=politica) == (True, "ok")
+    assert len(intentos) == 2
+    # El primer intento se deshizo: solo cuenta el UPDATE del segundo
+    assert _valores(db) == {1: 1, 2: 0}
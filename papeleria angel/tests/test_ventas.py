@@ -0,0 +1,52 @@
+# test_ventas.py
+"""registrar_venta_en_base: stock, rechazo y reenvío con clave de idempotencia."""
+from sales_controller import registrar_venta_en_base
+
+CARRITO = [
+    {'producto_id': 1, 'cantidad': 2, 'precio_unitario': 35, 'subtotal': 70},
+    {'producto_id': 2, 'cantidad': 3, 'precio_unitario': 5, 'subtotal': 15},
+]
+
+
+def _contar(db):
+    with db.transaccion() as cursor:
+        cursor.execute("SELECT COUNT(*) FROM ventas")
+        ventas = cursor.fetchone()[0]
+        cursor.execute("SELECT id, stock FROM productos ORDER BY id")
+        return ventas, {fila[0]: fila[1] for fila in cursor.fetchall()}
+
+
+def test_venta_descuenta_stock(base_migrada):
+    exito, mensaje, cantidades = registrar_venta_en_base(1, CARRITO)
+    assert exito, mensaje
+    assert cantidades == {1: 2, 2: 3}
+    assert _contar(base_migrada) == (1, {1: 8, 2: 97})
+
+
+def test_stock_insuficiente_no_registra_nada(base_migrada):
+    carrito = CARRITO + [{'producto_id': 1, 'cantidad': 9, 'precio_unitario': 35, 'subtotal': 315}]
+    exito, mensaje, cantidades = registrar_venta_en_base(1, carrito)
+    assert exito is False
+    assert "Stock insuficiente" in mensaje
+    assert cantidades is None
+    assert _contar(base_migrada) == (0, {1: 10, 2: 100})
+
+
+def test_reenvio_con_la_misma_clave_no_duplica(base_migrada):
+    clave = "3f1c2b8e-0000-4000-8000-000000000001"
+    primera = registrar_venta_en_base(1, CARRITO, clave_idempotencia=clave)
+    repetida = registrar_venta_en_base(1, CARRITO, clave_idempotencia=clave)
+    assert primera[0] and repetida[0]
+    # Mismo mensaje (mismo número de venta); sin cantidades porque no se descontó nada
+    assert repetida[1] == primera[1]
+    assert repetida[2] is None
+    assert _contar(base_migrada) == (1, {1: 8, 2: 97})
+
+
+def test_reenvio_dentro_de_una_transaccion_abierta(base_migrada):
+    clave = "3f1c2b8e-0000-4000-8000-000000000002"
+    registrar_venta_en_base(1, CARRITO, clave_idempotencia=clave)
+    with base_migrada.transaccion():
+        exito, _, cantidades = registrar_venta_en_base(1, CARRITO, clave_idempotencia=clave)
+    assert exito and cantidades is None
+    assert _contar(base_migrada) == (1, {1: 8, 2: 97})
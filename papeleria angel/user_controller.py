@@ -1,5 +1,6 @@
 # user_controller.py
-from database import conectar
+from database import transaccion, SinConexion
+from versiones_tablas import incrementar_version, consultar_si_cambio, CacheVersionada
 from hashlib import sha256
 import logging
 
@@ -9,78 +10,62 @@ logger = logging.getLogger(__name__)
 def hash_password(password):
     return sha256(password.encode('utf-8')).hexdigest()
 
-def get_all_users():
-    conn = conectar()
-    if not conn:
-        return []
-    cursor = conn.cursor(dictionary=True)
+def get_all_users_si_cambio(version_conocida=None):
+    """(versión, usuarios), o (versión, None) si version_conocida sigue vigente (ver versiones_tablas)."""
     query = "SELECT * FROM usuarios ORDER BY nombre ASC"
     try:
-        cursor.execute(query)
-        usuarios = cursor.fetchall()
-        return usuarios
+        with transaccion(dictionary=True) as cursor:
+            return consultar_si_cambio(cursor, "usuarios", version_conocida, query)
+    except SinConexion:
+        return None, []
     except Exception as e:
         logger.error(f"Error al obtener usuarios: {e}")
-        return []
-    finally:
-        cursor.close()
-        conn.close()
+        return None, []
+
+_cache_usuarios = CacheVersionada(get_all_users_si_cambio)
+
+def get_all_users():
+    # Sin cambios desde la última lectura solo se consulta la versión de la tabla
+    return _cache_usuarios.obtener()
 
 def add_user(nombre, correo, contraseña, rol="cajero"):
-    conn = conectar()
-    if not conn:
-        return False, "Error de conexión"
-    cursor = conn.cursor()
     hashed_pass = hash_password(contraseña)
     query = """INSERT INTO usuarios (nombre, correo, contraseña, rol) VALUES (%s, %s, %s, %s)"""
     try:
-        cursor.execute(query, (nombre, correo, hashed_pass, rol))
-        conn.commit()
-        cursor.close()
-        conn.close()
+        with transaccion() as cursor:
+            cursor.execute(query, (nombre, correo, hashed_pass, rol))
+            incrementar_version(cursor, "usuarios")
         return True, "Usuario registrado exitosamente"
+    except SinConexion:
+        return False, "Error de conexión"
     except Exception as e:
-        conn.rollback()
-        cursor.close()
-        conn.close()
         return False, f"Error al registrar: {str(e)}"
 
 def update_user(user_id, nombre, correo, rol):
-    conn = conectar()
-    if not conn:
-        return False, "Error de conexión"
-    cursor = conn.cursor()
     query = """UPDATE usuarios SET nombre = %s, correo = %s, rol = %s WHERE id = %s"""
     try:
-        cursor.execute(query, (nombre, correo, rol, user_id))
-        conn.commit()
-        if cursor.rowcount == 0:
-            return False, "Usuario no encontrado."
-        cursor.close()
-        conn.close()
+        with transaccion() as cursor:
+            cursor.execute(query, (nombre, correo, rol, user_id))
+            if cursor.rowcount == 0:
+                return False, "Usuario no encontrado."
+            incrementar_version(cursor, "usuarios")
         return True, "Usuario actualizado exitosamente"
+    except SinConexion:
+        return False, "Error de conexión"
     except Exception as e:
-        conn.rollback()
-        cursor.close()
-        conn.close()
         return False, f"Error al actualizar: {str(e)}"
 
 def delete_user(user_id):
-    conn = conectar()
-    if not conn:
-        return False, "Error de conexión"
-    cursor = conn.cursor()
     query = "DELETE FROM usuarios WHERE id = %s"
     try:
-        cursor.execute(query, (user_id,))
-        conn.commit()
-        if cursor.rowcount == 0:
-            return False, "Usuario no encontrado."
-        cursor.close()
-        conn.close()
+        with transaccion() as cursor:
+            cursor.execute(query, (user_id,))
+            if cursor.rowcount == 0:
+                cursor.revertir()
+                return False, "Usuario no encontrado."
+            incrementar_version(cursor, "usuarios")
         return True, "Usuario eliminado exitosamente"
+    except SinConexion:
+        return False, "Error de conexión"
     except Exception as e:
-        conn.rollback()
-        cursor.close()
-        conn.close()
-        return False, f"Error al eliminar: {str(e)}"
\ No newline at end of file
+        return False, f"Error al eliminar: {str(e)}"
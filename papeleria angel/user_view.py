@@ -2,6 +2,8 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 from user_controller import get_all_users, add_user, update_user, delete_user
+from cargador_async import CargadorAsync, IndicadorCarga
+from tabla_virtual import SincronizadorTreeview
 
 class UserView:
     def __init__(self, root, usuario):
@@ -10,6 +12,7 @@ class UserView:
         self.root.title("⚙️ Administración de Usuarios - Papelería Ángel")
         self.root.geometry("1000x600")
         self.root.configure(bg="#f5f7fa")
+        self.cargador = CargadorAsync(self.root)
 
         top_bar = tk.Frame(root, bg="#2c3e50", height=60)
         top_bar.pack(fill="x")
@@ -59,6 +62,11 @@ class UserView:
         scrollbar.pack(side="right", fill="y")
 
         self.tree.bind("<ButtonRelease-1>", self.on_tree_click)
+        self.indicador_carga = IndicadorCarga(self.tree)
+        self.sincronizador = SincronizadorTreeview(
+            self.tree, clave='id',
+            formatear=lambda u: (u['id'], u['nombre'], u['correo'], u['rol'], "✏️", "🗑️")
+        )
 
         btn_frame = tk.Frame(table_frame, bg="#f5f7fa")
         btn_frame.pack(pady=10)
@@ -80,11 +88,14 @@ class UserView:
                     self.delete_user_direct(user_id)
 
     def load_users(self):
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        usuarios = get_all_users()
-        for u in usuarios:
-            self.tree.insert("", "end", values=(u['id'], u['nombre'], u['correo'], u['rol'], "✏️", "🗑️"))
+        # Consulta en segundo plano; _mostrar_usuarios llena la tabla en el hilo de Tk
+        self.indicador_carga.mostrar()
+        self.cargador.ejecutar("usuarios", get_all_users, al_terminar=self._mostrar_usuarios)
+
+    def _mostrar_usuarios(self, usuarios):
+        self.indicador_carga.ocultar()
+        # Solo se insertan, actualizan o borran las filas que cambiaron
+        self.sincronizador.aplicar(usuarios)
 
     def add_user(self):
         nombre = self.name_entry.get().strip()
@@ -183,6 +194,7 @@ class UserView:
             messagebox.showinfo("ℹ️ Cancelado", "No se ha eliminado ningún usuario.", parent=self.root)
 
     def back_to_dashboard(self):
+        self.cargador.cerrar()
         self.root.destroy()
         from dashboard_view import DashboardView
         new_root = tk.Tk()
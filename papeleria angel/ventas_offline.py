@@ -0,0 +1,280 @@
+# ventas_offline.py
+"""
+Ventas sin conexión: diario local y reenvío a MySQL.
+
+Si la base no responde al cobrar, la venta se guarda en un diario SQLite local
+(modo WAL con synchronous=FULL: cada venta queda en disco antes de confirmarla
+al cajero) y la caja sigue vendiendo con el catálogo en memoria. Cuando la base
+vuelve, reenviar_pendientes() registra las ventas en el orden en que se
+hicieron, cada una con su clave de idempotencia (migración 8): si una venta ya
+había llegado a la base (p. ej. se cortó la conexión después del COMMIT), no
+se duplica.
+
+El diario solo crece: las ventas no se modifican ni se borran; el resultado de
+cada reenvío se anota en una tabla aparte. Una venta que la base rechaza
+(stock insuficiente, producto dado de baja) queda como conflicto para que el
+encargado la revise; no detiene a las que siguen.
+
+El archivo se indica con VENTAS_OFFLINE_DB (por defecto
+~/.papeleria_angel/ventas_pendientes.sqlite3).
+"""
+from database import SinConexion, PoolAgotado, con_reintentos, al_confirmar, Error
+from sales_controller import registrar_venta_en_base
+from catalogo_cache import obtener_catalogo
+from datetime import datetime
+import json
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger(__name__)
+
+# Errores de MySQL que indican que la base no está disponible (no que rechazó la venta):
+# 2003/2005 no se pudo conectar, 2006 se fue el servidor, 2013 se perdió la conexión,
+# 2055 se perdió la conexión en una lectura/escritura
+_ERRORES_CONEXION = {2003, 2005, 2006, 2013, 2055}
+
+# Error de MySQL "Unknown column": la migración 8 aún no se aplicó
+_ER_BAD_FIELD = 1054
+
+ESTADO_REGISTRADA = "registrada"
+ESTADO_CONFLICTO = "conflicto"
+
+_ESQUEMA = """
+    CREATE TABLE IF NOT EXISTS ventas_diario (
+        secuencia INTEGER PRIMARY KEY AUTOINCREMENT,
+        clave TEXT NOT NULL UNIQUE,
+        fecha_venta TEXT NOT NULL,
+        usuario_id INTEGER NOT NULL,
+        cliente_id INTEGER,
+        items TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS ventas_resultados (
+        clave TEXT PRIMARY KEY REFERENCES ventas_diario(clave),
+        estado TEXT NOT NULL,
+        mensaje TEXT,
+        resuelta_en TEXT NOT NULL
+    );
+"""
+
+_reenvio_lock = threading.Lock()
+_con_clave = True   # False si la base no tiene ventas.clave_idempotencia
+
+
+def ruta_diario():
+    ruta = os.getenv('VENTAS_OFFLINE_DB')
+    if ruta:
+        return ruta
+    return os.path.join(os.path.expanduser("~"), ".papeleria_angel", "ventas_pendientes.sqlite3")
+
+
+def _abrir_diario():
+    ruta = ruta_diario()
+    carpeta = os.path.dirname(ruta)
+    if carpeta:
+        os.makedirs(carpeta, exist_ok=True)
+    conn = sqlite3.connect(ruta, timeout=10)
+    conn.execute("PRAGMA journal_mode=WAL")
+    # FULL: el WAL se sincroniza (fsync) en cada COMMIT
+    conn.execute("PRAGMA synchronous=FULL")
+    conn.executescript(_ESQUEMA)
+    return conn
+
+
+def es_error_de_conexion(error):
+    """True si el error indica que la base no está disponible (la venta puede guardarse offline)."""
+    if isinstance(error, (SinConexion, PoolAgotado)):
+        return True
+    return getattr(error, 'errno', None) in _ERRORES_CONEXION
+
+
+# ============================================================
+# DIARIO LOCAL
+# ============================================================
+
+def guardar_en_diario(clave, usuario_id, items_vendidos, cliente_id=None, fecha_venta=None):
+    """Agrega una venta al diario local; al volver, la venta ya está en disco."""
+    items = [{
+        'producto_id': int(item['producto_id']),
+        'cantidad': int(item['cantidad']),
+        'precio_unitario': float(item['precio_unitario']),
+        'subtotal': float(item['subtotal']),
+    } for item in items_vendidos]
+    fecha_venta = fecha_venta or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    conn = _abrir_diario()
+    try:
+        with conn:
+            conn.execute(
+                "INSERT INTO ventas_diario (clave, fecha_venta, usuario_id, cliente_id, items) VALUES (?, ?, ?, ?, ?)",
+                (clave, fecha_venta, usuario_id, cliente_id, json.dumps(items))
+            )
+    finally:
+        conn.close()
+
+
+def _anotar_resultado(conn, clave, estado, mensaje):
+    with conn:
+        conn.execute(
+            "INSERT INTO ventas_resultados (clave, estado, mensaje, resuelta_en) VALUES (?, ?, ?, ?)",
+            (clave, estado, mensaje, datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        )
+
+
+def _leer_ventas(conn, condicion):
+    filas = conn.execute(f"""
+        SELECT d.secuencia, d.clave, d.fecha_venta, d.usuario_id, d.cliente_id, d.items, r.mensaje
+        FROM ventas_diario d LEFT JOIN ventas_resultados r ON r.clave = d.clave
+        WHERE {condicion}
+        ORDER BY d.secuencia
+    """).fetchall()
+    return [{
+        'secuencia': f[0], 'clave': f[1], 'fecha_venta': f[2], 'usuario_id': f[3],
+        'cliente_id': f[4], 'items': json.loads(f[5]), 'mensaje': f[6],
+    } for f in filas]
+
+
+def ventas_pendientes():
+    """Ventas del diario que aún no llegan a la base, en el orden en que se hicieron."""
+    conn = _abrir_diario()
+    try:
+        return _leer_ventas(conn, "r.clave IS NULL")
+    finally:
+        conn.close()
+
+
+def contar_pendientes():
+    if not os.path.exists(ruta_diario()):
+        return 0
+    conn = _abrir_diario()
+    try:
+        return conn.execute("""
+            SELECT COUNT(*) FROM ventas_diario d
+            WHERE NOT EXISTS (SELECT 1 FROM ventas_resultados r WHERE r.clave = d.clave)
+        """).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def ventas_en_conflicto():
+    """Ventas que la base rechazó al reenviarlas (con el motivo en 'mensaje')."""
+    conn = _abrir_diario()
+    try:
+        return _leer_ventas(conn, f"r.estado = '{ESTADO_CONFLICTO}'")
+    finally:
+        conn.close()
+
+
+# ============================================================
+# REGISTRO Y REENVÍO
+# ============================================================
+
+def _registrar(usuario_id, items, cliente_id, clave, fecha_venta=None):
+    """registrar_venta_en_base con reintentos; ante una caída breve se reintenta antes de pasar al diario."""
+    global _con_clave
+    try:
+        return con_reintentos(registrar_venta_en_base, usuario_id, items, cliente_id,
+                              clave if _con_clave else None, fecha_venta, idempotente=_con_clave)
+    except Error as e:
+        if getattr(e, 'errno', None) != _ER_BAD_FIELD or not _con_clave:
+            raise
+        logger.warning("ventas.clave_idempotencia no existe (aplique migraciones.py); "
+                       "las ventas se reenviarán sin clave de idempotencia.")
+        _con_clave = False
+        return con_reintentos(registrar_venta_en_base, usuario_id, items, cliente_id, None, fecha_venta)
+
+
+def registrar_venta_o_guardar(usuario_id, items_vendidos, cliente_id=None):
+    """
+    Registra la venta en la base o, si la base no está disponible, en el diario local.
+
+    Returns:
+        (bool, str): (éxito, mensaje). Una venta guardada sin conexión cuenta como éxito.
+    """
+    clave = str(uuid.uuid4())
+    fecha_venta = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    try:
+        exito, mensaje, cantidades = _registrar(usuario_id, items_vendidos, cliente_id, clave, fecha_venta)
+    except Error as e:
+        if not es_error_de_conexion(e):
+            logger.error(f"Error de base de datos al registrar venta: {str(e)}", exc_info=True)
+            return False, "❌ Error de base de datos al registrar venta. Consulte logs para detalles."
+        logger.warning(f"Base de datos no disponible; la venta se guarda en el diario local: {e}")
+    except Exception as e:
+        logger.error(f"Error inesperado al registrar venta: {str(e)}", exc_info=True)
+        return False, f"❌ Error inesperado al registrar venta. Error: {str(e)}"
+    else:
+        if cantidades:
+            al_confirmar(obtener_catalogo().descontar_stock, cantidades)
+        return exito, mensaje
+
+    try:
+        guardar_en_diario(clave, usuario_id, items_vendidos, cliente_id, fecha_venta)
+    except (sqlite3.Error, OSError) as e:
+        logger.exception("No se pudo guardar la venta en el diario local")
+        return False, f"❌ Sin conexión y no se pudo guardar la venta localmente: {str(e)}"
+
+    # La caja sigue vendiendo con el stock en memoria descontado
+    cantidades = {}
+    for item in items_vendidos:
+        producto_id = int(item['producto_id'])
+        cantidades[producto_id] = cantidades.get(producto_id, 0) + item['cantidad']
+    obtener_catalogo().descontar_stock(cantidades)
+
+    total = sum(item['subtotal'] for item in items_vendidos)
+    return True, (f"📴 Sin conexión: la venta se guardó en esta caja y se enviará al volver la conexión. "
+                  f"Total: ${total:.2f}")
+
+
+def reenviar_pendientes():
+    """
+    Registra en la base las ventas pendientes del diario, en orden.
+
+    Se detiene en la primera falla de conexión (las demás esperan al siguiente
+    intento, así se conserva el orden). Una venta rechazada por la base queda
+    como conflicto y se sigue con la siguiente.
+
+    Returns:
+        dict: {'registradas': int, 'conflictos': [venta], 'pendientes': int}
+    """
+    resumen = {'registradas': 0, 'conflictos': [], 'pendientes': 0}
+    if not os.path.exists(ruta_diario()):
+        return resumen
+    # Un solo reenvío a la vez en este proceso; entre cajas protege la clave de idempotencia
+    if not _reenvio_lock.acquire(blocking=False):
+        resumen['pendientes'] = contar_pendientes()
+        return resumen
+    try:
+        conn = _abrir_diario()
+        try:
+            pendientes = _leer_ventas(conn, "r.clave IS NULL")
+            for indice, venta in enumerate(pendientes):
+                try:
+                    exito, mensaje, _ = _registrar(venta['usuario_id'], venta['items'], venta['cliente_id'],
+                                                   venta['clave'], venta['fecha_venta'])
+                except Error as e:
+                    if es_error_de_conexion(e):
+                        resumen['pendientes'] = len(pendientes) - indice
+                        break
+                    logger.error(f"Venta {venta['clave']} rechazada por la base: {e}", exc_info=True)
+                    exito, mensaje = False, f"❌ Error de base de datos: {str(e)}"
+
+                if exito:
+                    _anotar_resultado(conn, venta['clave'], ESTADO_REGISTRADA, mensaje)
+                    resumen['registradas'] += 1
+                else:
+                    _anotar_resultado(conn, venta['clave'], ESTADO_CONFLICTO, mensaje)
+                    venta['mensaje'] = mensaje
+                    resumen['conflictos'].append(venta)
+                    logger.warning(f"Venta sin conexión del {venta['fecha_venta']} en conflicto: {mensaje}")
+        finally:
+            conn.close()
+    finally:
+        _reenvio_lock.release()
+
+    if resumen['registradas']:
+        logger.info(f"Ventas sin conexión reenviadas: {resumen['registradas']}")
+    return resumen
@@ -0,0 +1,146 @@
+# versiones_tablas.py
+"""
+Versión por tabla para lecturas condicionales de datos de referencia.
+
+La tabla versiones_tablas (migración 10) guarda un contador por tabla
+(proveedores, usuarios, clientes). Cada escritura de los controladores lo
+incrementa dentro de su misma transacción, así la versión cambia exactamente
+cuando se confirman los datos.
+
+Las funciones *_si_cambio(version_conocida) de los controladores leen primero
+la versión (una búsqueda por clave primaria) y solo traen las filas si el
+llamador no tiene la vigente. CacheVersionada guarda la última copia del
+proceso: reabrir una pantalla cuesta esa única consulta pequeña.
+
+Los cambios hechos a mano en la base, sin pasar por los controladores, no
+incrementan la versión; después de uno, llame a incrementar_version o
+espere a que la copia cumpla su edad máxima (CacheVersionada.max_edad).
+
+Sin la migración 10 las lecturas traen siempre las filas; la tabla se vuelve
+a buscar cada _REINTENTAR_TABLA_CADA segundos, así aplicar la migración no
+obliga a reiniciar las cajas.
+"""
+from database import Error
+import copy
+import logging
+import threading
+import time
+
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger(__name__)
+
+TABLA_VERSIONES = "versiones_tablas"
+
+SQL_CREAR_TABLA_VERSIONES = f"""
+CREATE TABLE IF NOT EXISTS {TABLA_VERSIONES} (
+    tabla VARCHAR(64) NOT NULL PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+)
+"""
+
+# Error de MySQL "Table doesn't exist": falta aplicar la migración 10
+_ER_NO_SUCH_TABLE = 1146
+
+_REINTENTAR_TABLA_CADA = 60.0
+_sin_tabla_hasta = 0.0   # time.monotonic() hasta el que no se consulta la versión
+_aviso_dado = False
+
+
+def _sin_tabla(error):
+    """True (y se deja de leer la versión por un rato) si el error es que versiones_tablas no existe."""
+    global _sin_tabla_hasta, _aviso_dado
+    if getattr(error, 'errno', None) != _ER_NO_SUCH_TABLE:
+        return False
+    if not _aviso_dado:
+        logger.warning(f"La tabla {TABLA_VERSIONES} no existe (aplique migraciones.py); "
+                       "los datos de referencia se leerán completos cada vez.")
+        _aviso_dado = True
+    _sin_tabla_hasta = time.monotonic() + _REINTENTAR_TABLA_CADA
+    return True
+
+
+def incrementar_version(cursor, tabla):
+    """Incrementa la versión de ``tabla``; se llama dentro de la transacción que la modifica."""
+    # Se intenta siempre, aunque la tabla faltara hace poco: si otra caja ya aplicó
+    # la migración y guardó una versión, saltarse el incremento dejaría su copia vieja
+    try:
+        cursor.execute(f"""
+            INSERT INTO {TABLA_VERSIONES} (tabla, version) VALUES (%s, 1)
+            ON DUPLICATE KEY UPDATE version = version + 1
+        """, (tabla,))
+    except Error as e:
+        if not _sin_tabla(e):
+            raise
+
+
+def version_actual(cursor, tabla):
+    """Versión vigente de ``tabla`` (0 si nunca se modificó), o None sin la migración 10."""
+    if time.monotonic() < _sin_tabla_hasta:
+        return None
+    try:
+        cursor.execute(f"SELECT version FROM {TABLA_VERSIONES} WHERE tabla = %s", (tabla,))
+    except Error as e:
+        if _sin_tabla(e):
+            return None
+        raise
+    fila = cursor.fetchone()
+    if fila is None:
+        return 0
+    return fila['version'] if isinstance(fila, dict) else fila[0]
+
+
+def consultar_si_cambio(cursor, tabla, version_conocida, query, params=()):
+    """
+    Ejecuta ``query`` solo si la versión de ``tabla`` no es ``version_conocida``.
+
+    Versión y filas se leen en la misma transacción del cursor.
+
+    Returns:
+        (int|None, list|None): (versión, filas), o (versión, None) si no hubo cambios.
+            Sin la migración 10 la versión es None y siempre se devuelven las filas.
+    """
+    version = version_actual(cursor, tabla)
+    if version is not None and version == version_conocida:
+        return version, None
+    cursor.execute(query, params)
+    return version, cursor.fetchall()
+
+
+class CacheVersionada:
+    """
+    Última copia de una lista de referencia, validada con su función *_si_cambio.
+
+    Args:
+        leer_si_cambio (callable): version_conocida -> (versión, filas | None).
+        max_edad (float): Segundos tras los que las filas se vuelven a traer aunque
+            la versión no haya cambiado (cubre cambios hechos fuera de los controladores).
+    """
+
+    def __init__(self, leer_si_cambio, max_edad=300.0):
+        self._leer_si_cambio = leer_si_cambio
+        self.max_edad = max_edad
+        self._version = None
+        self._filas = None
+        self._leidas_en = 0.0
+        self._lock = threading.Lock()
+
+    def obtener(self):
+        """Copia de las filas vigentes; si no cambiaron, sin volver a traerlas de la base."""
+        with self._lock:
+            conocida = self._version
+            if conocida is not None and time.monotonic() - self._leidas_en >= self.max_edad:
+                conocida = None
+            version, filas = self._leer_si_cambio(conocida)
+            if filas is None:
+                filas = self._filas
+            elif version is not None:
+                self._version, self._filas = version, filas
+                self._leidas_en = time.monotonic()
+            else:
+                self._version = self._filas = None
+            # Las vistas pueden modificar lo que reciben; la copia guardada no debe cambiar
+            return copy.deepcopy(filas)
+
+    def invalidar(self):
+        with self._lock:
+            self._version = self._filas = None